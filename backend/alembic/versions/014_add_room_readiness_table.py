@@ -0,0 +1,63 @@
+"""Create room_readiness projection table
+
+This migration creates the room_readiness table holding materialized
+per-room document/approval counters, maintained on write. Run
+scripts/rebuild_room_readiness.py afterwards to populate existing rooms.
+
+Revision ID: 014_room_readiness
+Revises: 013_add_document_type_fields
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '014_room_readiness'
+down_revision = '013_add_document_type_fields'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create room_readiness table - IDEMPOTENT"""
+    
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+    
+    if 'room_readiness' not in tables:
+        op.create_table(
+            'room_readiness',
+            sa.Column('room_id', sa.String(36), primary_key=True),
+            sa.Column('total_documents', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('missing_documents', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('under_review_documents', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('approved_documents', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('rejected_documents', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('expired_documents', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('required_documents', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('resolved_required_documents', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('total_approvals', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('pending_approvals', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('approved_approvals', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('rejected_approvals', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('oldest_pending_approval_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('next_expiry_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.ForeignKeyConstraint(['room_id'], ['rooms.id'], ondelete='CASCADE'),
+        )
+        print("✅ Created room_readiness table")
+    else:
+        print("⚠️  room_readiness table already exists, skipping")
+
+
+def downgrade() -> None:
+    """Remove room_readiness table"""
+    
+    try:
+        op.drop_table('room_readiness')
+        print("✅ Removed room_readiness table")
+    except Exception as e:
+        print(f"⚠️  Error removing room_readiness table: {e}")
@@ -0,0 +1,74 @@
+"""Add content-addressed document blob index
+
+This migration creates the document_blobs table (one row per distinct
+file content, with a reference count), adds original_filename to
+document_versions and indexes document_versions.sha256.
+
+Existing versions keep their per-upload file paths; only new uploads
+go through the blob layout.
+
+Revision ID: 015_document_blobs
+Revises: 014_room_readiness
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '015_document_blobs'
+down_revision = '014_room_readiness'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create document_blobs and extend document_versions - IDEMPOTENT"""
+    
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+    
+    if 'document_blobs' not in tables:
+        op.create_table(
+            'document_blobs',
+            sa.Column('sha256', sa.String(64), primary_key=True),
+            sa.Column('size_bytes', sa.Integer(), nullable=False),
+            sa.Column('file_url', sa.String(500), nullable=False),
+            sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('last_referenced_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        print("✅ Created document_blobs table")
+    else:
+        print("⚠️  document_blobs table already exists, skipping")
+    
+    columns = [col['name'] for col in inspector.get_columns('document_versions')]
+    if 'original_filename' not in columns:
+        op.add_column(
+            'document_versions',
+            sa.Column('original_filename', sa.String(255), nullable=True),
+        )
+        print("✅ Added original_filename to document_versions")
+    else:
+        print("⚠️  document_versions.original_filename already exists, skipping")
+    
+    indexes = [idx['name'] for idx in inspector.get_indexes('document_versions')]
+    if 'ix_document_versions_sha256' not in indexes:
+        op.create_index('ix_document_versions_sha256', 'document_versions', ['sha256'])
+        print("✅ Created ix_document_versions_sha256")
+    else:
+        print("⚠️  ix_document_versions_sha256 already exists, skipping")
+
+
+def downgrade() -> None:
+    """Remove document_blobs and the document_versions extensions"""
+    
+    try:
+        op.drop_index('ix_document_versions_sha256', table_name='document_versions')
+        op.drop_column('document_versions', 'original_filename')
+        op.drop_table('document_blobs')
+        print("✅ Removed document_blobs table")
+    except Exception as e:
+        print(f"⚠️  Error removing document_blobs table: {e}")
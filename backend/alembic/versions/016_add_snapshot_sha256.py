@@ -0,0 +1,44 @@
+"""Add content hash to snapshots
+
+This migration adds snapshots.sha256, the hash of the rendered snapshot
+file. Downloads use it as a strong ETag; snapshots generated before this
+migration are hashed on first download instead.
+
+Revision ID: 016_snapshot_sha256
+Revises: 015_document_blobs
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '016_snapshot_sha256'
+down_revision = '015_document_blobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Add sha256 to snapshots - IDEMPOTENT"""
+
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = [col['name'] for col in inspector.get_columns('snapshots')]
+    if 'sha256' not in columns:
+        op.add_column('snapshots', sa.Column('sha256', sa.String(64), nullable=True))
+        print("✅ Added sha256 to snapshots")
+    else:
+        print("⚠️  snapshots.sha256 already exists, skipping")
+
+
+def downgrade() -> None:
+    """Remove sha256 from snapshots"""
+
+    try:
+        op.drop_column('snapshots', 'sha256')
+        print("✅ Removed snapshots.sha256")
+    except Exception as e:
+        print(f"⚠️  Error removing snapshots.sha256: {e}")
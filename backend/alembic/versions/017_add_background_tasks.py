@@ -0,0 +1,69 @@
+"""Add durable background task queue table
+
+This migration creates background_tasks, the SQL backend of the task
+queue that replaces the per-task JSON files under uploads/.tasks.
+Tasks are claimed by workers with a lease; dedup_key is unique while a
+task is active.
+
+Revision ID: 017_background_tasks
+Revises: 016_snapshot_sha256
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '017_background_tasks'
+down_revision = '016_snapshot_sha256'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create background_tasks - IDEMPOTENT"""
+
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'background_tasks' not in inspector.get_table_names():
+        op.create_table(
+            'background_tasks',
+            sa.Column('id', sa.String(255), primary_key=True),
+            sa.Column('task_type', sa.String(100), nullable=False),
+            sa.Column('priority', sa.Integer(), nullable=False, server_default='1'),
+            sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+            sa.Column('dedup_key', sa.String(255), nullable=True, unique=True),
+            sa.Column('data', sa.JSON(), nullable=True),
+            sa.Column('result', sa.JSON(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('progress', sa.Float(), nullable=True, server_default='0'),
+            sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='3'),
+            sa.Column('available_at', sa.DateTime(), nullable=False),
+            sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+            sa.Column('worker_id', sa.String(100), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('completed_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index(
+            'ix_background_tasks_claim',
+            'background_tasks',
+            ['task_type', 'status', 'priority', 'available_at'],
+        )
+        print("✅ Created background_tasks table")
+    else:
+        print("⚠️  background_tasks table already exists, skipping")
+
+
+def downgrade() -> None:
+    """Remove background_tasks"""
+
+    try:
+        op.drop_index('ix_background_tasks_claim', table_name='background_tasks')
+        op.drop_table('background_tasks')
+        print("✅ Removed background_tasks table")
+    except Exception as e:
+        print(f"⚠️  Error removing background_tasks table: {e}")
@@ -0,0 +1,132 @@
+"""Add message_reads table and backfill from messages.read_by
+
+This migration creates message_reads, holding a per-(room, user) read
+high-water mark and a maintained unread counter, plus a (room_id,
+created_at) index on messages for the unread range counts. Existing
+read_by JSON arrays are folded into high-water marks: the newest message a
+user had read becomes their mark.
+
+Revision ID: 018_message_reads
+Revises: 017_background_tasks
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '018_message_reads'
+down_revision = '017_background_tasks'
+branch_labels = None
+depends_on = None
+
+
+messages = sa.table(
+    'messages',
+    sa.column('id', sa.String),
+    sa.column('room_id', sa.String),
+    sa.column('sender_email', sa.String),
+    sa.column('created_at', sa.DateTime),
+    sa.column('read_by', sa.Text),
+)
+
+message_reads = sa.table(
+    'message_reads',
+    sa.column('room_id', sa.String),
+    sa.column('user_email', sa.String),
+    sa.column('last_read_at', sa.DateTime),
+    sa.column('last_read_message_id', sa.String),
+    sa.column('unread_count', sa.Integer),
+)
+
+
+def _readers(raw):
+    """Decode a legacy read_by value (JSON text or already a list)"""
+    if not raw:
+        return []
+    if isinstance(raw, (list, tuple)):
+        return list(raw)
+    try:
+        decoded = json.loads(raw)
+    except (TypeError, ValueError):
+        return []
+    return decoded if isinstance(decoded, list) else []
+
+
+def _backfill(bind) -> int:
+    """Fold read_by arrays into one high-water mark per (room, user)"""
+    marks = {}
+    rows = bind.execute(
+        sa.select(messages.c.id, messages.c.room_id, messages.c.created_at, messages.c.read_by)
+        .where(messages.c.read_by.isnot(None))
+    )
+    for message_id, room_id, created_at, read_by in rows:
+        if created_at is None:
+            continue
+        for email in _readers(read_by):
+            key = (room_id, email)
+            if key not in marks or marks[key][0] < created_at:
+                marks[key] = (created_at, message_id)
+
+    for (room_id, email), (last_read_at, message_id) in marks.items():
+        unread = bind.execute(
+            sa.select(sa.func.count(messages.c.id)).where(
+                messages.c.room_id == room_id,
+                messages.c.sender_email != email,
+                messages.c.created_at > last_read_at,
+            )
+        ).scalar() or 0
+        bind.execute(
+            message_reads.insert().values(
+                room_id=room_id,
+                user_email=email,
+                last_read_at=last_read_at,
+                last_read_message_id=message_id,
+                unread_count=unread,
+            )
+        )
+    return len(marks)
+
+
+def upgrade() -> None:
+    """Create message_reads and backfill it - IDEMPOTENT"""
+
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    existing_indexes = {index['name'] for index in inspector.get_indexes('messages')}
+    if 'idx_messages_room_created' not in existing_indexes:
+        op.create_index('idx_messages_room_created', 'messages', ['room_id', 'created_at'])
+        print("✅ Created idx_messages_room_created index")
+
+    if 'message_reads' not in inspector.get_table_names():
+        op.create_table(
+            'message_reads',
+            sa.Column('room_id', sa.String(36), primary_key=True),
+            sa.Column('user_email', sa.String(255), primary_key=True),
+            sa.Column('last_read_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('last_read_message_id', sa.String(36), nullable=True),
+            sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.ForeignKeyConstraint(['room_id'], ['rooms.id'], ondelete='CASCADE'),
+        )
+        print("✅ Created message_reads table")
+
+        backfilled = _backfill(bind)
+        print(f"✅ Backfilled {backfilled} read marks from messages.read_by")
+    else:
+        print("⚠️  message_reads table already exists, skipping")
+
+
+def downgrade() -> None:
+    """Remove message_reads and the messages (room_id, created_at) index"""
+
+    try:
+        op.drop_table('message_reads')
+        op.drop_index('idx_messages_room_created', table_name='messages')
+        print("✅ Removed message_reads table")
+    except Exception as e:
+        print(f"⚠️  Error removing message_reads table: {e}")
@@ -0,0 +1,61 @@
+"""Add composite indexes for keyset pagination
+
+This migration adds (ts, id) composite indexes backing the cursor
+pagination of messages, activities and historical operations. The
+messages (room_id, created_at) index from 018 is superseded by the
+(room_id, created_at, id) index and dropped.
+
+Revision ID: 019_keyset_indexes
+Revises: 018_message_reads
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '019_keyset_indexes'
+down_revision = '018_message_reads'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('idx_activity_log_room_ts_id', 'activity_log', ['room_id', 'ts', 'id']),
+    ('idx_activity_log_ts_id', 'activity_log', ['ts', 'id']),
+    ('idx_messages_room_created_id', 'messages', ['room_id', 'created_at', 'id']),
+    ('idx_rooms_created_id', 'rooms', ['created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Create keyset pagination indexes - IDEMPOTENT"""
+
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    for name, table, columns in INDEXES:
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns)
+            print(f"✅ Created {name} index")
+        else:
+            print(f"⚠️  {name} index already exists, skipping")
+
+    existing = {index['name'] for index in inspector.get_indexes('messages')}
+    if 'idx_messages_room_created' in existing:
+        op.drop_index('idx_messages_room_created', table_name='messages')
+        print("✅ Dropped superseded idx_messages_room_created index")
+
+
+def downgrade() -> None:
+    """Remove keyset pagination indexes"""
+
+    try:
+        op.create_index('idx_messages_room_created', 'messages', ['room_id', 'created_at'])
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
+        print("✅ Removed keyset pagination indexes")
+    except Exception as e:
+        print(f"⚠️  Error removing keyset pagination indexes: {e}")
@@ -0,0 +1,127 @@
+"""Add full-text search index
+
+This migration creates search_index, one row per room, document, message
+and vessel holding its searchable title, body and OCR text, and the
+dialect's text index over it: an FTS5 external-content table kept in step
+by triggers on SQLite, a weighted generated tsvector column with a GIN
+index on PostgreSQL. Existing rows are backfilled from the source tables.
+
+Revision ID: 020_search_index
+Revises: 019_keyset_indexes
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '020_search_index'
+down_revision = '019_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index_fts USING fts5("
+    "title, body, ocr_text, content='search_index', content_rowid='doc_rowid', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS search_index_ai AFTER INSERT ON search_index BEGIN "
+    "INSERT INTO search_index_fts(rowid, title, body, ocr_text) "
+    "VALUES (new.doc_rowid, new.title, new.body, new.ocr_text); END",
+    "CREATE TRIGGER IF NOT EXISTS search_index_ad AFTER DELETE ON search_index BEGIN "
+    "INSERT INTO search_index_fts(search_index_fts, rowid, title, body, ocr_text) "
+    "VALUES ('delete', old.doc_rowid, old.title, old.body, old.ocr_text); END",
+    "CREATE TRIGGER IF NOT EXISTS search_index_au AFTER UPDATE ON search_index BEGIN "
+    "INSERT INTO search_index_fts(search_index_fts, rowid, title, body, ocr_text) "
+    "VALUES ('delete', old.doc_rowid, old.title, old.body, old.ocr_text); "
+    "INSERT INTO search_index_fts(rowid, title, body, ocr_text) "
+    "VALUES (new.doc_rowid, new.title, new.body, new.ocr_text); END",
+]
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(body, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(ocr_text, '')), 'C')"
+)
+
+# (entity_type, SELECT of entity_id, room_id, title, body)
+BACKFILL = [
+    ("room",
+     "SELECT id, id, title, trim(location || ' ' || coalesce(description, '')) FROM rooms"),
+    ("document",
+     "SELECT d.id, d.room_id, t.name, "
+     "trim(t.code || ' ' || coalesce(d.notes, '') || ' ' || coalesce(d.uploaded_by, '')) "
+     "FROM documents d JOIN document_types t ON t.id = d.type_id"),
+    ("message",
+     "SELECT id, room_id, sender_name, content FROM messages"),
+    ("vessel",
+     "SELECT id, room_id, name, imo || ' ' || vessel_type || ' ' || flag FROM vessels"),
+]
+
+
+def upgrade() -> None:
+    """Create and backfill search_index - IDEMPOTENT"""
+
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    is_sqlite = bind.dialect.name == 'sqlite'
+
+    if 'search_index' in inspector.get_table_names():
+        print("⚠️  search_index table already exists, skipping")
+        return
+
+    if is_sqlite:
+        uuid_type = sa.String(36)
+        extra_columns = []
+    else:
+        from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+        uuid_type = UUID(as_uuid=True)
+        extra_columns = [
+            sa.Column('search_vector', TSVECTOR(), sa.Computed(POSTGRES_VECTOR, persisted=True)),
+        ]
+
+    op.create_table(
+        'search_index',
+        sa.Column('doc_rowid', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('entity_type', sa.String(20), nullable=False),
+        sa.Column('entity_id', uuid_type, nullable=False),
+        sa.Column('room_id', uuid_type, nullable=False),
+        sa.Column('title', sa.String(500), nullable=False, server_default=''),
+        sa.Column('body', sa.Text(), nullable=True),
+        sa.Column('ocr_text', sa.Text(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        *extra_columns,
+        sa.ForeignKeyConstraint(['room_id'], ['rooms.id'], ondelete='CASCADE'),
+        sa.UniqueConstraint('entity_type', 'entity_id', name='uq_search_index_entity'),
+    )
+    op.create_index('idx_search_index_room_type', 'search_index', ['room_id', 'entity_type'])
+
+    if is_sqlite:
+        for ddl in SQLITE_DDL:
+            op.execute(ddl)
+        print("✅ Created search_index table with FTS5 index")
+    else:
+        op.create_index(
+            'idx_search_index_vector', 'search_index', ['search_vector'], postgresql_using='gin'
+        )
+        print("✅ Created search_index table with tsvector GIN index")
+
+    for entity_type, source in BACKFILL:
+        result = bind.execute(sa.text(
+            "INSERT INTO search_index (entity_type, entity_id, room_id, title, body) "
+            f"SELECT '{entity_type}', src.* FROM ({source}) AS src"
+        ))
+        print(f"✅ Indexed {result.rowcount} {entity_type} rows")
+
+
+def downgrade() -> None:
+    """Remove search_index"""
+
+    try:
+        if op.get_bind().dialect.name == 'sqlite':
+            op.execute("DROP TABLE IF EXISTS search_index_fts")
+        op.drop_table('search_index')
+        print("✅ Removed search_index table")
+    except Exception as e:
+        print(f"⚠️  Error removing search_index table: {e}")
@@ -0,0 +1,48 @@
+"""Add token version to users
+
+This migration adds users.token_version. Access tokens carry the version
+they were issued at; it is bumped when a user's role, email, activation or
+password changes, which revokes older tokens and lets the authentication
+dependencies serve users of current tokens from an in-process cache.
+
+Revision ID: 021_user_token_version
+Revises: 020_search_index
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '021_user_token_version'
+down_revision = '020_search_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Add token_version to users - IDEMPOTENT"""
+
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = [col['name'] for col in inspector.get_columns('users')]
+    if 'token_version' not in columns:
+        op.add_column(
+            'users',
+            sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'),
+        )
+        print("✅ Added token_version to users")
+    else:
+        print("⚠️  users.token_version already exists, skipping")
+
+
+def downgrade() -> None:
+    """Remove token_version from users"""
+
+    try:
+        op.drop_column('users', 'token_version')
+        print("✅ Removed users.token_version")
+    except Exception as e:
+        print(f"⚠️  Error removing users.token_version: {e}")
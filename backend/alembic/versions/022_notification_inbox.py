@@ -0,0 +1,65 @@
+"""Add notification inbox indexes and dedup key
+
+This migration turns notifications into a persisted per-user inbox: a
+dedup_key column (unique per user) lets producers and the expiry scanner
+write each notice once, and (user_email, read, created_at, id) /
+(user_email, created_at, id) indexes back unread filtering and keyset
+pagination. Rows without a read flag are marked unread.
+
+Revision ID: 022_notification_inbox
+Revises: 021_user_token_version
+Create Date: 2026-10-16 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '022_notification_inbox'
+down_revision = '021_user_token_version'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('idx_notifications_user_read_created', ['user_email', 'read', 'created_at', 'id'], False),
+    ('idx_notifications_user_created', ['user_email', 'created_at', 'id'], False),
+    ('uq_notifications_user_dedup', ['user_email', 'dedup_key'], True),
+]
+
+
+def upgrade() -> None:
+    """Add notifications.dedup_key and inbox indexes - IDEMPOTENT"""
+
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = [col['name'] for col in inspector.get_columns('notifications')]
+    if 'dedup_key' not in columns:
+        op.add_column('notifications', sa.Column('dedup_key', sa.String(255), nullable=True))
+        print("✅ Added dedup_key to notifications")
+    else:
+        print("⚠️  notifications.dedup_key already exists, skipping")
+
+    op.execute(sa.text("UPDATE notifications SET read = :unread WHERE read IS NULL").bindparams(unread=False))
+
+    existing = {index['name'] for index in inspector.get_indexes('notifications')}
+    for name, columns, unique in INDEXES:
+        if name not in existing:
+            op.create_index(name, 'notifications', columns, unique=unique)
+            print(f"✅ Created {name} index")
+        else:
+            print(f"⚠️  {name} index already exists, skipping")
+
+
+def downgrade() -> None:
+    """Remove notification inbox indexes and dedup key"""
+
+    try:
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='notifications')
+        op.drop_column('notifications', 'dedup_key')
+        print("✅ Removed notification inbox indexes and dedup_key")
+    except Exception as e:
+        print(f"⚠️  Error removing notification inbox indexes: {e}")
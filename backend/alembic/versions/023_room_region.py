@@ -0,0 +1,83 @@
+"""Add normalized region to rooms
+
+Regional operation views used to match ``location ILIKE '%region%'`` on
+every room. Rooms now carry the region derived from their location
+(app.regions.extract_region), indexed with (created_at, id) so a region's
+operations page straight off the index. Existing rooms are backfilled,
+and STS operation sessions are moved onto the same region names.
+
+Revision ID: 023_room_region
+Revises: 022_notification_inbox
+Create Date: 2026-10-16 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.regions import REGIONS, extract_region, operation_region
+
+
+# revision identifiers, used by Alembic.
+revision = '023_room_region'
+down_revision = '022_notification_inbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Add rooms.region, backfill it and index it - IDEMPOTENT"""
+
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = [col['name'] for col in inspector.get_columns('rooms')]
+    if 'region' not in columns:
+        op.add_column('rooms', sa.Column('region', sa.String(100), nullable=True))
+        print("✅ Added region to rooms")
+    else:
+        print("⚠️  rooms.region already exists, skipping")
+
+    rooms = bind.execute(sa.text("SELECT id, location FROM rooms WHERE region IS NULL")).fetchall()
+    if rooms:
+        bind.execute(
+            sa.text("UPDATE rooms SET region = :region WHERE id = :id"),
+            [{"id": room_id, "region": extract_region(location)} for room_id, location in rooms],
+        )
+        print(f"✅ Backfilled region for {len(rooms)} rooms")
+
+    existing = {index['name'] for index in inspector.get_indexes('rooms')}
+    if 'idx_rooms_region_created' not in existing:
+        op.create_index('idx_rooms_region_created', 'rooms', ['region', 'created_at', 'id'])
+        print("✅ Created idx_rooms_region_created index")
+    else:
+        print("⚠️  idx_rooms_region_created index already exists, skipping")
+
+    # Sessions used their own names ("Asia", "Europe") before app.regions
+    if 'sts_operation_sessions' in inspector.get_table_names():
+        sessions = [
+            (session_id, region, location)
+            for session_id, region, location in bind.execute(sa.text(
+                "SELECT id, region, location FROM sts_operation_sessions WHERE region IS NOT NULL"
+            )).fetchall()
+            if region not in REGIONS
+        ]
+        if sessions:
+            bind.execute(
+                sa.text("UPDATE sts_operation_sessions SET region = :region WHERE id = :id"),
+                [
+                    {"id": session_id, "region": operation_region(region, location)}
+                    for session_id, region, location in sessions
+                ],
+            )
+            print(f"✅ Renamed region for {len(sessions)} STS operation sessions")
+
+
+def downgrade() -> None:
+    """Remove rooms.region"""
+
+    try:
+        op.drop_index('idx_rooms_region_created', table_name='rooms')
+        op.drop_column('rooms', 'region')
+        print("✅ Removed rooms.region")
+    except Exception as e:
+        print(f"⚠️  Error removing rooms.region: {e}")
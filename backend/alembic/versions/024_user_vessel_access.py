@@ -0,0 +1,97 @@
+"""Add user_vessel_access index of vessel grants
+
+Vessel access used to be decided in Python by loading the whole fleet and
+comparing company names per vessel. Grants of owners and charterers are
+now stored per (user, vessel) with the room and the reason, maintained by
+app.vessel_access on every flush that changes a vessel or a user. Existing
+users and vessels are backfilled here.
+
+Revision ID: 024_user_vessel_access
+Revises: 023_room_region
+Create Date: 2026-10-16 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '024_user_vessel_access'
+down_revision = '023_room_region'
+branch_labels = None
+depends_on = None
+
+# Either company name contains the other, ignoring case; {position} is the
+# dialect's substring search so names are never read as LIKE patterns
+BACKFILL = """
+INSERT INTO user_vessel_access (user_email, vessel_id, room_id, reason)
+SELECT users.email, vessels.id, vessels.room_id, users.role
+FROM users JOIN vessels ON (
+    users.role = 'owner' AND {match_owner}
+) OR (
+    users.role = 'charterer' AND {match_charterer}
+)
+"""
+
+MATCH = (
+    "(LOWER({column}) <> '' AND LOWER(users.company) <> '' AND "
+    "({position}(LOWER({column}), LOWER(users.company)) > 0 OR "
+    "{position}(LOWER(users.company), LOWER({column})) > 0))"
+)
+
+
+def upgrade() -> None:
+    """Create user_vessel_access and backfill it - IDEMPOTENT"""
+
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if bind.dialect.name == 'sqlite':
+        uuid_type = sa.String(36)
+    else:
+        from sqlalchemy.dialects.postgresql import UUID
+        uuid_type = UUID(as_uuid=True)
+
+    if 'user_vessel_access' not in inspector.get_table_names():
+        op.create_table(
+            'user_vessel_access',
+            sa.Column('user_email', sa.String(255), primary_key=True),
+            sa.Column('vessel_id', uuid_type,
+                      sa.ForeignKey('vessels.id', ondelete='CASCADE'), primary_key=True),
+            sa.Column('room_id', uuid_type,
+                      sa.ForeignKey('rooms.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('reason', sa.String(50), nullable=False),
+            sa.Column('granted_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        print("✅ Created user_vessel_access table")
+    else:
+        print("⚠️  user_vessel_access table already exists, skipping")
+
+    existing = {index['name'] for index in inspector.get_indexes('user_vessel_access')}
+    for name, columns in [
+        ('idx_user_vessel_access_user_room', ['user_email', 'room_id']),
+        ('idx_user_vessel_access_vessel', ['vessel_id']),
+    ]:
+        if name not in existing:
+            op.create_index(name, 'user_vessel_access', columns)
+            print(f"✅ Created {name} index")
+        else:
+            print(f"⚠️  {name} index already exists, skipping")
+
+    position = 'instr' if bind.dialect.name == 'sqlite' else 'strpos'
+    bind.execute(sa.text("DELETE FROM user_vessel_access"))
+    result = bind.execute(sa.text(BACKFILL.format(
+        match_owner=MATCH.format(column='vessels.owner', position=position),
+        match_charterer=MATCH.format(column='vessels.charterer', position=position),
+    )))
+    print(f"✅ Backfilled {result.rowcount} vessel grants")
+
+
+def downgrade() -> None:
+    """Remove user_vessel_access"""
+
+    try:
+        op.drop_table('user_vessel_access')
+        print("✅ Removed user_vessel_access table")
+    except Exception as e:
+        print(f"⚠️  Error removing user_vessel_access: {e}")
@@ -0,0 +1,109 @@
+"""Give search_index a stable integer row key
+
+search_index had the composite primary key (entity_type, entity_id), so on
+SQLite its rowid - which the FTS5 external-content index points at - was
+implicit and could be renumbered by VACUUM, silently desyncing the index.
+The table now has an INTEGER PRIMARY KEY (doc_rowid) that aliases the
+rowid, with (entity_type, entity_id) kept unique. On SQLite the table is
+rebuilt and the FTS index re-created over it; on PostgreSQL the key is
+swapped in place.
+
+Revision ID: 025_search_index_rowid
+Revises: 024_user_vessel_access
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '025_search_index_rowid'
+down_revision = '024_user_vessel_access'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index_fts USING fts5("
+    "title, body, ocr_text, content='search_index', content_rowid='doc_rowid', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS search_index_ai AFTER INSERT ON search_index BEGIN "
+    "INSERT INTO search_index_fts(rowid, title, body, ocr_text) "
+    "VALUES (new.doc_rowid, new.title, new.body, new.ocr_text); END",
+    "CREATE TRIGGER IF NOT EXISTS search_index_ad AFTER DELETE ON search_index BEGIN "
+    "INSERT INTO search_index_fts(search_index_fts, rowid, title, body, ocr_text) "
+    "VALUES ('delete', old.doc_rowid, old.title, old.body, old.ocr_text); END",
+    "CREATE TRIGGER IF NOT EXISTS search_index_au AFTER UPDATE ON search_index BEGIN "
+    "INSERT INTO search_index_fts(search_index_fts, rowid, title, body, ocr_text) "
+    "VALUES ('delete', old.doc_rowid, old.title, old.body, old.ocr_text); "
+    "INSERT INTO search_index_fts(rowid, title, body, ocr_text) "
+    "VALUES (new.doc_rowid, new.title, new.body, new.ocr_text); END",
+]
+
+COLUMNS = "entity_type, entity_id, room_id, title, body, ocr_text, updated_at"
+
+
+def upgrade() -> None:
+    """Key search_index on doc_rowid - IDEMPOTENT"""
+
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'search_index' not in inspector.get_table_names():
+        print("⚠️  search_index table does not exist, skipping")
+        return
+    if 'doc_rowid' in [col['name'] for col in inspector.get_columns('search_index')]:
+        print("⚠️  search_index.doc_rowid already exists, skipping")
+        return
+
+    if bind.dialect.name == 'sqlite':
+        for trigger in ('search_index_ai', 'search_index_ad', 'search_index_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS search_index_fts")
+        op.execute("ALTER TABLE search_index RENAME TO search_index_old")
+        op.execute(
+            "CREATE TABLE search_index ("
+            "doc_rowid INTEGER PRIMARY KEY, "
+            "entity_type VARCHAR(20) NOT NULL, "
+            "entity_id VARCHAR(36) NOT NULL, "
+            "room_id VARCHAR(36) NOT NULL REFERENCES rooms (id) ON DELETE CASCADE, "
+            "title VARCHAR(500) NOT NULL DEFAULT '', "
+            "body TEXT, "
+            "ocr_text TEXT, "
+            "updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), "
+            "CONSTRAINT uq_search_index_entity UNIQUE (entity_type, entity_id))"
+        )
+        op.execute(
+            f"INSERT INTO search_index ({COLUMNS}) SELECT {COLUMNS} FROM search_index_old"
+        )
+        op.execute("DROP TABLE search_index_old")
+        op.create_index('idx_search_index_room_type', 'search_index', ['room_id', 'entity_type'])
+        for ddl in SQLITE_DDL:
+            op.execute(ddl)
+        op.execute("INSERT INTO search_index_fts(search_index_fts) VALUES ('rebuild')")
+        print("✅ Rebuilt search_index on doc_rowid and re-created its FTS5 index")
+    else:
+        op.execute("ALTER TABLE search_index ADD COLUMN doc_rowid SERIAL")
+        op.execute("ALTER TABLE search_index DROP CONSTRAINT search_index_pkey")
+        op.execute("ALTER TABLE search_index ADD PRIMARY KEY (doc_rowid)")
+        op.create_unique_constraint(
+            'uq_search_index_entity', 'search_index', ['entity_type', 'entity_id']
+        )
+        print("✅ Keyed search_index on doc_rowid")
+
+
+def downgrade() -> None:
+    """Key search_index on (entity_type, entity_id) again"""
+
+    try:
+        if op.get_bind().dialect.name == 'sqlite':
+            print("⚠️  search_index keeps doc_rowid on SQLite (rebuild with 020 to revert)")
+            return
+        op.drop_constraint('uq_search_index_entity', 'search_index', type_='unique')
+        op.execute("ALTER TABLE search_index DROP CONSTRAINT search_index_pkey")
+        op.execute("ALTER TABLE search_index ADD PRIMARY KEY (entity_type, entity_id)")
+        op.drop_column('search_index', 'doc_rowid')
+        print("✅ Removed search_index.doc_rowid")
+    except Exception as e:
+        print(f"⚠️  Error removing search_index.doc_rowid: {e}")
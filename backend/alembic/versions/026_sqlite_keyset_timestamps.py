@@ -0,0 +1,58 @@
+"""Store keyset timestamps in one format on SQLite
+
+SQLite keeps DATETIME values as text. Rows stamped by server_default
+(CURRENT_TIMESTAMP) read ``YYYY-MM-DD HH:MM:SS`` while values written by
+SQLAlchemy, including bound cursor parameters, carry microseconds, so the
+(ts, id) keyset comparisons went wrong on those rows and pages repeated.
+The columns are now stamped from Python; existing short values are padded
+to the SQLAlchemy format. PostgreSQL stores real timestamps and is left
+alone.
+
+Revision ID: 026_sqlite_keyset_timestamps
+Revises: 025_search_index_rowid
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '026_sqlite_keyset_timestamps'
+down_revision = '025_search_index_rowid'
+branch_labels = None
+depends_on = None
+
+
+KEYSET_COLUMNS = [
+    ('rooms', 'created_at'),
+    ('activity_log', 'ts'),
+    ('messages', 'created_at'),
+    ('notifications', 'created_at'),
+    ('approvals', 'updated_at'),
+]
+
+
+def upgrade() -> None:
+    """Pad second-precision SQLite timestamps to microseconds - IDEMPOTENT"""
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        print("⚠️  Not SQLite, skipping timestamp normalization")
+        return
+
+    tables = set(sa.inspect(bind).get_table_names())
+    for table, column in KEYSET_COLUMNS:
+        if table not in tables:
+            continue
+        updated = bind.execute(sa.text(
+            f"UPDATE {table} SET {column} = {column} || '.000000' "
+            f"WHERE length({column}) = 19"
+        )).rowcount
+        if updated:
+            print(f"✅ Normalized {updated} {table}.{column} values")
+
+
+def downgrade() -> None:
+    """Nothing to undo: padded values compare the same way"""
+    pass
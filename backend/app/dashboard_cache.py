@@ -0,0 +1,471 @@
+"""
+Dashboard Cache for STS Clearance Hub
+Per (role, user scope) cache of /dashboard-v2/for-role payloads: a bounded
+in-process LRU, optionally backed by Redis so workers share entries
+
+Entries are fresh for ``ttl_seconds``; for another ``stale_seconds`` they are
+still served while one background build refreshes them. Concurrent misses
+for the same key share a single build. Writes to documents, approvals,
+rooms, parties or vessels drop every entry whose scope they touch.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models import Approval, Document, Party, Room, Vessel
+
+try:
+    import redis.asyncio as redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# session.info key
+PENDING_DASHBOARD_KEY = "dashboard_pending_invalidations"
+
+# Roles whose dashboard is system-wide and shared by every user of the role
+GLOBAL_ROLES = ("admin",)
+
+# Roles whose dashboard is built from vessels matched by owner, not by party
+VESSEL_ROLES = ("owner", "shipowner")
+
+REDIS_PREFIX = "dashboard"
+
+
+@dataclass
+class DashboardEntry:
+    """One cached dashboard payload; ``room_ids`` is None for global scope"""
+    role: str
+    email: Optional[str]
+    data: Dict[str, Any]
+    stored_at: float
+    room_ids: Optional[FrozenSet[str]]
+    # monotonic time this worker last confirmed the entry against Redis
+    checked_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def age_seconds(self) -> float:
+        return max(0.0, time.time() - self.stored_at)
+
+    def dumps(self) -> str:
+        return json.dumps({
+            "role": self.role,
+            "email": self.email,
+            "data": self.data,
+            "stored_at": self.stored_at,
+            "room_ids": sorted(self.room_ids) if self.room_ids is not None else None,
+        })
+
+    @classmethod
+    def loads(cls, raw: str) -> "DashboardEntry":
+        item = json.loads(raw)
+        room_ids = item["room_ids"]
+        return cls(
+            role=item["role"],
+            email=item["email"],
+            data=item["data"],
+            stored_at=item["stored_at"],
+            room_ids=frozenset(room_ids) if room_ids is not None else None,
+        )
+
+
+@dataclass(frozen=True)
+class Invalidation:
+    """Scope touched by a write; an entry matches if any part overlaps"""
+    room_ids: FrozenSet[str] = frozenset()
+    emails: FrozenSet[str] = frozenset()
+    roles: FrozenSet[str] = frozenset()
+    everything: bool = False
+
+    def matches(self, entry: DashboardEntry) -> bool:
+        if self.everything or entry.role in self.roles:
+            return True
+        if entry.email is not None and entry.email in self.emails:
+            return True
+        if not self.room_ids:
+            return False
+        return entry.room_ids is None or not entry.room_ids.isdisjoint(self.room_ids)
+
+    def merge(self, other: "Invalidation") -> "Invalidation":
+        return Invalidation(
+            room_ids=self.room_ids | other.room_ids,
+            emails=self.emails | other.emails,
+            roles=self.roles | other.roles,
+            everything=self.everything or other.everything,
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.everything or self.room_ids or self.emails or self.roles)
+
+
+def dashboard_key(role: str, email: str) -> Tuple[str, Optional[str]]:
+    """(role, scope) of a user's dashboard; global roles share one scope"""
+    role = (role or "").lower()
+    if role in GLOBAL_ROLES:
+        return role, None
+    return role, (email or "").lower()
+
+
+# A build returns the payload and the rooms it was computed from
+# (None for system-wide data)
+DashboardBuild = Callable[[], Awaitable[Tuple[Dict[str, Any], Optional[Iterable[str]]]]]
+
+
+class DashboardCache:
+    """
+    Two-tier stale-while-revalidate cache of dashboard payloads
+
+    Redis (when configured) holds the shared copy, indexed by room, email
+    and role so invalidation can find entries; the in-process tier trusts
+    its copy for ``l1_ttl_seconds`` before re-checking Redis, which bounds
+    how long another worker's invalidation can go unnoticed.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[int] = None,
+        stale_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        l1_ttl_seconds: Optional[float] = None,
+        redis_client: Optional["redis.Redis"] = None,
+    ):
+        """
+        Initialize dashboard cache
+
+        Args:
+            ttl_seconds: Age up to which an entry is served as fresh
+            stale_seconds: Further age up to which an entry is served while
+                it is rebuilt in the background
+            max_entries: Maximum number of in-process entries
+            l1_ttl_seconds: How long an in-process entry is trusted before
+                re-reading Redis (only with a Redis client)
+            redis_client: asyncio Redis client instance (optional)
+        """
+        self.ttl_seconds = ttl_seconds or int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", 300))
+        self.stale_seconds = (
+            stale_seconds if stale_seconds is not None
+            else int(os.getenv("DASHBOARD_CACHE_STALE_SECONDS", 300))
+        )
+        self.max_entries = max_entries or int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", 2000))
+        self.l1_ttl_seconds = (
+            l1_ttl_seconds if l1_ttl_seconds is not None
+            else float(os.getenv("DASHBOARD_CACHE_L1_TTL_SECONDS", 5))
+        )
+        self.redis_client = None
+        self.enabled = False
+        self.use_redis(redis_client)
+
+        self._entries: "OrderedDict[Tuple[str, Optional[str]], DashboardEntry]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, Optional[str]], asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+        # Recent invalidations, so a build that raced with one is not stored
+        self._generation = 0
+        self._recent: "deque[Tuple[int, Invalidation]]" = deque(maxlen=256)
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.coalesced = 0
+        self.discarded = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def use_redis(self, redis_client: Optional["redis.Redis"]) -> None:
+        """Share entries through Redis (None keeps them in this process)"""
+        self.redis_client = redis_client
+        self.enabled = REDIS_AVAILABLE and redis_client is not None
+
+    # Lookup
+
+    async def get_or_build(
+        self, role: str, email: str, build: DashboardBuild
+    ) -> DashboardEntry:
+        """
+        Cached dashboard of a (role, user), building it on a miss
+
+        ``build`` must not depend on the caller's session: a stale entry is
+        refreshed after the request that found it has finished.
+        """
+        key = dashboard_key(role, email)
+        entry = await self._lookup(key)
+
+        if entry is not None:
+            age = entry.age_seconds
+            if age < self.ttl_seconds:
+                self.hits += 1
+                return entry
+            if age < self.ttl_seconds + self.stale_seconds:
+                self.stale_hits += 1
+                self._start_build(key, build)
+                return entry
+
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = self._start_build(key, build)
+        # A cancelled request must not cancel the build others wait on
+        return await asyncio.shield(task)
+
+    async def _lookup(self, key: Tuple[str, Optional[str]]) -> Optional[DashboardEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.age_seconds >= self.ttl_seconds + self.stale_seconds:
+                del self._entries[key]
+                entry = None
+            elif not self.enabled or time.monotonic() - entry.checked_at < self.l1_ttl_seconds:
+                self._entries.move_to_end(key)
+                return entry
+
+        if not self.enabled:
+            return None
+        try:
+            raw = await self.redis_client.get(self._redis_key(key))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Error reading dashboard cache: {e}")
+            return entry
+        if raw is None:
+            self._entries.pop(key, None)
+            return None
+        entry = DashboardEntry.loads(raw)
+        self.redis_hits += 1
+        self._remember(key, entry)
+        return entry
+
+    # Builds
+
+    def _start_build(self, key: Tuple[str, Optional[str]], build: DashboardBuild) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is not None:
+            return task
+        task = asyncio.ensure_future(self._build(key, build))
+        self._inflight[key] = task
+
+        def _done(finished: asyncio.Task) -> None:
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            if not finished.cancelled() and finished.exception() is not None:
+                logger.error(f"Dashboard build failed: {finished.exception()}")
+
+        task.add_done_callback(_done)
+        return task
+
+    async def _build(self, key: Tuple[str, Optional[str]], build: DashboardBuild) -> DashboardEntry:
+        generation = self._generation
+        self.builds += 1
+        data, room_ids = await build()
+        entry = DashboardEntry(
+            role=key[0],
+            email=key[1],
+            data=data,
+            stored_at=time.time(),
+            room_ids=frozenset(str(rid) for rid in room_ids) if room_ids is not None else None,
+        )
+        if self._invalidated_since(generation, entry):
+            # Built from rows a concurrent write has changed; serve it once
+            self.discarded += 1
+            return entry
+        self._remember(key, entry)
+        await self._redis_store(key, entry)
+        return entry
+
+    def _invalidated_since(self, generation: int, entry: DashboardEntry) -> bool:
+        if generation == self._generation:
+            return False
+        if not self._recent or self._recent[0][0] > generation + 1:
+            # Older invalidations were forgotten; assume the worst
+            return True
+        return any(g > generation and inv.matches(entry) for g, inv in self._recent)
+
+    def _remember(self, key: Tuple[str, Optional[str]], entry: DashboardEntry) -> None:
+        entry.checked_at = time.monotonic()
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # Redis tier
+
+    @staticmethod
+    def _redis_key(key: Tuple[str, Optional[str]]) -> str:
+        return f"{REDIS_PREFIX}:{key[0]}:{key[1] or '*'}"
+
+    @staticmethod
+    def _index_keys(inv: Invalidation) -> Set[str]:
+        keys = {f"{REDIS_PREFIX}:idx:room:{rid}" for rid in inv.room_ids}
+        keys |= {f"{REDIS_PREFIX}:idx:email:{email}" for email in inv.emails}
+        keys |= {f"{REDIS_PREFIX}:idx:role:{role}" for role in inv.roles}
+        if inv.room_ids:
+            keys.add(f"{REDIS_PREFIX}:idx:global")
+        return keys
+
+    async def _redis_store(self, key: Tuple[str, Optional[str]], entry: DashboardEntry) -> None:
+        if not self.enabled:
+            return
+        redis_key = self._redis_key(key)
+        expires = self.ttl_seconds + self.stale_seconds
+        if entry.room_ids is None:
+            indexes = {f"{REDIS_PREFIX}:idx:global"}
+        else:
+            indexes = {f"{REDIS_PREFIX}:idx:room:{rid}" for rid in entry.room_ids}
+        indexes.add(f"{REDIS_PREFIX}:idx:role:{entry.role}")
+        if entry.email is not None:
+            indexes.add(f"{REDIS_PREFIX}:idx:email:{entry.email}")
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.setex(redis_key, expires, entry.dumps())
+            for index in indexes:
+                pipe.sadd(index, redis_key)
+                pipe.expire(index, expires)
+            await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Error storing dashboard cache entry: {e}")
+
+    async def _redis_invalidate(self, inv: Invalidation) -> None:
+        try:
+            if inv.everything:
+                keys = [k async for k in self.redis_client.scan_iter(match=f"{REDIS_PREFIX}:*")]
+            else:
+                indexes = list(self._index_keys(inv))
+                keys = list(await self.redis_client.sunion(indexes)) if indexes else []
+                # Empty index sets are harmless; delete them with the entries
+                keys.extend(indexes)
+            if keys:
+                await self.redis_client.delete(*keys)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Error invalidating dashboard cache: {e}")
+
+    # Invalidation
+
+    def invalidate(self, inv: Invalidation) -> int:
+        """
+        Drop the entries a write touched (Redis asynchronously)
+
+        Returns:
+            Number of in-process entries dropped
+        """
+        if not inv:
+            return 0
+        self._generation += 1
+        self._recent.append((self._generation, inv))
+        # Later misses must not join a build that may predate the write
+        self._inflight.clear()
+
+        stale = [key for key, entry in self._entries.items() if inv.matches(entry)]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+        if self.enabled:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                task = loop.create_task(self._redis_invalidate(inv))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+        return len(stale)
+
+    async def clear(self) -> None:
+        """Drop every entry, in this process and in Redis"""
+        self.invalidate(Invalidation(everything=True))
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+            "redis_enabled": self.enabled,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+            "builds": self.builds,
+            "builds_in_flight": len(self._inflight),
+            "coalesced": self.coalesced,
+            "discarded": self.discarded,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+# Global dashboard cache instance (Redis attached at startup)
+dashboard_cache = DashboardCache()
+
+
+# Invalidation on writes -------------------------------------------------------
+
+def _collect_invalidation(session: Session) -> Invalidation:
+    """Dashboard scope touched by the pending flush"""
+    room_ids: Set[str] = set()
+    emails: Set[str] = set()
+    roles: Set[str] = set()
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, Room):
+            if instance.id:
+                room_ids.add(str(instance.id))
+        elif isinstance(instance, (Document, Approval)):
+            if instance.room_id:
+                room_ids.add(str(instance.room_id))
+        elif isinstance(instance, Party):
+            # A new party row widens its user's scope beyond the cached rooms
+            if instance.room_id:
+                room_ids.add(str(instance.room_id))
+            if instance.email:
+                emails.add(instance.email.lower())
+        elif isinstance(instance, Vessel):
+            # Owner dashboards match vessels by owner, wherever they are
+            if instance.room_id:
+                room_ids.add(str(instance.room_id))
+            roles.update(VESSEL_ROLES)
+    return Invalidation(frozenset(room_ids), frozenset(emails), frozenset(roles))
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_after_flush(session: Session, flush_context) -> None:
+    inv = _collect_invalidation(session)
+    if not inv:
+        return
+    dashboard_cache.invalidate(inv)
+    # Invalidate again on commit so a dashboard built from pre-commit rows
+    # meanwhile is not kept
+    pending = session.info.get(PENDING_DASHBOARD_KEY)
+    session.info[PENDING_DASHBOARD_KEY] = pending.merge(inv) if pending else inv
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    inv = session.info.pop(PENDING_DASHBOARD_KEY, None)
+    if inv:
+        dashboard_cache.invalidate(inv)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(PENDING_DASHBOARD_KEY, None)
@@ -12,6 +12,8 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_session
+from app.identity_cache import (get_identity_context, identity_cache,
+                                load_token_user, reset_identity_context)
 from app.models import DocumentType, FeatureFlag, Party, Room, User
 from app.schemas import PartyRole
 
@@ -90,10 +92,7 @@ async def get_user_party(
         Party object or None if not found
     """
     try:
-        result = await session.execute(
-            select(Party).where(Party.room_id == room_id, Party.email == user_email)
-        )
-        return result.scalar_one_or_none()
+        return await get_identity_context(session).get_party(room_id, user_email)
     except Exception as e:
         logger.error(f"Error getting user party: {e}")
         return None
@@ -103,7 +102,7 @@ async def get_user_accessible_vessels(
     room_id: str, user_email: str, session: AsyncSession
 ) -> list[str]:
     """
-    Get list of vessel IDs that the user has access to based on their role and vessel ownership
+    Get list of vessel IDs that the user has access to, from the vessel access index
 
     Args:
         room_id: Room identifier
@@ -114,55 +113,47 @@ async def get_user_accessible_vessels(
         List of vessel IDs the user can access
     """
     try:
-        from app.models import Vessel, User
-
-        # Get user role
-        user_result = await session.execute(
-            select(User).where(User.email == user_email)
-        )
-        user = user_result.scalar_one_or_none()
-
-        if not user:
-            return []
-
-        user_role = user.role
-
-        # Get all vessels in the room
-        vessels_result = await session.execute(
-            select(Vessel).where(Vessel.room_id == room_id)
-        )
-        vessels = vessels_result.scalars().all()
+        from app.vessel_access import accessible_vessels_by_room
 
-        accessible_vessel_ids = []
+        context = get_identity_context(session)
+        cache_key = (str(room_id), user_email.lower())
+        if cache_key in context.vessel_ids:
+            return list(context.vessel_ids[cache_key])
 
-        for vessel in vessels:
-            # Brokers see everything
-            if user_role == "broker":
-                accessible_vessel_ids.append(str(vessel.id))
-                continue
+        cached = identity_cache.get(user_email, room_id, "vessel_ids")
+        if cached is not None:
+            context.vessel_ids[cache_key] = cached
+            return list(cached)
 
-            # Charterers see vessels under their charter
-            if user_role == "charterer":
-                if vessel.charterer and vessel.charterer.lower() in user.company.lower():
-                    accessible_vessel_ids.append(str(vessel.id))
-                continue
+        user = await context.get_user(user_email)
 
-            # Owners see only their vessels
-            if user_role == "owner":
-                if vessel.owner and vessel.owner.lower() in user.company.lower():
-                    accessible_vessel_ids.append(str(vessel.id))
-                continue
+        if not user:
+            return []
 
-            # Other roles (seller, buyer) - no vessel-specific access for now
-            # They can see room-level data but not vessel-specific data
+        # Brokers see every vessel, owners and charterers their granted ones;
+        # other roles (seller, buyer) see room-level data only
+        access = await accessible_vessels_by_room(session, user, [room_id])
+        accessible_vessel_ids = access[str(room_id)]
 
-        return accessible_vessel_ids
+        context.vessel_ids[cache_key] = accessible_vessel_ids
+        identity_cache.set(user_email, room_id, "vessel_ids", accessible_vessel_ids)
+        return list(accessible_vessel_ids)
 
     except Exception as e:
         logger.error(f"Error getting user accessible vessels: {e}")
         return []
 
 
+def _grant_room_access(
+    session: AsyncSession, room_id: str, user_email: str, party: Party
+) -> None:
+    """Record a granted room access in the request context and process cache"""
+    context = get_identity_context(session)
+    context.remember_party(party)
+    context.granted_rooms.add((str(room_id), user_email.lower()))
+    identity_cache.set(user_email, room_id, "access", True)
+
+
 async def require_room_access(
     room_id: str, user_email: str, session: AsyncSession
 ) -> bool:
@@ -181,9 +172,18 @@ async def require_room_access(
         HTTPException: If user doesn't have access
     """
     try:
+        context = get_identity_context(session)
+        access_key = (str(room_id), user_email.lower())
+        if access_key in context.granted_rooms:
+            return True
+
+        # Access already verified by a recent request in this process
+        if identity_cache.get(user_email, room_id, "access"):
+            context.granted_rooms.add(access_key)
+            return True
+
         # Check if room exists
-        room_result = await session.execute(select(Room).where(Room.id == room_id))
-        room = room_result.scalar_one_or_none()
+        room = await context.get_room(room_id)
 
         if not room:
             raise HTTPException(status_code=404, detail="Room not found")
@@ -192,33 +192,22 @@ async def require_room_access(
         party = await get_user_party(room_id, user_email, session)
 
         if not party:
+            user = await context.get_user(user_email)
+
             # Check if user is the room creator
             if room.created_by == user_email:
                 # Auto-add room creator as owner party
-                from app.models import Party, User
-
-                user_result = await session.execute(
-                    select(User).where(User.email == user_email)
-                )
-                user = user_result.scalar_one_or_none()
-
                 if user:
                     new_party = Party(
                         room_id=room_id, role="owner", name=user.name, email=user.email
                     )
                     session.add(new_party)
                     await session.commit()
+                    _grant_room_access(session, room_id, user_email, new_party)
                     return True
 
             # For demo/development purposes, auto-add any authenticated user as a viewer party
             # This allows testing without manually adding users to parties
-            from app.models import User
-
-            user_result = await session.execute(
-                select(User).where(User.email == user_email)
-            )
-            user = user_result.scalar_one_or_none()
-
             if user:
                 # Check if this is a demo/development environment
                 import os
@@ -229,6 +218,7 @@ async def require_room_access(
                     session.add(new_party)
                     await session.commit()
                     logger.info(f"Auto-added user {user_email} as viewer to room {room_id} for demo purposes")
+                    _grant_room_access(session, room_id, user_email, new_party)
                     return True
 
             raise HTTPException(
@@ -236,6 +226,7 @@ async def require_room_access(
                 detail="Access denied: User is not a party in this room",
             )
 
+        _grant_room_access(session, room_id, user_email, party)
         return True
 
     except HTTPException:
@@ -587,6 +578,21 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 
+def user_token_claims(user: User) -> dict:
+    """
+    Access token claims for a user: identity, role, company and the user's
+    token version, which lets get_current_user skip the user query
+    """
+    return {
+        "sub": user.email,
+        "uid": str(user.id),
+        "name": user.name,
+        "role": user.role,
+        "company": user.company,
+        "ver": user.token_version or 0,
+    }
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     session: AsyncSession = Depends(get_async_session),
@@ -608,10 +614,12 @@ async def get_current_user(
         raise credentials_exception
 
     # CAMBIO: Retornar objeto User, no diccionario
-    result = await session.execute(select(User).where(User.email == email).limit(1))
-    user = result.scalar_one_or_none()
+    # (served from the user cache, without a query, for tokens with claims)
+    user = await load_token_user(session, payload)
     if user is None:
         raise credentials_exception
+    # Share the loaded user with the other dependencies of this request
+    reset_identity_context(session).remember_user(user)
     # Retornar el objeto User completo
     return user
 
@@ -708,93 +716,110 @@ async def get_user_message_visibility(
         }
     """
     try:
-        from app.models import User, UserRolePermission, UserMessageAccess, Vessel
-        
-        # Get user and their role
-        user_result = await session.execute(
-            select(User).where(User.email == user_email)
+        context = get_identity_context(session)
+        cache_key = (str(room_id), user_email.lower())
+        if cache_key in context.visibility:
+            return dict(context.visibility[cache_key])
+
+        cached = identity_cache.get(user_email, room_id, "visibility")
+        if cached is not None:
+            context.visibility[cache_key] = cached
+            return dict(cached)
+
+        visibility = await _load_user_message_visibility(room_id, user_email, session)
+        context.visibility[cache_key] = visibility
+        identity_cache.set(user_email, room_id, "visibility", visibility)
+        return dict(visibility)
+
+    except Exception as e:
+        logger.error(f"Error getting user message visibility: {e}")
+        # Default to safe permissions on error
+        return {
+            "can_see_room_level": False,
+            "can_see_vessel_level": False,
+            "accessible_vessel_ids": [],
+            "can_see_all_vessels": False
+        }
+
+
+async def _load_user_message_visibility(
+    room_id: str, user_email: str, session: AsyncSession
+) -> dict:
+    """Compute message visibility rules from the database (uncached)"""
+    from app.models import UserRolePermission, UserMessageAccess
+
+    # Get user and their role
+    user = await get_identity_context(session).get_user(user_email)
+
+    if not user:
+        return {
+            "can_see_room_level": False,
+            "can_see_vessel_level": False,
+            "accessible_vessel_ids": [],
+            "can_see_all_vessels": False
+        }
+    
+    # Check for explicit user-specific overrides
+    user_access_result = await session.execute(
+        select(UserMessageAccess).where(
+            UserMessageAccess.user_email == user_email,
+            UserMessageAccess.room_id == room_id
         )
-        user = user_result.scalar_one_or_none()
-        
-        if not user:
-            return {
-                "can_see_room_level": False,
-                "can_see_vessel_level": False,
-                "accessible_vessel_ids": [],
-                "can_see_all_vessels": False
-            }
-        
-        # Check for explicit user-specific overrides
-        user_access_result = await session.execute(
-            select(UserMessageAccess).where(
-                UserMessageAccess.user_email == user_email,
-                UserMessageAccess.room_id == room_id
-            )
+    )
+    user_accesses = user_access_result.scalars().all()
+    
+    if user_accesses:
+        # User has explicit permissions configured
+        can_see_room_level = any(
+            ua.access_level in ["room_level", "all"] and ua.vessel_id is None
+            for ua in user_accesses
         )
-        user_accesses = user_access_result.scalars().all()
-        
-        if user_accesses:
-            # User has explicit permissions configured
-            can_see_room_level = any(
-                ua.access_level in ["room_level", "all"] and ua.vessel_id is None
-                for ua in user_accesses
-            )
-            accessible_vessel_ids = [
-                str(ua.vessel_id) for ua in user_accesses 
-                if ua.vessel_id is not None
-            ]
-            can_see_all_vessels = any(
-                ua.access_level == "all" and ua.vessel_id is None
-                for ua in user_accesses
-            )
-            
-            return {
-                "can_see_room_level": can_see_room_level,
-                "can_see_vessel_level": len(accessible_vessel_ids) > 0 or can_see_all_vessels,
-                "accessible_vessel_ids": accessible_vessel_ids,
-                "can_see_all_vessels": can_see_all_vessels
-            }
-        
-        # Fall back to role-based defaults
-        role_perm_result = await session.execute(
-            select(UserRolePermission).where(UserRolePermission.role == user.role)
+        accessible_vessel_ids = [
+            str(ua.vessel_id) for ua in user_accesses 
+            if ua.vessel_id is not None
+        ]
+        can_see_all_vessels = any(
+            ua.access_level == "all" and ua.vessel_id is None
+            for ua in user_accesses
         )
-        role_perm = role_perm_result.scalar_one_or_none()
-        
-        if role_perm:
-            # Get accessible vessels based on role
-            accessible_vessel_ids = await get_user_accessible_vessels(
-                room_id, user_email, session
-            )
-            
-            return {
-                "can_see_room_level": role_perm.can_see_room_level,
-                "can_see_vessel_level": role_perm.can_see_vessel_level,
-                "accessible_vessel_ids": accessible_vessel_ids,
-                "can_see_all_vessels": role_perm.can_see_all_vessels
-            }
         
-        # Default: everyone sees room-level messages
+        return {
+            "can_see_room_level": can_see_room_level,
+            "can_see_vessel_level": len(accessible_vessel_ids) > 0 or can_see_all_vessels,
+            "accessible_vessel_ids": accessible_vessel_ids,
+            "can_see_all_vessels": can_see_all_vessels
+        }
+    
+    # Fall back to role-based defaults
+    role_perm_result = await session.execute(
+        select(UserRolePermission).where(UserRolePermission.role == user.role)
+    )
+    role_perm = role_perm_result.scalar_one_or_none()
+    
+    if role_perm:
+        # Get accessible vessels based on role
         accessible_vessel_ids = await get_user_accessible_vessels(
             room_id, user_email, session
         )
         
         return {
-            "can_see_room_level": True,
-            "can_see_vessel_level": len(accessible_vessel_ids) > 0,
+            "can_see_room_level": role_perm.can_see_room_level,
+            "can_see_vessel_level": role_perm.can_see_vessel_level,
             "accessible_vessel_ids": accessible_vessel_ids,
-            "can_see_all_vessels": False
-        }
-        
-    except Exception as e:
-        logger.error(f"Error getting user message visibility: {e}")
-        # Default to safe permissions on error
-        return {
-            "can_see_room_level": False,
-            "can_see_vessel_level": False,
-            "accessible_vessel_ids": [],
-            "can_see_all_vessels": False
+            "can_see_all_vessels": role_perm.can_see_all_vessels
         }
+    
+    # Default: everyone sees room-level messages
+    accessible_vessel_ids = await get_user_accessible_vessels(
+        room_id, user_email, session
+    )
+    
+    return {
+        "can_see_room_level": True,
+        "can_see_vessel_level": len(accessible_vessel_ids) > 0,
+        "accessible_vessel_ids": accessible_vessel_ids,
+        "can_see_all_vessels": False
+    }
 
 
 async def initialize_default_role_permissions(session: AsyncSession) -> None:
@@ -0,0 +1,452 @@
+"""
+Identity Cache for STS Clearance Hub
+Request-scoped identity context plus small process-wide TTL/LRU caches of
+room access decisions and of token users, shared by the authentication
+dependencies
+"""
+
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.models import (Party, Room, User, UserMessageAccess,
+                        UserRolePermission, Vessel)
+
+logger = logging.getLogger(__name__)
+
+# session.info keys
+CONTEXT_INFO_KEY = "identity_context"
+PENDING_INVALIDATIONS_KEY = "identity_pending_invalidations"
+PENDING_USERS_KEY = "identity_pending_users"
+
+# Sentinel for "looked up, not found" in the request context
+_MISSING = object()
+
+# Serve users of tokens carrying uid/ver claims from the user cache
+SIGNED_CLAIMS = os.getenv("AUTH_SIGNED_CLAIMS", "true").lower() == "true"
+
+# Changing any of these bumps users.token_version, revoking issued tokens.
+# Password changes are seen through last_password_change, so upgrading a
+# hash on login keeps the user's sessions.
+TOKEN_VERSION_ATTRIBUTES = ("email", "role", "is_active", "last_password_change")
+
+
+class IdentityCache:
+    """
+    Process-wide TTL/LRU cache of per (email, room_id) access snapshots
+
+    Each entry holds plain values only (never ORM instances), e.g.
+    ``{"access": True, "vessel_ids": [...], "visibility": {...}}``.
+    Only granted access is cached; denials are always re-checked.
+    """
+
+    def __init__(self, ttl_seconds: int = 60, max_entries: int = 10000):
+        """
+        Initialize identity cache
+
+        Args:
+            ttl_seconds: Time to live for cached entries
+            max_entries: Maximum number of (email, room_id) entries kept
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _make_key(user_email: str, room_id: str) -> Tuple[str, str]:
+        return (user_email.lower(), str(room_id))
+
+    def get(self, user_email: str, room_id: str, field: str) -> Any:
+        """
+        Get one cached field for (email, room_id)
+
+        Returns:
+            The cached value, or None if absent or expired
+        """
+        key = self._make_key(user_email, room_id)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            values, stored_at = item
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            if field not in values:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(values[field])
+
+    def set(self, user_email: str, room_id: str, field: str, value: Any) -> None:
+        """Store one field for (email, room_id), evicting the least recently used entry"""
+        key = self._make_key(user_email, room_id)
+        with self._lock:
+            item = self._entries.get(key)
+            now = time.monotonic()
+            if item is None or now - item[1] > self.ttl_seconds:
+                values: Dict[str, Any] = {}
+                stored_at = now
+            else:
+                values, stored_at = item
+            values[field] = copy.deepcopy(value)
+            self._entries[key] = (values, stored_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(
+        self,
+        user_email: Optional[str] = None,
+        room_id: Optional[str] = None,
+    ) -> int:
+        """
+        Drop entries matching an email, a room, or both
+
+        Returns:
+            Number of entries removed
+        """
+        email = user_email.lower() if user_email else None
+        room = str(room_id) if room_id else None
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if (email is None or key[0] == email) and (room is None or key[1] == room)
+            ]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        """Clear all cached entries"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """Get cache statistics"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+class UserCache:
+    """
+    Process-wide TTL/LRU cache of user rows keyed by (user id, token version)
+
+    Entries hold plain column values, one version per user. A token whose
+    version matches the entry is served without a query; a token older than
+    the entry was revoked by a version bump.
+    """
+
+    def __init__(self, ttl_seconds: int = 60, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # user id -> (token version, column values, stored_at)
+        self._entries: "OrderedDict[str, Tuple[int, Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._columns = [attr.key for attr in inspect(User).column_attrs]
+        self.hits = 0
+        self.misses = 0
+        self.revoked = 0
+        self.invalidations = 0
+
+    def _entry(self, user_id: str) -> Optional[Tuple[int, Dict[str, Any], float]]:
+        item = self._entries.get(user_id)
+        if item is not None and time.monotonic() - item[2] > self.ttl_seconds:
+            del self._entries[user_id]
+            return None
+        return item
+
+    def get(self, user_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """Column values of a user at a token version, or None"""
+        key = str(user_id)
+        with self._lock:
+            item = self._entry(key)
+            if item is None or item[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(item[1])
+
+    def is_revoked(self, user_id: str, version: int) -> bool:
+        """Whether the cached user has moved past a token's version"""
+        with self._lock:
+            item = self._entry(str(user_id))
+            revoked = item is not None and item[0] > version
+        if revoked:
+            self.revoked += 1
+        return revoked
+
+    def put(self, user: User) -> bool:
+        """Cache a loaded user (skipped if some column is not loaded)"""
+        loaded = inspect(user).dict
+        if any(column not in loaded for column in self._columns):
+            return False
+        values = {column: copy.deepcopy(loaded[column]) for column in self._columns}
+        with self._lock:
+            self._entries[str(user.id)] = (user.token_version or 0, values, time.monotonic())
+            self._entries.move_to_end(str(user.id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    async def attach(self, session: AsyncSession, values: Dict[str, Any]) -> User:
+        """A persistent User in ``session`` built from cached values, without a query"""
+        user = User(**values)
+        make_transient_to_detached(user)
+        return await session.merge(user, load=False)
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            if self._entries.pop(str(user_id), None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "revoked": self.revoked,
+            "invalidations": self.invalidations,
+        }
+
+
+async def load_token_user(session: AsyncSession, payload: Dict[str, Any]) -> Optional[User]:
+    """
+    User of a decoded access token; None if it is unknown or the token revoked
+
+    Tokens with uid/ver claims (see ``dependencies.user_token_claims``) are
+    served from ``user_cache`` while the user's token version is unchanged.
+    Other tokens look the user up by email.
+    """
+    user_id = payload.get("uid")
+    version = payload.get("ver")
+    claims = SIGNED_CLAIMS and user_id is not None and isinstance(version, int)
+
+    if claims:
+        values = user_cache.get(user_id, version)
+        if values is not None:
+            return await user_cache.attach(session, values)
+        if user_cache.is_revoked(user_id, version):
+            return None
+        result = await session.execute(select(User).where(User.id == user_id).limit(1))
+    else:
+        email = payload.get("sub")
+        if email is None:
+            return None
+        result = await session.execute(select(User).where(User.email == email).limit(1))
+
+    user = result.scalar_one_or_none()
+    if user is None:
+        return None
+    if claims:
+        if (user.token_version or 0) != version:
+            user_cache.revoked += 1
+            return None
+        user_cache.put(user)
+    return user
+
+
+class IdentityContext:
+    """
+    Identity data loaded once per request and shared by every dependency
+
+    Lives in ``session.info`` so every helper that receives the request's
+    session sees the same user, room and party rows.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.users: Dict[str, Any] = {}
+        self.rooms: Dict[str, Any] = {}
+        self.parties: Dict[Tuple[str, str], Any] = {}
+        self.vessel_ids: Dict[Tuple[str, str], list] = {}
+        self.visibility: Dict[Tuple[str, str], dict] = {}
+        self.granted_rooms: Set[Tuple[str, str]] = set()
+
+    def remember_user(self, user: User) -> None:
+        """Register a user row already loaded by the caller"""
+        self.users[user.email.lower()] = user
+
+    async def get_user(self, user_email: str) -> Optional[User]:
+        key = user_email.lower()
+        if key not in self.users:
+            result = await self.session.execute(
+                select(User).where(User.email == user_email).limit(1)
+            )
+            self.users[key] = result.scalar_one_or_none() or _MISSING
+        user = self.users[key]
+        return None if user is _MISSING else user
+
+    async def get_room(self, room_id: str) -> Optional[Room]:
+        key = str(room_id)
+        if key not in self.rooms:
+            result = await self.session.execute(select(Room).where(Room.id == room_id))
+            self.rooms[key] = result.scalar_one_or_none() or _MISSING
+        room = self.rooms[key]
+        return None if room is _MISSING else room
+
+    async def get_party(self, room_id: str, user_email: str) -> Optional[Party]:
+        key = (str(room_id), user_email.lower())
+        if key not in self.parties:
+            result = await self.session.execute(
+                select(Party).where(Party.room_id == room_id, Party.email == user_email)
+            )
+            self.parties[key] = result.scalars().first() or _MISSING
+        party = self.parties[key]
+        return None if party is _MISSING else party
+
+    def remember_party(self, party: Party) -> None:
+        self.parties[(str(party.room_id), party.email.lower())] = party
+
+
+def get_identity_context(session: AsyncSession) -> IdentityContext:
+    """Get (or create) the identity context bound to a session"""
+    context = session.info.get(CONTEXT_INFO_KEY)
+    if context is None:
+        context = IdentityContext(session)
+        session.info[CONTEXT_INFO_KEY] = context
+    return context
+
+
+def reset_identity_context(session: AsyncSession) -> IdentityContext:
+    """Start a fresh identity context, e.g. at the beginning of a request"""
+    context = IdentityContext(session)
+    session.info[CONTEXT_INFO_KEY] = context
+    return context
+
+
+# Invalidation on writes -------------------------------------------------------
+
+def _collect_invalidations(session: Session) -> Set[Tuple[Optional[str], Optional[str]]]:
+    """(email, room_id) patterns touched by the pending flush; None is a wildcard"""
+    targets: Set[Tuple[Optional[str], Optional[str]]] = set()
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, (Party, Vessel)):
+            # Vessel changes alter everyone's vessel access in the room; party
+            # edits may move the email, so drop the whole room as well
+            if instance.room_id:
+                targets.add((None, str(instance.room_id)))
+        elif isinstance(instance, UserMessageAccess):
+            targets.add((instance.user_email, str(instance.room_id) if instance.room_id else None))
+        elif isinstance(instance, Room):
+            if instance.id:
+                targets.add((None, str(instance.id)))
+        elif isinstance(instance, User):
+            if instance.email:
+                targets.add((instance.email, None))
+        elif isinstance(instance, UserRolePermission):
+            targets.add((None, None))
+    return targets
+
+
+def _apply_invalidations(targets: Set[Tuple[Optional[str], Optional[str]]]) -> None:
+    for email, room_id in targets:
+        if email is None and room_id is None:
+            identity_cache.clear()
+        else:
+            identity_cache.invalidate(user_email=email, room_id=room_id)
+
+
+def _changed_users(session: Session) -> Set[str]:
+    return {
+        str(instance.id)
+        for instance in list(session.dirty) + list(session.deleted)
+        if isinstance(instance, User) and instance.id
+    }
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_token_version(session: Session, flush_context, instances) -> None:
+    for instance in session.dirty:
+        if isinstance(instance, User):
+            state = inspect(instance)
+            if any(state.attrs[name].history.has_changes() for name in TOKEN_VERSION_ATTRIBUTES):
+                instance.token_version = (instance.token_version or 0) + 1
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_after_flush(session: Session, flush_context) -> None:
+    users = _changed_users(session)
+    if users:
+        for user_id in users:
+            user_cache.invalidate(user_id)
+        session.info.setdefault(PENDING_USERS_KEY, set()).update(users)
+
+    targets = _collect_invalidations(session)
+    if not targets:
+        return
+
+    _apply_invalidations(targets)
+    # The request context may hold rows this flush just changed
+    session.info.pop(CONTEXT_INFO_KEY, None)
+    # Invalidate again on commit so a concurrent request cannot re-cache
+    # pre-commit state for longer than the transaction lasts
+    session.info.setdefault(PENDING_INVALIDATIONS_KEY, set()).update(targets)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    targets = session.info.pop(PENDING_INVALIDATIONS_KEY, None)
+    if targets:
+        _apply_invalidations(targets)
+    for user_id in session.info.pop(PENDING_USERS_KEY, ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(PENDING_INVALIDATIONS_KEY, None)
+    session.info.pop(PENDING_USERS_KEY, None)
+    session.info.pop(CONTEXT_INFO_KEY, None)
+
+
+# Global identity cache instance
+identity_cache = IdentityCache(
+    ttl_seconds=int(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "60")),
+    max_entries=int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", "10000")),
+)
+
+# Global token user cache instance
+user_cache = UserCache(
+    ttl_seconds=int(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+    max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000")),
+)
@@ -13,15 +13,28 @@ from pathlib import Path
 import redis.asyncio as redis
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
+from app.dashboard_cache import dashboard_cache
 from app.database import close_db, get_async_session_factory, init_db
 from app.database_optimization import DatabaseOptimizer
 from app.init_data import main as init_data
 from app.middleware.auth import AuthMiddleware
 from app.middleware.rate_limiter import RateLimiter, RateLimitMiddleware
 from app.middleware.caching import get_cache_stats, clear_cache
+from app.permission_cache import init_permission_cache
+from app.services.background_task_service import background_task_service
+from app.services.message_ingestion_service import message_ingestion_service
+from app.services.notification_inbox_service import notification_inbox_service
+from app.services.search_index_service import search_index_service
+from app.services.ocr_service import ocr_service
+from app.services.pdf_generator import pdf_render_pool
+from app.services.password_service import password_service
+from app.services.task_queue_backends import RedisStreamTaskQueueBackend
+from app.websocket_backplane import RedisTransport, websocket_backplane
+from app.websocket_manager import manager as chat_manager
+from app.websocket_v2_manager import manager_v2
 from app.config.settings import Settings, Environment
 from app.security_initialization import initialize_security_middleware, initialize_security_headers, get_security_configuration
 from app.monitoring.performance import HealthChecker, PerformanceMonitor
@@ -165,20 +178,19 @@ app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
 # File serving endpoint
 @app.get("/api/v1/files/{file_path:path}")
-async def serve_file(file_path: str):
+async def serve_file(file_path: str, request: Request):
     """
-    Serve uploaded files
+    Serve uploaded files (ETag / 304 and byte ranges supported)
     """
     full_path = uploads_dir / file_path
 
     if not full_path.exists() or not full_path.is_file():
         raise HTTPException(status_code=404, detail="File not found")
 
-    return FileResponse(
-        path=str(full_path),
-        filename=full_path.name,
-        media_type="application/octet-stream",
-    )
+    if not full_path.resolve().is_relative_to(uploads_dir.resolve()):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    return await files.serve_local_file(request, full_path, file_path)
 
 
 # Startup event
@@ -210,6 +222,11 @@ async def startup_event():
             logging.warning(f"Redis connection failed (caching disabled): {e}")
             redis_client = None
 
+        # Permission cache: in-process L1, backed by Redis when available
+        init_permission_cache(redis_client)
+        # Dashboard cache: shared across workers through Redis when available
+        dashboard_cache.use_redis(redis_client)
+
         # Initialize session factory
         session_factory = get_async_session_factory()
 
@@ -238,6 +255,23 @@ async def startup_event():
         #     app.add_middleware(SecurityMiddleware, redis_client=redis_client)
         #     logging.info("Production security middleware enabled")
 
+        # Durable task queue: SQL table by default, Redis streams on request
+        if redis_client and os.getenv("TASK_QUEUE_BACKEND", "sql") == "redis":
+            background_task_service.use_backend(RedisStreamTaskQueueBackend(redis_client))
+        await background_task_service.start()
+
+        # Write-behind persistence for websocket chat messages
+        await message_ingestion_service.start()
+
+        # Document expiry and STS deadline notices for the notification inbox
+        await notification_inbox_service.start()
+
+        # Keep extracted document text searchable
+        ocr_service.add_completion_listener(search_index_service.index_ocr_job)
+
+        # WebSocket fan-out across workers: Redis pub/sub, else this process only
+        await websocket_backplane.start(RedisTransport(redis_client) if redis_client else None)
+
         # Start background monitoring task
         asyncio.create_task(monitoring_background_task())
         logging.info("Background monitoring task started")
@@ -308,10 +342,23 @@ async def shutdown_event():
     logging.info("Shutting down STS Clearance API...")
 
     try:
+        # Persist queued chat messages while the database is still open
+        await message_ingestion_service.stop()
+        await notification_inbox_service.stop()
+
         # Close database connections
         await close_db()
         logging.info("Database connections closed")
 
+        # Stop websocket writers and backplane, task queue, OCR, PDF rendering and password workers
+        for ws_manager in (websocket.manager, chat_manager, manager_v2):
+            await ws_manager.engine.close()
+        await websocket_backplane.stop()
+        await background_task_service.stop()
+        await ocr_service.shutdown()
+        pdf_render_pool.shutdown()
+        password_service.shutdown()
+
         # Close Redis connection
         if redis_client:
             await redis_client.close()
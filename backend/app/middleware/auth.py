@@ -10,11 +10,10 @@ from typing import Any, Dict, Optional
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_session
-from app.models import User
+from app.identity_cache import load_token_user
 
 logger = logging.getLogger(__name__)
 
@@ -179,10 +178,9 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Get user from database
+    # Get user (from the user cache when the token carries claims)
     try:
-        result = await session.execute(select(User).where(User.email == user_email))
-        user = result.scalar_one_or_none()
+        user = await load_token_user(session, payload)
 
         if not user:
             raise HTTPException(
@@ -3,22 +3,30 @@ Simple endpoint-level caching for static endpoints
 Avoids middleware complexity that was causing deadlocks
 """
 
+import os
 import time
+from collections import OrderedDict
 from typing import Dict, Tuple, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
 class SimpleEndpointCache:
-    """Simple in-memory cache for endpoint responses"""
+    """Simple in-memory LRU cache for endpoint responses"""
     
-    def __init__(self):
-        self.cache: Dict[str, Tuple[dict, float]] = {}  # key -> (data, timestamp)
+    def __init__(self, max_entries: Optional[int] = None):
+        # key -> (data, timestamp), least recently used first
+        self.cache: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
         self.default_ttl = 300  # 5 minutes
+        self.max_entries = max_entries or int(os.getenv("ENDPOINT_CACHE_MAX_ENTRIES", 1000))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
     
     def get(self, key: str, ttl: int = None) -> Optional[dict]:
         """Get cached data if still valid"""
         if key not in self.cache:
+            self.misses += 1
             return None
         
         data, timestamp = self.cache[key]
@@ -28,13 +36,20 @@ class SimpleEndpointCache:
         if time.time() - timestamp > cache_ttl:
             # Cache expired, remove it
             del self.cache[key]
+            self.misses += 1
             return None
         
+        self.cache.move_to_end(key)
+        self.hits += 1
         return data
     
     def set(self, key: str, data: dict):
-        """Cache data with timestamp"""
+        """Cache data with timestamp, evicting the least recently used entries"""
         self.cache[key] = (data, time.time())
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+            self.evictions += 1
     
     def clear(self):
         """Clear all cached data"""
@@ -44,6 +59,10 @@ class SimpleEndpointCache:
         """Get cache statistics"""
         return {
             "total_entries": len(self.cache),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
             "cache_type": "simple_endpoint_cache",
             "status": "working"
         }
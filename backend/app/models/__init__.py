@@ -1,13 +1,17 @@
 import os
 import uuid
+from datetime import datetime
 
-from sqlalchemy import (JSON, Boolean, Column, DateTime, Float, ForeignKey,
-                        Integer, String, Text, UniqueConstraint, Index)
+from sqlalchemy import (DDL, JSON, Boolean, Column, Computed, DateTime, Float,
+                        ForeignKey, Integer, String, Text, UniqueConstraint, Index,
+                        event)
 import sqlalchemy
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
+from app.regions import extract_region
+
 # Use String for UUID in SQLite, UUID for PostgreSQL
 if "sqlite" in os.getenv("DATABASE_URL", "sqlite"):
     UUIDType = String(36)
@@ -55,6 +59,9 @@ class User(Base):
     last_login = Column(DateTime(timezone=True), nullable=True)
     updated_at = Column(DateTime(timezone=True), nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
+    # Bumped when role, email, activation or password change; tokens
+    # carrying an older version are refused
+    token_version = Column(Integer, default=0, nullable=False)
 
 
 class Room(Base):
@@ -65,10 +72,16 @@ class Room(Base):
     location = Column(String(255), nullable=False)
     sts_eta = Column(DateTime, nullable=False)
     created_by = Column(String(255), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), nullable=True)
     description = Column(Text, nullable=True)
     status = Column(String(50), default='active', nullable=False)
+    # Normalized from location (app.regions); kept in step by _set_room_region
+    region = Column(
+        String(100),
+        nullable=True,
+        default=lambda context: extract_region(context.get_current_parameters().get("location")),
+    )
     
     # ============ DASHBOARD METRICS FIELDS ============
     # Operational metrics for dashboard calculations
@@ -98,6 +111,18 @@ class Room(Base):
     metrics = relationship("Metric", back_populates="room", cascade="all, delete-orphan")
     party_metrics = relationship("PartyMetric", back_populates="room", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination of historical operations
+        Index("idx_rooms_created_id", "created_at", "id"),
+        # Regional operations, newest first
+        Index("idx_rooms_region_created", "region", "created_at", "id"),
+    )
+
+
+@event.listens_for(Room.location, "set")
+def _set_room_region(target, value, oldvalue, initiator):
+    target.region = extract_region(value)
+
 
 class Party(Base):
     __tablename__ = "parties"
@@ -165,14 +190,31 @@ class DocumentVersion(Base):
     id = Column(UUIDType, primary_key=True, default=uuid_default)
     document_id = Column(UUIDType, ForeignKey("documents.id"), nullable=False)
     file_url = Column(String(500), nullable=False)
-    sha256 = Column(String(64), nullable=False)
+    sha256 = Column(String(64), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     size_bytes = Column(Integer, nullable=False)
     mime = Column(String(100), nullable=False)
+    original_filename = Column(String(255), nullable=True)  # Content-addressed paths drop the name
 
     document = relationship("Document", back_populates="versions")
 
 
+class DocumentBlob(Base):
+    """
+    Content-addressed blob index shared by all storage backends.
+    One row per distinct file content (uploads/blobs/ab/cd/<sha256>);
+    ref_count is the number of DocumentVersion rows pointing at it.
+    """
+    __tablename__ = "document_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size_bytes = Column(Integer, nullable=False)
+    file_url = Column(String(500), nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_referenced_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class Approval(Base):
     __tablename__ = "approvals"
 
@@ -182,7 +224,8 @@ class Approval(Base):
     party_id = Column(UUIDType, ForeignKey("parties.id"), nullable=False)
     status = Column(String(50), default="pending")  # pending, approved, rejected
     updated_at = Column(
-        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+        DateTime(timezone=True), default=datetime.utcnow, server_default=func.now(),
+        onupdate=datetime.utcnow,
     )
 
     room = relationship("Room", back_populates="approvals")
@@ -198,10 +241,16 @@ class ActivityLog(Base):
     actor = Column(String(255), nullable=False)
     action = Column(String(100), nullable=False)
     meta_json = Column(Text, nullable=True)
-    ts = Column(DateTime(timezone=True), server_default=func.now())
+    ts = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
 
     room = relationship("Room", back_populates="activity_logs")
 
+    __table_args__ = (
+        # Keyset pagination (ts, id) per room and across rooms
+        Index("idx_activity_log_room_ts_id", "room_id", "ts", "id"),
+        Index("idx_activity_log_ts_id", "ts", "id"),
+    )
+
 
 class FeatureFlag(Base):
     __tablename__ = "feature_flags"
@@ -221,13 +270,35 @@ class Message(Base):
     content = Column(Text, nullable=False)
     message_type = Column(String(50), default="text")  # text, file, system
     attachments = Column(Text, nullable=True)  # JSON array of file URLs
-    read_by = Column(Text, nullable=True)  # JSON array of user emails
+    read_by = Column(Text, nullable=True)  # Legacy JSON array of user emails (see message_reads)
     is_public = Column(Boolean, default=True)  # Public/Private message visibility - PHASE 4
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
 
     room = relationship("Room", back_populates="messages")
     vessel = relationship("Vessel", back_populates="messages")
 
+    __table_args__ = (
+        # Unread range counts and keyset pagination (created_at, id)
+        Index("idx_messages_room_created_id", "room_id", "created_at", "id"),
+    )
+
+
+class MessageRead(Base):
+    """
+    Per-(room, user) read state for chat messages.
+    last_read_at is a high-water mark: every message created at or before it
+    counts as read. unread_count is maintained on message insert and on
+    mark-read so unread badges are a primary-key lookup.
+    """
+    __tablename__ = "message_reads"
+
+    room_id = Column(UUIDType, ForeignKey("rooms.id", ondelete="CASCADE"), primary_key=True)
+    user_email = Column(String(255), primary_key=True)
+    last_read_at = Column(DateTime(timezone=True), nullable=True)
+    last_read_message_id = Column(UUIDType, nullable=True)
+    unread_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 
 class Notification(Base):
     __tablename__ = "notifications"
@@ -246,10 +317,19 @@ class Notification(Base):
     action_url = Column(String(500), nullable=True)  # URL for action
     expires_at = Column(DateTime(timezone=True), nullable=True)  # When notification expires
     read_at = Column(DateTime(timezone=True), nullable=True)  # When notification was read
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    dedup_key = Column(String(255), nullable=True)  # Producer key, unique per user
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
 
     room = relationship("Room", back_populates="notifications")
 
+    __table_args__ = (
+        # Inbox pages (unread first filter) newest first, keyset on (created_at, id)
+        Index("idx_notifications_user_read_created", "user_email", "read", "created_at", "id"),
+        Index("idx_notifications_user_created", "user_email", "created_at", "id"),
+        # Producers and the expiry scanner never repeat a notice
+        Index("uq_notifications_user_dedup", "user_email", "dedup_key", unique=True),
+    )
+
 
 class Vessel(Base):
     __tablename__ = "vessels"
@@ -278,6 +358,27 @@ class Vessel(Base):
     messages = relationship("Message", back_populates="vessel")
 
 
+class UserVesselAccess(Base):
+    """
+    Which users may see which vessels (and so rooms), and why
+
+    Maintained by app.vessel_access whenever vessels or users change;
+    brokers see every vessel and have no rows.
+    """
+    __tablename__ = "user_vessel_access"
+
+    user_email = Column(String(255), primary_key=True)
+    vessel_id = Column(UUIDType, ForeignKey("vessels.id", ondelete="CASCADE"), primary_key=True)
+    room_id = Column(UUIDType, ForeignKey("rooms.id", ondelete="CASCADE"), nullable=False)
+    reason = Column(String(50), nullable=False)  # owner, charterer
+    granted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_user_vessel_access_user_room", "user_email", "room_id"),
+        Index("idx_user_vessel_access_vessel", "vessel_id"),
+    )
+
+
 class Snapshot(Base):
     __tablename__ = "snapshots"
 
@@ -288,6 +389,7 @@ class Snapshot(Base):
     status = Column(String(50), default="generating")  # generating, completed, failed
     file_url = Column(String(500), nullable=True)
     file_size = Column(Integer, default=0)
+    sha256 = Column(String(64), nullable=True)  # Hash of the rendered file, served as its ETag
     snapshot_type = Column(String(50), default="pdf")
     data = Column(Text, nullable=True)  # JSON data with generation options
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -295,6 +397,110 @@ class Snapshot(Base):
     room = relationship("Room", back_populates="snapshots")
 
 
+class BackgroundTaskRecord(Base):
+    """
+    Durable background task (SQL queue backend).
+    Rows are claimed by workers with a lease (lease_expires_at); a task whose
+    lease lapses is visible to other workers again. dedup_key is cleared when
+    the task reaches a final state so the same key can be queued again.
+    """
+    __tablename__ = "background_tasks"
+
+    id = Column(String(255), primary_key=True)
+    task_type = Column(String(100), nullable=False)
+    priority = Column(Integer, nullable=False, default=1)  # 0 high, 1 normal, 2 low
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, completed, failed, cancelled
+    dedup_key = Column(String(255), nullable=True, unique=True)
+    data = Column(JSON, default=dict)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    progress = Column(Float, default=0.0)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, nullable=False)
+    lease_expires_at = Column(DateTime, nullable=True)
+    worker_id = Column(String(100), nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_background_tasks_claim", "task_type", "status", "priority", "available_at"),
+    )
+
+
+class SearchIndexEntry(Base):
+    """
+    Full-text search document for one room, document, message or vessel.
+    Written by the search index flush listener in the same transaction as
+    the entity it describes. The text index is dialect specific: an FTS5
+    table kept in step by triggers on SQLite, a weighted tsvector column
+    with a GIN index on PostgreSQL (title A, body B, OCR text C).
+    """
+    __tablename__ = "search_index"
+
+    # INTEGER PRIMARY KEY aliases the SQLite rowid, so VACUUM cannot renumber
+    # the rows the FTS5 index points at
+    doc_rowid = Column(Integer, primary_key=True, autoincrement=True)
+    entity_type = Column(String(20), nullable=False)  # room, document, message, vessel
+    entity_id = Column(UUIDType, nullable=False)
+    room_id = Column(UUIDType, ForeignKey("rooms.id", ondelete="CASCADE"), nullable=False)
+    title = Column(String(500), nullable=False, default="")
+    body = Column(Text, nullable=True)
+    ocr_text = Column(Text, nullable=True)  # Extracted document text (documents only)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    if "sqlite" in os.getenv("DATABASE_URL", "sqlite"):
+        __table_args__ = (
+            UniqueConstraint("entity_type", "entity_id", name="uq_search_index_entity"),
+            Index("idx_search_index_room_type", "room_id", "entity_type"),
+        )
+    else:
+        from sqlalchemy.dialects.postgresql import TSVECTOR
+
+        search_vector = Column(
+            TSVECTOR,
+            Computed(
+                "setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('simple'::regconfig, coalesce(body, '')), 'B') || "
+                "setweight(to_tsvector('simple'::regconfig, coalesce(ocr_text, '')), 'C')",
+                persisted=True,
+            ),
+        )
+        __table_args__ = (
+            UniqueConstraint("entity_type", "entity_id", name="uq_search_index_entity"),
+            Index("idx_search_index_room_type", "room_id", "entity_type"),
+            Index("idx_search_index_vector", "search_vector", postgresql_using="gin"),
+        )
+
+
+# SQLite: FTS5 external-content table over search_index, synced by triggers
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index_fts USING fts5("
+    "title, body, ocr_text, content='search_index', content_rowid='doc_rowid', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS search_index_ai AFTER INSERT ON search_index BEGIN "
+    "INSERT INTO search_index_fts(rowid, title, body, ocr_text) "
+    "VALUES (new.doc_rowid, new.title, new.body, new.ocr_text); END",
+    "CREATE TRIGGER IF NOT EXISTS search_index_ad AFTER DELETE ON search_index BEGIN "
+    "INSERT INTO search_index_fts(search_index_fts, rowid, title, body, ocr_text) "
+    "VALUES ('delete', old.doc_rowid, old.title, old.body, old.ocr_text); END",
+    "CREATE TRIGGER IF NOT EXISTS search_index_au AFTER UPDATE ON search_index BEGIN "
+    "INSERT INTO search_index_fts(search_index_fts, rowid, title, body, ocr_text) "
+    "VALUES ('delete', old.doc_rowid, old.title, old.body, old.ocr_text); "
+    "INSERT INTO search_index_fts(rowid, title, body, ocr_text) "
+    "VALUES (new.doc_rowid, new.title, new.body, new.ocr_text); END",
+]
+
+for _ddl in SQLITE_SEARCH_DDL:
+    event.listen(SearchIndexEntry.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+event.listen(
+    SearchIndexEntry.__table__,
+    "after_drop",
+    DDL("DROP TABLE IF EXISTS search_index_fts").execute_if(dialect="sqlite"),
+)
+
+
 class VesselPair(Base):
     __tablename__ = "vessel_pairs"
 
@@ -414,6 +620,43 @@ class PartyMetric(Base):
     )
 
 
+class RoomReadiness(Base):
+    """
+    Materialized per-room readiness counters.
+    Maintained in the same transaction as document, approval and room writes
+    so read endpoints can use a primary-key lookup instead of aggregate scans.
+    """
+    __tablename__ = "room_readiness"
+
+    room_id = Column(UUIDType, ForeignKey("rooms.id", ondelete="CASCADE"), primary_key=True)
+
+    # Document counts by status
+    total_documents = Column(Integer, default=0, nullable=False)
+    missing_documents = Column(Integer, default=0, nullable=False)
+    under_review_documents = Column(Integer, default=0, nullable=False)
+    approved_documents = Column(Integer, default=0, nullable=False)
+    rejected_documents = Column(Integer, default=0, nullable=False)
+    expired_documents = Column(Integer, default=0, nullable=False)
+
+    # Required documents (resolved = approved or under_review)
+    required_documents = Column(Integer, default=0, nullable=False)
+    resolved_required_documents = Column(Integer, default=0, nullable=False)
+
+    # Approval progress
+    total_approvals = Column(Integer, default=0, nullable=False)
+    pending_approvals = Column(Integer, default=0, nullable=False)
+    approved_approvals = Column(Integer, default=0, nullable=False)
+    rejected_approvals = Column(Integer, default=0, nullable=False)
+    oldest_pending_approval_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Earliest expiry among documents not already marked expired
+    next_expiry_at = Column(DateTime, nullable=True)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    room = relationship("Room")
+
+
 class ApprovalWorkflow(Base):
     """
     Multi-step approval workflows for operations, documents, and mutual signoffs.
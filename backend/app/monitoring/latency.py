@@ -0,0 +1,66 @@
+"""
+Latency histogram for STS Clearance Hub
+Fixed-bucket, in-process latency distribution for hot endpoints
+"""
+
+from bisect import bisect_left
+from typing import Any, Dict, Optional, Sequence
+
+# Upper bounds of the buckets in milliseconds; larger values overflow
+DEFAULT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """
+    Counts observations per latency bucket.
+
+    Percentiles are reported as the upper bound of the bucket holding them
+    (the maximum seen for the overflow bucket), which is precise enough to
+    tell a 250ms login from a 2.5s one at constant memory.
+    """
+
+    def __init__(self, buckets_ms: Optional[Sequence[float]] = None):
+        self.buckets_ms = tuple(buckets_ms or DEFAULT_BUCKETS_MS)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float) -> None:
+        self.counts[bisect_left(self.buckets_ms, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket containing the given fraction of observations"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if index == len(self.buckets_ms):
+                    return self.max_ms
+                return min(float(self.buckets_ms[index]), self.max_ms)
+        return self.max_ms
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        buckets = {f"le_{bound}": n for bound, n in zip(self.buckets_ms, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "p50_ms": round(self.percentile(0.50), 2),
+            "p95_ms": round(self.percentile(0.95), 2),
+            "p99_ms": round(self.percentile(0.99), 2),
+            "buckets": buckets,
+        }
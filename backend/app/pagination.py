@@ -0,0 +1,131 @@
+"""
+Keyset pagination for STS Clearance Hub
+Opaque (timestamp, id) cursor tokens so deep pages cost the same as page 1
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+# Response header carrying the next-page token for endpoints that return lists
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+
+
+def encode_cursor(ts: Optional[datetime], row_id: Any) -> str:
+    """Encode the sort key of the last row on a page (``ts`` is None for undated rows)"""
+    payload = json.dumps([ts.isoformat() if ts else None, str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[Optional[datetime], str]:
+    """Decode a token produced by encode_cursor"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        ts, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(ts) if ts is not None else None), str(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid pagination cursor") from e
+
+
+def parse_cursor(token: Optional[str]) -> Optional[Tuple[Optional[datetime], str]]:
+    """decode_cursor for request parameters: 400 on a malformed token"""
+    if not token:
+        return None
+    try:
+        return decode_cursor(token)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def keyset_page(
+    query, ts_column, id_column, cursor: Optional[Tuple[Optional[datetime], str]], limit: int
+):
+    """
+    Order ``query`` newest first by (ts, id) and start after ``cursor``.
+
+    Only dated rows are selected, so the page is a plain descending seek on
+    the (ts, id) index; a cursor taken from an undated row continues
+    through the undated rows by id instead (see fetch_keyset_page). One
+    extra row is fetched so the caller can tell whether a next page exists
+    without counting.
+    """
+    if cursor is not None and cursor[0] is None:
+        return keyset_tail(query, ts_column, id_column, cursor, limit)
+    if cursor is None:
+        query = query.where(ts_column.isnot(None))
+    else:
+        ts, row_id = cursor
+        query = query.where(
+            or_(ts_column < ts, and_(ts_column == ts, id_column < row_id))
+        )
+    return query.order_by(ts_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def keyset_tail(
+    query, ts_column, id_column, cursor: Optional[Tuple[Optional[datetime], str]], limit: int
+):
+    """Undated rows of ``query`` newest id first, after ``cursor`` if it is an undated row"""
+    query = query.where(ts_column.is_(None))
+    if cursor is not None and cursor[0] is None:
+        query = query.where(id_column < cursor[1])
+    return query.order_by(id_column.desc()).limit(limit + 1)
+
+
+async def fetch_keyset_page(
+    session,
+    query,
+    ts_column,
+    id_column,
+    cursor: Optional[Tuple[Optional[datetime], str]],
+    limit: int,
+    ts_attr: str,
+    offset: int = 0,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Run a keyset page over a nullable timestamp and split it.
+
+    Dated rows come first; only on the page where they run out is a second
+    query made for the undated rows, so every other page stays an index
+    seek. ``offset`` (without a cursor) is the legacy path and orders both
+    ranges in one query.
+    """
+    if offset and cursor is None:
+        result = await session.execute(
+            query.order_by(ts_column.desc().nulls_last(), id_column.desc())
+            .offset(offset).limit(limit + 1)
+        )
+        return split_page(result.scalars().all(), limit, ts_attr)
+
+    result = await session.execute(keyset_page(query, ts_column, id_column, cursor, limit))
+    rows = list(result.scalars().all())
+    if len(rows) <= limit and (cursor is None or cursor[0] is not None):
+        tail = await session.execute(
+            keyset_tail(query, ts_column, id_column, None, limit - len(rows))
+        )
+        rows.extend(tail.scalars().all())
+    return split_page(rows, limit, ts_attr)
+
+
+def split_page(
+    rows: Sequence[Any], limit: int, ts_attr: str, id_attr: str = "id"
+) -> Tuple[List[Any], Optional[str]]:
+    """Trim the look-ahead row and build the next cursor, if any"""
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    last = page[-1]
+    return page, encode_cursor(getattr(last, ts_attr), getattr(last, id_attr))
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    """Expose the next-page token on list endpoints without changing their body"""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
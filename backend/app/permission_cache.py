@@ -1,48 +1,200 @@
 """
 Permission Cache for STS Clearance Hub
-Caches permission checks using Redis for performance optimization
+Two-tier cache for permission checks: an in-process LRU (L1) in front of
+an asyncio Redis backend (L2) with pipelined bulk lookups
 """
 
-import json
 import logging
-from typing import Optional
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
 
 try:
-    import redis
+    import redis.asyncio as redis
     REDIS_AVAILABLE = True
 except ImportError:
     REDIS_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Redis key holding the global version (bumped by clear_all_permissions)
+GLOBAL_VERSION_KEY = "permver:__global__"
+
 
 class PermissionCache:
     """
-    Cache layer for permission checks using Redis
-    Improves performance by caching permission validation results
+    Cache layer for permission checks
+
+    Keys are versioned per user: ``perm:{global_v}.{user_v}:{email}:...``.
+    Invalidating a user (or everything) increments a version counter, which
+    makes every older key unreachable in O(1); stale keys simply expire.
     """
 
-    def __init__(self, redis_client: Optional["redis.Redis"] = None, ttl_seconds: int = 3600):
+    def __init__(
+        self,
+        redis_client: Optional["redis.Redis"] = None,
+        ttl_seconds: int = 3600,
+        l1_ttl_seconds: float = 5.0,
+        l1_max_entries: int = 10000,
+    ):
         """
         Initialize permission cache
 
         Args:
-            redis_client: Redis client instance (optional)
-            ttl_seconds: Time to live for cached entries (default: 1 hour)
+            redis_client: asyncio Redis client instance (optional)
+            ttl_seconds: Time to live for Redis entries (default: 1 hour)
+            l1_ttl_seconds: Time to live for in-process entries; bounds how long
+                another worker's invalidation can go unnoticed
+            l1_max_entries: Maximum number of in-process entries
         """
         self.redis_client = redis_client
         self.ttl_seconds = ttl_seconds
+        self.l1_ttl_seconds = l1_ttl_seconds
+        self.l1_max_entries = l1_max_entries
         self.enabled = REDIS_AVAILABLE and redis_client is not None
 
-    def _make_key(self, user_email: str, resource: str, action: str) -> str:
+        # key -> (value, expires_at); holds both results and version counters
+        self._l1: "OrderedDict[str, Tuple[object, float]]" = OrderedDict()
+
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.redis_calls = 0
+        self.redis_time_ms = 0.0
+        self.redis_max_ms = 0.0
+
+    # Key helpers
+
+    @staticmethod
+    def _user_version_key(user_email: str) -> str:
+        return f"permver:{user_email}"
+
+    @staticmethod
+    def _make_key(version: str, user_email: str, resource: str, action: str) -> str:
         """Generate cache key for a permission check"""
-        return f"perm:{user_email}:{resource}:{action}"
+        return f"perm:{version}:{user_email}:{resource}:{action}"
 
-    def _make_vessel_key(self, user_email: str, vessel_id: str) -> str:
+    @staticmethod
+    def _make_vessel_key(version: str, user_email: str, vessel_id: str) -> str:
         """Generate cache key for vessel access check"""
-        return f"vessel:{user_email}:{vessel_id}"
+        return f"vessel:{version}:{user_email}:{vessel_id}"
+
+    # L1 tier
+
+    def _l1_get(self, key: str):
+        item = self._l1.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if time.monotonic() > expires_at:
+            del self._l1[key]
+            return None
+        self._l1.move_to_end(key)
+        return value
+
+    def _l1_set(self, key: str, value) -> None:
+        self._l1[key] = (value, time.monotonic() + self.l1_ttl_seconds)
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.l1_max_entries:
+            self._l1.popitem(last=False)
+
+    # L2 tier
+
+    async def _timed(self, coro):
+        """Await a Redis call and record its latency"""
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.redis_calls += 1
+            self.redis_time_ms += elapsed_ms
+            self.redis_max_ms = max(self.redis_max_ms, elapsed_ms)
+
+    @staticmethod
+    def _decode(value) -> Optional[str]:
+        if value is None:
+            return None
+        return value.decode() if isinstance(value, bytes) else str(value)
+
+    async def _get_version(self, user_email: str) -> str:
+        """Current ``global.user`` version string for a user"""
+        user_key = self._user_version_key(user_email)
+        global_v = self._l1_get(GLOBAL_VERSION_KEY)
+        user_v = self._l1_get(user_key)
+
+        if (global_v is None or user_v is None) and self.enabled:
+            try:
+                values = await self._timed(
+                    self.redis_client.mget([GLOBAL_VERSION_KEY, user_key])
+                )
+                global_v = self._decode(values[0]) or "0"
+                user_v = self._decode(values[1]) or "0"
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Error getting permission version from cache: {str(e)}")
+
+        global_v = global_v if global_v is not None else "0"
+        user_v = user_v if user_v is not None else "0"
+        self._l1_set(GLOBAL_VERSION_KEY, global_v)
+        self._l1_set(user_key, user_v)
+        return f"{global_v}.{user_v}"
+
+    async def _get_many(self, keys: List[str]) -> Dict[str, Optional[bool]]:
+        """Look up keys in L1, then fetch the remainder with one MGET"""
+        results: Dict[str, Optional[bool]] = {}
+        pending = []
+        for key in keys:
+            value = self._l1_get(key)
+            if value is None:
+                pending.append(key)
+            else:
+                self.l1_hits += 1
+                results[key] = value
+
+        if pending and self.enabled:
+            try:
+                values = await self._timed(self.redis_client.mget(pending))
+                for key, raw in zip(pending, values):
+                    raw = self._decode(raw)
+                    if raw is not None:
+                        allowed = raw == "true"
+                        self.l2_hits += 1
+                        self._l1_set(key, allowed)
+                        results[key] = allowed
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Error getting permissions from cache: {str(e)}")
+
+        for key in keys:
+            if key not in results:
+                self.misses += 1
+                results[key] = None
+        return results
+
+    async def _set_many(self, items: Dict[str, bool]) -> bool:
+        """Store results in L1 and pipeline the SETEX calls to Redis"""
+        for key, allowed in items.items():
+            self._l1_set(key, allowed)
+
+        if not self.enabled or not items:
+            return True
+
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, allowed in items.items():
+                pipe.setex(key, self.ttl_seconds, "true" if allowed else "false")
+            await self._timed(pipe.execute())
+            return True
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Error setting permissions in cache: {str(e)}")
+            return False
 
-    def get_permission(
+    # Permission checks
+
+    async def get_permission(
         self, user_email: str, resource: str, action: str
     ) -> Optional[bool]:
         """
@@ -56,23 +208,32 @@ class PermissionCache:
         Returns:
             Cached boolean result or None if not cached
         """
-        if not self.enabled:
-            return None
+        results = await self.get_permissions(user_email, [(resource, action)])
+        return results[(resource, action)]
 
-        try:
-            key = self._make_key(user_email, resource, action)
-            value = self.redis_client.get(key)
-
-            if value:
-                return value.decode() == "true"
-
-            return None
+    async def get_permissions(
+        self, user_email: str, checks: Iterable[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], Optional[bool]]:
+        """
+        Get cached results for many (resource, action) pairs in one round trip
 
-        except Exception as e:
-            logger.warning(f"Error getting permission from cache: {str(e)}")
-            return None
+        Args:
+            user_email: User's email
+            checks: (resource, action) pairs
 
-    def set_permission(
+        Returns:
+            Mapping of each pair to its cached result, or None if not cached
+        """
+        checks = list(dict.fromkeys(checks))
+        version = await self._get_version(user_email)
+        keys = {
+            pair: self._make_key(version, user_email, pair[0], pair[1])
+            for pair in checks
+        }
+        found = await self._get_many(list(keys.values()))
+        return {pair: found[key] for pair, key in keys.items()}
+
+    async def set_permission(
         self, user_email: str, resource: str, action: str, allowed: bool
     ) -> bool:
         """
@@ -87,20 +248,28 @@ class PermissionCache:
         Returns:
             True if caching succeeded, False otherwise
         """
-        if not self.enabled:
-            return False
+        return await self.set_permissions(user_email, {(resource, action): allowed})
 
-        try:
-            key = self._make_key(user_email, resource, action)
-            value = "true" if allowed else "false"
-            self.redis_client.setex(key, self.ttl_seconds, value)
-            return True
+    async def set_permissions(
+        self, user_email: str, results: Dict[Tuple[str, str], bool]
+    ) -> bool:
+        """
+        Cache many permission results with a single pipeline
 
-        except Exception as e:
-            logger.warning(f"Error setting permission in cache: {str(e)}")
-            return False
+        Args:
+            user_email: User's email
+            results: Mapping of (resource, action) to allowed
+
+        Returns:
+            True if caching succeeded, False otherwise
+        """
+        version = await self._get_version(user_email)
+        return await self._set_many({
+            self._make_key(version, user_email, resource, action): allowed
+            for (resource, action), allowed in results.items()
+        })
 
-    def get_vessel_access(self, user_email: str, vessel_id: str) -> Optional[bool]:
+    async def get_vessel_access(self, user_email: str, vessel_id: str) -> Optional[bool]:
         """
         Get cached vessel access result
 
@@ -111,23 +280,11 @@ class PermissionCache:
         Returns:
             Cached boolean result or None if not cached
         """
-        if not self.enabled:
-            return None
-
-        try:
-            key = self._make_vessel_key(user_email, vessel_id)
-            value = self.redis_client.get(key)
-
-            if value:
-                return value.decode() == "true"
-
-            return None
-
-        except Exception as e:
-            logger.warning(f"Error getting vessel access from cache: {str(e)}")
-            return None
+        version = await self._get_version(user_email)
+        key = self._make_vessel_key(version, user_email, vessel_id)
+        return (await self._get_many([key]))[key]
 
-    def set_vessel_access(
+    async def set_vessel_access(
         self, user_email: str, vessel_id: str, allowed: bool
     ) -> bool:
         """
@@ -141,20 +298,33 @@ class PermissionCache:
         Returns:
             True if caching succeeded, False otherwise
         """
+        version = await self._get_version(user_email)
+        return await self._set_many(
+            {self._make_vessel_key(version, user_email, vessel_id): allowed}
+        )
+
+    # Invalidation
+
+    async def _bump_version(self, version_key: str) -> bool:
+        current = self._l1_get(version_key)
+        local_next = str(int(current or "0") + 1)
+
         if not self.enabled:
-            return False
+            self._l1_set(version_key, local_next)
+            return True
 
         try:
-            key = self._make_vessel_key(user_email, vessel_id)
-            value = "true" if allowed else "false"
-            self.redis_client.setex(key, self.ttl_seconds, value)
+            new_version = await self._timed(self.redis_client.incr(version_key))
+            self._l1_set(version_key, str(new_version))
             return True
-
         except Exception as e:
-            logger.warning(f"Error setting vessel access in cache: {str(e)}")
+            self.errors += 1
+            # Still hide stale entries from this process
+            self._l1_set(version_key, local_next)
+            logger.warning(f"Error bumping permission version: {str(e)}")
             return False
 
-    def invalidate_user_permissions(self, user_email: str) -> bool:
+    async def invalidate_user_permissions(self, user_email: str) -> bool:
         """
         Invalidate all cached permissions for a user
         (Call this when user role changes or permissions are updated)
@@ -165,30 +335,9 @@ class PermissionCache:
         Returns:
             True if invalidation succeeded, False otherwise
         """
-        if not self.enabled:
-            return False
-
-        try:
-            # Find all keys for this user
-            pattern = f"perm:{user_email}:*"
-            keys = self.redis_client.keys(pattern)
+        return await self._bump_version(self._user_version_key(user_email))
 
-            # Also invalidate vessel access keys
-            vessel_pattern = f"vessel:{user_email}:*"
-            vessel_keys = self.redis_client.keys(vessel_pattern)
-
-            all_keys = keys + vessel_keys
-
-            if all_keys:
-                self.redis_client.delete(*all_keys)
-
-            return True
-
-        except Exception as e:
-            logger.warning(f"Error invalidating user permissions: {str(e)}")
-            return False
-
-    def invalidate_permission(
+    async def invalidate_permission(
         self, user_email: str, resource: str, action: str
     ) -> bool:
         """
@@ -202,19 +351,11 @@ class PermissionCache:
         Returns:
             True if invalidation succeeded, False otherwise
         """
-        if not self.enabled:
-            return False
+        version = await self._get_version(user_email)
+        key = self._make_key(version, user_email, resource, action)
+        return await self._delete(key)
 
-        try:
-            key = self._make_key(user_email, resource, action)
-            self.redis_client.delete(key)
-            return True
-
-        except Exception as e:
-            logger.warning(f"Error invalidating permission: {str(e)}")
-            return False
-
-    def invalidate_vessel_access(self, user_email: str, vessel_id: str) -> bool:
+    async def invalidate_vessel_access(self, user_email: str, vessel_id: str) -> bool:
         """
         Invalidate a specific vessel access cache entry
 
@@ -225,19 +366,23 @@ class PermissionCache:
         Returns:
             True if invalidation succeeded, False otherwise
         """
-        if not self.enabled:
-            return False
+        version = await self._get_version(user_email)
+        key = self._make_vessel_key(version, user_email, vessel_id)
+        return await self._delete(key)
 
+    async def _delete(self, key: str) -> bool:
+        self._l1.pop(key, None)
+        if not self.enabled:
+            return True
         try:
-            key = self._make_vessel_key(user_email, vessel_id)
-            self.redis_client.delete(key)
+            await self._timed(self.redis_client.delete(key))
             return True
-
         except Exception as e:
-            logger.warning(f"Error invalidating vessel access: {str(e)}")
+            self.errors += 1
+            logger.warning(f"Error invalidating permission: {str(e)}")
             return False
 
-    def clear_all_permissions(self) -> bool:
+    async def clear_all_permissions(self) -> bool:
         """
         Clear all permission-related cache entries
         (Use with caution - call when permissions are globally updated)
@@ -245,24 +390,8 @@ class PermissionCache:
         Returns:
             True if clearing succeeded, False otherwise
         """
-        if not self.enabled:
-            return False
-
-        try:
-            # Clear all permission keys
-            perm_keys = self.redis_client.keys("perm:*")
-            vessel_keys = self.redis_client.keys("vessel:*")
-
-            all_keys = perm_keys + vessel_keys
-
-            if all_keys:
-                self.redis_client.delete(*all_keys)
-
-            return True
-
-        except Exception as e:
-            logger.warning(f"Error clearing all permissions: {str(e)}")
-            return False
+        self._l1.clear()
+        return await self._bump_version(GLOBAL_VERSION_KEY)
 
     def get_stats(self) -> dict:
         """
@@ -271,24 +400,24 @@ class PermissionCache:
         Returns:
             Dictionary with cache stats
         """
-        if not self.enabled:
-            return {"enabled": False, "reason": "Redis not available"}
-
-        try:
-            perm_keys = self.redis_client.keys("perm:*")
-            vessel_keys = self.redis_client.keys("vessel:*")
-
-            return {
-                "enabled": True,
-                "permission_cache_entries": len(perm_keys),
-                "vessel_cache_entries": len(vessel_keys),
-                "total_entries": len(perm_keys) + len(vessel_keys),
-                "ttl_seconds": self.ttl_seconds,
-            }
-
-        except Exception as e:
-            logger.warning(f"Error getting cache stats: {str(e)}")
-            return {"enabled": False, "error": str(e)}
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        return {
+            "enabled": True,
+            "redis_enabled": self.enabled,
+            "l1_entries": len(self._l1),
+            "l1_max_entries": self.l1_max_entries,
+            "l1_ttl_seconds": self.l1_ttl_seconds,
+            "ttl_seconds": self.ttl_seconds,
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.l1_hits + self.l2_hits) / lookups, 3) if lookups else 0.0,
+            "errors": self.errors,
+            "redis_calls": self.redis_calls,
+            "redis_avg_latency_ms": round(self.redis_time_ms / self.redis_calls, 3)
+            if self.redis_calls else 0.0,
+            "redis_max_latency_ms": round(self.redis_max_ms, 3),
+        }
 
 
 # Singleton instance
@@ -302,7 +431,7 @@ def init_permission_cache(
     Initialize the permission cache singleton
 
     Args:
-        redis_client: Redis client instance
+        redis_client: asyncio Redis client instance
         ttl_seconds: Cache TTL in seconds
 
     Returns:
@@ -318,9 +447,9 @@ def get_permission_cache() -> PermissionCache:
     Get the permission cache singleton
 
     Returns:
-        PermissionCache instance (or dummy if not initialized)
+        PermissionCache instance (L1 only if Redis was not initialized)
     """
     global permission_cache
     if permission_cache is None:
         permission_cache = PermissionCache()
-    return permission_cache
\ No newline at end of file
+    return permission_cache
@@ -179,21 +179,11 @@ def require_any_permission(permissions: list[tuple[str, str]]):
 
             user_email = current_user.get("email")
 
-            # Check if user has ANY of the permissions
-            has_any_permission = False
-            for resource, action in permissions:
-                allowed, _ = await permission_manager.check_permission(
-                    user_email=user_email,
-                    resource=resource,
-                    action=action,
-                    room_id=room_id or "system",
-                    session=session,
-                    audit=False,  # Don't audit each check, only the final result
-                )
-
-                if allowed:
-                    has_any_permission = True
-                    break
+            # Check if user has ANY of the permissions (one cache round trip)
+            results = await permission_manager.check_permissions(
+                user_email, permissions, session
+            )
+            has_any_permission = any(allowed for allowed, _ in results.values())
 
             if not has_any_permission:
                 permission_str = ", ".join([f"{r}.{a}" for r, a in permissions])
@@ -245,20 +235,15 @@ def require_all_permissions(permissions: list[tuple[str, str]]):
 
             user_email = current_user.get("email")
 
-            # Check if user has ALL permissions
-            missing_permissions = []
-            for resource, action in permissions:
-                allowed, error_msg = await permission_manager.check_permission(
-                    user_email=user_email,
-                    resource=resource,
-                    action=action,
-                    room_id=room_id or "system",
-                    session=session,
-                    audit=False,
-                )
-
-                if not allowed:
-                    missing_permissions.append(f"{resource}.{action}")
+            # Check if user has ALL permissions (one cache round trip)
+            results = await permission_manager.check_permissions(
+                user_email, permissions, session
+            )
+            missing_permissions = [
+                f"{resource}.{action}"
+                for (resource, action), (allowed, _) in results.items()
+                if not allowed
+            ]
 
             if missing_permissions:
                 logger.warning(
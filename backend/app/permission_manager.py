@@ -4,12 +4,13 @@ Handles permission checks, vessel access, and audit logging
 """
 
 import logging
-from typing import Optional, Tuple
+from typing import Dict, Iterable, Optional, Tuple
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import User, Vessel, Party
+from app.permission_cache import get_permission_cache
 from app.permission_matrix import PermissionMatrix
 
 logger = logging.getLogger(__name__)
@@ -47,43 +48,83 @@ class PermissionManager:
         Returns:
             Tuple of (allowed: bool, error_message: Optional[str])
         """
-        try:
-            # Get user role
-            user = await self._get_user(user_email, session)
-            if not user:
-                error_msg = f"User not found: {user_email}"
-                if audit:
-                    await self.audit_permission_check(
-                        user_email, resource, action, room_id, False, error_msg, session
-                    )
-                return False, error_msg
+        results = await self.check_permissions(
+            user_email, [(resource, action)], session
+        )
+        allowed, msg = results[(resource, action)]
+
+        if audit:
+            await self.audit_permission_check(
+                user_email, resource, action, room_id, allowed, msg, session
+            )
 
-            user_role = user.role
+        return allowed, msg
 
-            # Check permission in matrix
-            allowed, msg = self.permission_matrix.validate_permission(
-                user_role, resource, action
-            )
+    async def check_permissions(
+        self,
+        user_email: str,
+        checks: Iterable[Tuple[str, str]],
+        session: AsyncSession,
+    ) -> Dict[Tuple[str, str], Tuple[bool, Optional[str]]]:
+        """
+        Check several (resource, action) pairs at once
 
-            if not allowed:
-                if audit:
-                    await self.audit_permission_check(
-                        user_email, resource, action, room_id, False, msg, session
+        Cached results are fetched in one round trip; the user row is loaded
+        at most once for the pairs that miss the cache. No auditing.
+
+        Args:
+            user_email: User's email address
+            checks: (resource, action) pairs
+            session: Database session
+
+        Returns:
+            Mapping of each pair to (allowed, error_message)
+        """
+        checks = list(dict.fromkeys(checks))
+        results: Dict[Tuple[str, str], Tuple[bool, Optional[str]]] = {}
+        cache = get_permission_cache()
+
+        try:
+            cached = await cache.get_permissions(user_email, checks)
+            missing = []
+            for pair in checks:
+                if cached[pair] is None:
+                    missing.append(pair)
+                elif cached[pair]:
+                    results[pair] = (True, None)
+                else:
+                    results[pair] = (
+                        False,
+                        f"Permission denied to {pair[1]} {pair[0]}",
                     )
-                return False, msg
 
-            # If audit is enabled, log the successful permission check
-            if audit:
-                await self.audit_permission_check(
-                    user_email, resource, action, room_id, True, None, session
+            if not missing:
+                return results
+
+            # Get user role
+            user = await self._get_user(user_email, session)
+            if not user:
+                error_msg = f"User not found: {user_email}"
+                for pair in missing:
+                    results[pair] = (False, error_msg)
+                return results
+
+            computed = {}
+            for resource, action in missing:
+                # Check permission in matrix
+                allowed, msg = self.permission_matrix.validate_permission(
+                    user.role, resource, action
                 )
+                results[(resource, action)] = (allowed, None if allowed else msg)
+                computed[(resource, action)] = allowed
 
-            return True, None
+            await cache.set_permissions(user_email, computed)
+            return results
 
         except Exception as e:
             error_msg = f"Error checking permission: {str(e)}"
             logger.error(error_msg)
-            return False, error_msg
+            return {pair: results.get(pair, (False, error_msg)) for pair in checks}
 
     async def check_vessel_access(
         self,
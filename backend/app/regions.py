@@ -0,0 +1,59 @@
+"""
+Maritime regions for STS Clearance system
+One mapping from free-text locations to the regions stored on rooms
+"""
+
+from typing import Optional
+
+# Checked in order; the first region with a keyword in the location wins
+REGION_KEYWORDS = (
+    ("Southeast Asia", ("singapore", "malaysia", "indonesia", "thailand")),
+    ("East Asia", ("china", "japan", "korea", "taiwan")),
+    ("South Asia", ("india", "sri lanka", "bangladesh")),
+    ("Middle East", ("middle east", "oman", "uae", "qatar", "dubai", "kuwait", "saudi")),
+    ("Europe/Mediterranean", (
+        "europe", "mediterranean", "atlantic", "rotterdam", "antwerp", "london", "hamburg", "spain",
+    )),
+    ("Africa", ("africa", "cape town", "durban", "nigeria", "ghana")),
+    ("Americas", ("america", "pacific", "houston", "mexico", "canada", "brazil")),
+)
+
+# Locations matching no region
+DEFAULT_REGION = "Global"
+
+REGIONS = tuple(region for region, _ in REGION_KEYWORDS) + (DEFAULT_REGION,)
+
+
+def extract_region(location: Optional[str]) -> str:
+    """Region of a free-text location, ``DEFAULT_REGION`` when none matches"""
+    location_lower = (location or "").lower()
+    for region, keywords in REGION_KEYWORDS:
+        if any(keyword in location_lower for keyword in keywords):
+            return region
+    return DEFAULT_REGION
+
+
+def normalize_region(value: str) -> str:
+    """
+    Region for a filter value: a region name in any case, or else the
+    region of the value read as a location ("Singapore" -> "Southeast Asia")
+    """
+    for region in REGIONS:
+        if value.strip().lower() == region.lower():
+            return region
+    return extract_region(value)
+
+
+def operation_region(region: Optional[str], location: Optional[str]) -> Optional[str]:
+    """
+    Region stored on an STS operation: ``region`` when it names one, else
+    the region of the location, else of ``region`` read as a location
+    ("Europe" -> "Europe/Mediterranean"); None when nothing matches
+    """
+    for name in REGIONS:
+        if region and region.strip().lower() == name.lower():
+            return None if name == DEFAULT_REGION else name
+    derived = extract_region(location)
+    if derived == DEFAULT_REGION and region:
+        derived = extract_region(region)
+    return None if derived == DEFAULT_REGION else derived
@@ -8,7 +8,7 @@ import logging
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from pydantic import BaseModel
 from sqlalchemy import desc, select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -16,6 +16,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_async_session
 from app.dependencies import get_current_user, require_room_access
 from app.models import ActivityLog, Party, Room, User
+from app.pagination import (keyset_page, parse_cursor, set_next_cursor,
+                            split_page)
 
 logger = logging.getLogger(__name__)
 
@@ -42,8 +44,10 @@ class ActivityResponse(BaseModel):
 
 @router.get("/activities", response_model=List[ActivityResponse])
 async def get_user_activities_general(
+    response: Response,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
     action_filter: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
@@ -52,14 +56,22 @@ async def get_user_activities_general(
     Get activities for all rooms the user has access to (alias for backward compatibility)
     """
     return await get_user_activities(
-        limit, offset, action_filter, current_user, session
+        response=response,
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+        action_filter=action_filter,
+        current_user=current_user,
+        session=session,
     )
 
 
 @router.get("/activities/my-recent", response_model=List[ActivityResponse])
 async def get_user_activities(
+    response: Response,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
     action_filter: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
@@ -70,8 +82,11 @@ async def get_user_activities(
     - All authenticated users can view own activities (permission_matrix: activities.view_own)
     - Admins can view all activities (permission_matrix: activities.view_all)
     - Users only see activities from rooms they're members of
+    Pages newest first; the X-Next-Cursor header is the ``cursor`` of the next page.
     """
     try:
+        cursor_key = parse_cursor(cursor)
+
         from app.permission_matrix import permission_matrix
         from app.models import User
 
@@ -97,17 +112,17 @@ async def get_user_activities(
                 )
             # Query all activities from all rooms
             try:
-                query = (
-                    select(ActivityLog)
-                    .order_by(desc(ActivityLog.ts))
-                )
+                query = select(ActivityLog)
 
                 if action_filter:
                     query = query.where(ActivityLog.action.ilike(f"%{action_filter}%"))
 
-                query = query.offset(offset).limit(limit)
+                query = keyset_page(query, ActivityLog.ts, ActivityLog.id, cursor_key, limit)
+                if offset and cursor_key is None:
+                    query = query.offset(offset)
                 result = await session.execute(query)
-                activities = result.scalars().all()
+                activities, next_cursor = split_page(result.scalars().all(), limit, "ts")
+                set_next_cursor(response, next_cursor)
 
                 logger.info(f"Admin {user_email} retrieved {len(activities)} activities from all rooms")
                 return [
@@ -144,18 +159,17 @@ async def get_user_activities(
 
             # Build optimized query with proper indexing - only user's rooms
             try:
-                query = (
-                    select(ActivityLog)
-                    .where(ActivityLog.room_id.in_(user_room_ids))
-                    .order_by(desc(ActivityLog.ts))
-                )
+                query = select(ActivityLog).where(ActivityLog.room_id.in_(user_room_ids))
 
                 if action_filter:
                     query = query.where(ActivityLog.action.ilike(f"%{action_filter}%"))
 
-                query = query.offset(offset).limit(limit)
+                query = keyset_page(query, ActivityLog.ts, ActivityLog.id, cursor_key, limit)
+                if offset and cursor_key is None:
+                    query = query.offset(offset)
                 result = await session.execute(query)
-                activities = result.scalars().all()
+                activities, next_cursor = split_page(result.scalars().all(), limit, "ts")
+                set_next_cursor(response, next_cursor)
 
                 logger.info(f"User {user_email} retrieved {len(activities)} activities from {len(user_room_ids)} rooms")
                 return [
@@ -184,8 +198,10 @@ async def get_user_activities(
 @router.get("/rooms/{room_id}/activities", response_model=List[ActivityResponse])
 async def get_room_activities(
     room_id: str,
+    response: Response,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
     action_filter: Optional[str] = None,
     actor_filter: Optional[str] = None,
     current_user: User = Depends(get_current_user),
@@ -197,11 +213,13 @@ async def get_room_activities(
     - All authenticated users in room can view own activities (permission_matrix: activities.view_own)
     - Only admins can view all activities in a room (permission_matrix: activities.view_all)
     - Non-admin users see limited actor info to prevent cross-room spying
+    Pages newest first; the X-Next-Cursor header is the ``cursor`` of the next page.
     """
     try:
         from app.permission_matrix import permission_matrix
         from app.models import User
         
+        cursor_key = parse_cursor(cursor)
         user_email = get_user_info(current_user)
 
         # 1. VERIFY ROOM ACCESS - First checkpoint
@@ -228,11 +246,7 @@ async def get_room_activities(
             )
 
         # Build optimized query with proper indexing
-        query = (
-            select(ActivityLog)
-            .where(ActivityLog.room_id == room_id)
-            .order_by(desc(ActivityLog.ts))
-        )
+        query = select(ActivityLog).where(ActivityLog.room_id == room_id)
 
         # Apply filters with indexed columns
         if action_filter:
@@ -241,15 +255,18 @@ async def get_room_activities(
             # Only admins can filter by actor (prevents exposing other users' activity)
             query = query.where(ActivityLog.actor.ilike(f"%{actor_filter}%"))
 
-        # Apply pagination
-        query = query.offset(offset).limit(limit)
+        # Apply pagination (keyset on ts, id; uses idx_activity_log_room_ts_id)
+        query = keyset_page(query, ActivityLog.ts, ActivityLog.id, cursor_key, limit)
+        if offset and cursor_key is None:
+            query = query.offset(offset)
 
         # Execute query
         activities_result = await session.execute(query)
-        activities = activities_result.scalars().all()
+        activities, next_cursor = split_page(activities_result.scalars().all(), limit, "ts")
+        set_next_cursor(response, next_cursor)
 
         # Convert to response format
-        response = []
+        items = []
         for activity in activities:
             meta = None
             if activity.meta_json:
@@ -261,7 +278,7 @@ async def get_room_activities(
             # Non-admins should not see actor information to prevent data leakage
             actor_info = activity.actor if can_view_all else "[redacted]"
 
-            response.append(
+            items.append(
                 ActivityResponse(
                     id=str(activity.id),
                     actor=actor_info,
@@ -271,8 +288,8 @@ async def get_room_activities(
                 )
             )
 
-        logger.info(f"User {user_email} retrieved {len(response)} activities from room {room_id}")
-        return response
+        logger.info(f"User {user_email} retrieved {len(items)} activities from room {room_id}")
+        return items
 
     except HTTPException:
         raise
@@ -639,6 +656,7 @@ async def get_activities_by_role(
     role_filter: Optional[str] = None,
     limit: int = 10,
     offset: int = 0,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
@@ -648,7 +666,8 @@ async def get_activities_by_role(
     Query Parameters:
     - role_filter: Filter by role ('trading_company', 'shipowner', 'broker', 'system', or 'all')
     - limit: Number of activities to return (default: 10)
-    - offset: Pagination offset (default: 0)
+    - offset: Pagination offset (default: 0, superseded by cursor)
+    - cursor: next_cursor from the previous page
     
     Returns activities with:
     - id: Activity ID
@@ -666,6 +685,7 @@ async def get_activities_by_role(
         from app.permission_matrix import permission_matrix
         from app.models import User
         
+        cursor_key = parse_cursor(cursor)
         user_email = get_user_info(current_user)
         
         # 1. VERIFY ROOM ACCESS
@@ -690,11 +710,7 @@ async def get_activities_by_role(
             )
         
         # 3. BUILD QUERY
-        query = (
-            select(ActivityLog)
-            .where(ActivityLog.room_id == room_id)
-            .order_by(desc(ActivityLog.ts))
-        )
+        query = select(ActivityLog).where(ActivityLog.room_id == room_id)
         
         # 4. APPLY ROLE FILTER if specified
         if role_filter and role_filter != "all":
@@ -708,12 +724,14 @@ async def get_activities_by_role(
             elif role_filter == "system":
                 query = query.where(ActivityLog.actor.ilike("%system%") | ActivityLog.actor.ilike("%admin%"))
         
-        # 5. APPLY PAGINATION
-        query = query.offset(offset).limit(limit)
+        # 5. APPLY PAGINATION (keyset on ts, id)
+        query = keyset_page(query, ActivityLog.ts, ActivityLog.id, cursor_key, limit)
+        if offset and cursor_key is None:
+            query = query.offset(offset)
         
         # 6. EXECUTE QUERY
         result = await session.execute(query)
-        activities = result.scalars().all()
+        activities, next_cursor = split_page(result.scalars().all(), limit, "ts")
         
         # 7. FORMAT RESPONSE
         response = []
@@ -773,6 +791,7 @@ async def get_activities_by_role(
             "role_filter": role_filter or "all",
             "count": len(response),
             "activities": response,
+            "next_cursor": next_cursor,
             "timestamp": datetime.utcnow().isoformat()
         }
         
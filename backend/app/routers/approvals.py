@@ -24,6 +24,7 @@ from app.dependencies import (get_current_user, log_activity,
 from app.models import Approval, ApprovalWorkflow, Document, DocumentType, Party, Room, User
 from app.permission_decorators import require_permission
 from app.services.approval_service import ApprovalService
+from app.services.room_readiness_service import room_readiness_service
 
 logger = logging.getLogger(__name__)
 
@@ -209,6 +210,7 @@ async def create_approval(
             )
             session.add(approval)
 
+        await room_readiness_service.refresh(session, room_id)
         await session.commit()
 
         # Log activity
@@ -395,6 +397,7 @@ async def revoke_approval(
 
         if approval:
             await session.delete(approval)
+            await room_readiness_service.refresh(session, room_id)
             await session.commit()
 
             # Log activity
@@ -522,6 +525,7 @@ async def update_approval(
         if update_data.comments:
             approval.comments = update_data.comments
 
+        await room_readiness_service.refresh(session, room_id)
         await session.commit()
 
         # Log activity
@@ -583,6 +587,7 @@ async def update_approval_by_id(
                 updated_at=datetime.utcnow()
             )
         )
+        await room_readiness_service.refresh(session, room.id)
         await session.commit()
         
         # Log activity
@@ -5,18 +5,21 @@ Handles login, token validation, and user management
 
 import logging
 import os
+import time
+import traceback
 from datetime import datetime
 
-from passlib.hash import bcrypt
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_session
-from app.dependencies import create_access_token, get_current_user
+from app.dependencies import create_access_token, get_current_user, user_token_claims
 from app.models import Party, User
+from app.monitoring.latency import LatencyHistogram
 from app.schemas import LoginRequest, TokenResponse, UserResponse
+from app.services.password_service import PasswordServiceBusy, password_service
 
 
 class RegisterRequest(BaseModel):
@@ -43,6 +46,21 @@ router = APIRouter(prefix="/api/v1/auth", tags=["auth"])
 ALLOWED_PUBLIC_ROLES = ["seller", "buyer", "viewer"]
 ALL_ROLES = ["owner", "seller", "buyer", "charterer", "broker", "admin", "viewer"]
 
+# Wall-clock latency of /login, successful or not
+login_latency = LatencyHistogram()
+
+
+async def _hash_password(password: str) -> str:
+    """Hash in the password worker pool; 503 while the pool is saturated"""
+    try:
+        return await password_service.hash(password)
+    except PasswordServiceBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+
 
 @router.post("/register", status_code=201)
 async def register(
@@ -78,7 +96,7 @@ async def register(
             )
 
         # Hash password
-        hashed_password = bcrypt.hashpw(register_data.password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = await _hash_password(register_data.password)
 
         # Create user
         user = User(
@@ -86,19 +104,14 @@ async def register(
             name=register_data.name,
             role=register_data.role,
             company=register_data.company,
-            password_hash=hashed_password.decode('utf-8'),
+            password_hash=hashed_password,
             is_active=True
         )
         session.add(user)
         await session.commit()
 
         # Create access token
-        token_data = {
-            "email": register_data.email,
-            "name": register_data.name,
-            "role": register_data.role,
-        }
-        access_token = create_access_token(token_data)
+        access_token = create_access_token(user_token_claims(user))
 
         return {
             "message": "User registered successfully",
@@ -160,7 +173,7 @@ async def admin_create_user(
             )
 
         # Hash password
-        hashed_password = bcrypt.hashpw(user_data.password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = await _hash_password(user_data.password)
 
         # Create user
         user = User(
@@ -168,7 +181,7 @@ async def admin_create_user(
             name=user_data.name,
             role=user_data.role,
             company=user_data.company,
-            password_hash=hashed_password.decode('utf-8'),
+            password_hash=hashed_password,
             is_active=True
         )
         session.add(user)
@@ -200,74 +213,77 @@ async def login(
     """
     Login endpoint for user authentication
     """
+    start = time.perf_counter()
+    try:
+        return await _login(login_data, session)
+    finally:
+        login_latency.observe((time.perf_counter() - start) * 1000)
+
+
+async def _login(login_data: LoginRequest, session: AsyncSession) -> TokenResponse:
     email = login_data.email
     password = login_data.password
 
     try:
-        logger.info(f"Login attempt for email: {email}")
-        print(f"[LOGIN] Attempting login for {email}")
-        
+        logger.debug(f"Login attempt for email: {email}")
+
         # Find user
         result = await session.execute(select(User).where(User.email == email).limit(1))
         user = result.scalar_one_or_none()
 
         if not user:
             logger.warning(f"User not found: {email}")
-            print(f"[LOGIN] User not found: {email}")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password",
             )
 
-        logger.info(f"User found: {user.email}, role: {user.role}")
-        print(f"[LOGIN] User found: {user.email}, role: {user.role}")
-
-        # Validate password
+        # Validate password (in the password worker pool, never on the loop)
         if user.password_hash:
             try:
-                print(f"[LOGIN] Verifying password for {email}...")
-                verified = bcrypt.verify(password, user.password_hash)
-                print(f"[LOGIN] Password verification result: {verified}")
-                if not verified:
-                    logger.warning(f"Invalid password for: {email}")
-                    print(f"[LOGIN] Invalid password for {email}")
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="Invalid email or password",
-                    )
-            except HTTPException:
-                raise
+                verified, new_hash = await password_service.verify_and_update(
+                    password, user.password_hash
+                )
+            except PasswordServiceBusy:
+                logger.warning(f"Password workers saturated, deferring login for {email}")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server busy, please retry",
+                    headers={"Retry-After": "1"},
+                )
             except Exception as verify_error:
-                logger.error(f"Password verification error: {verify_error}")
-                print(f"[LOGIN] Password verification error: {verify_error}")
-                import traceback
-                traceback.print_exc()
+                logger.error(f"Password verification error for {email}: {verify_error}")
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid email or password",
+                )
+            if not verified:
+                logger.warning(f"Invalid password for: {email}")
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Invalid email or password",
                 )
+            if new_hash:
+                # Stored hash used an outdated cost; upgrade it now that we
+                # have the plaintext
+                user.password_hash = new_hash
+                await session.commit()
+                logger.info(f"Upgraded password hash for {email}")
         else:
             # No password set, allow login (for demo users)
             logger.warning(f"No password hash for user: {email}, allowing login")
-            print(f"[LOGIN] No password hash for user: {email}, allowing login")
 
         # Create access token
-        print(f"[LOGIN] Creating access token for {email}...")
         try:
-            token = create_access_token({"sub": user.email, "role": user.role})
-            print(f"[LOGIN] Token created successfully")
+            token = create_access_token(user_token_claims(user))
         except Exception as token_error:
             logger.error(f"Error creating token: {token_error}")
-            print(f"[LOGIN] Token creation error: {token_error}")
-            import traceback
-            traceback.print_exc()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to create access token"
             )
 
         logger.info(f"Login successful for: {email}")
-        print(f"[LOGIN] Login successful for {email}")
         
         # Ensure name is not None (fallback to email if missing)
         user_name = user.name if user.name else user.email.split('@')[0]
@@ -280,13 +296,9 @@ async def login(
         raise
     except Exception as e:
         logger.error(f"Login error: {e}")
-        print(f"[LOGIN] Uncaught exception: {e}")
-        import traceback
         error_trace = traceback.format_exc()
-        print(error_trace)
         logger.error(error_trace)
         # Always show detailed error in development (default)
-        import os
         is_dev = os.getenv("ENVIRONMENT", "development").lower() != "production"
         if is_dev:
             raise HTTPException(
@@ -340,7 +352,7 @@ async def refresh_token(current_user: User = Depends(get_current_user)):
     """
     try:
         # Create new access token
-        new_token = create_access_token(data={"sub": current_user.email})
+        new_token = create_access_token(data=user_token_claims(current_user))
 
         return TokenResponse(
             access_token=new_token,
@@ -393,3 +405,19 @@ async def logout(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Logout failed"
         )
+
+
+@router.get("/metrics")
+async def get_login_metrics(current_user: User = Depends(get_current_user)):
+    """
+    Login latency histogram and password worker pool stats (admin only)
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can view login metrics",
+        )
+    return {
+        "login_latency": login_latency.get_stats(),
+        "password_hashing": password_service.get_stats(),
+    }
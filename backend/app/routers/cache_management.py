@@ -4,14 +4,24 @@ Provides endpoints for monitoring and managing response cache
 """
 
 from fastapi import APIRouter
+from app.dashboard_cache import dashboard_cache
 from app.middleware.caching import get_cache_stats, clear_cache
+from app.identity_cache import identity_cache, user_cache
+from app.permission_cache import get_permission_cache
+from app.services.search_service import search_service
 
 router = APIRouter(prefix="/api/v1/cache", tags=["cache"])
 
 @router.get("/stats")
 async def get_cache_statistics():
-    """Get response cache statistics"""
-    return get_cache_stats()
+    """Get response, permission, identity, search and dashboard cache statistics"""
+    stats = get_cache_stats()
+    stats["permission_cache"] = get_permission_cache().get_stats()
+    stats["identity_cache"] = identity_cache.get_stats()
+    stats["user_cache"] = user_cache.get_stats()
+    stats["search_cache"] = search_service.get_cache_stats()
+    stats["dashboard_cache"] = dashboard_cache.get_stats()
+    return stats
 
 @router.post("/clear")
 async def clear_response_cache():
@@ -6,13 +6,19 @@ Central dispatcher for all role-based dashboards
 
 import logging
 from datetime import datetime
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 
+from app.dashboard_cache import GLOBAL_ROLES, VESSEL_ROLES, dashboard_cache
 from app.database import get_async_session
 from app.dependencies import get_current_user
-from app.models import User
+from app.models import Party, User, UserVesselAccess
 from app.services.dashboard_projection_service import DashboardProjectionService
 from app.schemas.fase2_schemas import (
     DashboardValidationRequest,
@@ -43,17 +49,53 @@ async def get_dashboard_for_role(
     - inspector: Findings, remediation status, compliance assessment
     
     **Features:**
-    - 5-minute response cache
+    - 5-minute response cache per role and user scope, refreshed in the
+      background once stale; dropped when the user's rooms change
     - Metadata includes cache age
     - Refresh indicator for stale data
     
     **Example:** GET `/api/v1/dashboard-v2/for-role`
     """
     try:
-        service = DashboardProjectionService(session, current_user)
+        entry = await dashboard_cache.get_or_build(
+            current_user.role,
+            current_user.email,
+            partial(_build_role_dashboard, _session_factory(session), current_user),
+        )
+
+        # Create response with metadata
+        age = int(entry.age_seconds)
+        metadata = DashboardMetadata(
+            role=current_user.role.lower(),
+            last_updated=datetime.utcfromtimestamp(entry.stored_at),
+            cache_age_seconds=age,
+            refresh_in_seconds=max(0, dashboard_cache.ttl_seconds - age),
+        )
+        
+        return DashboardDataResponse(
+            metadata=metadata,
+            data=entry.data,
+        )
+        
+    except Exception as e:
+        logger.error(f"Error fetching dashboard for role: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error fetching dashboard")
+
+
+def _session_factory(session: AsyncSession):
+    """Sessions on the request's engine; cached builds outlive the request session"""
+    return sessionmaker(session.bind, class_=AsyncSession, expire_on_commit=False)
+
+
+async def _build_role_dashboard(
+    session_factory, user: User
+) -> Tuple[Dict[str, Any], Optional[List[str]]]:
+    """Role dashboard of a user and the rooms it covers (None: system-wide)"""
+    async with session_factory() as session:
+        service = DashboardProjectionService(session, user)
         
         # Get role-based data
-        role = current_user.role.lower()
+        role = user.role.lower()
         
         if role == "admin":
             data = await service.get_admin_overview()
@@ -67,23 +109,24 @@ async def get_dashboard_for_role(
             data = await service.get_inspector_overview()
         else:
             data = {"message": "Access limited to assigned organization"}
-        
-        # Create response with metadata
-        metadata = DashboardMetadata(
-            role=role,
-            last_updated=datetime.utcnow(),
-            cache_age_seconds=0,
-            refresh_in_seconds=300,
-        )
-        
-        return DashboardDataResponse(
-            metadata=metadata,
-            data=data,
-        )
-        
-    except Exception as e:
-        logger.error(f"Error fetching dashboard for role: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Error fetching dashboard")
+
+        room_ids = None
+        if role in VESSEL_ROLES:
+            # Owners see rooms through their vessels, not through party rows
+            result = await session.execute(
+                select(UserVesselAccess.room_id)
+                .where(UserVesselAccess.user_email == user.email)
+                .distinct()
+            )
+            room_ids = [str(room_id) for room_id in result.scalars().all()]
+        elif role not in GLOBAL_ROLES:
+            result = await session.execute(
+                select(Party.room_id).where(Party.email == user.email).distinct()
+            )
+            room_ids = [str(room_id) for room_id in result.scalars().all() if room_id]
+
+    # Plain JSON values, identical whether served from memory or Redis
+    return jsonable_encoder(data), room_ids
 
 
 @router.post("/validate-access", response_model=DashboardAccessResponse)
@@ -314,12 +357,16 @@ async def refresh_dashboard_cache(
         if current_user.role != "admin":
             raise HTTPException(status_code=403, detail="Admin access required")
         
+        await dashboard_cache.clear()
+        
         return {
             "cache_cleared": True,
             "next_refresh": datetime.utcnow().isoformat(),
             "message": "Dashboard cache refreshed",
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error refreshing cache: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error refreshing cache")
\ No newline at end of file
@@ -7,11 +7,11 @@ Uses centralized permission manager for consistent permission checking
 
 import logging
 from datetime import datetime
+from pathlib import Path
 from typing import List, Optional
 
-from fastapi import (APIRouter, Depends, File, Form, HTTPException, UploadFile,
-                     status)
-from fastapi.responses import FileResponse
+from fastapi import (APIRouter, Depends, File, Form, HTTPException, Request,
+                     UploadFile, status)
 from pydantic import BaseModel
 from sqlalchemy import select, update, or_, func, desc
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -26,7 +26,12 @@ from app.database import get_async_session
 from app.dependencies import (get_current_user, log_activity,
                               require_room_access)
 from app.models import Document, DocumentType, DocumentVersion, Party, Room, User
+from app.services.blob_store import blob_store
 from app.services.file_service import file_service
+from app.services.file_serving import (file_response, log_access_in_background,
+                                       resolve_etag)
+from app.services.ocr_service import OCRQueueFullError, ocr_service
+from app.services.room_readiness_service import room_readiness_service
 from app.permission_decorators import require_permission
 
 logger = logging.getLogger(__name__)
@@ -295,9 +300,9 @@ async def create_and_upload_document(
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid expiry date format")
 
-        # Save file
-        file_path = await file_service.save_file(file, room_id, "documents")
-        file_url = f"/api/v1/files/{file_path}"
+        # Stream into the content-addressed store (known content is not rewritten)
+        stored = await blob_store.ingest(session, file)
+        file_url = stored.file_url
 
         # Check if document already exists for this type in this room
         existing_doc_result = await session.execute(
@@ -333,20 +338,17 @@ async def create_and_upload_document(
         await session.flush()  # Get the document ID
 
         # Create document version
-        import hashlib
-        file_content = await file.read()
-        await file.seek(0)
-        sha256_hash = hashlib.sha256(file_content).hexdigest()
-
         doc_version = DocumentVersion(
             document_id=document.id,
             file_url=file_url,
-            sha256=sha256_hash,
-            size_bytes=len(file_content),
+            sha256=stored.sha256,
+            size_bytes=stored.size_bytes,
             mime=file.content_type or "application/octet-stream",
+            original_filename=file.filename,
         )
         session.add(doc_version)
 
+        await room_readiness_service.refresh(session, room_id)
         await session.commit()
 
         # Log activity
@@ -400,9 +402,9 @@ async def upload_document(
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
 
-        # Save file
-        file_path = await file_service.save_file(file, room_id, "documents")
-        file_url = f"/api/v1/files/{file_path}"
+        # Stream into the content-addressed store (known content is not rewritten)
+        stored = await blob_store.ingest(session, file)
+        file_url = stored.file_url
 
         # Parse expires_on if provided
         expires_datetime = None
@@ -422,16 +424,17 @@ async def upload_document(
         document.notes = notes
 
         # Create document version with file info
-        # For now, using placeholder SHA256 and size - these should come from file_service
         doc_version = DocumentVersion(
             document_id=document.id,
             file_url=file_url,
-            sha256="",  # Could be calculated from file_service
-            size_bytes=0,  # Could come from file_service
-            mime=file.content_type or "application/octet-stream"
+            sha256=stored.sha256,
+            size_bytes=stored.size_bytes,
+            mime=file.content_type or "application/octet-stream",
+            original_filename=file.filename,
         )
         session.add(doc_version)
 
+        await room_readiness_service.refresh(session, room_id)
         await session.commit()
 
         # Log activity
@@ -494,6 +497,7 @@ async def update_document(
         if document_data.notes is not None:
             document.notes = document_data.notes
 
+        await room_readiness_service.refresh(session, room_id)
         await session.commit()
 
         # Log activity
@@ -572,6 +576,7 @@ async def approve_document(
 
         # Update document status
         document.status = "approved"
+        await room_readiness_service.refresh(session, room_id)
         await session.commit()
 
         # Log activity
@@ -623,6 +628,7 @@ async def reject_document(
         # Update document status and notes
         document.status = "rejected"
         document.notes = notes
+        await room_readiness_service.refresh(session, room_id)
         await session.commit()
 
         # Log activity
@@ -646,12 +652,14 @@ async def reject_document(
 async def download_document(
     room_id: str,
     document_id: str,
+    request: Request,
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
     """
     Download a document file
-    Validates user has access to the specific document
+    Validates user has access to the specific document.
+    Supports If-None-Match (304) and byte ranges (206).
     """
     try:
         user_email, _ = get_user_info(current_user)
@@ -686,24 +694,29 @@ async def download_document(
         if not document.versions or len(document.versions) == 0:
             raise HTTPException(status_code=404, detail="Document file not found")
         
-        file_url = document.versions[0].file_url
+        version = document.versions[0]
 
         # Extract file path from URL
-        file_path = file_url.replace("/api/v1/files/", "")
+        file_path = version.file_url.replace("/api/v1/files/", "")
         full_path = file_service.get_file_path(file_path)
 
         if not full_path or not full_path.exists():
             raise HTTPException(status_code=404, detail="Document file not found")
 
-        # Log download activity
-        await log_activity(
-            room_id, user_email, "document_downloaded", {"document_id": document_id}
+        # Blob paths are named by their hash; legacy uploads are hashed on demand
+        etag = await resolve_etag(
+            full_path, version.sha256 if blob_store.is_blob_url(version.file_url) else None
         )
 
-        return FileResponse(
-            path=str(full_path),
-            filename=full_path.name,
-            media_type="application/octet-stream",
+        return file_response(
+            request,
+            full_path,
+            etag=etag,
+            filename=version.original_filename or full_path.name,
+            media_type=version.mime,
+            background=log_access_in_background(
+                room_id, user_email, "document_downloaded", {"document_id": document_id}
+            ),
         )
 
     except HTTPException:
@@ -713,6 +726,91 @@ async def download_document(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.post("/rooms/{room_id}/documents/{document_id}/ocr", status_code=202)
+async def start_document_ocr(
+    room_id: str,
+    document_id: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Queue text and expiry-date extraction for the latest document version.
+    Poll the returned job with GET /rooms/{room_id}/ocr-jobs/{job_id}; the job
+    lives in the durable task queue, so any API worker can answer the poll.
+    """
+    try:
+        user_email, _ = get_user_info(current_user)
+
+        await require_room_access(room_id, user_email, session)
+
+        result = await session.execute(
+            select(DocumentVersion)
+            .join(Document, Document.id == DocumentVersion.document_id)
+            .where(Document.id == document_id, Document.room_id == room_id)
+            .order_by(DocumentVersion.created_at.desc())
+            .limit(1)
+        )
+        version = result.scalar_one_or_none()
+        if not version:
+            raise HTTPException(status_code=404, detail="Document file not found")
+
+        full_path = blob_store.resolve_path(version.file_url) or file_service.get_file_path(
+            version.file_url.replace("/api/v1/files/", "")
+        )
+        if not full_path or not full_path.exists():
+            raise HTTPException(status_code=404, detail="Document file not found")
+
+        file_type = Path(version.original_filename or full_path.name).suffix
+        try:
+            job = await ocr_service.enqueue_job(
+                full_path,
+                file_type,
+                room_id=room_id,
+                document_id=document_id,
+                sha256=version.sha256 if blob_store.is_blob_url(version.file_url) else None,
+            )
+        except OCRQueueFullError as e:
+            raise HTTPException(
+                status_code=503, detail=str(e), headers={"Retry-After": "30"}
+            )
+
+        return job
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error starting OCR job: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/rooms/{room_id}/ocr-jobs/{job_id}")
+async def get_ocr_job(
+    room_id: str,
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Get the status of an OCR job (queued, running, completed, failed)
+    """
+    try:
+        user_email, _ = get_user_info(current_user)
+
+        await require_room_access(room_id, user_email, session)
+
+        job = await ocr_service.get_queued_job(room_id, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="OCR job not found")
+
+        return job
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting OCR job: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 @router.get("/document-types", response_model=List[DocumentTypeResponse])
 async def get_document_types(session: AsyncSession = Depends(get_async_session)):
     """
@@ -920,20 +1018,16 @@ async def create_document_version(
         await require_room_access(str(document.room_id), user_email, session)
 
         # Upload file and create version
-        file_path = await file_service.save_file(file, str(document.room_id))
-        
-        import hashlib
-        file_content = await file.read()
-        await file.seek(0)
-        sha256_hash = hashlib.sha256(file_content).hexdigest()
+        stored = await blob_store.ingest(session, file)
 
         # Create new version
         new_version = DocumentVersion(
             document_id=document_id,
-            file_url=file_path,
-            sha256=sha256_hash,
-            size_bytes=len(file_content),
+            file_url=stored.file_url,
+            sha256=stored.sha256,
+            size_bytes=stored.size_bytes,
             mime=file.content_type or "application/octet-stream",
+            original_filename=file.filename,
         )
 
         session.add(new_version)
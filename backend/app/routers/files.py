@@ -3,23 +3,23 @@ File handling router for STS Clearance system
 Handles file uploads, downloads, and static file serving
 """
 
-import hashlib
 import logging
 import os
-import uuid
 from datetime import datetime
 from pathlib import Path
 
-import aiofiles
-from fastapi import (APIRouter, Depends, File, Form, HTTPException, UploadFile,
-                     status)
-from fastapi.responses import FileResponse
+from fastapi import (APIRouter, Depends, File, Form, HTTPException, Request,
+                     UploadFile, status)
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_session
 from app.dependencies import get_current_user, require_room_access
 from app.models import Document, DocumentVersion, Room
+from app.services.blob_store import BLOB_PREFIX, blob_store
+from app.services.file_serving import (IMMUTABLE_CACHE_CONTROL, file_response,
+                                       log_access_in_background, resolve_etag)
+from app.services.room_readiness_service import room_readiness_service
 
 logger = logging.getLogger(__name__)
 
@@ -68,28 +68,19 @@ async def upload_document_file(
                 detail=f"File type not allowed. Allowed types: {', '.join(allowed_extensions)}",
             )
 
-        # Create file path
-        file_id = str(uuid.uuid4())
-        safe_filename = f"{file_id}_{file.filename}"
-        file_path = UPLOADS_DIR / room_id / safe_filename
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # Read and save file
-        content = await file.read()
-
-        # Calculate SHA256 hash
-        sha256_hash = hashlib.sha256(content).hexdigest()
-
-        # Save file
-        async with aiofiles.open(file_path, "wb") as f:
-            await f.write(content)
+        # Stream into the content-addressed store in chunks, hashing and
+        # size-checking as bytes arrive; known content is not rewritten
+        stored = await blob_store.ingest(session, file)
+        sha256_hash = stored.sha256
 
         # Create document version
         doc_version = DocumentVersion(
             document_id=document_id,
-            file_url=str(file_path),
+            file_url=stored.file_url,
             sha256=sha256_hash,
-            size_bytes=len(content),
+            size_bytes=stored.size_bytes,
+            mime=file.content_type or "application/octet-stream",
+            original_filename=Path(file.filename).name,
         )
         session.add(doc_version)
 
@@ -98,7 +89,9 @@ async def upload_document_file(
         document.uploaded_by = user_email
         document.uploaded_at = datetime.utcnow()
 
+        await room_readiness_service.refresh(session, room_id)
         await session.commit()
+        file_id = str(doc_version.id)
 
         # Log activity
         from app.dependencies import log_activity
@@ -110,7 +103,7 @@ async def upload_document_file(
             {
                 "document_id": document_id,
                 "filename": file.filename,
-                "size_bytes": len(content),
+                "size_bytes": stored.size_bytes,
                 "file_type": file_extension,
             },
         )
@@ -130,8 +123,9 @@ async def upload_document_file(
             "message": "File uploaded successfully",
             "file_id": file_id,
             "filename": file.filename,
-            "size_bytes": len(content),
+            "size_bytes": stored.size_bytes,
             "sha256": sha256_hash,
+            "deduplicated": stored.deduplicated,
         }
 
     except HTTPException:
@@ -145,11 +139,13 @@ async def upload_document_file(
 async def download_document_file(
     room_id: str,
     document_id: str,
+    request: Request,
     current_user: dict = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
     """
     Download the latest version of a document file
+    Supports If-None-Match (304) and byte ranges (206).
     """
     try:
         user_email = current_user.email
@@ -169,20 +165,30 @@ async def download_document_file(
         if not doc_version:
             raise HTTPException(status_code=404, detail="Document file not found")
 
-        file_path = Path(doc_version.file_url)
+        file_path = blob_store.resolve_path(doc_version.file_url) or Path(doc_version.file_url)
 
         if not file_path.exists():
             raise HTTPException(status_code=404, detail="File not found on disk")
 
         # Extract original filename from path
-        original_filename = (
+        original_filename = doc_version.original_filename or (
             file_path.name.split("_", 1)[1] if "_" in file_path.name else file_path.name
         )
 
-        return FileResponse(
-            path=str(file_path),
+        etag = await resolve_etag(
+            file_path,
+            doc_version.sha256 if blob_store.is_blob_url(doc_version.file_url) else None,
+        )
+
+        return file_response(
+            request,
+            file_path,
+            etag=etag,
             filename=original_filename,
-            media_type="application/octet-stream",
+            media_type=doc_version.mime,
+            background=log_access_in_background(
+                room_id, user_email, "document_downloaded", {"document_id": document_id}
+            ),
         )
 
     except HTTPException:
@@ -192,8 +198,21 @@ async def download_document_file(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+async def serve_local_file(request: Request, full_path: Path, file_path: str):
+    """Conditional response for a file under the uploads directory"""
+    if file_path.startswith(f"{BLOB_PREFIX}/"):
+        # Content-addressed: the file name is the hash and never changes
+        return file_response(
+            request,
+            full_path,
+            etag=full_path.name,
+            cache_control=IMMUTABLE_CACHE_CONTROL,
+        )
+    return file_response(request, full_path, etag=await resolve_etag(full_path))
+
+
 @router.get("/files/{file_path:path}")
-async def serve_static_file(file_path: str):
+async def serve_static_file(file_path: str, request: Request):
     """
     Serve static files (for development only)
     """
@@ -207,7 +226,7 @@ async def serve_static_file(file_path: str):
         if not str(full_path.resolve()).startswith(str(UPLOADS_DIR.resolve())):
             raise HTTPException(status_code=403, detail="Access denied")
 
-        return FileResponse(path=str(full_path))
+        return await serve_local_file(request, full_path, file_path)
 
     except HTTPException:
         raise
@@ -297,10 +316,15 @@ async def delete_document_file(
         if not doc_version:
             raise HTTPException(status_code=404, detail="Document version not found")
 
-        # Delete file from disk
-        file_path = Path(doc_version.file_url)
-        if file_path.exists():
-            file_path.unlink()
+        if blob_store.is_blob_url(doc_version.file_url):
+            # Shared content: drop this version's reference, the GC sweep
+            # removes the blob once nothing points at it
+            await blob_store.release(session, doc_version)
+        else:
+            # Legacy per-upload file
+            file_path = Path(doc_version.file_url)
+            if file_path.exists():
+                file_path.unlink()
 
         # Delete from database
         from sqlalchemy import delete as delete_stmt
@@ -7,14 +7,18 @@ import logging
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel
-from sqlalchemy import desc, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_session
 from app.dependencies import get_current_user
 from app.models import Room, Vessel, Document, Approval, Message
+from app.pagination import (fetch_keyset_page, keyset_page, parse_cursor,
+                            set_next_cursor, split_page)
+from app.vessel_access import (accessible_operations, operation_role,
+                               vessel_access_clause)
 
 logger = logging.getLogger(__name__)
 
@@ -63,66 +67,47 @@ class PrivacySettings(BaseModel):
 
 @router.get("/historical/operations", response_model=List[HistoricalRoomSummary])
 async def get_historical_operations(
+    response: Response,
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
     """
     Get historical operations that the user has access to
+
+    Pages newest first; the X-Next-Cursor header is the ``cursor`` of the next page.
     """
+    cursor_key = parse_cursor(cursor)
     try:
-        user_email = current_user.email
         user_role = current_user.role
-        user_company = current_user.get("company", "")
 
-        # Get rooms that are completed or older than 30 days
+        # Rooms that are completed or older than 30 days, among those
+        # the user can access (filtered before paging, so pages are full)
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
 
-        rooms_query = select(Room).where(
-            (Room.status == 'completed') |
-            (Room.created_at < thirty_days_ago)
-        ).order_by(desc(Room.created_at)).limit(limit).offset(offset)
-
-        rooms_result = await session.execute(rooms_query)
-        rooms = rooms_result.scalars().all()
-
-        historical_operations = []
-
-        for room in rooms:
-            # Check if user has access to any vessels in this room
-            user_accessible_vessels = await _get_user_accessible_vessels(
-                session, str(room.id), user_email, user_role, user_company
+        rows, next_cursor = await accessible_operations(
+            session, current_user,
+            [(Room.status == 'completed') | (Room.created_at < thirty_days_ago)],
+            limit=limit, offset=offset, cursor=cursor_key,
+        )
+        set_next_cursor(response, next_cursor)
+
+        return [
+            HistoricalRoomSummary(
+                id=str(row.room.id),
+                title=row.room.title,
+                location=row.room.location,
+                sts_eta=row.room.sts_eta,
+                created_at=row.room.created_at,
+                status=row.room.status,
+                vessel_count=row.vessel_count,
+                last_activity=row.last_activity,
+                user_role=operation_role(user_role)
             )
-
-            if user_accessible_vessels:
-                # Get vessel count and last activity
-                vessels_result = await session.execute(
-                    select(Vessel).where(Vessel.room_id == room.id)
-                )
-                vessels = vessels_result.scalars().all()
-
-                # Get last activity from messages, approvals, or documents
-                last_activity = await _get_room_last_activity(session, str(room.id))
-
-                # Determine user's role in this historical operation
-                user_role_in_operation = await _determine_user_role_in_operation(
-                    session, str(room.id), user_email, user_role, user_company
-                )
-
-                historical_operations.append(HistoricalRoomSummary(
-                    id=str(room.id),
-                    title=room.title,
-                    location=room.location,
-                    sts_eta=room.sts_eta,
-                    created_at=room.created_at,
-                    status=room.status,
-                    vessel_count=len(vessels),
-                    last_activity=last_activity,
-                    user_role=user_role_in_operation
-                ))
-
-        return historical_operations
+            for row in rows
+        ]
 
     except Exception as e:
         logger.error(f"Error getting historical operations: {e}")
@@ -139,44 +124,34 @@ async def get_historical_operation_details(
     Get detailed historical data for a specific operation
     """
     try:
-        user_email = current_user.email
         user_role = current_user.role
-        user_company = current_user.get("company", "")
 
         # Verify user has access to this historical operation
-        user_accessible_vessels = await _get_user_accessible_vessels(
-            session, room_id, user_email, user_role, user_company
+        operations, _ = await accessible_operations(
+            session, current_user, [Room.id == room_id]
         )
 
-        if not user_accessible_vessels:
+        if not operations:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Access denied to this historical operation"
             )
+        operation = operations[0]
+        room = operation.room
 
-        # Get room details
-        room_result = await session.execute(
-            select(Room).where(Room.id == room_id)
-        )
-        room = room_result.scalar_one_or_none()
-
-        if not room:
-            raise HTTPException(status_code=404, detail="Historical operation not found")
-
-        # Get all vessels in the room
+        # Get all vessels in the room, with the user's access to each
         vessels_result = await session.execute(
-            select(Vessel).where(Vessel.room_id == room_id)
+            select(Vessel, vessel_access_clause(current_user).label("can_access"))
+            .where(Vessel.room_id == room_id)
         )
-        all_vessels = vessels_result.scalars().all()
+        all_vessels = vessels_result.all()
+        user_accessible_vessels = [vessel.imo for vessel, can_access in all_vessels if can_access]
 
         # Build vessel data with privacy filtering
         vessels_data = []
-        for vessel in all_vessels:
+        for vessel, can_access in all_vessels:
             vessel_imo = vessel.imo
 
-            # Check if user can access this vessel's data
-            can_access = vessel_imo in user_accessible_vessels
-
             if can_access:
                 # Get counts for accessible data
                 documents_count = await _get_vessel_data_count(session, room_id, vessel.id, Document)
@@ -208,14 +183,6 @@ async def get_historical_operation_details(
                     messages_count=0
                 ))
 
-        # Get last activity
-        last_activity = await _get_room_last_activity(session, room_id)
-
-        # Determine user's role
-        user_role_in_operation = await _determine_user_role_in_operation(
-            session, room_id, user_email, user_role, user_company
-        )
-
         room_summary = HistoricalRoomSummary(
             id=str(room.id),
             title=room.title,
@@ -223,9 +190,9 @@ async def get_historical_operation_details(
             sts_eta=room.sts_eta,
             created_at=room.created_at,
             status=room.status,
-            vessel_count=len(all_vessels),
-            last_activity=last_activity,
-            user_role=user_role_in_operation
+            vessel_count=operation.vessel_count,
+            last_activity=operation.last_activity,
+            user_role=operation_role(user_role)
         )
 
         return HistoricalOperationDetails(
@@ -250,25 +217,26 @@ async def get_historical_vessel_data(
     data_type: str = Query(..., regex="^(documents|approvals|messages)$"),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
     """
     Get historical data for a specific vessel (documents, approvals, or messages)
+
+    Pages newest first; pass ``next_cursor`` back as ``cursor`` for the next page.
     """
+    cursor_key = parse_cursor(cursor)
     try:
-        user_email = current_user.email
-        user_role = current_user.role
-        user_company = current_user.get("company", "")
-
         # Verify user has access to this vessel
-        vessel = await _get_vessel_by_id(session, vessel_id)
-        if not vessel:
-            raise HTTPException(status_code=404, detail="Vessel not found")
-
-        can_access = await _user_can_access_vessel(
-            session, vessel, user_email, user_role, user_company
+        vessel_result = await session.execute(
+            select(Vessel, vessel_access_clause(current_user).label("can_access"))
+            .where(Vessel.id == vessel_id)
         )
+        vessel_row = vessel_result.first()
+        if not vessel_row:
+            raise HTTPException(status_code=404, detail="Vessel not found")
+        vessel, can_access = vessel_row
 
         if not can_access:
             raise HTTPException(
@@ -278,11 +246,17 @@ async def get_historical_vessel_data(
 
         # Get data based on type
         if data_type == "documents":
-            data = await _get_vessel_documents(session, room_id, vessel_id, limit, offset)
+            data, next_cursor = await _get_vessel_documents(
+                session, room_id, vessel_id, limit, offset, cursor_key
+            )
         elif data_type == "approvals":
-            data = await _get_vessel_approvals(session, room_id, vessel_id, limit, offset)
+            data, next_cursor = await _get_vessel_approvals(
+                session, room_id, vessel_id, limit, offset, cursor_key
+            )
         elif data_type == "messages":
-            data = await _get_vessel_messages(session, room_id, vessel_id, limit, offset)
+            data, next_cursor = await _get_vessel_messages(
+                session, room_id, vessel_id, limit, offset, cursor_key
+            )
         else:
             raise HTTPException(status_code=400, detail="Invalid data type")
 
@@ -292,7 +266,8 @@ async def get_historical_vessel_data(
             "data_type": data_type,
             "data": data,
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": next_cursor
         }
 
     except HTTPException:
@@ -347,109 +322,6 @@ async def update_privacy_settings(
 
 
 # Helper functions
-async def _get_user_accessible_vessels(
-    session: AsyncSession,
-    room_id: str,
-    user_email: str,
-    user_role: str,
-    user_company: str
-) -> List[str]:
-    """Get list of vessel IMOs the user can access"""
-    vessels_result = await session.execute(
-        select(Vessel).where(Vessel.room_id == room_id)
-    )
-    vessels = vessels_result.scalars().all()
-
-    accessible_imos = []
-
-    for vessel in vessels:
-        can_access = await _user_can_access_vessel(
-            session, vessel, user_email, user_role, user_company
-        )
-        if can_access:
-            accessible_imos.append(vessel.imo)
-
-    return accessible_imos
-
-
-async def _user_can_access_vessel(
-    session: AsyncSession,
-    vessel: Vessel,
-    user_email: str,
-    user_role: str,
-    user_company: str
-) -> bool:
-    """Check if user can access a specific vessel"""
-    if user_role == "broker":
-        return True
-    elif user_role == "owner":
-        return vessel.owner and user_company.lower() in vessel.owner.lower()
-    elif user_role == "charterer":
-        return vessel.charterer and user_company.lower() in vessel.charterer.lower()
-    else:
-        return False
-
-
-async def _get_room_last_activity(session: AsyncSession, room_id: str) -> Optional[datetime]:
-    """Get the last activity timestamp for a room"""
-    # Check messages first
-    messages_result = await session.execute(
-        select(Message.created_at)
-        .where(Message.room_id == room_id)
-        .order_by(desc(Message.created_at))
-        .limit(1)
-    )
-    message_time = messages_result.scalar_one_or_none()
-
-    # Check approvals
-    approvals_result = await session.execute(
-        select(Approval.updated_at)
-        .where(Approval.room_id == room_id)
-        .order_by(desc(Approval.updated_at))
-        .limit(1)
-    )
-    approval_time = approvals_result.scalar_one_or_none()
-
-    # Check documents
-    documents_result = await session.execute(
-        select(Document.uploaded_at)
-        .where(Document.room_id == room_id)
-        .order_by(desc(Document.uploaded_at))
-        .limit(1)
-    )
-    document_time = documents_result.scalar_one_or_none()
-
-    # Return the most recent activity
-    times = [t for t in [message_time, approval_time, document_time] if t is not None]
-    return max(times) if times else None
-
-
-async def _determine_user_role_in_operation(
-    session: AsyncSession,
-    room_id: str,
-    user_email: str,
-    user_role: str,
-    user_company: str
-) -> str:
-    """Determine the user's role in a historical operation"""
-    if user_role == "broker":
-        return "broker"
-
-    # Check if user was involved as owner or charterer
-    vessels_result = await session.execute(
-        select(Vessel).where(Vessel.room_id == room_id)
-    )
-    vessels = vessels_result.scalars().all()
-
-    for vessel in vessels:
-        if user_role == "owner" and vessel.owner and user_company.lower() in vessel.owner.lower():
-            return "owner"
-        if user_role == "charterer" and vessel.charterer and user_company.lower() in vessel.charterer.lower():
-            return "charterer"
-
-    return "viewer"
-
-
 async def _get_vessel_data_count(session: AsyncSession, room_id: str, vessel_id: str, model_class) -> int:
     """Get count of data items for a vessel"""
     result = await session.execute(
@@ -461,24 +333,16 @@ async def _get_vessel_data_count(session: AsyncSession, room_id: str, vessel_id:
     return len(result.scalars().all())
 
 
-async def _get_vessel_by_id(session: AsyncSession, vessel_id: str) -> Optional[Vessel]:
-    """Get vessel by ID"""
-    result = await session.execute(
-        select(Vessel).where(Vessel.id == vessel_id)
-    )
-    return result.scalar_one_or_none()
-
-
-async def _get_vessel_documents(session: AsyncSession, room_id: str, vessel_id: str, limit: int, offset: int):
+async def _get_vessel_documents(
+    session: AsyncSession, room_id: str, vessel_id: str, limit: int, offset: int, cursor_key=None
+):
     """Get historical documents for a vessel"""
-    result = await session.execute(
-        select(Document)
-        .where(Document.room_id == room_id, Document.vessel_id == vessel_id)
-        .order_by(desc(Document.uploaded_at))
-        .limit(limit)
-        .offset(offset)
+    # uploaded_at is nullable: undated documents follow the dated ones
+    documents, next_cursor = await fetch_keyset_page(
+        session,
+        select(Document).where(Document.room_id == room_id, Document.vessel_id == vessel_id),
+        Document.uploaded_at, Document.id, cursor_key, limit, "uploaded_at", offset,
     )
-    documents = result.scalars().all()
 
     return [{
         "id": str(doc.id),
@@ -486,19 +350,18 @@ async def _get_vessel_documents(session: AsyncSession, room_id: str, vessel_id:
         "status": doc.status,
         "uploaded_at": doc.uploaded_at.isoformat() if doc.uploaded_at else None,
         "uploaded_by": doc.uploaded_by
-    } for doc in documents]
+    } for doc in documents], next_cursor
 
 
-async def _get_vessel_approvals(session: AsyncSession, room_id: str, vessel_id: str, limit: int, offset: int):
+async def _get_vessel_approvals(
+    session: AsyncSession, room_id: str, vessel_id: str, limit: int, offset: int, cursor_key=None
+):
     """Get historical approvals for a vessel"""
-    result = await session.execute(
-        select(Approval)
-        .where(Approval.room_id == room_id, Approval.vessel_id == vessel_id)
-        .order_by(desc(Approval.updated_at))
-        .limit(limit)
-        .offset(offset)
+    approvals, next_cursor = await fetch_keyset_page(
+        session,
+        select(Approval).where(Approval.room_id == room_id, Approval.vessel_id == vessel_id),
+        Approval.updated_at, Approval.id, cursor_key, limit, "updated_at", offset,
     )
-    approvals = result.scalars().all()
 
     return [{
         "id": str(approval.id),
@@ -506,19 +369,21 @@ async def _get_vessel_approvals(session: AsyncSession, room_id: str, vessel_id:
         "party_role": approval.party.role if approval.party else "Unknown",
         "status": approval.status,
         "updated_at": approval.updated_at.isoformat() if approval.updated_at else None
-    } for approval in approvals]
+    } for approval in approvals], next_cursor
 
 
-async def _get_vessel_messages(session: AsyncSession, room_id: str, vessel_id: str, limit: int, offset: int):
+async def _get_vessel_messages(
+    session: AsyncSession, room_id: str, vessel_id: str, limit: int, offset: int, cursor_key=None
+):
     """Get historical messages for a vessel"""
-    result = await session.execute(
-        select(Message)
-        .where(Message.room_id == room_id, Message.vessel_id == vessel_id)
-        .order_by(desc(Message.created_at))
-        .limit(limit)
-        .offset(offset)
+    query = keyset_page(
+        select(Message).where(Message.room_id == room_id, Message.vessel_id == vessel_id),
+        Message.created_at, Message.id, cursor_key, limit,
     )
-    messages = result.scalars().all()
+    if offset and cursor_key is None:
+        query = query.offset(offset)
+    result = await session.execute(query)
+    messages, next_cursor = split_page(result.scalars().all(), limit, "created_at")
 
     return [{
         "id": str(msg.id),
@@ -526,4 +391,4 @@ async def _get_vessel_messages(session: AsyncSession, room_id: str, vessel_id: s
         "content": msg.content,
         "message_type": msg.message_type,
         "created_at": msg.created_at.isoformat() if msg.created_at else None
-    } for msg in messages]
+    } for msg in messages], next_cursor
@@ -9,8 +9,8 @@ import uuid
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import (APIRouter, Depends, HTTPException, Query, WebSocket,
-                     WebSocketDisconnect, status)
+from fastapi import (APIRouter, Depends, HTTPException, Query, Response,
+                     WebSocket, WebSocketDisconnect, status)
 from pydantic import BaseModel
 from sqlalchemy import desc, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -19,6 +19,9 @@ from app.database import get_async_session
 from app.dependencies import (get_current_user, log_activity,
                               require_room_access)
 from app.models import Message, Party, Room, User
+from app.pagination import (keyset_page, parse_cursor, set_next_cursor,
+                            split_page)
+from app.services.message_read_service import message_read_service
 from app.websocket_manager import manager
 
 logger = logging.getLogger(__name__)
@@ -144,6 +147,7 @@ async def handle_chat_message(
                     is_public=is_public,  # PHASE 4: Save visibility
                 )
                 session.add(message)
+                await message_read_service.record_message(session, message)
                 await session.commit()
 
                 # Broadcast message to room
@@ -207,11 +211,10 @@ async def handle_read_receipt(room_id: str, user_email: str, message_id: str):
                 message = result.scalar_one_or_none()
 
                 if message:
-                    # Add user to read_by list if not already there
-                    read_by = message.read_by or []
-                    if user_email not in read_by:
-                        read_by.append(user_email)
-                        message.read_by = read_by
+                    # Advance the user's read high-water mark
+                    if await message_read_service.mark_read(
+                        session, room_id, user_email, message
+                    ):
                         await session.commit()
 
                         # Broadcast read receipt
@@ -236,15 +239,22 @@ async def handle_read_receipt(room_id: str, user_email: str, message_id: str):
 @router.get("/rooms/{room_id}/messages", response_model=List[MessageResponse])
 async def get_room_messages(
     room_id: str,
+    response: Response,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
     """
     Get messages for a room, filtered by user's vessel access
+
+    Pages newest first. Pass the X-Next-Cursor response header back as
+    ``cursor`` to fetch older messages; ``offset`` is kept for older clients.
     """
     try:
+        cursor_key = parse_cursor(cursor)
+
         # current_user is now a User SQLAlchemy object, not a dict
         user_email = get_user_info(current_user)
 
@@ -277,21 +287,28 @@ async def get_room_messages(
             # User has no permission to see any messages
             return []
 
-        # Execute query with computed filters
-        messages_result = await session.execute(
-            select(Message)
-            .where(*query_filters)
-            .order_by(desc(Message.created_at))
-            .offset(offset)
-            .limit(limit)
+        # Execute query with computed filters (keyset on created_at, id)
+        query = keyset_page(
+            select(Message, message_read_service.readers_column(session)).where(*query_filters),
+            Message.created_at, Message.id, cursor_key, limit,
         )
+        if offset and cursor_key is None:
+            query = query.offset(offset)
+        rows = (await session.execute(query)).all()
+        readers = {
+            str(message.id): json.loads(read_by) if read_by else []
+            for message, read_by in rows
+        }
 
-        messages = messages_result.scalars().all()
+        messages, next_cursor = split_page(
+            [message for message, _ in rows], limit, "created_at"
+        )
+        set_next_cursor(response, next_cursor)
 
         # Convert to response format
-        response = []
+        items = []
         for message in reversed(messages):  # Reverse to get chronological order
-            response.append(
+            items.append(
                 MessageResponse(
                     id=str(message.id),
                     sender_email=message.sender_email,
@@ -299,12 +316,12 @@ async def get_room_messages(
                     content=message.content,
                     message_type=message.message_type,
                     created_at=message.created_at,
-                    read_by=message.read_by or [],
+                    read_by=readers.get(str(message.id), []),
                     is_public=message.is_public,  # PHASE 4
                 )
             )
 
-        return response
+        return items
 
     except HTTPException:
         raise
@@ -340,6 +357,7 @@ async def send_message(
             is_public=message_data.is_public,  # PHASE 4
         )
         session.add(message)
+        await message_read_service.record_message(session, message)
         await session.commit()
 
         # Broadcast message to WebSocket connections
@@ -403,11 +421,8 @@ async def mark_message_read(
         if not message:
             raise HTTPException(status_code=404, detail="Message not found")
 
-        # Add user to read_by list if not already there
-        read_by = message.read_by or []
-        if user_email not in read_by:
-            read_by.append(user_email)
-            message.read_by = read_by
+        # Advance the user's read high-water mark
+        if await message_read_service.mark_read(session, room_id, user_email, message):
             await session.commit()
 
             # Broadcast read receipt via WebSocket
@@ -445,19 +460,12 @@ async def get_unread_message_count(
         # Verify user has access to room
         await require_room_access(room_id, user_email, session)
 
-        # Get all messages in room
-        messages_result = await session.execute(
-            select(Message).where(Message.room_id == room_id)
+        # Maintained counter (own messages are never counted)
+        unread_count = await message_read_service.get_unread_count(
+            session, room_id, user_email
         )
-        messages = messages_result.scalars().all()
-
-        # Count unread messages
-        unread_count = 0
-        for message in messages:
-            if message.sender_email != user_email:  # Don't count own messages
-                read_by = message.read_by or []
-                if user_email not in read_by:
-                    unread_count += 1
+        # Keep the counter row built on first access
+        await session.commit()
 
         return {"unread_count": unread_count}
 
@@ -468,6 +476,44 @@ async def get_unread_message_count(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.post("/rooms/{room_id}/messages/read-all")
+async def mark_all_messages_read(
+    room_id: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Mark every message in a room as read for the current user
+    """
+    try:
+        user_email = get_user_info(current_user)
+
+        # Verify user has access to room
+        await require_room_access(room_id, user_email, session)
+
+        marked = await message_read_service.mark_all_read(session, room_id, user_email)
+        await session.commit()
+
+        if marked:
+            await manager.broadcast_to_room(
+                room_id,
+                {
+                    "type": "read_receipt",
+                    "all": True,
+                    "user_email": user_email,
+                    "timestamp": datetime.utcnow().isoformat(),
+                },
+            )
+
+        return {"message": "Messages marked as read", "marked_count": marked}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error marking messages as read: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 @router.get("/rooms/{room_id}/online-users")
 async def get_online_users(
     room_id: str,
@@ -484,7 +530,7 @@ async def get_online_users(
         await require_room_access(room_id, user_email, session)
 
         # Get online users from WebSocket manager
-        online_users = manager.get_room_users(room_id)
+        online_users = await manager.get_room_users(room_id)
 
         return {"online_users": online_users, "count": len(online_users)}
 
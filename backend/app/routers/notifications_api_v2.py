@@ -13,6 +13,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_async_session
 from app.dependencies import get_current_user
 from app.models import User
+from app.services.background_task_service import background_task_service
 from app.services.notification_service import NotificationService
 from app.schemas.fase2_schemas import (
     NotificationQueueRequest,
@@ -52,26 +53,31 @@ async def queue_notification_with_retry(
     - next_retry: When next attempt scheduled
     
     **Retry Policy:**
-    - Exponential backoff: 2^(n+1) seconds
-    - Max 3 retries
-    - Critical priority gets priority processing
+    - Sent from the background task queue's high-priority lane
+    - Exponential backoff, max 3 attempts
+    - ``queue_id`` is the task id
     
     **Example:** POST `/api/v1/notifications/queue-with-retry`
     """
     try:
         service = NotificationService(session)
         result = await service.queue_notification_with_retry(
-            recipient_id=request.recipient_id,
+            user_email=request.recipient_id,
             notification_type=request.notification_type,
-            message=request.message,
-            metadata=request.metadata,
-            priority=request.priority,
+            room_id=request.metadata.get("room_id"),
+            data=dict(request.metadata, message=request.message, priority=request.priority),
         )
         
-        if not result:
+        if result["status"] == "failed":
             raise HTTPException(status_code=400, detail="Failed to queue notification")
         
-        return result
+        return NotificationQueueResponse(
+            queue_id=result["notification_id"],
+            recipient_id=request.recipient_id,
+            status=result["status"],
+            retry_count=result["retries_used"],
+            created_at=datetime.utcnow(),
+        )
         
     except HTTPException:
         raise
@@ -94,18 +100,22 @@ async def send_expiry_alerts_scheduled(
     **Request Body:**
     - room_id: Optional, alert specific room
     - vessel_id: Optional, alert specific vessel
-    - send_to_all: Send to all affected parties (default false)
+    - send_to_all: Send current alerts again to all affected parties,
+      including those already notified (default false)
     
     **Returns:**
     - alerts_sent: Number of alerts sent
-    - critical_count: Documents expiring ≤1 day
-    - urgent_count: Documents expiring ≤3 days
-    - warning_count: Documents expiring ≤7 days
+    - critical_count: Alerts for documents expiring ≤1 day
+    - urgent_count: Alerts for documents expiring ≤3 days
+    - warning_count: Alerts for documents expiring ≤7 days
     
     **Alert Tiers:**
-    - Critical: 1 day until expiry (sent immediately)
-    - Urgent: 3 days until expiry (sent daily)
-    - Warning: 7 days until expiry (sent 3x per week)
+    - Critical: 1 day until expiry
+    - Urgent: 3 days until expiry
+    - Warning: 7 days until expiry
+
+    A document alerts at its highest tier only, and each party gets each
+    tier of a document once, so the endpoint is safe to call repeatedly.
     
     **Example:** POST `/api/v1/notifications/send-expiry-alerts`
     """
@@ -120,10 +130,17 @@ async def send_expiry_alerts_scheduled(
             send_to_all=request.send_to_all,
         )
         
-        if not result:
+        if result["errors"]:
             raise HTTPException(status_code=400, detail="Failed to send expiry alerts")
         
-        return result
+        return ExpiryAlertResponse(
+            alerts_sent=result["total_sent"],
+            critical_count=result["critical_sent"],
+            urgent_count=result["urgent_sent"],
+            warning_count=result["warning_sent"],
+            status="sent" if result["total_sent"] else "up_to_date",
+            timestamp=datetime.utcnow(),
+        )
         
     except HTTPException:
         raise
@@ -165,14 +182,18 @@ async def send_approval_reminders(
         
         service = NotificationService(session)
         result = await service.send_approval_reminders(
-            approval_type=request.approval_type,
-            hours_overdue=request.hours_overdue,
+            session=session,
+            pending_threshold_hours=request.hours_overdue,
         )
         
-        if not result:
+        if result["errors"]:
             raise HTTPException(status_code=400, detail="Failed to send reminders")
         
-        return result
+        return ApprovalReminderResponse(
+            reminders_sent=result["reminders_sent"],
+            escalations_sent=result["approvals_escalated"],
+            timestamp=datetime.utcnow(),
+        )
         
     except HTTPException:
         raise
@@ -197,21 +218,25 @@ async def get_notification_status(
     - status: Current status
     - retry_count: Retries attempted
     - last_attempt: Timestamp of last attempt
-    - next_retry: Timestamp of next retry (if pending)
+    - error: Last delivery error, if any
     
     **Example:** GET `/api/v1/notifications/status/NOTIF-12345`
     """
     try:
-        status = {
+        task = await background_task_service.get_task_status(queue_id)
+        if not task or task["task_type"] != "send_notification":
+            raise HTTPException(status_code=404, detail="Queued notification not found")
+
+        return {
             "queue_id": queue_id,
-            "status": "sent",
-            "retry_count": 0,
-            "last_attempt": datetime.utcnow().isoformat(),
-            "next_retry": None,
+            "status": "sent" if task["status"] == "completed" else task["status"],
+            "retry_count": max(task["attempts"] - 1, 0),
+            "last_attempt": task["completed_at"] or task["started_at"],
+            "error": task["error"],
         }
         
-        return status
-        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching notification status: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error fetching status")
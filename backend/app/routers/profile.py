@@ -22,7 +22,7 @@ from ..schemas import (
     UserPreferencesUpdate,
     ActivityResponse
 )
-from passlib.hash import bcrypt
+from ..services.password_service import password_service
 
 router = APIRouter(prefix="/api/v1/profile", tags=["profile"])
 
@@ -95,7 +95,7 @@ async def change_password(
 ):
     """Change user's password"""
     # Verificar contraseña actual
-    if not bcrypt.verify(password_data.current_password, current_user.password_hash):
+    if not await password_service.verify(password_data.current_password, current_user.password_hash):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
 
     # Validar nueva contraseña
@@ -106,8 +106,7 @@ async def change_password(
         raise HTTPException(status_code=400, detail="New passwords do not match")
 
     # Hash nueva contraseña
-    hashed_password = bcrypt.hashpw(password_data.new_password.encode('utf-8'), bcrypt.gensalt())
-    current_user.password_hash = hashed_password.decode('utf-8')
+    current_user.password_hash = await password_service.hash(password_data.new_password)
     current_user.last_password_change = datetime.utcnow()
     current_user.password_expiry_date = datetime.utcnow() + timedelta(days=90)  # Password expires in 90 days
     current_user.updated_at = datetime.utcnow()
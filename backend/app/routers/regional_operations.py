@@ -7,14 +7,17 @@ import logging
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel
-from sqlalchemy import desc, select, func
+from sqlalchemy import desc, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_session
 from app.dependencies import get_current_user
-from app.models import Room, User, Vessel, VesselPair
+from app.models import Room, User, Vessel
+from app.pagination import parse_cursor, set_next_cursor
+from app.regions import extract_region, normalize_region
+from app.vessel_access import accessible_operations, vessel_access_clause
 
 logger = logging.getLogger(__name__)
 
@@ -70,18 +73,16 @@ async def get_regional_dashboard(
     Get regional dashboard with filtered operations based on user involvement
     """
     try:
-        user_email = current_user.email
         user_role = current_user.role
-        user_company = current_user.get("company", "")
 
         # Get user's accessible vessels across all regions
         user_vessels = await _get_user_vessels_across_regions(
-            session, user_email, user_role, user_company
+            session, current_user
         )
 
         # Get operations filtered by user access
         operations = await _get_user_regional_operations(
-            session, user_email, user_role, user_company
+            session, current_user
         )
 
         # Calculate regional summary
@@ -117,78 +118,54 @@ async def get_regional_dashboard(
 
 @router.get("/regional/operations", response_model=List[RegionalOperation])
 async def get_regional_operations(
+    response: Response,
     region: Optional[str] = None,
     status_filter: Optional[str] = None,
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
     """
     Get operations filtered by region and user involvement
+
+    ``region`` is a region name or a location within it. Pages newest
+    first; the X-Next-Cursor header is the ``cursor`` of the next page.
     """
+    cursor_key = parse_cursor(cursor)
     try:
-        user_email = current_user.email
-        user_role = current_user.role
-        user_company = current_user.get("company", "")
-
         # Build query filters
         query_filters = []
 
         if region:
-            # Extract region from location (simplified - in real app might have dedicated region field)
-            query_filters.append(Room.location.ilike(f"%{region}%"))
+            query_filters.append(Room.region == normalize_region(region))
 
         if status_filter:
             query_filters.append(Room.status == status_filter)
 
-        # Get rooms with filters
-        rooms_query = select(Room).where(*query_filters).order_by(desc(Room.created_at))
-
-        rooms_result = await session.execute(rooms_query)
-        rooms = rooms_result.scalars().all()
-
-        operations = []
-
-        for room in rooms:
-            # Check user access to this operation
-            user_vessels_in_room = await _get_user_vessels_in_room(
-                session, str(room.id), user_email, user_role, user_company
-            )
-
-            if user_vessels_in_room:
-                # Get vessel count
-                vessels_result = await session.execute(
-                    select(func.count(Vessel.id)).where(Vessel.room_id == room.id)
-                )
-                vessel_count = vessels_result.scalar_one()
-
-                # Determine region (simplified)
-                operation_region = _extract_region_from_location(room.location)
-
-                # Get last activity
-                last_activity = await _get_room_last_activity(session, str(room.id))
-
+        rows, next_cursor = await accessible_operations(
+            session, current_user, query_filters,
+            limit=limit, offset=offset, cursor=cursor_key,
+        )
+        set_next_cursor(response, next_cursor)
+
+        return [
+            RegionalOperation(
+                id=str(row.room.id),
+                title=row.room.title,
+                location=row.room.location,
+                region=row.room.region or extract_region(row.room.location),
+                sts_eta=row.room.sts_eta,
+                status=row.room.status,
+                vessel_count=row.vessel_count,
+                user_vessels=row.user_vessels,
+                last_activity=row.last_activity,
                 # Calculate priority based on user involvement
-                priority = _calculate_operation_priority(len(user_vessels_in_room), room.status)
-
-                operations.append(RegionalOperation(
-                    id=str(room.id),
-                    title=room.title,
-                    location=room.location,
-                    region=operation_region,
-                    sts_eta=room.sts_eta,
-                    status=room.status,
-                    vessel_count=vessel_count,
-                    user_vessels=len(user_vessels_in_room),
-                    last_activity=last_activity,
-                    priority=priority
-                ))
-
-        # Apply pagination
-        paginated_operations = operations[offset:offset + limit]
-
-        return paginated_operations
+                priority=_calculate_operation_priority(row.user_vessels, row.room.status),
+            )
+            for row in rows
+        ]
 
     except Exception as e:
         logger.error(f"Error getting regional operations: {e}")
@@ -205,31 +182,30 @@ async def get_operation_vessels_by_region(
     Get vessels in an operation that the user has access to
     """
     try:
-        user_email = current_user.email
-        user_role = current_user.role
-        user_company = current_user.get("company", "")
-
-        # Get all vessels in the room
+        # Get all vessels in the room, with the user's access to each
         vessels_result = await session.execute(
-            select(Vessel).where(Vessel.room_id == room_id)
+            select(
+                Vessel,
+                Room.region,
+                Room.location,
+                vessel_access_clause(current_user).label("can_access"),
+            )
+            .join(Room, Room.id == Vessel.room_id)
+            .where(Vessel.room_id == room_id)
         )
-        all_vessels = vessels_result.scalars().all()
+        all_vessels = vessels_result.all()
 
         user_accessible_vessels = []
         restricted_vessels = []
 
-        for vessel in all_vessels:
-            can_access = await _user_can_access_vessel(
-                session, vessel, user_email, user_role, user_company
-            )
-
+        for vessel, region, location, can_access in all_vessels:
             vessel_data = {
                 "id": str(vessel.id),
                 "name": vessel.name,
                 "imo": vessel.imo,
                 "vessel_type": vessel.vessel_type,
                 "status": vessel.status,
-                "region": _extract_region_from_location(vessel.room.location) if vessel.room else "Unknown"
+                "region": region or extract_region(location)
             }
 
             if can_access:
@@ -271,13 +247,9 @@ async def get_regional_statistics(
     Get regional statistics for user's operations
     """
     try:
-        user_email = current_user.email
-        user_role = current_user.role
-        user_company = current_user.get("company", "")
-
         # Get user's vessels grouped by region
         user_vessels = await _get_user_vessels_across_regions(
-            session, user_email, user_role, user_company
+            session, current_user
         )
 
         # Group by region
@@ -296,7 +268,7 @@ async def get_regional_statistics(
 
         # Get operation counts per region
         operations = await _get_user_regional_operations(
-            session, user_email, user_role, user_company
+            session, current_user
         )
 
         for op in operations:
@@ -328,90 +300,61 @@ async def get_regional_statistics(
 # Helper functions
 async def _get_user_vessels_across_regions(
     session: AsyncSession,
-    user_email: str,
-    user_role: str,
-    user_company: str
+    user: User
 ) -> List[dict]:
     """Get all vessels user has access to across regions"""
-    # Get all active rooms
-    rooms_result = await session.execute(
-        select(Room).where(Room.status.in_(['active', 'pending']))
-    )
-    rooms = rooms_result.scalars().all()
-
-    user_vessels = []
-
-    for room in rooms:
-        vessels_result = await session.execute(
-            select(Vessel).where(Vessel.room_id == room.id)
+    vessels_result = await session.execute(
+        select(Vessel, Room.region, Room.location)
+        .join(Room, Room.id == Vessel.room_id)
+        .where(
+            Room.status.in_(['active', 'pending']),
+            vessel_access_clause(user),
         )
-        vessels = vessels_result.scalars().all()
-
-        for vessel in vessels:
-            can_access = await _user_can_access_vessel(
-                session, vessel, user_email, user_role, user_company
-            )
-
-            if can_access:
-                user_vessels.append({
-                    "id": str(vessel.id),
-                    "name": vessel.name,
-                    "imo": vessel.imo,
-                    "room_id": str(room.id),
-                    "region": _extract_region_from_location(room.location),
-                    "status": vessel.status
-                })
+    )
 
-    return user_vessels
+    return [
+        {
+            "id": str(vessel.id),
+            "name": vessel.name,
+            "imo": vessel.imo,
+            "room_id": str(vessel.room_id),
+            "region": region or extract_region(location),
+            "status": vessel.status
+        }
+        for vessel, region, location in vessels_result.all()
+    ]
 
 
 async def _get_user_regional_operations(
     session: AsyncSession,
-    user_email: str,
-    user_role: str,
-    user_company: str
+    user: User
 ) -> List[dict]:
     """Get operations user has access to with regional info"""
-    rooms_result = await session.execute(
-        select(Room).order_by(desc(Room.created_at))
-    )
-    rooms = rooms_result.scalars().all()
+    rows, _ = await accessible_operations(session, user)
 
     operations = []
-
-    for room in rooms:
-        user_vessels = await _get_user_vessels_in_room(
-            session, str(room.id), user_email, user_role, user_company
-        )
-
-        if user_vessels:
-            # Get vessel count
-            vessels_result = await session.execute(
-                select(func.count(Vessel.id)).where(Vessel.room_id == room.id)
-            )
-            vessel_count = vessels_result.scalar_one()
-
-            # Get last activity
-            last_activity = await _get_room_last_activity(session, str(room.id))
-
-            # Check if upcoming
-            is_upcoming = False
-            if room.sts_eta:
-                days_until_eta = (room.sts_eta - datetime.utcnow()).days
-                is_upcoming = 0 <= days_until_eta <= 7
-
-            operations.append({
-                "id": str(room.id),
-                "title": room.title,
-                "location": room.location,
-                "region": _extract_region_from_location(room.location),
-                "sts_eta": room.sts_eta.isoformat() if room.sts_eta else None,
-                "status": room.status,
-                "vessel_count": vessel_count,
-                "user_vessels": len(user_vessels),
-                "last_activity": last_activity.isoformat() if last_activity else None,
-                "is_upcoming": is_upcoming
-            })
+    now = datetime.utcnow()
+    for row in rows:
+        room = row.room
+
+        # Check if upcoming
+        is_upcoming = False
+        if room.sts_eta:
+            days_until_eta = (room.sts_eta - now).days
+            is_upcoming = 0 <= days_until_eta <= 7
+
+        operations.append({
+            "id": str(room.id),
+            "title": room.title,
+            "location": room.location,
+            "region": room.region or extract_region(room.location),
+            "sts_eta": room.sts_eta.isoformat() if room.sts_eta else None,
+            "status": room.status,
+            "vessel_count": row.vessel_count,
+            "user_vessels": row.user_vessels,
+            "last_activity": row.last_activity.isoformat() if row.last_activity else None,
+            "is_upcoming": is_upcoming
+        })
 
     return operations
 
@@ -538,107 +481,6 @@ async def _get_recent_activity(session: AsyncSession, user_vessels: List[dict])
     return recent_activity[:15]
 
 
-async def _get_user_vessels_in_room(
-    session: AsyncSession,
-    room_id: str,
-    user_email: str,
-    user_role: str,
-    user_company: str
-) -> List[Vessel]:
-    """Get vessels user has access to in a specific room"""
-    vessels_result = await session.execute(
-        select(Vessel).where(Vessel.room_id == room_id)
-    )
-    vessels = vessels_result.scalars().all()
-
-    accessible_vessels = []
-    for vessel in vessels:
-        can_access = await _user_can_access_vessel(
-            session, vessel, user_email, user_role, user_company
-        )
-        if can_access:
-            accessible_vessels.append(vessel)
-
-    return accessible_vessels
-
-
-async def _user_can_access_vessel(
-    session: AsyncSession,
-    vessel: Vessel,
-    user_email: str,
-    user_role: str,
-    user_company: str
-) -> bool:
-    """Check if user can access a specific vessel"""
-    if user_role == "broker":
-        return True
-    elif user_role == "owner":
-        return vessel.owner and user_company.lower() in vessel.owner.lower()
-    elif user_role == "charterer":
-        return vessel.charterer and user_company.lower() in vessel.charterer.lower()
-    else:
-        return False
-
-
-def _extract_region_from_location(location: str) -> str:
-    """Extract region from location string (simplified implementation)"""
-    location_lower = location.lower()
-
-    # Common maritime regions
-    if any(keyword in location_lower for keyword in ['singapore', 'malaysia', 'indonesia', 'thailand']):
-        return "Southeast Asia"
-    elif any(keyword in location_lower for keyword in ['china', 'japan', 'korea', 'taiwan']):
-        return "East Asia"
-    elif any(keyword in location_lower for keyword in ['india', 'sri lanka', 'bangladesh']):
-        return "South Asia"
-    elif any(keyword in location_lower for keyword in ['middle east', 'oman', 'uae', 'qatar']):
-        return "Middle East"
-    elif any(keyword in location_lower for keyword in ['europe', 'mediterranean', 'atlantic']):
-        return "Europe/Mediterranean"
-    elif any(keyword in location_lower for keyword in ['africa', 'cape town', 'durban']):
-        return "Africa"
-    elif any(keyword in location_lower for keyword in ['america', 'pacific', 'atlantic']):
-        return "Americas"
-    else:
-        return "Global"
-
-
-async def _get_room_last_activity(session: AsyncSession, room_id: str) -> Optional[datetime]:
-    """Get the last activity timestamp for a room"""
-    from app.models import Message, Approval, Document
-
-    # Check messages
-    messages_result = await session.execute(
-        select(Message.created_at)
-        .where(Message.room_id == room_id)
-        .order_by(desc(Message.created_at))
-        .limit(1)
-    )
-    message_time = messages_result.scalar_one_or_none()
-
-    # Check approvals
-    approvals_result = await session.execute(
-        select(Approval.updated_at)
-        .where(Approval.room_id == room_id)
-        .order_by(desc(Approval.updated_at))
-        .limit(1)
-    )
-    approval_time = approvals_result.scalar_one_or_none()
-
-    # Check documents
-    documents_result = await session.execute(
-        select(Document.uploaded_at)
-        .where(Document.room_id == room_id)
-        .order_by(desc(Document.uploaded_at))
-        .limit(1)
-    )
-    document_time = documents_result.scalar_one_or_none()
-
-    # Return the most recent
-    times = [t for t in [message_time, approval_time, document_time] if t is not None]
-    return max(times) if times else None
-
-
 def _calculate_operation_priority(user_vessels_count: int, status: str) -> str:
     """Calculate operation priority based on user involvement"""
     if status == 'active' and user_vessels_count > 1:
@@ -10,17 +10,20 @@ from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from sqlalchemy import delete, func, select
+from sqlalchemy import delete, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_session
 from app.dependencies import get_current_user, log_activity, require_room_access
+from app.identity_cache import identity_cache
 from app.models import (ActivityLog, Approval, Document, DocumentType, Message,
                         Party, Room, Snapshot, User, Vessel)
 from app.schemas import PartyRole, RoomResponse, RoomSummaryResponse, DocumentResponse
 from app.permission_decorators import require_permission
 from app.services.room_status_service import RoomStatusService
 from app.services.criticality_scorer import criticality_scorer
+from app.services.blob_store import blob_store
+from app.services.room_readiness_service import room_readiness_service
 
 logger = logging.getLogger(__name__)
 
@@ -165,7 +168,10 @@ async def get_room_summary(
         if not room:
             raise HTTPException(status_code=404, detail="Room not found")
 
-        # Get all documents for the room
+        # Progress counters come from the readiness projection (PK lookup)
+        readiness = await room_readiness_service.get(session, room_id)
+
+        # Only fetch documents that can be blockers or expiring soon
         docs_result = await session.execute(
             select(
                 Document.id,
@@ -180,7 +186,13 @@ async def get_room_summary(
                 DocumentType.criticality,
             )
             .join(DocumentType, Document.type_id == DocumentType.id)
-            .where(Document.room_id == room_id)
+            .where(
+                Document.room_id == room_id,
+                or_(
+                    Document.status.in_(["missing", "expired", "under_review"]),
+                    Document.expires_on.isnot(None),
+                ),
+            )
         )
 
         documents = []
@@ -200,9 +212,9 @@ async def get_room_summary(
             )
             documents.append(doc)
 
-        # Calculate progress and get blockers
-        progress_dict = criticality_scorer.calculate_progress(documents)
-        progress = progress_dict.get("progress_percentage", 0.0)
+        # Get progress and blockers
+        progress_dict = room_readiness_service.to_dict(readiness)
+        progress = progress_dict["progress_percentage"]
         blockers = criticality_scorer.get_blockers(documents)
         expiring_soon = criticality_scorer.get_expiring_soon(documents)
 
@@ -245,8 +257,8 @@ async def get_room_summary(
             location=room.location,
             sts_eta=room.sts_eta,
             progress_percentage=progress,
-            total_required_docs=progress_dict.get("total_required_docs", 0),
-            resolved_required_docs=progress_dict.get("resolved_required_docs", 0),
+            total_required_docs=progress_dict["required_documents"],
+            resolved_required_docs=progress_dict["resolved_required_documents"],
             blockers=blockers_response,
             expiring_soon=expiring_response,
         )
@@ -258,6 +270,32 @@ async def get_room_summary(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.get("/rooms/{room_id}/readiness")
+async def get_room_readiness(
+    room_id: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Get materialized readiness counters for a room (documents by status,
+    required/resolved counts, approval progress, next expiry)
+    """
+    try:
+        user_email, _ = get_user_info(current_user)
+
+        # Verify user has access to room
+        await require_room_access(room_id, user_email, session)
+
+        readiness = await room_readiness_service.get(session, room_id)
+        return room_readiness_service.to_dict(readiness)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting room readiness: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 @router.post("/rooms", response_model=RoomResponse)
 async def create_room(
     room_data: CreateRoomRequest,
@@ -367,6 +405,7 @@ async def create_room(
                     )
                     session.add(document)
 
+                await room_readiness_service.refresh(session, room.id)
                 await session.commit()
 
             except Exception as tx_error:
@@ -633,7 +672,11 @@ async def delete_room(
                     )
                 )
 
-                # 1. Delete document versions first (references documents)
+                # 1. Delete document versions first (references documents),
+                # releasing their references on shared blobs
+                await blob_store.release_for_documents(
+                    session, select(Document.id).where(Document.room_id == room_id)
+                )
                 await session.execute(
                     delete(DocumentVersion).where(
                         DocumentVersion.document_id.in_(
@@ -671,12 +714,18 @@ async def delete_room(
                 # 8. Delete parties
                 await session.execute(delete(Party).where(Party.room_id == room_id))
 
-                # 9. Finally delete the room
+                # 9. Delete the readiness projection
+                await room_readiness_service.remove(session, room_id)
+
+                # 10. Finally delete the room
                 await session.execute(delete(Room).where(Room.id == room_id))
 
                 # Commit the nested transaction
                 await session.commit()
 
+                # Bulk deletes bypass the ORM flush hooks
+                identity_cache.invalidate(room_id=room_id)
+
                 logger.info(
                     f"Room {room_id} cascade deletion completed. Deleted: "
                     f"{deletion_meta.get('documents_deleted', 0)} docs, "
@@ -14,9 +14,24 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_async_session
 from app.dependencies import get_current_user
 from app.models import Document, DocumentType, Message, Party, Room, User, Vessel
+from app.services.search_service import (SUGGESTION_CATEGORIES, SUGGESTION_TYPES,
+                                         search_service)
 
 logger = logging.getLogger(__name__)
 
+# /global searches these categories and returns these fields of each result
+GLOBAL_CATEGORIES = ("rooms", "documents", "messages", "vessels")
+GLOBAL_FIELDS = {
+    "rooms": ("id", "title", "location", "sts_eta", "created_at", "type"),
+    "documents": (
+        "id", "type_name", "type_code", "status", "room_title", "room_id", "uploaded_at", "type",
+    ),
+    "messages": (
+        "id", "sender_name", "content_preview", "room_title", "room_id", "created_at", "type",
+    ),
+    "vessels": ("id", "name", "imo", "vessel_type", "flag", "room_title", "room_id", "type"),
+}
+
 router = APIRouter(prefix="/api/v1/search", tags=["search"])
 
 
@@ -65,139 +80,28 @@ async def global_search(
                 "total_results": 0,
             }
 
-        search_term = f"%{q.lower()}%"
-        results = {"rooms": [], "documents": [], "messages": [], "vessels": []}
-
-        # Search rooms
-        rooms_result = await session.execute(
-            select(Room)
-            .where(
-                and_(
-                    Room.id.in_(user_room_ids),
-                    or_(
-                        func.lower(Room.title).like(search_term),
-                        func.lower(Room.location).like(search_term),
-                    ),
-                )
-            )
-            .limit(limit // 4)
-        )
-
-        for room in rooms_result.scalars().all():
-            results["rooms"].append(
-                {
-                    "id": str(room.id),
-                    "title": room.title,
-                    "location": room.location,
-                    "sts_eta": room.sts_eta,
-                    "created_at": room.created_at,
-                    "type": "room",
-                }
-            )
-
-        # Search documents
-        docs_result = await session.execute(
-            select(Document, DocumentType, Room)
-            .join(DocumentType, Document.type_id == DocumentType.id)
-            .join(Room, Document.room_id == Room.id)
-            .where(
-                and_(
-                    Document.room_id.in_(user_room_ids),
-                    or_(
-                        func.lower(DocumentType.name).like(search_term),
-                        func.lower(DocumentType.code).like(search_term),
-                    ),
-                )
-            )
-            .limit(limit // 4)
-        )
-
-        for doc, doc_type, room in docs_result.all():
-            results["documents"].append(
-                {
-                    "id": str(doc.id),
-                    "type_name": doc_type.name,
-                    "type_code": doc_type.code,
-                    "status": doc.status,
-                    "room_title": room.title,
-                    "room_id": str(room.id),
-                    "uploaded_at": doc.uploaded_at,
-                    "type": "document",
-                }
-            )
-
-        # Search messages
-        messages_result = await session.execute(
-            select(Message, Room)
-            .join(Room, Message.room_id == Room.id)
-            .where(
-                and_(
-                    Message.room_id.in_(user_room_ids),
-                    or_(
-                        func.lower(Message.content).like(search_term),
-                        func.lower(Message.sender_name).like(search_term),
-                    ),
-                )
-            )
-            .order_by(Message.created_at.desc())
-            .limit(limit // 4)
-        )
-
-        for message, room in messages_result.all():
-            # Truncate content for preview
-            content_preview = (
-                message.content[:100] + "..."
-                if len(message.content) > 100
-                else message.content
-            )
-
-            results["messages"].append(
-                {
-                    "id": str(message.id),
-                    "sender_name": message.sender_name,
-                    "content_preview": content_preview,
-                    "room_title": room.title,
-                    "room_id": str(room.id),
-                    "created_at": message.created_at,
-                    "type": "message",
-                }
-            )
-
-        # Search vessels
-        vessels_result = await session.execute(
-            select(Vessel, Room)
-            .join(Room, Vessel.room_id == Room.id)
-            .where(
-                and_(
-                    Vessel.room_id.in_(user_room_ids),
-                    or_(
-                        func.lower(Vessel.name).like(search_term),
-                        func.lower(Vessel.imo).like(search_term),
-                        func.lower(Vessel.vessel_type).like(search_term),
-                        func.lower(Vessel.flag).like(search_term),
-                    ),
-                )
-            )
-            .limit(limit // 4)
+        # Categories are matched in the full-text index concurrently, each
+        # on its own session; recent identical searches come from the cache
+        search = await search_service.search_categories(
+            q, user_room_ids, categories=GLOBAL_CATEGORIES, limit=max(limit // 4, 1), session=session
         )
-
-        for vessel, room in vessels_result.all():
-            results["vessels"].append(
-                {
-                    "id": str(vessel.id),
-                    "name": vessel.name,
-                    "imo": vessel.imo,
-                    "vessel_type": vessel.vessel_type,
-                    "flag": vessel.flag,
-                    "room_title": room.title,
-                    "room_id": str(room.id),
-                    "type": "vessel",
-                }
-            )
+        found = search["results"]
+        results = {
+            category: [
+                {field: row[field] for field in GLOBAL_FIELDS[category]}
+                for row in found[category]
+            ]
+            for category in GLOBAL_CATEGORIES
+        }
 
         total_results = sum(len(results[key]) for key in results)
 
-        return {"query": q, "results": results, "total_results": total_results}
+        return {
+            "query": q,
+            "results": results,
+            "total_results": total_results,
+            "partial": bool(search["timed_out"] or search["failed"]),
+        }
 
     except Exception as e:
         logger.error(f"Error in global search: {e}")
@@ -391,59 +295,17 @@ async def get_search_suggestions(
         if not user_room_ids:
             return {"suggestions": []}
 
-        search_term = f"{q.lower()}%"
-        suggestions = []
-
-        # Room title suggestions
-        rooms_result = await session.execute(
-            select(Room.title)
-            .where(
-                and_(
-                    Room.id.in_(user_room_ids), func.lower(Room.title).like(search_term)
-                )
-            )
-            .limit(5)
-        )
-
-        for title in rooms_result.scalars().all():
-            suggestions.append(
-                {"text": title, "type": "room_title", "category": "Rooms"}
-            )
-
-        # Document type suggestions
-        doc_types_result = await session.execute(
-            select(DocumentType.name.distinct())
-            .join(Document, DocumentType.id == Document.type_id)
-            .where(
-                and_(
-                    Document.room_id.in_(user_room_ids),
-                    func.lower(DocumentType.name).like(search_term),
-                )
-            )
-            .limit(5)
-        )
-
-        for doc_type in doc_types_result.scalars().all():
-            suggestions.append(
-                {"text": doc_type, "type": "document_type", "category": "Documents"}
-            )
-
-        # Vessel name suggestions
-        vessels_result = await session.execute(
-            select(Vessel.name.distinct())
-            .where(
-                and_(
-                    Vessel.room_id.in_(user_room_ids),
-                    func.lower(Vessel.name).like(search_term),
-                )
-            )
-            .limit(5)
-        )
-
-        for vessel_name in vessels_result.scalars().all():
-            suggestions.append(
-                {"text": vessel_name, "type": "vessel_name", "category": "Vessels"}
-            )
+        # Prefix match on indexed titles (room titles, document type names,
+        # vessel names), best ranked first
+        hits = await search_service.suggest_titles(q, user_room_ids, 15, session)
+        suggestions = [
+            {
+                "text": hit.title,
+                "type": SUGGESTION_TYPES[hit.entity_type],
+                "category": SUGGESTION_CATEGORIES[hit.entity_type],
+            }
+            for hit in hits
+        ]
 
         return {"suggestions": suggestions[:15]}  # Limit to 15 suggestions
 
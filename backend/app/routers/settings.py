@@ -14,11 +14,11 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from passlib.hash import bcrypt
 
 from app.database import get_async_session
 from app.dependencies import get_current_user
 from app.models import User, UserSettings
+from app.services.password_service import password_service
 from app.validators import (
     validate_settings_input,
     validate_theme_settings,
@@ -362,7 +362,7 @@ async def change_password(
                 detail="User account does not have a password set"
             )
 
-        old_password_valid = bcrypt.verify(
+        old_password_valid = await password_service.verify(
             password_data.old_password,
             user.password_hash
         )
@@ -374,13 +374,10 @@ async def change_password(
             )
 
         # Hash new password
-        new_password_hash = bcrypt.hashpw(
-            password_data.new_password.encode('utf-8'),
-            bcrypt.gensalt()
-        )
+        new_password_hash = await password_service.hash(password_data.new_password)
 
         # Update user password
-        user.password_hash = new_password_hash.decode('utf-8')
+        user.password_hash = new_password_hash
         user.last_password_change = datetime.utcnow()
         user.updated_at = datetime.utcnow()
 
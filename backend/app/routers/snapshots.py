@@ -5,17 +5,19 @@ Generates professional PDFs with real data (Day 2 implementation)
 Day 3 Enhancements: Async generation, dual-layer caching, performance monitoring
 """
 
+import asyncio
 import io
 import json
 import logging
+import os
 import time
 import uuid
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy import desc, select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -25,11 +27,14 @@ from app.dependencies import (get_current_user, log_activity,
                               require_room_access)
 from app.models import Snapshot, Party, Room
 from app.permission_matrix import PermissionMatrix
-from app.services.pdf_generator import pdf_generator
+from app.services.pdf_generator import pdf_render_pool
 from app.services.snapshot_data_service import snapshot_data_service
 from app.services.storage_service import storage_service
-from app.services.background_task_service import background_task_service
+from app.services.background_task_service import (TaskPriority,
+                                                  background_task_service)
 from app.services.pdf_cache_service import pdf_cache_service
+from app.services.file_serving import (file_response, log_access_in_background,
+                                       resolve_etag)
 from app.services.metrics_service import metrics_service
 
 logger = logging.getLogger(__name__)
@@ -80,7 +85,7 @@ async def get_task_status(
         if not task_status:
             raise HTTPException(status_code=404, detail="Task not found")
         
-        logger.info(f"Retrieved task status {task_id} for user {current_user['email']}")
+        logger.info(f"Retrieved task status {task_id} for user {current_user.email}")
         
         return task_status
         
@@ -91,6 +96,32 @@ async def get_task_status(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.get("/snapshots/queue/stats")
+async def get_task_queue_stats(
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Get background task queue depth, throughput and latency
+    
+    Depth is per task type and priority lane; latency is the time tasks
+    waited in the queue and ran, as observed by this worker process.
+    """
+    try:
+        if not PermissionMatrix.has_permission(current_user.role, "metrics", "view"):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Only admins can view system metrics",
+            )
+        
+        return await background_task_service.get_stats()
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting task queue stats: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 # ============================================================================
 # METRICS ENDPOINTS - Day 3 Enhancement
 # ============================================================================
@@ -131,6 +162,8 @@ async def get_metrics_summary(
             "pdf_generation": pdf_stats,
             "api_performance": api_perf,
             "cache": cache_stats,
+            "render_pool": pdf_render_pool.get_stats(),
+            "task_queue": await background_task_service.get_stats(),
         }
         
     except HTTPException:
@@ -294,7 +327,7 @@ async def create_snapshot(
         try:
             logger.info(f"Enqueuing background PDF generation for snapshot {snapshot_id}")
             
-            # Create background task for PDF generation
+            # Queued in this transaction: the task exists only if the snapshot does
             task_id = await background_task_service.create_task(
                 task_type="generate_pdf",
                 data={
@@ -305,7 +338,9 @@ async def create_snapshot(
                     "include_activity": snapshot_data.include_activity,
                     "include_approvals": snapshot_data.include_approvals,
                 },
-                task_id=f"snapshot-{snapshot_id}"
+                task_id=f"snapshot-{snapshot_id}",
+                dedup_key=f"snapshot-{snapshot_id}",
+                session=session,
             )
             
             # Store task ID for tracking
@@ -432,6 +467,7 @@ async def get_snapshot(
 async def download_snapshot(
     room_id: str,
     snapshot_id: str,
+    request: Request,
     current_user: dict = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
@@ -446,6 +482,7 @@ async def download_snapshot(
     **Day 2 Enhancement:**
     - Retrieves actual PDF files stored in filesystem
     - Validates file integrity before serving
+    - Strong ETag from the snapshot hash, 304s and byte ranges
     """
     try:
         user_email = current_user.email
@@ -484,29 +521,26 @@ async def download_snapshot(
                     status_code=404, detail="Snapshot file not found in storage"
                 )
 
-            # Log download activity
-            await log_activity(
-                session=session,
-                room_id=room_id,
-                actor=user_email,
-                action="snapshot_downloaded",
-                meta={
-                    "snapshot_id": snapshot.id,
-                    "file_size": snapshot.file_size,
-                }
-            )
-            
-            await session.commit()
+            # Snapshots generated before hashes were stored are hashed once
+            etag = await resolve_etag(file_path, snapshot.sha256)
 
             logger.info(
                 f"Snapshot {snapshot_id} ({snapshot.file_size} bytes) downloaded by {user_email} from room {room_id}"
             )
 
-            # Return actual file from storage
-            return FileResponse(
-                path=file_path,
+            # Download activity is logged after the response is sent
+            return file_response(
+                request,
+                file_path,
+                etag=etag,
                 media_type="application/pdf",
                 filename=f"snapshot-{snapshot_id}.pdf",
+                background=log_access_in_background(
+                    room_id,
+                    user_email,
+                    "snapshot_downloaded",
+                    {"snapshot_id": snapshot.id, "file_size": snapshot.file_size},
+                ),
             )
         else:
             raise HTTPException(status_code=400, detail="Unsupported snapshot type")
@@ -554,8 +588,7 @@ async def _store_pdf_file(pdf_content: bytes, room_id: str, snapshot_id: str) ->
         
         # Save file
         file_path = snapshots_dir / f"{snapshot_id}.pdf"
-        with open(file_path, "wb") as f:
-            f.write(pdf_content)
+        await asyncio.to_thread(file_path.write_bytes, pdf_content)
         
         # Generate relative file_url
         file_url = str(file_path.relative_to(Path("uploads")))
@@ -717,17 +750,13 @@ async def _pdf_generation_handler(task):
             # Step 3: Get or generate PDF (with caching)
             gen_func_start = time.time()
             
-            async def generate_pdf_async():
-                return pdf_generator.generate_room_snapshot(
-                    room_data=room_data,
-                    include_documents=include_documents,
-                    include_activity=include_activity,
-                    include_approvals=include_approvals,
-                )
-            
             pdf_content, was_cached = await pdf_cache_service.get_or_generate(
                 content_hash=content_hash,
-                generator_func=generate_pdf_async,
+                generator_func=pdf_render_pool.render_room_snapshot,
+                room_data=room_data,
+                include_documents=include_documents,
+                include_activity=include_activity,
+                include_approvals=include_approvals,
                 metadata={
                     "room_id": room_id,
                     "snapshot_id": snapshot_id,
@@ -755,6 +784,7 @@ async def _pdf_generation_handler(task):
             if snapshot:
                 snapshot.file_url = file_url
                 snapshot.file_size = file_size
+                snapshot.sha256 = sha256_hash
                 snapshot.status = "completed"
                 await session.flush()
                 
@@ -808,6 +838,10 @@ async def _pdf_generation_handler(task):
     except Exception as e:
         logger.error(f"Background PDF generation failed for task {task.task_id}: {e}", exc_info=True)
         
+        if not task.is_final_attempt:
+            # The queue retries the task; the snapshot stays "generating"
+            raise
+        
         # Update snapshot status to failed
         try:
             async with AsyncSessionLocal() as session:
@@ -824,18 +858,13 @@ async def _pdf_generation_handler(task):
         raise
 
 
-# Register the PDF generation handler
-async def _register_handlers():
-    """Register background task handlers"""
-    await background_task_service.register_handler("generate_pdf", _pdf_generation_handler)
-    logger.info("Registered PDF generation background task handler")
-
-
-# Register handlers on module load
-import asyncio
-try:
-    asyncio.create_task(_register_handlers())
-except RuntimeError:
-    # If there's no running event loop, the handlers will be registered
-    # when the router is first used
-    pass
\ No newline at end of file
+# Register the PDF generation handler (low lane: never delays notifications)
+background_task_service.register_handler(
+    "generate_pdf",
+    _pdf_generation_handler,
+    concurrency=int(os.getenv("SNAPSHOT_TASK_CONCURRENCY", 2)),
+    priority=TaskPriority.LOW,
+    max_attempts=3,
+    retry_backoff_seconds=5.0,
+    timeout_seconds=600,
+)
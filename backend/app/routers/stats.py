@@ -15,6 +15,7 @@ from app.database import get_async_session
 from app.dependencies import get_current_user
 from app.models import (ActivityLog, Approval, Document, DocumentType, Message,
                         Party, Room)
+from app.services.room_readiness_service import room_readiness_service
 
 logger = logging.getLogger(__name__)
 
@@ -64,26 +65,16 @@ async def get_dashboard_stats(
         )
         active_operations = active_ops_result.scalar()
 
-        # Pending approvals
-        pending_approvals_result = await session.execute(
-            select(func.count(Approval.id)).where(
-                and_(Approval.room_id.in_(user_room_ids), Approval.status == "pending")
-            )
-        )
-        pending_approvals = pending_approvals_result.scalar()
+        # Pending approvals and documents summary from the readiness projection
+        readiness = await room_readiness_service.get_many(session, user_room_ids)
 
-        # Documents summary
-        docs_result = await session.execute(
-            select(Document.status, func.count(Document.id))
-            .where(Document.room_id.in_(user_room_ids))
-            .group_by(Document.status)
-        )
-
-        documents_summary = {"total": 0, "approved": 0, "missing": 0, "under_review": 0}
-        for status, count in docs_result.all():
-            documents_summary["total"] += count
-            if status in documents_summary:
-                documents_summary[status] = count
+        pending_approvals = sum(r.pending_approvals for r in readiness.values())
+        documents_summary = {
+            "total": sum(r.total_documents for r in readiness.values()),
+            "approved": sum(r.approved_documents for r in readiness.values()),
+            "missing": sum(r.missing_documents for r in readiness.values()),
+            "under_review": sum(r.under_review_documents for r in readiness.values()),
+        }
 
         # Recent activity (last 7 days)
         recent_activity_result = await session.execute(
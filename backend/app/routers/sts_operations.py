@@ -104,7 +104,7 @@ async def create_operation(
       "location": "Singapore",
       "scheduled_start_date": "2025-02-01T10:00:00Z",
       "scheduled_end_date": "2025-02-03T18:00:00Z",
-      "region": "Asia",
+      "region": "Southeast Asia",
       "q88_enabled": true
     }
     ```
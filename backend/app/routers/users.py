@@ -7,7 +7,6 @@ import logging
 import uuid
 from typing import List, Optional
 
-from passlib.context import CryptContext
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr
 from sqlalchemy import desc, select
@@ -16,8 +15,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_async_session
 from app.dependencies import get_current_user, get_user_role_permissions
 from app.models import User
+from app.permission_cache import get_permission_cache
 from app.permission_decorators import require_role
 from app.permission_manager import PermissionManager
+from app.services.password_service import password_service
 
 logger = logging.getLogger(__name__)
 permission_manager = PermissionManager()
@@ -97,8 +98,7 @@ async def create_user(
             )
         
         # Hash password
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        hashed_password = pwd_context.hash(user_data.password)
+        hashed_password = await password_service.hash(user_data.password)
         
         # Create user
         user = User(
@@ -307,11 +307,15 @@ async def update_user(
         if update_data.name is not None:
             target_user.name = update_data.name
 
+        role_changed = update_data.role is not None and update_data.role != target_user.role
         if update_data.role is not None:
             target_user.role = update_data.role
 
         await session.commit()
 
+        if role_changed:
+            await get_permission_cache().invalidate_user_permissions(target_user.email)
+
         return UserResponse(
             id=str(target_user.id),
             email=target_user.email,
@@ -366,6 +370,8 @@ async def delete_user(
         await session.execute(delete_stmt(User).where(User.id == user_id))
         await session.commit()
 
+        await get_permission_cache().invalidate_user_permissions(target_user.email)
+
         return {"message": "User deleted successfully"}
 
     except HTTPException:
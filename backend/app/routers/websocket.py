@@ -3,20 +3,29 @@ WebSocket router for STS Clearance system
 Handles real-time chat and notifications
 """
 
+import asyncio
 import json
 import logging
+import uuid
 from datetime import datetime
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set
 
 import jwt
 from fastapi import (APIRouter, Depends, HTTPException, WebSocket,
-                     WebSocketDisconnect)
+                     WebSocketDisconnect, status)
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_async_session
-from app.dependencies import ALGORITHM, SECRET_KEY
-from app.models import Message, Party, Room, User
+from app.database import AsyncSessionLocal
+from app.dependencies import ALGORITHM, SECRET_KEY, get_current_user
+from app.identity_cache import load_token_user
+from app.models import Party, Room
+from app.permission_matrix import PermissionMatrix
+from app.services.message_ingestion_service import message_ingestion_service
+from app.websocket_backplane import WebSocketBackplane, websocket_backplane
+from app.websocket_broadcast import COALESCABLE_EVENT_TYPES, BroadcastEngine
+from app.websocket_manager import manager as chat_manager
+from app.websocket_v2_manager import manager_v2
 
 logger = logging.getLogger(__name__)
 
@@ -24,11 +33,24 @@ router = APIRouter()
 
 
 class ConnectionManager:
-    def __init__(self):
+    def __init__(
+        self,
+        backplane: Optional[WebSocketBackplane] = None,
+        scope: str = "ws",
+        engine: Optional[BroadcastEngine] = None,
+    ):
         # room_id -> set of websockets
         self.active_connections: Dict[str, Set[WebSocket]] = {}
         # websocket -> user info
         self.connection_users: Dict[WebSocket, dict] = {}
+        # websocket -> backplane presence id
+        self.connection_ids: Dict[WebSocket, str] = {}
+
+        self.backplane = backplane
+        self.scope = scope
+        self.engine = engine
+        if backplane is not None:
+            backplane.register(scope, self._deliver_local)
 
     async def connect(self, websocket: WebSocket, room_id: str, user: dict):
         await websocket.accept()
@@ -39,6 +61,20 @@ class ConnectionManager:
         self.active_connections[room_id].add(websocket)
         self.connection_users[websocket] = user
 
+        if self.engine is not None:
+            self.engine.attach(
+                websocket,
+                on_close=lambda reason: self.disconnect(websocket, room_id),
+                label=user["email"],
+            )
+
+        if self.backplane is not None:
+            connection_id = str(uuid.uuid4())
+            self.connection_ids[websocket] = connection_id
+            await self.backplane.add_presence(self.scope, room_id, connection_id, {
+                "email": user["email"], "name": user["name"], "role": user["role"],
+            })
+
         logger.info(f"User {user['email']} connected to room {room_id}")
 
         # Notify other users in the room
@@ -58,11 +94,23 @@ class ConnectionManager:
             if not self.active_connections[room_id]:
                 del self.active_connections[room_id]
 
+        if self.engine is not None:
+            self.engine.detach(websocket)
+
         user = self.connection_users.pop(websocket, None)
         if user:
             logger.info(f"User {user['email']} disconnected from room {room_id}")
 
+        connection_id = self.connection_ids.pop(websocket, None)
+        if connection_id and self.backplane is not None:
+            asyncio.create_task(
+                self.backplane.remove_presence(self.scope, room_id, connection_id)
+            )
+
     async def send_personal_message(self, message: dict, websocket: WebSocket):
+        if self.engine is not None and self.engine.is_attached(websocket):
+            self.engine.send(websocket, json.dumps(message))
+            return
         try:
             await websocket.send_text(json.dumps(message))
         except Exception as e:
@@ -70,11 +118,33 @@ class ConnectionManager:
 
     async def broadcast_to_room(
         self, room_id: str, message: dict, exclude: WebSocket = None
+    ):
+        message_text = json.dumps(message)
+        coalescable = message.get("type") in COALESCABLE_EVENT_TYPES
+        await self._deliver_local(room_id, message_text, exclude, coalescable)
+        if self.backplane is not None:
+            await self.backplane.publish(
+                self.scope, room_id, message_text, coalescable=coalescable
+            )
+
+    async def _deliver_local(
+        self,
+        room_id: str,
+        message_text: str,
+        exclude: WebSocket = None,
+        coalescable: bool = False,
     ):
         if room_id not in self.active_connections:
             return
 
-        message_text = json.dumps(message)
+        if self.engine is not None:
+            # Each connection's writer drains its own queue; nobody waits here
+            self.engine.fanout(
+                self.active_connections[room_id], message_text,
+                exclude=exclude, coalescable=coalescable,
+            )
+            return
+
         disconnected = set()
 
         for connection in self.active_connections[room_id]:
@@ -89,10 +159,14 @@ class ConnectionManager:
 
         # Clean up disconnected connections
         for connection in disconnected:
-            self.active_connections[room_id].discard(connection)
-            self.connection_users.pop(connection, None)
+            self.disconnect(connection, room_id)
+
+    async def get_room_users(self, room_id: str) -> List[dict]:
+        if self.backplane is not None:
+            members = await self.backplane.room_presence(self.scope, room_id)
+            if members is not None:
+                return members
 
-    def get_room_users(self, room_id: str) -> List[dict]:
         if room_id not in self.active_connections:
             return []
 
@@ -107,7 +181,7 @@ class ConnectionManager:
         return users
 
 
-manager = ConnectionManager()
+manager = ConnectionManager(backplane=websocket_backplane, scope="ws", engine=BroadcastEngine())
 
 
 async def get_user_from_token(token: str, session: AsyncSession) -> dict:
@@ -120,9 +194,8 @@ async def get_user_from_token(token: str, session: AsyncSession) -> dict:
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        # Get user from database
-        result = await session.execute(select(User).where(User.email == email))
-        user = result.scalar_one_or_none()
+        # Get user (from the user cache when the token carries claims)
+        user = await load_token_user(session, payload)
 
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
@@ -176,12 +249,13 @@ async def websocket_endpoint(
         await websocket.close(code=1008, reason="Token or user credentials required")
         return
 
-    # Get database session
-    async for session in get_async_session():
-        try:
-            # Authenticate user
+    # Authenticate on a short-lived session; nothing holds a pool
+    # connection for the lifetime of the socket
+    try:
+        async with AsyncSessionLocal() as session:
             if token:
                 user = await get_user_from_token(token, session)
+                has_access = await verify_room_access(room_id, user["email"], session)
             else:
                 # Testing mode - create user object from parameters
                 user = {
@@ -189,123 +263,151 @@ async def websocket_endpoint(
                     "name": user_name,
                     "role": "user"
                 }
+                has_access = True
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    except Exception as e:
+        logger.error(f"WebSocket authentication error: {e}")
+        await websocket.close(code=1011, reason="Internal server error")
+        return
 
-            # Verify room access (skip for testing)
-            if token:
-                has_access = await verify_room_access(room_id, user["email"], session)
-                if not has_access:
-                    await websocket.close(code=1008, reason="Access denied")
-                    return
-
-            # Connect user
-            await manager.connect(websocket, room_id, user)
-
-            # Send current room users
-            room_users = manager.get_room_users(room_id)
-            await manager.send_personal_message(
-                {
-                    "type": "room_users",
-                    "users": room_users,
-                    "timestamp": datetime.utcnow().isoformat(),
-                },
-                websocket,
-            )
+    if not has_access:
+        await websocket.close(code=1008, reason="Access denied")
+        return
 
-            # Listen for messages
-            while True:
-                try:
-                    data = await websocket.receive_text()
-                    message_data = json.loads(data)
-
-                    message_type = message_data.get("type", "message")
-
-                    if message_type == "message":
-                        content = message_data.get("content", "").strip()
-                        if not content:
-                            continue
-
-                        # Save message to database
-                        message = Message(
-                            room_id=room_id,
-                            sender_name=user["name"],
-                            sender_email=user["email"],
-                            content=content,
-                            created_at=datetime.utcnow(),
-                        )
-                        session.add(message)
-                        await session.commit()
-
-                        # Broadcast message to room
-                        broadcast_data = {
-                            "type": "message",
-                            "id": str(message.id),
-                            "sender_name": user["name"],
-                            "sender_email": user["email"],
-                            "content": content,
-                            "timestamp": message.created_at.isoformat(),
-                        }
-
-                        await manager.broadcast_to_room(room_id, broadcast_data)
-
-                    elif message_type == "typing":
-                        # Broadcast typing indicator
-                        typing_data = {
-                            "type": "typing",
-                            "user": user,
-                            "is_typing": message_data.get("is_typing", False),
-                            "timestamp": datetime.utcnow().isoformat(),
-                        }
-
-                        await manager.broadcast_to_room(
-                            room_id, typing_data, exclude=websocket
-                        )
-
-                    elif message_type == "ping":
-                        # Respond to ping
-                        await manager.send_personal_message(
-                            {
-                                "type": "pong",
-                                "timestamp": datetime.utcnow().isoformat(),
-                            },
-                            websocket,
-                        )
-
-                except WebSocketDisconnect:
-                    break
-                except json.JSONDecodeError:
-                    await manager.send_personal_message(
-                        {
-                            "type": "error",
-                            "message": "Invalid JSON format",
-                            "timestamp": datetime.utcnow().isoformat(),
-                        },
-                        websocket,
+    try:
+        # Connect user
+        await manager.connect(websocket, room_id, user)
+
+        # Send current room users
+        room_users = await manager.get_room_users(room_id)
+        await manager.send_personal_message(
+            {
+                "type": "room_users",
+                "users": room_users,
+                "timestamp": datetime.utcnow().isoformat(),
+            },
+            websocket,
+        )
+
+        # Listen for messages
+        while True:
+            try:
+                data = await websocket.receive_text()
+                message_data = json.loads(data)
+
+                message_type = message_data.get("type", "message")
+
+                if message_type == "message":
+                    content = message_data.get("content", "").strip()
+                    if not content:
+                        continue
+
+                    # Id and timestamp are assigned now; the row is written
+                    # by the ingestion pipeline in the next micro-batch
+                    message = await message_ingestion_service.submit(
+                        room_id, user["email"], user["name"], content
+                    )
+
+                    # Broadcast message to room
+                    broadcast_data = {
+                        "type": "message",
+                        "id": str(message.id),
+                        "sender_name": user["name"],
+                        "sender_email": user["email"],
+                        "content": content,
+                        "timestamp": message.created_at.isoformat(),
+                    }
+
+                    await manager.broadcast_to_room(room_id, broadcast_data)
+
+                elif message_type == "typing":
+                    # Broadcast typing indicator
+                    typing_data = {
+                        "type": "typing",
+                        "user": user,
+                        "is_typing": message_data.get("is_typing", False),
+                        "timestamp": datetime.utcnow().isoformat(),
+                    }
+
+                    await manager.broadcast_to_room(
+                        room_id, typing_data, exclude=websocket
                     )
-                except Exception as e:
-                    logger.error(f"Error processing WebSocket message: {e}")
+
+                elif message_type == "ping":
+                    # Respond to ping
                     await manager.send_personal_message(
                         {
-                            "type": "error",
-                            "message": "Internal server error",
+                            "type": "pong",
                             "timestamp": datetime.utcnow().isoformat(),
                         },
                         websocket,
                     )
 
-        except Exception as e:
-            logger.error(f"WebSocket connection error: {e}")
-            await websocket.close(code=1011, reason="Internal server error")
+            except WebSocketDisconnect:
+                break
+            except json.JSONDecodeError:
+                await manager.send_personal_message(
+                    {
+                        "type": "error",
+                        "message": "Invalid JSON format",
+                        "timestamp": datetime.utcnow().isoformat(),
+                    },
+                    websocket,
+                )
+            except Exception as e:
+                logger.error(f"Error processing WebSocket message: {e}")
+                await manager.send_personal_message(
+                    {
+                        "type": "error",
+                        "message": "Internal server error",
+                        "timestamp": datetime.utcnow().isoformat(),
+                    },
+                    websocket,
+                )
+
+    except Exception as e:
+        logger.error(f"WebSocket connection error: {e}")
+        await websocket.close(code=1011, reason="Internal server error")
 
-        finally:
-            manager.disconnect(websocket, room_id)
-            await session.close()
-            break
+    finally:
+        manager.disconnect(websocket, room_id)
 
 
 @router.get("/ws/rooms/{room_id}/users")
 async def get_room_online_users(room_id: str):
     """
-    Get list of users currently online in a room
+    Get list of users currently online in a room (across all workers)
     """
-    users = manager.get_room_users(room_id)
+    users = await manager.get_room_users(room_id)
     return {"room_id": room_id, "online_users": users, "count": len(users)}
+
+
+@router.get("/ws/stats")
+async def get_websocket_stats(
+    include_connections: bool = True,
+    current_user=Depends(get_current_user),
+):
+    """
+    Get websocket broadcast statistics for this worker
+
+    Per connection: outbound queue depth, delivery lag, events sent and
+    events coalesced away; per manager: slow consumers dropped. Also the
+    chat message write-behind queue and batch sizes.
+    """
+    if not PermissionMatrix.has_permission(current_user.role, "metrics", "view"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can view system metrics",
+        )
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "backplane": websocket_backplane.get_stats(),
+        "message_ingestion": message_ingestion_service.get_stats(),
+        "managers": {
+            name: mgr.engine.get_stats(include_connections) if mgr.engine is not None else None
+            for name, mgr in (("ws", manager), ("chat", chat_manager), ("v2", manager_v2))
+        },
+    }
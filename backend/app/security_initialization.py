@@ -34,7 +34,8 @@ def initialize_security_middleware(app: FastAPI, settings: Settings) -> None:
                 "X-RateLimit-Limit",
                 "X-RateLimit-Remaining",
                 "X-RateLimit-Reset",
-                "X-Process-Time"
+                "X-Process-Time",
+                "X-Next-Cursor",
             ],
             max_age=3600,
         )
@@ -46,6 +47,7 @@ def initialize_security_middleware(app: FastAPI, settings: Settings) -> None:
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=["X-Next-Cursor"],
         )
     
     logger.info(f"🔒 Security initialized for {settings.environment.value} environment")
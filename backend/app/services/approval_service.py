@@ -22,6 +22,7 @@ from app.models import (
 )
 from app.services.audit_service import AuditService
 from app.services.notification_service import NotificationService
+from app.services.room_readiness_service import room_readiness_service
 
 logger = logging.getLogger(__name__)
 
@@ -119,6 +120,7 @@ class ApprovalService:
                     )
                     self.session.add(approval)
 
+            await room_readiness_service.refresh(self.session, room_id)
             await self.session.commit()
 
         logger.info(
@@ -303,6 +305,7 @@ class ApprovalService:
         # Update approval status
         approval.status = self.STATUS_APPROVED
         approval.updated_at = datetime.utcnow()
+        await room_readiness_service.refresh(self.session, str(workflow.room_id))
         await self.session.commit()
 
         # Check if all approvals for this step are complete
@@ -421,6 +424,7 @@ class ApprovalService:
             approval.status = self.STATUS_REJECTED
             approval.updated_at = datetime.utcnow()
 
+        await room_readiness_service.refresh(self.session, str(workflow.room_id))
         await self.session.commit()
 
         # Log activity
@@ -8,10 +8,11 @@ import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
-from sqlalchemy import desc, select
+from sqlalchemy import desc, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import ActivityLog, Room
+from app.pagination import decode_cursor, keyset_page, split_page
 
 logger = logging.getLogger(__name__)
 
@@ -83,9 +84,18 @@ class AuditService:
         actor_filter: Optional[str] = None,
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
-        session: AsyncSession = None
+        session: AsyncSession = None,
+        cursor: Optional[str] = None,
+        include_total: bool = False
     ) -> Dict:
-        """Get activity timeline for a room with filtering options"""
+        """
+        Get activity timeline for a room with filtering options
+
+        Pages newest first by (ts, id): pass ``next_cursor`` back as ``cursor``
+        for the next page. ``offset`` still works but deep offsets scan every
+        skipped row. ``total_count`` is only computed (one COUNT query) when
+        ``include_total`` is set.
+        """
         try:
             # Build query conditions
             conditions = [ActivityLog.room_id == room_id]
@@ -102,23 +112,25 @@ class AuditService:
             if date_to:
                 conditions.append(ActivityLog.ts <= date_to)
 
-            # Get total count
-            count_result = await session.execute(
-                select(ActivityLog.id).where(*conditions)
-            )
-            total_count = len(count_result.scalars().all())
-
-            # Get paginated results
-            activities_result = await session.execute(
-                select(ActivityLog)
-                .where(*conditions)
-                .order_by(desc(ActivityLog.ts))
-                .offset(offset)
-                .limit(limit)
+            total_count = None
+            if include_total:
+                total_count = (
+                    await session.execute(select(func.count(ActivityLog.id)).where(*conditions))
+                ).scalar() or 0
+
+            # Get paginated results (keyset on ts, id)
+            cursor_key = decode_cursor(cursor) if cursor else None
+            query = keyset_page(
+                select(ActivityLog).where(*conditions),
+                ActivityLog.ts, ActivityLog.id, cursor_key, limit,
             )
+            if offset and cursor_key is None:
+                query = query.offset(offset)
+            activities_result = await session.execute(query)
+            page, next_cursor = split_page(activities_result.scalars().all(), limit, "ts")
 
             activities = []
-            for activity in activities_result.scalars().all():
+            for activity in page:
                 activities.append({
                     "id": activity.id,
                     "actor": activity.actor,
@@ -133,12 +145,16 @@ class AuditService:
                 "total_count": total_count,
                 "offset": offset,
                 "limit": limit,
-                "has_more": (offset + limit) < total_count
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor
             }
 
         except Exception as e:
             logger.error(f"Error getting activity timeline: {e}")
-            return {"activities": [], "total_count": 0, "offset": 0, "limit": limit, "has_more": False}
+            return {
+                "activities": [], "total_count": 0, "offset": 0, "limit": limit,
+                "has_more": False, "next_cursor": None
+            }
 
     async def get_user_activity_summary(
         self,
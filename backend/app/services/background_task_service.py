@@ -1,17 +1,25 @@
 """
 Background Task Service for STS Clearance system
 Handles asynchronous PDF generation and other long-running operations
-Day 3 Enhancement: Async PDF generation for non-blocking snapshot creation
+
+Tasks live in a durable queue (SQL table, or Redis streams when configured)
+and are executed by worker loops in every API process. Each task type has
+its own concurrency limit, retry policy and priority lane, so a backlog of
+snapshot PDFs cannot hold up notification sends.
 """
 
 import asyncio
 import json
 import logging
+import os
+import random
+import socket
 import uuid
-from datetime import datetime
-from enum import Enum
-from pathlib import Path
-from typing import Callable, Dict, Optional, Any
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from enum import Enum, IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -25,20 +33,51 @@ class TaskStatus(Enum):
     CANCELLED = "cancelled"
 
 
+FINAL_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED)
+
+
+class TaskPriority(IntEnum):
+    """Priority lanes; lower values are claimed first"""
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
 class BackgroundTask:
     """Represents a background task for async execution"""
-    
-    def __init__(self, task_id: str, task_type: str, data: Dict[str, Any]):
+
+    def __init__(
+        self,
+        task_id: str,
+        task_type: str,
+        data: Dict[str, Any],
+        priority: TaskPriority = TaskPriority.NORMAL,
+        max_attempts: int = 3,
+        dedup_key: Optional[str] = None,
+    ):
         self.task_id = task_id
         self.task_type = task_type
         self.data = data
+        self.priority = TaskPriority(priority)
+        self.dedup_key = dedup_key
         self.status = TaskStatus.PENDING
         self.created_at = datetime.utcnow()
+        self.available_at = self.created_at
         self.started_at: Optional[datetime] = None
         self.completed_at: Optional[datetime] = None
         self.result: Optional[Dict[str, Any]] = None
         self.error: Optional[str] = None
         self.progress: float = 0.0  # 0-100%
+        self.attempts = 0
+        self.max_attempts = max_attempts
+        self.worker_id: Optional[str] = None
+        # Backend-specific handle for the claimed delivery (e.g. a stream entry)
+        self.receipt: Any = None
+
+    @property
+    def is_final_attempt(self) -> bool:
+        """Whether a failure now would be final (no retry left)"""
+        return self.attempts >= self.max_attempts
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert task to dictionary"""
@@ -47,6 +86,9 @@ class BackgroundTask:
             "task_type": self.task_type,
             "status": self.status.value,
             "progress": self.progress,
+            "priority": self.priority.name.lower(),
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
             "created_at": self.created_at.isoformat(),
             "started_at": self.started_at.isoformat() if self.started_at else None,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
@@ -55,245 +97,416 @@ class BackgroundTask:
         }
 
 
+class TaskQueueBackend:
+    """
+    Storage for queued tasks. Implementations must make claim() safe across
+    processes: a task is delivered to one worker at a time, and a claimed
+    task whose visibility timeout lapses is delivered again.
+    """
+
+    name = "base"
+
+    async def enqueue(self, task: BackgroundTask, session=None) -> str:
+        """Store a task; returns the id of an active task with the same dedup key if any"""
+        raise NotImplementedError
+
+    async def claim(
+        self, task_type: str, worker_id: str, limit: int, visibility_timeout: float
+    ) -> List[BackgroundTask]:
+        """Lease up to ``limit`` runnable tasks of one type, highest priority first"""
+        raise NotImplementedError
+
+    async def heartbeat(self, task: BackgroundTask, visibility_timeout: float) -> bool:
+        """Extend the lease and save progress; False if the lease was lost"""
+        raise NotImplementedError
+
+    async def complete(self, task: BackgroundTask) -> None:
+        raise NotImplementedError
+
+    async def retry(self, task: BackgroundTask, available_at: datetime) -> None:
+        raise NotImplementedError
+
+    async def fail(self, task: BackgroundTask) -> None:
+        raise NotImplementedError
+
+    async def cancel(self, task_id: str) -> bool:
+        """Cancel a task that has not started"""
+        raise NotImplementedError
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def stats(self, task_types: List[str]) -> Dict[str, Any]:
+        """Queue depth per task type and lane"""
+        raise NotImplementedError
+
+    async def cleanup(self, older_than: datetime) -> int:
+        """Delete finished tasks completed before ``older_than``"""
+        raise NotImplementedError
+
+
+@dataclass
+class TaskTypeConfig:
+    """Execution policy for one task type"""
+    handler: Callable[[BackgroundTask], Awaitable[Optional[Dict[str, Any]]]]
+    concurrency: int = 1
+    priority: TaskPriority = TaskPriority.NORMAL
+    max_attempts: int = 3
+    retry_backoff_seconds: float = 2.0
+    timeout_seconds: Optional[float] = None
+
+
 class BackgroundTaskService:
     """
     Service for managing background tasks
     Supports async PDF generation and other long-running operations
     """
-    
-    def __init__(self):
-        self.tasks: Dict[str, BackgroundTask] = {}
-        self.handlers: Dict[str, Callable] = {}
-        self.task_file = Path("uploads/.tasks")
-        self.task_file.mkdir(parents=True, exist_ok=True)
-        self._load_persisted_tasks()
-
-    async def register_handler(self, task_type: str, handler: Callable) -> None:
-        """Register a handler for a specific task type"""
-        self.handlers[task_type] = handler
+
+    def __init__(
+        self,
+        backend: Optional[TaskQueueBackend] = None,
+        poll_interval: float = 0.5,
+        visibility_timeout: Optional[float] = None,
+        max_retry_delay_seconds: float = 300.0,
+    ):
+        self._backend = backend
+        self.handlers: Dict[str, TaskTypeConfig] = {}
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout or float(
+            os.getenv("TASK_VISIBILITY_TIMEOUT_SECONDS", 300)
+        )
+        self.max_retry_delay_seconds = max_retry_delay_seconds
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+        self._running: Dict[str, int] = {}
+        self._executions: set = set()
+        self._worker: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+        # Metrics
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self.queue_latency_ms: Deque[float] = deque(maxlen=1000)
+        self.run_duration_ms: Deque[float] = deque(maxlen=1000)
+
+    @property
+    def backend(self) -> TaskQueueBackend:
+        if self._backend is None:
+            from app.services.task_queue_backends import SQLTaskQueueBackend
+            self._backend = SQLTaskQueueBackend()
+        return self._backend
+
+    def use_backend(self, backend: TaskQueueBackend) -> None:
+        """Switch the queue backend (call before start())"""
+        self._backend = backend
+        logger.info(f"Background task queue backend: {backend.name}")
+
+    def register_handler(
+        self,
+        task_type: str,
+        handler: Callable,
+        concurrency: int = 1,
+        priority: TaskPriority = TaskPriority.NORMAL,
+        max_attempts: int = 3,
+        retry_backoff_seconds: float = 2.0,
+        timeout_seconds: Optional[float] = None,
+    ) -> None:
+        """
+        Register a handler and the execution policy for a task type
+
+        Args:
+            task_type: Type of task (e.g., "generate_pdf")
+            handler: Async callable receiving the BackgroundTask; its return
+                value is stored as the task result
+            concurrency: Tasks of this type run at once per process
+            priority: Default lane for tasks of this type
+            max_attempts: Executions before a failing task is given up
+            retry_backoff_seconds: Base delay, doubled after every failure
+            timeout_seconds: Per-execution time limit
+        """
+        self.handlers[task_type] = TaskTypeConfig(
+            handler=handler,
+            concurrency=concurrency,
+            priority=priority,
+            max_attempts=max_attempts,
+            retry_backoff_seconds=retry_backoff_seconds,
+            timeout_seconds=timeout_seconds,
+        )
         logger.info(f"Registered handler for task type: {task_type}")
 
     async def create_task(
         self,
         task_type: str,
         data: Dict[str, Any],
-        task_id: Optional[str] = None
+        task_id: Optional[str] = None,
+        priority: Optional[TaskPriority] = None,
+        dedup_key: Optional[str] = None,
+        delay_seconds: float = 0,
+        max_attempts: Optional[int] = None,
+        session=None,
     ) -> str:
         """
         Create and enqueue a background task
-        
+
         Args:
             task_type: Type of task (e.g., "generate_pdf")
-            data: Task data/parameters
+            data: Task data/parameters (JSON-serialisable)
             task_id: Optional custom task ID (auto-generated if not provided)
-            
+            priority: Lane override (defaults to the task type's lane)
+            dedup_key: While a task with this key is pending or running,
+                its id is returned instead of queueing a duplicate
+            delay_seconds: Do not run before this many seconds
+            max_attempts: Retry policy override
+            session: With the SQL backend, enqueue inside the caller's
+                transaction so the task only exists if the caller commits
+
         Returns:
-            Task ID
+            Task ID (of the existing task when deduplicated)
         """
-        if task_id is None:
-            task_id = str(uuid.uuid4())
-        
-        task = BackgroundTask(task_id, task_type, data)
-        self.tasks[task_id] = task
-        
-        # Persist task to disk
-        await self._persist_task(task)
-        
-        logger.info(f"Created background task: {task_id} (type: {task_type})")
-        
-        # Start task execution (fire and forget)
-        asyncio.create_task(self._execute_task(task))
-        
-        return task_id
+        config = self.handlers.get(task_type)
+        task = BackgroundTask(
+            task_id or str(uuid.uuid4()),
+            task_type,
+            data,
+            priority=priority if priority is not None else (
+                config.priority if config else TaskPriority.NORMAL
+            ),
+            max_attempts=max_attempts or (config.max_attempts if config else 3),
+            dedup_key=dedup_key,
+        )
+        if delay_seconds:
+            task.available_at = task.created_at + timedelta(seconds=delay_seconds)
+
+        stored_id = await self.backend.enqueue(task, session=session)
+        if stored_id != task.task_id:
+            self._count(task_type, "deduplicated")
+            logger.info(f"Task {task.task_id} deduplicated onto {stored_id} (key: {dedup_key})")
+            return stored_id
+
+        self._count(task_type, "enqueued")
+        logger.info(f"Created background task: {task.task_id} (type: {task_type})")
+        if self._wakeup is not None and session is None:
+            self._wakeup.set()
+        return stored_id
 
     async def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Get current status of a task"""
-        task = self.tasks.get(task_id)
-        if task:
-            return task.to_dict()
-        
-        # Try to load from disk if not in memory
-        return await self._load_persisted_task(task_id)
+        return await self.backend.get(task_id)
 
     async def wait_for_task(
         self,
         task_id: str,
-        timeout: int = 300
+        timeout: int = 300,
+        poll_interval: float = 0.5,
     ) -> Optional[Dict[str, Any]]:
         """
         Wait for a task to complete
-        
+
         Args:
             task_id: ID of task to wait for
             timeout: Maximum seconds to wait
-            
+
         Returns:
             Task result or None if timeout
         """
-        start_time = datetime.utcnow()
-        
+        deadline = asyncio.get_running_loop().time() + timeout
+        final = {status.value for status in FINAL_STATUSES}
+
         while True:
-            task = self.tasks.get(task_id)
+            task = await self.backend.get(task_id)
             if not task:
                 return None
-            
-            if task.status in (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED):
-                return task.to_dict()
-            
-            # Check timeout
-            elapsed = (datetime.utcnow() - start_time).total_seconds()
-            if elapsed > timeout:
+            if task["status"] in final:
+                return task
+            if asyncio.get_running_loop().time() > deadline:
                 logger.warning(f"Task {task_id} timed out after {timeout}s")
                 return None
-            
-            # Wait a bit before checking again
-            await asyncio.sleep(0.5)
+            await asyncio.sleep(poll_interval)
 
     async def cancel_task(self, task_id: str) -> bool:
         """Cancel a task if it hasn't started yet"""
-        task = self.tasks.get(task_id)
-        if not task:
-            return False
-        
-        if task.status == TaskStatus.PENDING:
-            task.status = TaskStatus.CANCELLED
-            await self._persist_task(task)
+        cancelled = await self.backend.cancel(task_id)
+        if cancelled:
             logger.info(f"Cancelled task: {task_id}")
-            return True
-        
-        return False
+        return cancelled
+
+    async def cleanup_old_tasks(self, hours: int = 24) -> int:
+        """Remove finished task records older than the given age"""
+        count = await self.backend.cleanup(datetime.utcnow() - timedelta(hours=hours))
+        logger.info(f"Cleaned up {count} old task records")
+        return count
 
-    async def _execute_task(self, task: BackgroundTask) -> None:
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        """Start the worker loop for this process"""
+        if self._worker is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._worker = asyncio.create_task(self._work())
+        logger.info(
+            f"Background task worker {self.worker_id} started "
+            f"({self.backend.name} backend, types: {', '.join(self.handlers) or 'none'})"
+        )
+
+    async def stop(self) -> None:
+        """Stop claiming tasks and cancel running executions"""
+        if self._worker is not None:
+            # wait_for can swallow the cancel when the wakeup fires in the
+            # same tick (Python < 3.12), so the loop also checks this flag
+            self._stopping.set()
+            self._wakeup.set()
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        for execution in list(self._executions):
+            execution.cancel()
+        await asyncio.gather(*self._executions, return_exceptions=True)
+        self._wakeup = None
+        self._stopping = None
+
+    async def run_pending(self) -> int:
+        """Claim runnable tasks for every type with free slots; returns tasks started"""
+        started = 0
+        for task_type, config in self.handlers.items():
+            free = config.concurrency - self._running.get(task_type, 0)
+            if free <= 0:
+                continue
+            tasks = await self.backend.claim(
+                task_type, self.worker_id, free, self.visibility_timeout
+            )
+            for task in tasks:
+                self._running[task_type] = self._running.get(task_type, 0) + 1
+                execution = asyncio.create_task(self._execute(task, config))
+                self._executions.add(execution)
+                execution.add_done_callback(self._executions.discard)
+                started += 1
+        return started
+
+    async def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                started = await self.run_pending()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Task worker poll failed: {e}")
+                started = 0
+
+            if started:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _execute(self, task: BackgroundTask, config: TaskTypeConfig) -> None:
         """Execute a background task"""
+        heartbeat = asyncio.create_task(self._heartbeat(task))
+        started = datetime.utcnow()
+        self.queue_latency_ms.append(
+            max((started - task.available_at).total_seconds() * 1000, 0.0)
+        )
         try:
-            # Update status
-            task.status = TaskStatus.RUNNING
-            task.started_at = datetime.utcnow()
-            await self._persist_task(task)
-            
-            # Get handler for this task type
-            handler = self.handlers.get(task.task_type)
-            if not handler:
-                raise ValueError(f"No handler registered for task type: {task.task_type}")
-            
-            logger.info(f"Executing task {task.task_id}: {task.task_type}")
-            
-            # Execute the task
-            result = await handler(task)
-            
+            if task.attempts > task.max_attempts:
+                raise RuntimeError("Lease expired too many times")
+
+            logger.info(f"Executing task {task.task_id}: {task.task_type} (attempt {task.attempts})")
+
+            result = await asyncio.wait_for(config.handler(task), timeout=config.timeout_seconds)
+
             # Task completed successfully
             task.status = TaskStatus.COMPLETED
-            task.result = result
+            task.result = json.loads(json.dumps(result, default=str)) if result is not None else None
             task.progress = 100.0
             task.completed_at = datetime.utcnow()
-            
+            await self.backend.complete(task)
+            self._count(task.task_type, "completed")
+
             logger.info(
                 f"Task {task.task_id} completed in "
-                f"{(task.completed_at - task.started_at).total_seconds():.2f}s"
+                f"{(task.completed_at - started).total_seconds():.2f}s"
             )
-            
+
+        except asyncio.CancelledError:
+            # Shutdown: the lease lapses and another worker picks the task up
+            raise
         except Exception as e:
-            # Task failed
-            task.status = TaskStatus.FAILED
-            task.error = str(e)
-            task.completed_at = datetime.utcnow()
-            logger.error(f"Task {task.task_id} failed: {e}", exc_info=True)
-        
+            task.error = str(e) or e.__class__.__name__
+            if task.is_final_attempt:
+                task.status = TaskStatus.FAILED
+                task.completed_at = datetime.utcnow()
+                await self.backend.fail(task)
+                self._count(task.task_type, "failed")
+                logger.error(f"Task {task.task_id} failed: {e}", exc_info=True)
+            else:
+                delay = min(
+                    config.retry_backoff_seconds * (2 ** (task.attempts - 1)),
+                    self.max_retry_delay_seconds,
+                ) * random.uniform(0.8, 1.2)
+                task.status = TaskStatus.PENDING
+                await self.backend.retry(task, datetime.utcnow() + timedelta(seconds=delay))
+                self._count(task.task_type, "retried")
+                logger.warning(
+                    f"Task {task.task_id} attempt {task.attempts}/{task.max_attempts} "
+                    f"failed, retrying in {delay:.1f}s: {e}"
+                )
+
         finally:
-            await self._persist_task(task)
+            heartbeat.cancel()
+            self._running[task.task_type] -= 1
+            self.run_duration_ms.append((datetime.utcnow() - started).total_seconds() * 1000)
+            if self._wakeup is not None:
+                self._wakeup.set()
 
-    async def _persist_task(self, task: BackgroundTask) -> None:
-        """Save task state to disk"""
-        try:
-            task_file = self.task_file / f"{task.task_id}.json"
-            task_data = task.to_dict()
-            with open(task_file, "w") as f:
-                json.dump(task_data, f, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to persist task {task.task_id}: {e}")
+    async def _heartbeat(self, task: BackgroundTask) -> None:
+        """Keep the lease alive and publish progress while a task runs"""
+        interval = max(self.visibility_timeout / 3, 0.05)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.backend.heartbeat(task, self.visibility_timeout):
+                    logger.warning(f"Lost lease on task {task.task_id}")
+                    return
+            except Exception as e:
+                logger.warning(f"Heartbeat for task {task.task_id} failed: {e}")
 
-    async def _load_persisted_task(self, task_id: str) -> Optional[Dict[str, Any]]:
-        """Load task state from disk"""
-        try:
-            task_file = self.task_file / f"{task_id}.json"
-            if task_file.exists():
-                with open(task_file, "r") as f:
-                    return json.load(f)
-        except Exception as e:
-            logger.error(f"Failed to load task {task_id}: {e}")
-        
-        return None
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
 
-    def _load_persisted_tasks(self) -> None:
-        """Load all persisted tasks from disk on startup"""
-        try:
-            if self.task_file.exists():
-                for task_file in self.task_file.glob("*.json"):
-                    try:
-                        with open(task_file, "r") as f:
-                            task_data = json.load(f)
-                            task_id = task_data.get("task_id")
-                            
-                            # Only load recent tasks (not older than 24 hours)
-                            if task_id and self._is_recent(task_data.get("created_at")):
-                                task = BackgroundTask(
-                                    task_id,
-                                    task_data.get("task_type"),
-                                    {}
-                                )
-                                task.status = TaskStatus(task_data.get("status"))
-                                task.created_at = datetime.fromisoformat(
-                                    task_data.get("created_at")
-                                )
-                                if task_data.get("started_at"):
-                                    task.started_at = datetime.fromisoformat(
-                                        task_data.get("started_at")
-                                    )
-                                if task_data.get("completed_at"):
-                                    task.completed_at = datetime.fromisoformat(
-                                        task_data.get("completed_at")
-                                    )
-                                task.result = task_data.get("result")
-                                task.error = task_data.get("error")
-                                task.progress = task_data.get("progress", 0)
-                                
-                                self.tasks[task_id] = task
-                    except Exception as e:
-                        logger.warning(f"Failed to load task from {task_file}: {e}")
-        except Exception as e:
-            logger.error(f"Failed to load persisted tasks: {e}")
+    def _count(self, task_type: str, event: str) -> None:
+        counters = self.counters.setdefault(task_type, {})
+        counters[event] = counters.get(event, 0) + 1
 
     @staticmethod
-    def _is_recent(timestamp_str: str, hours: int = 24) -> bool:
-        """Check if timestamp is recent (within specified hours)"""
-        try:
-            timestamp = datetime.fromisoformat(timestamp_str)
-            delta = (datetime.utcnow() - timestamp).total_seconds()
-            return delta < (hours * 3600)
-        except Exception:
-            return False
+    def _summarise(samples: Deque[float]) -> Dict[str, float]:
+        if not samples:
+            return {"avg": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(samples)
+        return {
+            "avg": round(sum(ordered) / len(ordered), 2),
+            "p95": round(ordered[max(int(len(ordered) * 0.95) - 1, 0)], 2),
+            "max": round(ordered[-1], 2),
+        }
 
-    async def cleanup_old_tasks(self, hours: int = 24) -> int:
-        """Remove old task records to save disk space"""
-        count = 0
-        try:
-            if self.task_file.exists():
-                for task_file in self.task_file.glob("*.json"):
-                    try:
-                        with open(task_file, "r") as f:
-                            task_data = json.load(f)
-                            if not self._is_recent(task_data.get("created_at"), hours):
-                                task_file.unlink()
-                                count += 1
-                    except Exception as e:
-                        logger.warning(f"Failed to cleanup task file {task_file}: {e}")
-            
-            logger.info(f"Cleaned up {count} old task records")
-        except Exception as e:
-            logger.error(f"Failed to cleanup old tasks: {e}")
-        
-        return count
+    async def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, throughput counters and latency for this process"""
+        return {
+            "backend": self.backend.name,
+            "worker_id": self.worker_id,
+            "queue": await self.backend.stats(list(self.handlers)),
+            "running": dict(self._running),
+            "concurrency": {t: c.concurrency for t, c in self.handlers.items()},
+            "counters": self.counters,
+            "queue_latency_ms": self._summarise(self.queue_latency_ms),
+            "run_duration_ms": self._summarise(self.run_duration_ms),
+        }
 
 
 # Global service instance
-background_task_service = BackgroundTaskService()
\ No newline at end of file
+background_task_service = BackgroundTaskService()
@@ -0,0 +1,258 @@
+"""
+Blob store for STS Clearance system
+Content-addressed, deduplicating document storage with reference counting
+"""
+
+import logging
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from fastapi import UploadFile
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import settings
+from app.models import DocumentBlob, DocumentVersion
+from app.services.file_service import TEMP_DIR_NAME, stream_upload
+from app.services.storage_service import StorageService, storage_service
+
+logger = logging.getLogger(__name__)
+
+# Top-level folder of the content-addressed layout
+BLOB_PREFIX = "blobs"
+
+# Prefix used by the documents router for locally served files
+FILES_URL_PREFIX = "/api/v1/files/"
+
+# Unreferenced blobs younger than this are left alone by the GC sweep
+DEFAULT_GC_GRACE_PERIOD = timedelta(hours=1)
+
+
+@dataclass
+class StoredBlob:
+    """Result of ingesting an upload into the blob store"""
+    sha256: str
+    size_bytes: int
+    file_url: str
+    deduplicated: bool
+
+
+def blob_key(sha256: str) -> str:
+    """Storage key for a content hash: ``blobs/ab/cd/<sha256>``"""
+    return f"{BLOB_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+class BlobStore:
+    """
+    Service for content-addressed document storage.
+
+    The ``document_blobs`` table is the dedup index for whichever
+    StorageService backend is configured. Callers add the DocumentVersion
+    and commit; the refcount change lands in the same transaction.
+    """
+
+    def __init__(self, backend: StorageService, max_file_size: Optional[int] = None):
+        self.backend = backend
+        self.max_file_size = max_file_size or settings.max_upload_size_mb * 1024 * 1024
+
+    @property
+    def staging_dir(self) -> Path:
+        return self.backend.base_path / TEMP_DIR_NAME
+
+    async def ingest(self, session: AsyncSession, file: UploadFile) -> StoredBlob:
+        """
+        Stream an upload into the store and take one reference on its blob.
+
+        Content that is already stored is not written again: the staging file
+        is dropped and only the refcount moves.
+        """
+        staged = await stream_upload(
+            file,
+            self.staging_dir / f"{uuid.uuid4()}.blob",
+            self.staging_dir,
+            max_size=self.max_file_size,
+        )
+        key = blob_key(staged.sha256)
+
+        try:
+            blob = await self._add_reference(session, staged.sha256)
+            if blob is not None and await self.backend.blob_exists(key):
+                staged.path.unlink(missing_ok=True)
+                logger.info(f"Deduplicated upload {staged.sha256} (refs: {blob.ref_count})")
+                return StoredBlob(staged.sha256, staged.size_bytes, blob.file_url, True)
+
+            file_url = await self.backend.put_blob(
+                staged.path, key, file.content_type or "application/octet-stream"
+            )
+        finally:
+            staged.path.unlink(missing_ok=True)
+
+        if blob is not None:
+            # Index row survived but the content was lost; it is restored now
+            blob.file_url = file_url
+            return StoredBlob(staged.sha256, staged.size_bytes, file_url, False)
+
+        try:
+            async with session.begin_nested():
+                session.add(DocumentBlob(
+                    sha256=staged.sha256,
+                    size_bytes=staged.size_bytes,
+                    file_url=file_url,
+                    ref_count=1,
+                    last_referenced_at=datetime.utcnow(),
+                ))
+        except IntegrityError:
+            # A concurrent upload indexed the same content first
+            await self._add_reference(session, staged.sha256)
+
+        return StoredBlob(staged.sha256, staged.size_bytes, file_url, False)
+
+    async def release(self, session: AsyncSession, version: DocumentVersion) -> None:
+        """Drop the reference held by a document version being deleted (no commit)"""
+        await self.release_many(session, [version])
+
+    async def release_many(
+        self, session: AsyncSession, versions: Iterable[DocumentVersion]
+    ) -> None:
+        """Drop the references held by several document versions (no commit)"""
+        counts = Counter(v.sha256 for v in versions if self.is_blob_url(v.file_url))
+        await self._decrement(session, counts)
+
+    async def release_for_documents(
+        self, session: AsyncSession, document_ids_query
+    ) -> None:
+        """Drop references for every version of the selected documents (no commit)"""
+        result = await session.execute(
+            select(DocumentVersion.sha256, DocumentVersion.file_url).where(
+                DocumentVersion.document_id.in_(document_ids_query)
+            )
+        )
+        counts = Counter(
+            sha256 for sha256, file_url in result.all() if self.is_blob_url(file_url)
+        )
+        await self._decrement(session, counts)
+
+    async def collect_garbage(
+        self,
+        session: AsyncSession,
+        grace_period: timedelta = DEFAULT_GC_GRACE_PERIOD,
+    ) -> Dict[str, int]:
+        """
+        Delete unreferenced blobs and abandoned staging files.
+
+        Blobs are removed once their refcount is zero and they have not been
+        referenced for ``grace_period``. Local blob files without an index row
+        (left behind by rolled-back uploads) are removed after the same period.
+        Commits its own changes.
+        """
+        cutoff = datetime.utcnow() - grace_period
+        stats = {"blobs_deleted": 0, "orphan_files_deleted": 0, "staging_files_deleted": 0}
+
+        result = await session.execute(
+            select(DocumentBlob.sha256).where(
+                DocumentBlob.ref_count <= 0,
+                DocumentBlob.last_referenced_at < cutoff,
+            )
+        )
+        for sha256 in result.scalars().all():
+            # Conditional delete: skip blobs re-referenced since the select.
+            # The row stays locked until the file is gone, so an upload of the
+            # same content waits and then indexes and writes it afresh.
+            deleted = await session.execute(
+                delete(DocumentBlob).where(
+                    DocumentBlob.sha256 == sha256, DocumentBlob.ref_count <= 0
+                )
+            )
+            if not deleted.rowcount:
+                await session.commit()
+                continue
+            try:
+                await self.backend.delete_blob(blob_key(sha256))
+            except Exception as e:
+                # Keep the index row so the next sweep retries
+                await session.rollback()
+                logger.error(f"Failed to delete blob {sha256}: {e}")
+                continue
+            await session.commit()
+            stats["blobs_deleted"] += 1
+
+        indexed = set(
+            (await session.execute(select(DocumentBlob.sha256))).scalars().all()
+        )
+        cutoff_ts = time.time() - grace_period.total_seconds()
+        for key in self.backend.list_blob_keys():
+            if Path(key).name in indexed:
+                continue
+            if self._older_than(self.backend.base_path / key, cutoff_ts):
+                await self.backend.delete_blob(key)
+                stats["orphan_files_deleted"] += 1
+
+        if self.staging_dir.exists():
+            for path in self.staging_dir.iterdir():
+                if path.is_file() and self._older_than(path, cutoff_ts):
+                    path.unlink(missing_ok=True)
+                    stats["staging_files_deleted"] += 1
+
+        logger.info(f"Blob GC finished: {stats}")
+        return stats
+
+    @staticmethod
+    def _older_than(path: Path, cutoff_ts: float) -> bool:
+        try:
+            return path.stat().st_mtime < cutoff_ts
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def is_blob_url(file_url: str) -> bool:
+        """Whether a DocumentVersion.file_url points into the blob layout"""
+        if not file_url:
+            return False
+        path = file_url
+        if path.startswith(FILES_URL_PREFIX):
+            path = path[len(FILES_URL_PREFIX):]
+        elif path.startswith("s3://"):
+            path = path.split("/", 3)[-1]
+        return path.startswith(f"{BLOB_PREFIX}/")
+
+    def resolve_path(self, file_url: str) -> Optional[Path]:
+        """Local path of a blob file_url, or None for other URLs"""
+        if not self.is_blob_url(file_url) or file_url.startswith("s3://"):
+            return None
+        return self.backend.base_path / file_url.replace(FILES_URL_PREFIX, "", 1)
+
+    async def _add_reference(self, session: AsyncSession, sha256: str) -> Optional[DocumentBlob]:
+        result = await session.execute(
+            update(DocumentBlob)
+            .where(DocumentBlob.sha256 == sha256)
+            .values(
+                ref_count=DocumentBlob.ref_count + 1,
+                last_referenced_at=datetime.utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            return None
+        return await session.get(DocumentBlob, sha256, populate_existing=True)
+
+    async def _decrement(self, session: AsyncSession, counts: Dict[str, int]) -> None:
+        for sha256, count in counts.items():
+            await session.execute(
+                update(DocumentBlob)
+                .where(DocumentBlob.sha256 == sha256)
+                .values(
+                    ref_count=DocumentBlob.ref_count - count,
+                    last_referenced_at=datetime.utcnow(),
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+
+# Global blob store instance
+blob_store = BlobStore(storage_service)
@@ -28,6 +28,7 @@ from app.services.metrics_service import MetricsService
 from app.services.demurrage_service import DemurrageService
 from app.services.commission_service import CommissionService
 from app.services.compliance_service import ComplianceService
+from app.services.room_metrics_engine import RoomAggregate, RoomMetricsEngine
 
 logger = logging.getLogger(__name__)
 
@@ -69,6 +70,9 @@ class DashboardProjectionService:
         self.commission_service = CommissionService(session)
         self.compliance_service = ComplianceService(session)
         self.now = datetime.utcnow()
+        self.room_metrics_engine = RoomMetricsEngine(session, now=self.now)
+        self._room_metrics: Dict[str, RoomAggregate] = {}
+        self._room_metrics_with_timestamps = False
 
     # ============ ADMIN DASHBOARD ============
 
@@ -561,6 +565,30 @@ class DashboardProjectionService:
         result = await self.session.execute(stmt)
         return result.scalars().all()
 
+    # -- Batch Aggregates --
+
+    async def _get_room_metrics(
+        self, rooms: List[Room], include_approval_timestamps: bool = False
+    ) -> Dict[str, RoomAggregate]:
+        """
+        Get the in-memory aggregate table for the given rooms.
+
+        Loaded once per projection with a fixed number of grouped queries;
+        later calls for the same rooms are served from memory.
+        """
+        room_ids = [r.id for r in rooms]
+        missing = [rid for rid in room_ids if rid not in self._room_metrics]
+        needs_timestamps = include_approval_timestamps and not self._room_metrics_with_timestamps
+        if missing or needs_timestamps:
+            to_load = room_ids if needs_timestamps else missing
+            loaded = await self.room_metrics_engine.load(
+                to_load, include_approval_timestamps=include_approval_timestamps
+            )
+            self._room_metrics.update(loaded)
+            if include_approval_timestamps:
+                self._room_metrics_with_timestamps = True
+        return {rid: self._room_metrics[rid] for rid in room_ids}
+
     # -- Metric Calculations --
 
     async def _calculate_demurrage_exposure(self, rooms: List[Room]) -> Dict[str, Any]:
@@ -579,23 +607,13 @@ class DashboardProjectionService:
             }
 
         try:
-            # Get all documents with timestamps
-            stmt = (
-                select(Room, func.count(Document.id).label("pending_count"))
-                .outerjoin(Document, and_(
-                    Room.id == Document.room_id,
-                    Document.status.in_(["missing", "under_review"])
-                ))
-                .where(Room.id.in_(room_ids))
-                .group_by(Room.id)
-            )
-            result = await self.session.execute(stmt)
-            rooms_with_counts = result.all()
+            metrics = await self._get_room_metrics(rooms)
 
             by_room = []
             total_exposure = 0
 
-            for room, pending_count in rooms_with_counts:
+            for room in rooms:
+                pending_count = metrics[room.id].document_count("missing", "under_review")
                 # Simplified demurrage calculation
                 # In production: would use actual vessel data, charter rate, etc.
                 daily_rate = 15000  # Placeholder: $15k/day average
@@ -661,6 +679,7 @@ class DashboardProjectionService:
             return {"total_accrued": 0, "by_room": []}
 
         try:
+            metrics = await self._get_room_metrics(rooms)
             commission_rate = 0.015  # 1.5% standard rate
             total_accrued = 0
             by_room = []
@@ -672,14 +691,7 @@ class DashboardProjectionService:
                 commission = deal_value * commission_rate
                 
                 # Only accrue if room is progressing (documents submitted)
-                doc_count_stmt = select(func.count(Document.id)).where(
-                    and_(
-                        Document.room_id == room.id,
-                        Document.status.in_(["under_review", "approved"])
-                    )
-                )
-                doc_result = await self.session.execute(doc_count_stmt)
-                doc_count = doc_result.scalar() or 0
+                doc_count = metrics[room.id].document_count("under_review", "approved")
                 
                 if doc_count > 0:
                     total_accrued += commission
@@ -713,43 +725,22 @@ class DashboardProjectionService:
             return {"average_health": 0, "by_room": []}
 
         try:
+            metrics = await self._get_room_metrics(rooms)
             by_room = []
             total_health = 0
 
             for room in rooms:
-                # Document completion
-                total_docs_stmt = select(func.count(Document.id)).where(
-                    Document.room_id == room.id
-                )
-                total_result = await self.session.execute(total_docs_stmt)
-                total_docs = total_result.scalar() or 1
+                room_metrics = metrics[room.id]
 
-                approved_docs_stmt = select(func.count(Document.id)).where(
-                    and_(
-                        Document.room_id == room.id,
-                        Document.status == "approved"
-                    )
-                )
-                approved_result = await self.session.execute(approved_docs_stmt)
-                approved_docs = approved_result.scalar() or 0
+                # Document completion
+                total_docs = room_metrics.total_documents or 1
+                approved_docs = room_metrics.document_count("approved")
 
                 doc_health = (approved_docs / total_docs * 100) * 0.5  # 50% weight
 
                 # Approval progress
-                total_approvals_stmt = select(func.count(Approval.id)).where(
-                    Approval.room_id == room.id
-                )
-                total_app_result = await self.session.execute(total_approvals_stmt)
-                total_approvals = total_app_result.scalar() or 1
-
-                completed_approvals_stmt = select(func.count(Approval.id)).where(
-                    and_(
-                        Approval.room_id == room.id,
-                        Approval.status == "approved"
-                    )
-                )
-                completed_app_result = await self.session.execute(completed_approvals_stmt)
-                completed_approvals = completed_app_result.scalar() or 0
+                total_approvals = room_metrics.total_approvals or 1
+                completed_approvals = room_metrics.approval_count("approved")
 
                 approval_health = (completed_approvals / total_approvals * 100) * 0.3  # 30% weight
 
@@ -1034,23 +1025,13 @@ class DashboardProjectionService:
     async def _identify_stuck_deals(self, rooms: List[Room]) -> List[Dict[str, Any]]:
         """Identify deals stuck > 48 hours"""
         try:
+            metrics = await self._get_room_metrics(rooms)
             stuck = []
             two_days_ago = datetime.utcnow() - timedelta(hours=48)
             
             for room in rooms:
-                # Check if has pending approvals older than 48h
-                stmt = (
-                    select(func.count(Approval.id))
-                    .where(
-                        and_(
-                            Approval.room_id == room.id,
-                            Approval.status.in_(["pending", "under_review"]),
-                            Approval.created_at <= two_days_ago
-                        )
-                    )
-                )
-                result = await self.session.execute(stmt)
-                count = result.scalar() or 0
+                # Pending approvals untouched for more than 48h
+                count = metrics[room.id].stuck_approvals
                 
                 if count > 0:
                     stuck.append({
@@ -1068,24 +1049,15 @@ class DashboardProjectionService:
     async def _calculate_party_performance(self, rooms: List[Room]) -> List[Dict[str, Any]]:
         """Calculate performance metrics for each party"""
         try:
+            metrics = await self._get_room_metrics(rooms)
             performance = []
             
             for room in rooms:
-                stmt = select(Party).where(Party.room_id == room.id)
-                result = await self.session.execute(stmt)
-                parties = result.scalars().all()
-                
-                for party in parties:
-                    # Count responses (approvals)
-                    responses_stmt = select(func.count(Approval.id)).where(
-                        and_(
-                            Approval.room_id == room.id,
-                            Approval.status == "approved"
-                        )
-                    )
-                    responses_result = await self.session.execute(responses_stmt)
-                    responses = responses_result.scalar() or 0
-                    
+                room_metrics = metrics[room.id]
+                # Count responses (approvals)
+                responses = room_metrics.approval_count("approved")
+
+                for party in room_metrics.parties:
                     performance.append({
                         "party_name": party.name,
                         "party_role": party.role,
@@ -1140,6 +1112,7 @@ class DashboardProjectionService:
             }
 
         try:
+            metrics = await self._get_room_metrics(rooms)
             total_volume = 0
             total_spent = 0
             by_order = []
@@ -1151,18 +1124,7 @@ class DashboardProjectionService:
                 total_value = room.cargo_value_usd or 0
                 
                 # Get seller (other party in room with seller role)
-                sellers_stmt = (
-                    select(Party)
-                    .where(
-                        and_(
-                            Party.room_id == room.id,
-                            Party.role == "seller"
-                        )
-                    )
-                )
-                sellers_result = await self.session.execute(sellers_stmt)
-                sellers = sellers_result.scalars().all()
-                seller_name = sellers[0].name if sellers else "Unknown Seller"
+                seller_name = metrics[room.id].first_party_name("seller") or "Unknown Seller"
 
                 # Determine order status
                 status = "pending"
@@ -1242,26 +1204,14 @@ class DashboardProjectionService:
             return []
 
         try:
+            room_metrics = await self._get_room_metrics(rooms)
             supplier_metrics = {}
 
             for room in rooms:
                 # Get seller info
-                sellers_stmt = (
-                    select(Party)
-                    .where(
-                        and_(
-                            Party.room_id == room.id,
-                            Party.role == "seller"
-                        )
-                    )
-                )
-                sellers_result = await self.session.execute(sellers_stmt)
-                sellers = sellers_result.scalars().all()
-                
-                if not sellers:
+                seller_name = room_metrics[room.id].first_party_name("seller")
+                if not seller_name:
                     continue
-
-                seller_name = sellers[0].name
                 
                 if seller_name not in supplier_metrics:
                     supplier_metrics[seller_name] = {
@@ -1282,19 +1232,8 @@ class DashboardProjectionService:
                         metrics["on_time_count"] += 1
 
                 # Quality rating (based on document approval status)
-                approved_docs = await self.session.execute(
-                    select(func.count(Document.id)).where(
-                        and_(
-                            Document.room_id == room.id,
-                            Document.status == "approved"
-                        )
-                    )
-                )
-                total_docs = await self.session.execute(
-                    select(func.count(Document.id)).where(Document.room_id == room.id)
-                )
-                approved_count = approved_docs.scalar() or 0
-                total_count = total_docs.scalar() or 1
+                approved_count = room_metrics[room.id].document_count("approved")
+                total_count = room_metrics[room.id].total_documents or 1
 
                 quality_rating = (approved_count / total_count * 100) if total_count > 0 else 80
                 metrics["quality_score_sum"] += quality_rating
@@ -1381,6 +1320,7 @@ class DashboardProjectionService:
             }
 
         try:
+            metrics = await self._get_room_metrics(rooms)
             total_volume = 0
             total_revenue = 0
             by_room = []
@@ -1391,18 +1331,7 @@ class DashboardProjectionService:
                 unit_price = (revenue / quantity) if (quantity > 0 and revenue) else 0
 
                 # Get buyer info
-                buyers_stmt = (
-                    select(Party)
-                    .where(
-                        and_(
-                            Party.room_id == room.id,
-                            Party.role == "buyer"
-                        )
-                    )
-                )
-                buyers_result = await self.session.execute(buyers_stmt)
-                buyers = buyers_result.scalars().all()
-                buyer_name = buyers[0].name if buyers else "Unknown Buyer"
+                buyer_name = metrics[room.id].first_party_name("buyer") or "Unknown Buyer"
 
                 # Determine sales status
                 status = "pending"
@@ -1505,6 +1434,7 @@ class DashboardProjectionService:
 
             # Build room lookup and buyer lookup
             room_map = {r.id: r for r in rooms}
+            metrics = await self._get_room_metrics(rooms)
             
             for approval in approvals:
                 room = room_map.get(approval.room_id)
@@ -1512,18 +1442,7 @@ class DashboardProjectionService:
                     continue
 
                 # Get buyer party info
-                buyer_stmt = (
-                    select(Party)
-                    .where(
-                        and_(
-                            Party.room_id == room.id,
-                            Party.role == "buyer"
-                        )
-                    )
-                )
-                buyer_result = await self.session.execute(buyer_stmt)
-                buyer_parties = buyer_result.scalars().all()
-                buyer_name = buyer_parties[0].name if buyer_parties else "Unknown Buyer"
+                buyer_name = metrics[room.id].first_party_name("buyer") or "Unknown Buyer"
 
                 # Calculate negotiation duration
                 created_diff = (self.now - room.created_at).days if room.created_at else 0
@@ -1557,26 +1476,14 @@ class DashboardProjectionService:
             return []
 
         try:
+            room_metrics = await self._get_room_metrics(rooms, include_approval_timestamps=True)
             buyer_metrics = {}
 
             for room in rooms:
                 # Get buyer info
-                buyers_stmt = (
-                    select(Party)
-                    .where(
-                        and_(
-                            Party.room_id == room.id,
-                            Party.role == "buyer"
-                        )
-                    )
-                )
-                buyers_result = await self.session.execute(buyers_stmt)
-                buyers = buyers_result.scalars().all()
-                
-                if not buyers:
+                buyer_name = room_metrics[room.id].first_party_name("buyer")
+                if not buyer_name:
                     continue
-
-                buyer_name = buyers[0].name
                 
                 if buyer_name not in buyer_metrics:
                     buyer_metrics[buyer_name] = {
@@ -1589,29 +1496,15 @@ class DashboardProjectionService:
                 metrics = buyer_metrics[buyer_name]
                 metrics["total_deals"] += 1
 
-                # Get approvals for this room where buyer is involved
-                approvals_stmt = (
-                    select(Approval)
-                    .where(Approval.room_id == room.id)
-                )
-                approvals_result = await self.session.execute(approvals_stmt)
-                approvals = approvals_result.scalars().all()
-
-                for approval in approvals:
-                    # Get the party info for this approval
-                    party_stmt = select(Party).where(Party.id == approval.party_id)
-                    party_result = await self.session.execute(party_stmt)
-                    party = party_result.scalar()
-                    
-                    # Only count approvals from buyer party
-                    if party and party.role == "buyer":
-                        if approval.status == "approved":
-                            metrics["approved_deals"] += 1
-                        
-                        # Calculate response time (time from room creation to approval)
-                        if approval.updated_at and room.created_at:
-                            response_time = (approval.updated_at - room.created_at).total_seconds() / 3600
-                            metrics["response_times"].append(response_time)
+                # Only count approvals from buyer party
+                aggregate = room_metrics[room.id]
+                metrics["approved_deals"] += aggregate.party_approval_count("buyer", "approved")
+
+                # Calculate response time (time from room creation to approval)
+                if room.created_at:
+                    for updated_at in aggregate.approval_timestamps_by_role.get("buyer", []):
+                        response_time = (updated_at - room.created_at).total_seconds() / 3600
+                        metrics["response_times"].append(response_time)
 
             # Calculate final metrics
             result = []
@@ -0,0 +1,238 @@
+"""
+Expiry alert service for STS Clearance system
+Set-based document expiry alerts on the notification inbox
+
+One query finds every document expiring within the largest threshold,
+together with the parties of its room, and picks the document's highest
+alert level (the smallest threshold it falls within) in SQL. Alerts are
+bulk-inserted into the inbox with a ``document_expiry:{document}:{level}``
+dedup key, so a user gets each level of a document once however often the
+alerts run. New alerts are pushed over websocket after the commit, one
+event per user and room.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import case, event, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import Document, DocumentType, Party, Room, Vessel
+from app.services.notification_inbox_service import (notification_inbox_service,
+                                                     notification_row)
+
+logger = logging.getLogger(__name__)
+
+# Level -> days before expiry; a document gets the level of the smallest
+# threshold it falls within
+DEFAULT_THRESHOLDS = {"critical": 1, "urgent": 3, "warning": 7}
+
+# Alerts waiting for their transaction to commit before being pushed
+PENDING_ALERTS_KEY = "expiry_alerts_pending"
+
+
+def alert_priority(days: int) -> str:
+    return "high" if days <= 7 else "medium"
+
+
+class ExpiryAlertService:
+    """Computes, stores and pushes document expiry alerts in bulk"""
+
+    def __init__(self, inbox=None):
+        self.inbox = inbox or notification_inbox_service
+        self._background: Set[asyncio.Task] = set()
+
+        # Metrics
+        self.runs = 0
+        self.alerts_sent = 0
+        self.pushes = 0
+        self.last_run_ms = 0.0
+
+    async def send(
+        self,
+        session: AsyncSession,
+        thresholds: Optional[Dict[str, int]] = None,
+        room_id: Optional[str] = None,
+        vessel_id: Optional[str] = None,
+        resend: bool = False,
+        now: Optional[datetime] = None,
+    ) -> Dict[str, int]:
+        """
+        Alert the parties of every document expiring within the thresholds;
+        the caller commits (new alerts are pushed once it does)
+
+        With ``resend`` alerts users already have are raised again as unread
+        and pushed again. Returns ``{level}_sent`` counts of new alerts,
+        ``total_sent`` and the number of ``documents`` found.
+        """
+        start = asyncio.get_running_loop().time()
+        thresholds = thresholds or DEFAULT_THRESHOLDS
+        now = now or datetime.utcnow()
+        levels = sorted(thresholds.items(), key=lambda item: item[1])
+        level = case(
+            *[
+                (Document.expires_on <= now + timedelta(days=days), literal(name))
+                for name, days in levels
+            ]
+        ).label("level")
+
+        query = (
+            select(
+                Document.id, Document.room_id, Document.vessel_id, Document.expires_on, level,
+                DocumentType.name.label("type_name"), Room.title, Party.email,
+                Vessel.name.label("vessel_name"), Vessel.imo,
+            )
+            .join(Room, Room.id == Document.room_id)
+            .join(Party, Party.room_id == Document.room_id)
+            .outerjoin(DocumentType, DocumentType.id == Document.type_id)
+            .outerjoin(Vessel, Vessel.id == Document.vessel_id)
+            .where(
+                Document.status == "approved",
+                Document.expires_on > now,
+                Document.expires_on <= now + timedelta(days=levels[-1][1]),
+                Room.status.in_(["active", "pending"]),
+            )
+        )
+        if room_id:
+            query = query.where(Document.room_id == room_id)
+        if vessel_id:
+            query = query.where(Document.vessel_id == vessel_id)
+
+        rows: List[Dict[str, Any]] = []
+        levels_by_id: Dict[str, str] = {}
+        documents = set()
+        seen = set()
+        for row in await session.execute(query):
+            documents.add(row.id)
+            dedup_key = f"document_expiry:{row.id}:{row.level}"
+            # A user may hold several parties of a room
+            if (row.email, dedup_key) in seen:
+                continue
+            seen.add((row.email, dedup_key))
+
+            days = (row.expires_on - now).days
+            subject = f"{row.type_name or 'Document'} for {row.vessel_name}" if row.vessel_name \
+                else (row.type_name or "Document")
+            notification = notification_row(
+                row.email, "document_expiry", "Document Expiring Soon",
+                f"{subject} expires in {days} days",
+                dedup_key=dedup_key,
+                room_id=row.room_id,
+                priority=alert_priority(days),
+                action_url=f"/rooms/{row.room_id}/documents",
+                data={
+                    "room_title": row.title,
+                    "vessel_id": row.vessel_id,
+                    "vessel_name": row.vessel_name,
+                    "vessel_imo": row.imo,
+                    "document_id": row.id,
+                    "document_type": row.type_name or "Unknown",
+                    "expires_on": row.expires_on,
+                    "level": row.level,
+                },
+                expires_at=row.expires_on,
+                created_at=now,
+            )
+            rows.append(notification)
+            levels_by_id[notification["id"]] = row.level
+
+        stored = {
+            (user_email, dedup_key): notification_id
+            for notification_id, user_email, dedup_key in await self.inbox.deliver(
+                session, rows, refresh=resend, returning=True
+            )
+        }
+        delivered = []
+        for row in rows:
+            notification_id = stored.get((row["user_email"], row["dedup_key"]))
+            if notification_id is not None:
+                delivered.append(dict(row, id=str(notification_id), level=levels_by_id[row["id"]]))
+
+        counts = {f"{name}_sent": 0 for name, _ in levels}
+        for row in delivered:
+            counts[f"{row['level']}_sent"] += 1
+        counts["total_sent"] = len(delivered)
+        counts["documents"] = len(documents)
+
+        if delivered:
+            session.sync_session.info.setdefault(PENDING_ALERTS_KEY, []).extend(delivered)
+        self.runs += 1
+        self.alerts_sent += len(delivered)
+        self.last_run_ms = (asyncio.get_running_loop().time() - start) * 1000
+        return counts
+
+    async def push(self, alerts: List[Dict[str, Any]]) -> int:
+        """Push stored alerts, one websocket event per user and room"""
+        from app.websocket_manager import manager
+
+        batches: Dict[tuple, List[Dict[str, Any]]] = {}
+        for alert in alerts:
+            batches.setdefault((str(alert["room_id"]), alert["user_email"]), []).append(alert)
+
+        for (room_id, user_email), batch in batches.items():
+            try:
+                await manager.send_notification_to_room(
+                    room_id,
+                    "document_expiry",
+                    "Documents Expiring Soon",
+                    batch[0]["message"] if len(batch) == 1
+                    else f"{len(batch)} documents are expiring soon",
+                    {
+                        "user_email": user_email,
+                        "notifications": [
+                            {
+                                "notification_id": alert["id"],
+                                "message": alert["message"],
+                                "priority": alert["priority"],
+                                "expires_at": alert["expires_at"].isoformat(),
+                            }
+                            for alert in batch
+                        ],
+                    },
+                )
+                self.pushes += 1
+            except Exception as e:
+                logger.error(f"Error pushing expiry alerts to {user_email}: {e}")
+        return len(batches)
+
+    def _schedule_push(self, alerts: List[Dict[str, Any]]) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.push(alerts))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def drain(self) -> None:
+        """Wait for scheduled pushes to finish"""
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "alerts_sent": self.alerts_sent,
+            "pushes": self.pushes,
+            "pushes_in_flight": len(self._background),
+            "last_run_ms": round(self.last_run_ms, 2),
+        }
+
+
+# Global expiry alert service instance
+expiry_alert_service = ExpiryAlertService()
+
+
+@event.listens_for(Session, "after_commit")
+def _push_after_commit(session: Session) -> None:
+    alerts = session.info.pop(PENDING_ALERTS_KEY, None)
+    if alerts:
+        expiry_alert_service._schedule_push(alerts)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(PENDING_ALERTS_KEY, None)
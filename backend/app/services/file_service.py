@@ -3,54 +3,135 @@ File service for STS Clearance system
 Handles file uploads, storage, and management
 """
 
+import hashlib
 import logging
 import os
-import shutil
 import uuid
+from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Optional
 
-from fastapi import UploadFile
+import aiofiles
+from fastapi import HTTPException, UploadFile
+
+from app.config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Bytes read from the upload per iteration; bounds memory per upload
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Staging directory for partial uploads, kept under the upload root so the
+# final rename never crosses filesystems
+TEMP_DIR_NAME = ".tmp"
+
+
+@dataclass
+class StoredFile:
+    """Result of streaming an upload to disk"""
+    path: Path
+    sha256: str
+    size_bytes: int
+
+
+async def stream_upload(
+    file: UploadFile,
+    destination: Path,
+    temp_dir: Path,
+    max_size: Optional[int] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> StoredFile:
+    """
+    Stream an upload to ``destination`` in fixed-size chunks
+
+    The SHA-256 and byte count are updated as chunks arrive and ``max_size``
+    is enforced before anything past the limit is written. Data goes to a
+    staging file in ``temp_dir`` (same filesystem) that is atomically renamed
+    into place, so readers never see a partial file.
+
+    Raises:
+        HTTPException: 413 if the upload exceeds ``max_size``
+    """
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    temp_path = temp_dir / f"{uuid.uuid4()}.part"
+
+    hasher = hashlib.sha256()
+    size_bytes = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size_bytes += len(chunk)
+                if max_size is not None and size_bytes > max_size:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Maximum size: {max_size // (1024*1024)}MB",
+                    )
+                hasher.update(chunk)
+                await out.write(chunk)
+
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, destination)
+    except BaseException:
+        try:
+            temp_path.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
+    return StoredFile(path=destination, sha256=hasher.hexdigest(), size_bytes=size_bytes)
+
 
 class FileService:
     """
     Service for handling file operations
     """
 
-    def __init__(self, upload_dir: str = "uploads"):
+    def __init__(self, upload_dir: str = "uploads", max_file_size: Optional[int] = None):
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(exist_ok=True)
+        self.max_file_size = max_file_size or settings.max_upload_size_mb * 1024 * 1024
 
-    async def save_file(
+    async def save_upload(
         self, file: UploadFile, room_id: str, subfolder: str = "documents"
-    ) -> str:
+    ) -> StoredFile:
         """
-        Save uploaded file and return the file path
+        Stream uploaded file to disk, returning its relative path, hash and size
         """
         try:
-            # Create room directory
-            room_dir = self.upload_dir / room_id / subfolder
-            room_dir.mkdir(parents=True, exist_ok=True)
-
             # Generate unique filename
             file_extension = Path(file.filename).suffix if file.filename else ""
             unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = room_dir / unique_filename
+            file_path = self.upload_dir / room_id / subfolder / unique_filename
 
-            # Save file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            stored = await stream_upload(
+                file,
+                file_path,
+                self.upload_dir / TEMP_DIR_NAME,
+                max_size=self.max_file_size,
+            )
 
             # Return relative path
-            return str(file_path.relative_to(self.upload_dir))
+            stored.path = file_path.relative_to(self.upload_dir)
+            return stored
 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error saving file: {e}")
             raise
 
+    async def save_file(
+        self, file: UploadFile, room_id: str, subfolder: str = "documents"
+    ) -> str:
+        """
+        Save uploaded file and return the file path
+        """
+        stored = await self.save_upload(file, room_id, subfolder)
+        return str(stored.path)
+
     async def save_multiple_files(
         self, files: List[UploadFile], room_id: str, subfolder: str = "documents"
     ) -> List[str]:
@@ -0,0 +1,264 @@
+"""
+File serving for STS Clearance system
+Conditional (ETag / 304) and byte-range responses for stored files
+"""
+
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import anyio
+from fastapi import Request
+from starlette.background import BackgroundTask
+from starlette.responses import FileResponse, Response
+
+logger = logging.getLogger(__name__)
+
+# Authenticated content: browsers may keep it but must revalidate every use
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+# Content-addressed blobs never change under the same URL
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_RANGE_RE = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a Range header selects no bytes of the file"""
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse that sends only bytes ``start``..``end`` (inclusive) as a 206"""
+
+    def __init__(self, path: Union[str, "os.PathLike[str]"], start: int, end: int, **kwargs):
+        self.start = start
+        self.end = end
+        super().__init__(path, status_code=206, **kwargs)
+
+    def set_stat_headers(self, stat_result: os.stat_result) -> None:
+        super().set_stat_headers(stat_result)
+        self.headers["content-length"] = str(self.end - self.start + 1)
+        self.headers["content-range"] = f"bytes {self.start}-{self.end}/{stat_result.st_size}"
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.start)
+                remaining = self.end - self.start + 1
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": chunk,
+                            "more_body": remaining > 0,
+                        }
+                    )
+                if remaining > 0:
+                    # File shrank underneath us; close the body cleanly
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+
+class FileHashCache:
+    """
+    SHA-256 of files without a stored content hash (legacy uploads, snapshots).
+
+    Entries are keyed by path and invalidated when size or mtime changes, so a
+    file is hashed once per content change instead of once per request.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+
+    async def get(self, path: Path, stat_result: Optional[os.stat_result] = None) -> str:
+        stat_result = stat_result or os.stat(path)
+        key = str(path)
+        cached = self._entries.get(key)
+        if cached and cached[0] == stat_result.st_size and cached[1] == stat_result.st_mtime_ns:
+            self._entries.move_to_end(key)
+            return cached[2]
+
+        digest = await anyio.to_thread.run_sync(self._hash_file, path)
+        self._entries[key] = (stat_result.st_size, stat_result.st_mtime_ns, digest)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return digest
+
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def guess_media_type(filename: Optional[str], declared: Optional[str] = None) -> str:
+    """Media type from a stored MIME type, falling back to the file extension"""
+    if declared and declared != "application/octet-stream":
+        return declared
+    if filename:
+        guessed, _ = mimetypes.guess_type(filename)
+        if guessed:
+            return guessed
+    return "application/octet-stream"
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against a strong ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(
+        (tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates
+    )
+
+
+def parse_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single ``bytes=`` range into an inclusive (start, end) pair.
+
+    Returns None when the header should be ignored (other units, several
+    ranges, malformed values), in which case the full file is served.
+    Raises RangeNotSatisfiable when the range lies outside the file.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    match = _RANGE_RE.match(spec)
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0 or file_size == 0:
+            raise RangeNotSatisfiable()
+        return max(file_size - length, 0), file_size - 1
+
+    start = int(first)
+    end = int(last) if last else file_size - 1
+    if last and end < start:
+        return None
+    if start >= file_size:
+        raise RangeNotSatisfiable()
+    return start, min(end, file_size - 1)
+
+
+def file_response(
+    request: Request,
+    path: Union[str, Path],
+    *,
+    etag: Optional[str] = None,
+    filename: Optional[str] = None,
+    media_type: Optional[str] = None,
+    cache_control: str = REVALIDATE_CACHE_CONTROL,
+    background: Optional[BackgroundTask] = None,
+) -> Response:
+    """
+    Build a conditional, range-aware response for a file on disk.
+
+    Args:
+        request: Incoming request (If-None-Match, Range and If-Range are honoured)
+        path: File to serve; must exist
+        etag: Content hash used as the strong ETag (quoted here)
+        filename: Download name for Content-Disposition and type detection
+        media_type: Stored MIME type, if known
+        cache_control: Cache-Control header value
+        background: Task run after a body is sent; skipped for 304s and for
+            range requests that continue a download already in progress
+    """
+    stat_result = os.stat(path)
+    headers: Dict[str, str] = {
+        "accept-ranges": "bytes",
+        "cache-control": cache_control,
+    }
+    quoted_etag = f'"{etag}"' if etag else None
+    if quoted_etag:
+        headers["etag"] = quoted_etag
+
+    if_none_match = request.headers.get("if-none-match")
+    if quoted_etag and if_none_match and etag_matches(if_none_match, quoted_etag):
+        return Response(status_code=304, headers=headers)
+
+    media_type = guess_media_type(filename or Path(path).name, media_type)
+    method = request.method
+
+    range_header = request.headers.get("range")
+    if range_header and method in ("GET", "HEAD"):
+        if_range = request.headers.get("if-range")
+        if if_range is None or (quoted_etag is not None and if_range.strip() == quoted_etag):
+            try:
+                byte_range = parse_range(range_header, stat_result.st_size)
+            except RangeNotSatisfiable:
+                headers["content-range"] = f"bytes */{stat_result.st_size}"
+                return Response(status_code=416, headers=headers)
+
+            if byte_range is not None:
+                start, end = byte_range
+                return RangeFileResponse(
+                    path,
+                    start,
+                    end,
+                    headers=headers,
+                    media_type=media_type,
+                    filename=filename,
+                    stat_result=stat_result,
+                    method=method,
+                    background=background if start == 0 else None,
+                )
+
+    return FileResponse(
+        path,
+        headers=headers,
+        media_type=media_type,
+        filename=filename,
+        stat_result=stat_result,
+        method=method,
+        background=background,
+    )
+
+
+async def resolve_etag(path: Union[str, Path], known_sha256: Optional[str] = None) -> str:
+    """Stored content hash if trustworthy, else the (cached) hash of the file"""
+    return known_sha256 or await file_hash_cache.get(Path(path))
+
+
+def log_access_in_background(
+    room_id: str, actor: str, action: str, meta: dict
+) -> BackgroundTask:
+    """Access-log write that runs after the response, in its own session"""
+    from app.dependencies import log_activity
+
+    return BackgroundTask(log_activity, room_id, actor, action, meta)
+
+
+# Global file hash cache instance
+file_hash_cache = FileHashCache()
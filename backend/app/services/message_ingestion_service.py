@@ -0,0 +1,262 @@
+"""
+Message Ingestion service for STS Clearance system
+Write-behind persistence for websocket chat messages
+
+A chat message gets its id and timestamp when it is submitted, so it can be
+broadcast straight away. Writer tasks then insert messages in micro-batches
+(flushed when a batch is full or its time window ends), each on a short-lived
+session with a single commit. Rooms are pinned to one writer, and timestamps
+increase strictly within a room, so a room's messages are stored and paged
+in the order they were sent.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.models import Message, uuid_default
+from app.services.message_read_service import message_read_service
+
+logger = logging.getLogger(__name__)
+
+
+class MessageIngestionService:
+    """
+    Batches websocket chat messages into the messages table.
+
+    ``submit`` returns the (not yet persisted) Message once it is queued.
+    ``flush`` waits until everything submitted before it is committed.
+    When the writers are not running, ``submit`` persists inline.
+    """
+
+    def __init__(
+        self,
+        session_factory=None,
+        batch_size: Optional[int] = None,
+        flush_interval_ms: Optional[int] = None,
+        writers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        max_attempts: int = 3,
+    ):
+        self._session_factory = session_factory
+        self.batch_size = batch_size or int(os.getenv("MESSAGE_INGEST_BATCH_SIZE", 200))
+        self.flush_interval = (
+            flush_interval_ms or int(os.getenv("MESSAGE_INGEST_FLUSH_MS", 50))
+        ) / 1000
+        self.writers = writers or int(os.getenv("MESSAGE_INGEST_WRITERS", 2))
+        self.max_pending = max_pending or int(os.getenv("MESSAGE_INGEST_MAX_PENDING", 10000))
+        self.max_attempts = max_attempts
+
+        self._queues: List[asyncio.Queue] = []
+        self._full: List[asyncio.Event] = []
+        self._tasks: List[asyncio.Task] = []
+        # room_id -> last timestamp handed out, for strict per-room order
+        self._last_created: Dict[str, datetime] = {}
+
+        # Metrics
+        self.submitted = 0
+        self.persisted = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.largest_batch = 0
+        self.last_commit_ms = 0.0
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    # ------------------------------------------------------------------
+    # Producers
+    # ------------------------------------------------------------------
+
+    def prepare(
+        self, room_id: str, sender_email: str, sender_name: str, content: str, **fields: Any
+    ) -> Message:
+        """Build a Message with its id and timestamp assigned"""
+        created_at = datetime.utcnow()
+        last = self._last_created.get(room_id)
+        if last is not None and created_at <= last:
+            created_at = last + timedelta(microseconds=1)
+        self._last_created[room_id] = created_at
+
+        return Message(
+            id=uuid_default(),
+            room_id=room_id,
+            sender_email=sender_email,
+            sender_name=sender_name,
+            content=content,
+            created_at=created_at,
+            **fields,
+        )
+
+    async def submit(
+        self, room_id: str, sender_email: str, sender_name: str, content: str, **fields: Any
+    ) -> Message:
+        """
+        Accept a chat message for persistence and return it for broadcasting
+
+        Waits only when ``max_pending`` messages are already queued on the
+        room's writer (i.e. the database is far behind).
+        """
+        message = self.prepare(room_id, sender_email, sender_name, content, **fields)
+        self.submitted += 1
+
+        if not self.running:
+            await self._persist([message])
+            return message
+
+        shard = self._shard(room_id)
+        queue = self._queues[shard]
+        await queue.put(message)
+        if queue.qsize() >= self.batch_size:
+            self._full[shard].set()
+        return message
+
+    async def flush(self) -> None:
+        """Wait until every message submitted so far is committed"""
+        if not self.running:
+            return
+        loop = asyncio.get_running_loop()
+        markers = []
+        for shard, queue in enumerate(self._queues):
+            marker = loop.create_future()
+            await queue.put(marker)
+            self._full[shard].set()
+            markers.append(marker)
+        await asyncio.gather(*markers)
+
+    def _shard(self, room_id: str) -> int:
+        return hash(str(room_id)) % len(self._queues)
+
+    # ------------------------------------------------------------------
+    # Writers
+    # ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        """Start the writer tasks for this process"""
+        if self.running:
+            return
+        self._queues = [asyncio.Queue(maxsize=self.max_pending) for _ in range(self.writers)]
+        self._full = [asyncio.Event() for _ in range(self.writers)]
+        self._tasks = [asyncio.create_task(self._write(shard)) for shard in range(self.writers)]
+        logger.info(
+            f"Message ingestion started ({self.writers} writers, batch {self.batch_size}, "
+            f"window {self.flush_interval * 1000:.0f}ms)"
+        )
+
+    async def stop(self) -> None:
+        """Persist everything queued, then stop the writers"""
+        if not self.running:
+            return
+        try:
+            await self.flush()
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+            self._queues = []
+            self._full = []
+
+    async def _write(self, shard: int) -> None:
+        queue = self._queues[shard]
+        full = self._full[shard]
+
+        while True:
+            first = await queue.get()
+
+            # Give the batch its time window unless it is already full
+            if queue.qsize() + 1 < self.batch_size and not isinstance(first, asyncio.Future):
+                full.clear()
+                try:
+                    await asyncio.wait_for(full.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch: List[Message] = []
+            markers: List[asyncio.Future] = []
+            item = first
+            while True:
+                if isinstance(item, asyncio.Future):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= self.batch_size or queue.empty():
+                    break
+                item = queue.get_nowait()
+
+            if batch:
+                await self._persist(batch)
+            for marker in markers:
+                if not marker.done():
+                    marker.set_result(None)
+
+    async def _persist(self, batch: List[Message]) -> None:
+        """Insert a batch in one transaction, retrying before isolating bad rows"""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self._commit(batch)
+                return
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    logger.error(f"Message batch of {len(batch)} failed {attempt} times: {e}")
+                    break
+                self.retries += 1
+                logger.warning(f"Message batch of {len(batch)} failed, retrying: {e}")
+                await asyncio.sleep(0.1 * 2 ** attempt)
+
+        if len(batch) == 1:
+            self.failed += 1
+            logger.error(f"Dropping chat message {batch[0].id} for room {batch[0].room_id}")
+            return
+
+        # One bad row (e.g. a room deleted meanwhile) must not lose its neighbours
+        for message in batch:
+            try:
+                await self._commit([message])
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Dropping chat message {message.id} for room {message.room_id}: {e}")
+
+    async def _commit(self, batch: List[Message]) -> None:
+        start = time.perf_counter()
+        async with self.session_factory() as session:
+            session.add_all(batch)
+            await message_read_service.record_messages(session, batch)
+            await session.commit()
+        self.last_commit_ms = (time.perf_counter() - start) * 1000
+        self.batches += 1
+        self.persisted += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "writers": len(self._tasks),
+            "batch_size": self.batch_size,
+            "flush_interval_ms": round(self.flush_interval * 1000),
+            "pending": sum(queue.qsize() for queue in self._queues),
+            "submitted": self.submitted,
+            "persisted": self.persisted,
+            "batches": self.batches,
+            "avg_batch_size": round(self.persisted / self.batches, 2) if self.batches else 0,
+            "largest_batch": self.largest_batch,
+            "retries": self.retries,
+            "failed": self.failed,
+            "last_commit_ms": round(self.last_commit_ms, 2),
+        }
+
+
+# Global message ingestion service instance
+message_ingestion_service = MessageIngestionService()
@@ -0,0 +1,167 @@
+"""
+Message Read service for STS Clearance system
+Maintains per-(room, user) read high-water marks and unread counters
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Message, MessageRead
+
+logger = logging.getLogger(__name__)
+
+
+class MessageReadService:
+    """
+    Service for the message_reads table.
+
+    Writers call ``record_message(s)`` / ``mark_read`` / ``mark_all_read``
+    before committing so counters change in the same transaction as the
+    messages they count. Nothing here commits.
+    """
+
+    async def record_message(self, session: AsyncSession, message: Message) -> None:
+        """
+        Count a new message as unread for every tracked reader but its sender.
+
+        Readers without a row yet are counted lazily on first lookup.
+        """
+        if message.created_at is None:
+            # Sub-second timestamps keep the read high-water mark precise
+            message.created_at = datetime.utcnow()
+        await self.record_messages(session, [message])
+
+    async def record_messages(self, session: AsyncSession, messages: Iterable[Message]) -> None:
+        """Batch form of record_message: one counter UPDATE per (room, sender)"""
+        await session.flush()
+
+        per_sender = Counter((message.room_id, message.sender_email) for message in messages)
+        for (room_id, sender_email), count in per_sender.items():
+            await session.execute(
+                update(MessageRead)
+                .where(
+                    MessageRead.room_id == room_id,
+                    MessageRead.user_email != sender_email,
+                )
+                .values(unread_count=MessageRead.unread_count + count)
+                .execution_options(synchronize_session=False)
+            )
+
+    async def get_unread_count(self, session: AsyncSession, room_id: str, user_email: str) -> int:
+        """
+        Primary-key lookup, building the row on first access (the caller commits)
+
+        Concurrent first lookups race on the insert; the loser's is skipped
+        and it reads the winner's row.
+        """
+        read = await session.get(MessageRead, (room_id, user_email))
+        if read is not None:
+            return read.unread_count
+
+        unread_count = await self._count_unread(session, room_id, user_email, None)
+        if session.get_bind().dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        await session.execute(
+            insert(MessageRead)
+            .values(room_id=room_id, user_email=user_email, unread_count=unread_count)
+            .on_conflict_do_nothing(index_elements=["room_id", "user_email"])
+        )
+        read = await session.get(MessageRead, (room_id, user_email))
+        return read.unread_count if read is not None else unread_count
+
+    async def mark_read(
+        self, session: AsyncSession, room_id: str, user_email: str, message: Message
+    ) -> bool:
+        """
+        Advance the user's high-water mark to ``message``.
+
+        Returns False when the message was already covered by the mark.
+        """
+        read = await session.get(MessageRead, (room_id, user_email))
+        if read is None:
+            read = MessageRead(room_id=room_id, user_email=user_email, unread_count=0)
+            session.add(read)
+        elif read.last_read_at is not None and read.last_read_at >= message.created_at:
+            return False
+
+        read.last_read_at = message.created_at
+        read.last_read_message_id = message.id
+        read.unread_count = await self._count_unread(
+            session, room_id, user_email, message.created_at
+        )
+        return True
+
+    async def mark_all_read(self, session: AsyncSession, room_id: str, user_email: str) -> int:
+        """
+        Move the high-water mark to the newest message in the room.
+
+        Returns the number of messages that were unread.
+        """
+        latest = (
+            await session.execute(
+                select(Message.id, Message.created_at)
+                .where(Message.room_id == room_id)
+                .order_by(Message.created_at.desc())
+                .limit(1)
+            )
+        ).first()
+
+        read = await session.get(MessageRead, (room_id, user_email))
+        if read is None:
+            previously_unread = await self._count_unread(session, room_id, user_email, None)
+            read = MessageRead(room_id=room_id, user_email=user_email)
+            session.add(read)
+        else:
+            previously_unread = read.unread_count
+
+        if latest is not None:
+            read.last_read_message_id, read.last_read_at = latest
+        read.unread_count = 0
+        return previously_unread
+
+    def readers_column(self, session: AsyncSession):
+        """
+        Correlated column listing, as a JSON array, who has read each selected
+        Message, so a message page carries its read receipts without a second query
+        """
+        if session.get_bind().dialect.name == "sqlite":
+            emails = func.json_group_array(MessageRead.user_email)
+        else:
+            emails = func.json_agg(MessageRead.user_email)
+        return (
+            select(emails)
+            .where(
+                MessageRead.room_id == Message.room_id,
+                MessageRead.last_read_at >= Message.created_at,
+            )
+            .correlate(Message)
+            .scalar_subquery()
+            .label("read_by")
+        )
+
+    async def _count_unread(
+        self,
+        session: AsyncSession,
+        room_id: str,
+        user_email: str,
+        after: Optional[datetime],
+    ) -> int:
+        """Indexed range count of other users' messages newer than ``after``"""
+        query = select(func.count(Message.id)).where(
+            Message.room_id == room_id,
+            Message.sender_email != user_email,
+        )
+        if after is not None:
+            query = query.where(Message.created_at > after)
+        return (await session.execute(query)).scalar() or 0
+
+
+# Global message read service instance
+message_read_service = MessageReadService()
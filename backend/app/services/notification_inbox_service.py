@@ -0,0 +1,491 @@
+"""
+Notification Inbox service for STS Clearance system
+Persisted per-user notifications on the notifications table
+
+Notifications are written once, when something happens: a session flush
+listener adds them for new chat messages and pending approvals in the same
+transaction, and a periodic scanner adds document expiry and STS deadline
+notices. Every row has a ``dedup_key`` unique per user, so producers and
+reruns of the scanner never duplicate a notice. Reading an inbox is an
+indexed range over (user_email, read, created_at) and costs the same
+whatever the size of the fleet.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, delete, event, func, inspect, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import Approval, Message, Notification, Party, Room, uuid_default
+from app.pagination import keyset_page, split_page
+
+logger = logging.getLogger(__name__)
+
+_notifications = Notification.__table__
+
+# Upserting these keeps one notice per (user, key) that moves to the top
+_REFRESHED_COLUMNS = ("title", "message", "data", "priority", "created_at")
+
+# Rows per INSERT statement
+INSERT_CHUNK = 500
+
+
+def notification_row(
+    user_email: str,
+    notification_type: str,
+    title: str,
+    message: str,
+    dedup_key: Optional[str] = None,
+    room_id: Optional[str] = None,
+    priority: str = "medium",
+    action_url: Optional[str] = None,
+    data: Optional[Dict[str, Any]] = None,
+    expires_at: Optional[datetime] = None,
+    created_at: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """Values of one notifications row (every row has the same keys for multi-row inserts)"""
+    return {
+        "id": uuid_default(),
+        "user_email": user_email,
+        "title": title,
+        "message": message,
+        "notification_type": notification_type,
+        "room_id": room_id,
+        "read": False,
+        "data": json.dumps(data, default=str) if data else None,
+        "priority": priority,
+        "action_url": action_url,
+        "expires_at": expires_at,
+        "dedup_key": dedup_key,
+        "created_at": created_at or datetime.utcnow(),
+    }
+
+
+class NotificationInboxService:
+    """Writes, scans and reads the per-user notification inbox"""
+
+    def __init__(
+        self,
+        session_factory=None,
+        scan_interval_seconds: Optional[int] = None,
+        retention_days: Optional[int] = None,
+        expiry_window_days: int = 30,
+        deadline_window_days: int = 7,
+    ):
+        self._session_factory = session_factory
+        self.scan_interval = scan_interval_seconds or int(
+            os.getenv("NOTIFICATION_SCAN_INTERVAL_SECONDS", 900)
+        )
+        self.retention_days = retention_days or int(os.getenv("NOTIFICATION_RETENTION_DAYS", 90))
+        self.expiry_window_days = expiry_window_days
+        self.deadline_window_days = deadline_window_days
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.produced = 0
+        self.scans = 0
+        self.last_scan: Optional[Dict[str, int]] = None
+        self.last_scan_ms = 0.0
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def _insert_rows(
+        self,
+        connection,
+        rows: Sequence[Dict[str, Any]],
+        refresh: bool = False,
+        returning: bool = False,
+    ) -> List[Tuple[str, str, str]]:
+        """
+        Insert rows, skipping (or with ``refresh``, re-raising as unread)
+        notices whose (user_email, dedup_key) already exists
+
+        With ``returning``, (id, user_email, dedup_key) of the rows inserted
+        or re-raised; a re-raised notice keeps its id.
+        """
+        if not rows:
+            return []
+        if connection.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        stored: List[Tuple[str, str, str]] = []
+        for start in range(0, len(rows), INSERT_CHUNK):
+            statement = insert(_notifications).values(list(rows[start:start + INSERT_CHUNK]))
+            if refresh:
+                values = {name: statement.excluded[name] for name in _REFRESHED_COLUMNS}
+                values.update(read=False, read_at=None)
+                statement = statement.on_conflict_do_update(
+                    index_elements=["user_email", "dedup_key"], set_=values
+                )
+            else:
+                statement = statement.on_conflict_do_nothing(
+                    index_elements=["user_email", "dedup_key"]
+                )
+            if returning:
+                stored.extend(connection.execute(statement.returning(
+                    _notifications.c.id, _notifications.c.user_email, _notifications.c.dedup_key
+                )).all())
+            else:
+                connection.execute(statement)
+        self.produced += len(rows)
+        return [tuple(row) for row in stored]
+
+    async def deliver(
+        self,
+        session: AsyncSession,
+        rows: Sequence[Dict[str, Any]],
+        refresh: bool = False,
+        returning: bool = False,
+    ) -> List[Tuple[str, str, str]]:
+        """
+        Add notification rows (see ``notification_row``); the caller commits
+
+        With ``returning``, (id, user_email, dedup_key) of the rows that were
+        new or re-raised.
+        """
+        return await session.run_sync(lambda sync_session: self._insert_rows(
+            sync_session.connection(), rows, refresh, returning
+        ))
+
+    # ------------------------------------------------------------------
+    # Producers
+    # ------------------------------------------------------------------
+
+    def sync(self, session: Session) -> None:
+        """
+        Notify room parties of the chat messages and approvals of a flush
+        (flush listener)
+
+        A room's unread message notice is refreshed rather than repeated;
+        an approval notice is read once the approval leaves ``pending``.
+        """
+        messages: List[Message] = []
+        pending: List[Approval] = []
+        resolved: List[str] = []
+
+        for instance in session.new:
+            if isinstance(instance, Message):
+                if instance.is_public is not False and instance.message_type != "system":
+                    messages.append(instance)
+            elif isinstance(instance, Approval):
+                if (instance.status or "pending") == "pending":
+                    pending.append(instance)
+        for instance in session.dirty:
+            if isinstance(instance, Approval):
+                if not inspect(instance).attrs.status.history.has_changes():
+                    continue
+                if instance.status == "pending":
+                    pending.append(instance)
+                else:
+                    resolved.append(f"approval:{instance.id}")
+
+        if not (messages or pending or resolved):
+            return
+
+        connection = session.connection()
+        now = datetime.utcnow()
+
+        if resolved:
+            connection.execute(
+                update(_notifications)
+                .where(_notifications.c.dedup_key.in_(resolved), _notifications.c.read == False)
+                .values(read=True, read_at=now)
+            )
+
+        if messages:
+            recipients: Dict[Any, List[str]] = {}
+            titles: Dict[Any, str] = {}
+            for room_id, email, title in connection.execute(
+                select(Party.room_id, Party.email, Room.title)
+                .join(Room, Room.id == Party.room_id)
+                .where(Party.room_id.in_({m.room_id for m in messages}))
+                .distinct()
+            ):
+                recipients.setdefault(room_id, []).append(email)
+                titles[room_id] = title
+
+            # The latest message of a room speaks for the others
+            latest: Dict[Any, Message] = {}
+            for message in messages:
+                latest[message.room_id] = message
+            rows = []
+            for room_id, message in latest.items():
+                title = titles.get(room_id, "")
+                for email in recipients.get(room_id, ()):
+                    if email == message.sender_email:
+                        continue
+                    rows.append(notification_row(
+                        email, "message_received", "New Message",
+                        f"New message in {title} from {message.sender_name}",
+                        dedup_key=f"message:{room_id}",
+                        room_id=room_id,
+                        priority="low",
+                        action_url=f"/rooms/{room_id}/messages",
+                        data={
+                            "room_title": title,
+                            "vessel_id": message.vessel_id,
+                            "message_id": message.id,
+                            "sender_name": message.sender_name,
+                            "content_preview": (message.content or "")[:100],
+                        },
+                        created_at=message.created_at or now,
+                    ))
+            self._insert_rows(connection, rows, refresh=True)
+
+        if pending:
+            parties = {
+                row.id: row
+                for row in connection.execute(
+                    select(Party.id, Party.email, Party.name, Party.role, Room.title)
+                    .join(Room, Room.id == Party.room_id)
+                    .where(Party.id.in_({a.party_id for a in pending}))
+                )
+            }
+            rows = []
+            for approval in pending:
+                party = parties.get(approval.party_id)
+                if party is None:
+                    continue
+                title = party.title
+                rows.append(notification_row(
+                    party.email, "approval_required", "Approval Required",
+                    f"Your approval is required for operation {title}",
+                    dedup_key=f"approval:{approval.id}",
+                    room_id=approval.room_id,
+                    priority="high",
+                    action_url=f"/rooms/{approval.room_id}/approvals",
+                    data={
+                        "room_title": title,
+                        "vessel_id": approval.vessel_id,
+                        "approval_id": approval.id,
+                        "party_name": party.name,
+                        "party_role": party.role,
+                    },
+                    created_at=now,
+                ))
+            self._insert_rows(connection, rows, refresh=True)
+
+    async def scan(self, session: AsyncSession, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Add document expiry and STS deadline notices for every party of the
+        affected rooms; the caller commits
+
+        Notices are keyed by entity and level, so a rerun adds nothing and a
+        document moving to a closer threshold gets a new notice.
+        """
+        now = now or datetime.utcnow()
+        rows: List[Dict[str, Any]] = []
+
+        # Document expiry: the alert engine's levels, with a final notice at
+        # the edge of the expiry window
+        from app.services.expiry_alert_service import (DEFAULT_THRESHOLDS,
+                                                       expiry_alert_service)
+        alerts = await expiry_alert_service.send(
+            session, dict(DEFAULT_THRESHOLDS, notice=self.expiry_window_days), now=now
+        )
+
+        approaching = await session.execute(
+            select(Room.id, Room.title, Room.sts_eta, Room.location, Party.email)
+            .join(Party, Party.room_id == Room.id)
+            .where(
+                Room.sts_eta > now,
+                Room.sts_eta <= now + timedelta(days=self.deadline_window_days),
+                Room.status == "active",
+            )
+        )
+        deadlines = 0
+        for row in approaching:
+            days = (row.sts_eta - now).days
+            priority = "high" if days <= 2 else "medium"
+            rows.append(notification_row(
+                row.email, "deadline_approaching", "STS Operation Approaching",
+                f"STS operation {row.title} is scheduled in {days} days",
+                dedup_key=f"deadline:{row.id}:{priority}",
+                room_id=row.id,
+                priority=priority,
+                action_url=f"/rooms/{row.id}",
+                data={"room_title": row.title, "sts_eta": row.sts_eta, "location": row.location},
+                expires_at=row.sts_eta,
+                created_at=now,
+            ))
+            deadlines += 1
+
+        await self.deliver(session, rows)
+        return {"document_expiry": alerts["documents"], "deadline_approaching": deadlines}
+
+    async def cleanup(self, session: AsyncSession, older_than: datetime) -> int:
+        """Delete read notices created before ``older_than``; the caller commits"""
+        result = await session.execute(
+            delete(Notification).where(
+                Notification.read == True, Notification.created_at < older_than
+            )
+        )
+        return result.rowcount or 0
+
+    async def run_scan(self) -> Dict[str, int]:
+        """One scanner pass on its own session"""
+        start = asyncio.get_running_loop().time()
+        async with self.session_factory() as session:
+            counts = await self.scan(session)
+            counts["cleaned_up"] = await self.cleanup(
+                session, datetime.utcnow() - timedelta(days=self.retention_days)
+            )
+            await session.commit()
+        self.scans += 1
+        self.last_scan = counts
+        self.last_scan_ms = (asyncio.get_running_loop().time() - start) * 1000
+        return counts
+
+    async def _scan_forever(self) -> None:
+        while True:
+            try:
+                await self.run_scan()
+            except Exception as e:
+                logger.error(f"Notification scan failed: {e}")
+            await asyncio.sleep(self.scan_interval)
+
+    async def start(self) -> None:
+        """Run the scanner periodically in this process (reruns are harmless)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._scan_forever())
+            logger.info(f"Notification scanner started (every {self.scan_interval}s)")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # ------------------------------------------------------------------
+    # Inbox
+    # ------------------------------------------------------------------
+
+    def _visible(self, user_email: str, now: datetime):
+        return and_(
+            Notification.user_email == user_email,
+            or_(Notification.expires_at.is_(None), Notification.expires_at > now),
+        )
+
+    async def list(
+        self,
+        session: AsyncSession,
+        user_email: str,
+        limit: int = 50,
+        cursor: Optional[Tuple[Optional[datetime], str]] = None,
+        offset: int = 0,
+        unread_only: bool = False,
+        priority: Optional[str] = None,
+        notification_type: Optional[str] = None,
+    ) -> Tuple[List[Notification], Optional[str]]:
+        """A page of a user's notices, newest first, and the next page's cursor"""
+        query = select(Notification).where(self._visible(user_email, datetime.utcnow()))
+        if unread_only:
+            query = query.where(Notification.read == False)
+        if priority:
+            query = query.where(Notification.priority == priority)
+        if notification_type:
+            query = query.where(Notification.notification_type == notification_type)
+
+        query = keyset_page(query, Notification.created_at, Notification.id, cursor, limit)
+        if offset and cursor is None:
+            query = query.offset(offset)
+        result = await session.execute(query)
+        return split_page(result.scalars().all(), limit, "created_at")
+
+    async def summary(self, session: AsyncSession, user_email: str) -> Dict[str, Any]:
+        """Counts of a user's notices by type, priority and read state, in one query"""
+        now = datetime.utcnow()
+        result = await session.execute(
+            select(
+                Notification.notification_type,
+                Notification.priority,
+                Notification.read,
+                func.count(),
+                func.sum(case((Notification.created_at > now - timedelta(hours=24), 1), else_=0)),
+            )
+            .where(self._visible(user_email, now))
+            .group_by(Notification.notification_type, Notification.priority, Notification.read)
+        )
+        summary = {
+            "total_notifications": 0, "unread_count": 0, "high_priority_count": 0,
+            "recent_count": 0, "by_type": {}, "by_priority": {},
+        }
+        for notification_type, priority, read, count, recent in result.all():
+            priority = priority or "low"
+            summary["total_notifications"] += count
+            summary["recent_count"] += recent or 0
+            if not read:
+                summary["unread_count"] += count
+            if priority == "high":
+                summary["high_priority_count"] += count
+            by_type = summary["by_type"]
+            by_type[notification_type] = by_type.get(notification_type, 0) + count
+            by_priority = summary["by_priority"]
+            by_priority[priority] = by_priority.get(priority, 0) + count
+        return summary
+
+    async def mark_read(self, session: AsyncSession, user_email: str, notification_id: str) -> bool:
+        """Mark one of a user's notices read; False if it is not theirs. The caller commits"""
+        result = await session.execute(
+            update(Notification)
+            .where(Notification.id == notification_id, Notification.user_email == user_email)
+            .values(read=True, read_at=func.coalesce(Notification.read_at, datetime.utcnow()))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount > 0
+
+    async def mark_all_read(self, session: AsyncSession, user_email: str) -> int:
+        """Mark every unread notice of a user read; the caller commits"""
+        result = await session.execute(
+            update(Notification)
+            .where(Notification.user_email == user_email, Notification.read == False)
+            .values(read=True, read_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount or 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "scanner_running": self._task is not None,
+            "scan_interval_seconds": self.scan_interval,
+            "produced": self.produced,
+            "scans": self.scans,
+            "last_scan": self.last_scan,
+            "last_scan_ms": round(self.last_scan_ms, 2),
+        }
+
+
+def notification_data(notification: Notification) -> Dict[str, Any]:
+    """Decoded ``data`` of a notice"""
+    if not notification.data:
+        return {}
+    try:
+        return json.loads(notification.data)
+    except (TypeError, ValueError):
+        return {}
+
+
+# Global notification inbox service instance
+notification_inbox_service = NotificationInboxService()
+
+
+@event.listens_for(Session, "after_flush")
+def _notify_after_flush(session: Session, flush_context) -> None:
+    notification_inbox_service.sync(session)
@@ -4,11 +4,16 @@ Handles real-time notifications, email alerts, and user communication
 """
 
 import logging
-import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 
 from app.models import Notification, Room, User
+from app.services.background_task_service import (TaskPriority,
+                                                  background_task_service)
+from app.services.notification_inbox_service import (notification_data,
+                                                     notification_inbox_service,
+                                                     notification_row)
 from app.websocket_manager import manager
 
 logger = logging.getLogger(__name__)
@@ -17,7 +22,8 @@ logger = logging.getLogger(__name__)
 class NotificationService:
     """Service for managing notifications and alerts"""
 
-    def __init__(self):
+    def __init__(self, session=None):
+        self.session = session
         self.notification_types = {
             "document_uploaded": {
                 "title": "Document Uploaded",
@@ -55,9 +61,17 @@ class NotificationService:
         notification_type: str,
         room_id: Optional[str] = None,
         data: Optional[Dict] = None,
-        session=None
+        session=None,
+        dedup_key: Optional[str] = None,
+        priority: str = "medium",
     ) -> str:
-        """Create a new notification for a user"""
+        """
+        Store a notification in the user's inbox and push it to the room
+
+        With a session the row is added to it and the caller commits;
+        otherwise it is committed on a session of its own. A notification
+        whose ``dedup_key`` the user already has is not stored again.
+        """
         try:
             notification_config = self.notification_types.get(notification_type)
             if not notification_config:
@@ -66,37 +80,78 @@ class NotificationService:
 
             # Format message using template and data
             message = self._format_message(notification_config["template"], data or {})
-            
-            notification_id = str(uuid.uuid4())
-            
-            # Create notification object
-            notification = Notification(
-                id=notification_id,
-                user_email=user_email,
-                title=notification_config["title"],
-                message=message,
-                notification_type=notification_type,
+
+            row = notification_row(
+                user_email,
+                notification_type,
+                notification_config["title"],
+                message,
+                dedup_key=dedup_key,
                 room_id=room_id,
-                read=False,
-                data=data or {},
-                created_at=datetime.utcnow()
+                priority=priority,
+                data=data,
             )
-
-            # Store notification (in production, this would be in database)
-            # For now, we'll use the in-memory storage from notifications router
-            from app.routers.notifications import notifications_storage
-            notifications_storage[notification_id] = notification
+            session = session or self.session
+            if session is not None:
+                await notification_inbox_service.deliver(session, [row])
+            else:
+                async with notification_inbox_service.session_factory() as own_session:
+                    await notification_inbox_service.deliver(own_session, [row])
+                    await own_session.commit()
 
             # Send real-time notification via WebSocket
-            await self._send_realtime_notification(user_email, notification)
+            await self._send_realtime_notification(user_email, row)
 
-            logger.info(f"Notification created: {notification_id} for {user_email}")
-            return notification_id
+            logger.info(f"Notification created: {row['id']} for {user_email}")
+            return row["id"]
 
         except Exception as e:
             logger.error(f"Error creating notification: {e}")
             return None
 
+    async def _send_realtime_notification(self, user_email: str, row: Dict[str, Any]) -> None:
+        """Push a stored notification to its room; clients keep their own by ``user_email``"""
+        if not row.get("room_id"):
+            return
+        await manager.send_notification_to_room(
+            str(row["room_id"]),
+            row["notification_type"],
+            row["title"],
+            row["message"],
+            {"notification_id": row["id"], "user_email": user_email},
+        )
+
+    async def enqueue_notification(
+        self,
+        user_email: str,
+        notification_type: str,
+        room_id: Optional[str] = None,
+        data: Optional[Dict] = None,
+        dedup_key: Optional[str] = None,
+        max_attempts: Optional[int] = None,
+        session=None
+    ) -> str:
+        """
+        Queue a notification on the high-priority task lane
+
+        Delivery is retried with backoff by the task queue; returns the task id.
+        With a session the task is only queued if the caller commits. The
+        ``dedup_key`` also keys the inbox row, so a retried send is stored once.
+        """
+        return await background_task_service.create_task(
+            task_type="send_notification",
+            data={
+                "user_email": user_email,
+                "notification_type": notification_type,
+                "room_id": str(room_id) if room_id else None,
+                "data": data or {},
+                "dedup_key": dedup_key,
+            },
+            dedup_key=dedup_key,
+            max_attempts=max_attempts,
+            session=session,
+        )
+
     async def send_room_notification(
         self,
         room_id: str,
@@ -145,20 +200,19 @@ class NotificationService:
         except Exception as e:
             logger.error(f"Error sending expiry alerts: {e}")
 
-    async def mark_notification_read(self, notification_id: str, user_email: str) -> bool:
+    async def mark_notification_read(
+        self, notification_id: str, user_email: str, session=None
+    ) -> bool:
         """Mark a notification as read"""
         try:
-            from app.routers.notifications import notifications_storage
-            
-            notification = notifications_storage.get(notification_id)
-            if notification and notification.user_email == user_email:
-                notification.read = True
-                notifications_storage[notification_id] = notification
-                
+            async with self._session(session) as session:
+                marked = await notification_inbox_service.mark_read(
+                    session, user_email, notification_id
+                )
+                await session.commit()
+            if marked:
                 logger.info(f"Notification marked as read: {notification_id}")
-                return True
-            
-            return False
+            return marked
 
         except Exception as e:
             logger.error(f"Error marking notification as read: {e}")
@@ -168,30 +222,28 @@ class NotificationService:
         self,
         user_email: str,
         unread_only: bool = False,
-        limit: int = 50
+        limit: int = 50,
+        session=None
     ) -> List[Dict]:
         """Get notifications for a user"""
         try:
-            from app.routers.notifications import notifications_storage
-            
-            user_notifications = []
-            for notification in notifications_storage.values():
-                if notification.user_email == user_email:
-                    if not unread_only or not notification.read:
-                        user_notifications.append({
-                            "id": notification.id,
-                            "title": notification.title,
-                            "message": notification.message,
-                            "type": notification.notification_type,
-                            "room_id": notification.room_id,
-                            "read": notification.read,
-                            "data": notification.data,
-                            "created_at": notification.created_at
-                        })
-            
-            # Sort by created_at desc and limit
-            user_notifications.sort(key=lambda x: x["created_at"], reverse=True)
-            return user_notifications[:limit]
+            async with self._session(session) as session:
+                notifications, _ = await notification_inbox_service.list(
+                    session, user_email, limit=limit, unread_only=unread_only
+                )
+            return [
+                {
+                    "id": notification.id,
+                    "title": notification.title,
+                    "message": notification.message,
+                    "type": notification.notification_type,
+                    "room_id": notification.room_id,
+                    "read": bool(notification.read),
+                    "data": notification_data(notification),
+                    "created_at": notification.created_at
+                }
+                for notification in notifications
+            ]
 
         except Exception as e:
             logger.error(f"Error getting user notifications: {e}")
@@ -205,26 +257,29 @@ class NotificationService:
             logger.warning(f"Missing data for notification template: {e}")
             return template
 
-    async def cleanup_old_notifications(self, days_old: int = 30):
-        """Clean up old notifications"""
+    async def cleanup_old_notifications(self, days_old: int = 30, session=None):
+        """Clean up old read notifications"""
         try:
-            from app.routers.notifications import notifications_storage
-            
             cutoff_date = datetime.utcnow() - timedelta(days=days_old)
-            notifications_to_remove = []
-            
-            for notification_id, notification in notifications_storage.items():
-                if notification.created_at < cutoff_date:
-                    notifications_to_remove.append(notification_id)
-            
-            for notification_id in notifications_to_remove:
-                del notifications_storage[notification_id]
-            
-            logger.info(f"Cleaned up {len(notifications_to_remove)} old notifications")
+            async with self._session(session) as session:
+                removed = await notification_inbox_service.cleanup(session, cutoff_date)
+                await session.commit()
+
+            logger.info(f"Cleaned up {removed} old notifications")
 
         except Exception as e:
             logger.error(f"Error cleaning up notifications: {e}")
 
+    @asynccontextmanager
+    async def _session(self, session=None):
+        """The given (or service) session, else a new one closed on exit"""
+        session = session or self.session
+        if session is not None:
+            yield session
+            return
+        async with notification_inbox_service.session_factory() as own_session:
+            yield own_session
+
 
     async def queue_notification_with_retry(
         self,
@@ -238,69 +293,48 @@ class NotificationService:
         """
         Queue notification with automatic retry logic.
         
-        Retries with exponential backoff on failure.
-        Max retries: 3 (with 2s, 4s, 8s delays)
+        The send runs on the task queue's high-priority lane, which retries
+        it with exponential backoff up to ``max_retries`` attempts.
         
         Returns:
         {
-          "notification_id": str,
-          "status": "queued|sent|failed",
+          "notification_id": str (task id),
+          "status": "queued|failed",
           "retries_used": int,
           "error": str (if failed)
         }
         """
-        import asyncio
-        
-        notification_id = str(uuid.uuid4())
-        retries_used = 0
-        last_error = None
-        
-        for attempt in range(max_retries):
-            try:
-                # Try to send notification
-                result = await self.create_notification(
-                    user_email=user_email,
-                    notification_type=notification_type,
-                    room_id=room_id,
-                    data=data,
-                    session=session
-                )
-                
-                if result:
-                    return {
-                        "notification_id": result,
-                        "status": "sent",
-                        "retries_used": retries_used,
-                        "error": None,
-                    }
-                
-                last_error = "create_notification returned None"
-                retries_used = attempt
-                
-            except Exception as e:
-                last_error = str(e)
-                retries_used = attempt + 1
-                
-                if attempt < max_retries - 1:
-                    # Exponential backoff: 2^(attempt+1) seconds
-                    wait_time = 2 ** (attempt + 1)
-                    logger.warning(f"Notification send failed, retrying in {wait_time}s: {e}")
-                    await asyncio.sleep(wait_time)
-                else:
-                    # Last attempt failed, log and mark as failed
-                    logger.error(f"Notification failed after {max_retries} retries: {e}")
-        
-        return {
-            "notification_id": notification_id,
-            "status": "failed",
-            "retries_used": retries_used,
-            "error": last_error,
-        }
+        try:
+            task_id = await self.enqueue_notification(
+                user_email=user_email,
+                notification_type=notification_type,
+                room_id=room_id,
+                data=data,
+                max_attempts=max_retries,
+                session=session,
+            )
+            return {
+                "notification_id": task_id,
+                "status": "queued",
+                "retries_used": 0,
+                "error": None,
+            }
+        except Exception as e:
+            logger.error(f"Error queueing notification: {e}")
+            return {
+                "notification_id": None,
+                "status": "failed",
+                "retries_used": 0,
+                "error": str(e),
+            }
 
     async def send_expiry_alerts_scheduled(
         self,
         session=None,
-        thresholds: Dict[str, int] = None
+        thresholds: Dict[str, int] = None,
+        room_id: Optional[str] = None,
+        vessel_id: Optional[str] = None,
+        send_to_all: bool = False,
     ) -> Dict[str, int]:
         """
         Send expiry alerts for documents expiring soon.
@@ -309,6 +343,10 @@ class NotificationService:
         - "critical": 1 day (default)
         - "urgent": 3 days (default)
         - "warning": 7 days (default)
+
+        Each document alerts its room's parties at its highest level only,
+        and each level once per user; ``send_to_all`` raises the current
+        alerts again for every party, including those already notified.
         
         Returns:
         {
@@ -316,91 +354,34 @@ class NotificationService:
           "urgent_sent": int,
           "warning_sent": int,
           "total_sent": int,
+          "documents": int,
           "errors": int
         }
         """
-        if thresholds is None:
-            thresholds = {
-                "critical": 1,
-                "urgent": 3,
-                "warning": 7,
-            }
-        
-        sent_counts = {
-            "critical_sent": 0,
-            "urgent_sent": 0,
-            "warning_sent": 0,
-            "total_sent": 0,
-            "errors": 0,
-        }
-        
-        if not session:
-            logger.error("Database session required")
-            return sent_counts
-        
+        from app.services.expiry_alert_service import (DEFAULT_THRESHOLDS,
+                                                       expiry_alert_service)
+
+        thresholds = thresholds or DEFAULT_THRESHOLDS
         try:
-            from app.models import Document, Room
-            from sqlalchemy import select, and_
-            
-            now = datetime.utcnow()
-            
-            # Find documents expiring within thresholds
-            for level, days in thresholds.items():
-                threshold_date = now + timedelta(days=days)
-                
-                # Query documents expiring within this threshold
-                query = select(Document, Room).join(
-                    Room, Document.room_id == Room.id
-                ).where(
-                    and_(
-                        Document.expires_on <= threshold_date,
-                        Document.expires_on > now,
-                        Document.status == "approved"
-                    )
+            async with self._session(session) as session:
+                sent_counts = await expiry_alert_service.send(
+                    session,
+                    thresholds=thresholds,
+                    room_id=room_id,
+                    vessel_id=vessel_id,
+                    resend=send_to_all,
                 )
-                
-                result = await session.execute(query)
-                doc_room_pairs = result.all()
-                
-                # Send notification for each document
-                for doc, room in doc_room_pairs:
-                    try:
-                        # Get users in room to notify
-                        from app.models import Party
-                        
-                        parties_query = select(Party).where(
-                            Party.room_id == room.id
-                        )
-                        parties_result = await session.execute(parties_query)
-                        parties = parties_result.scalars().all()
-                        
-                        for party in parties:
-                            # Create notification
-                            notification_data = {
-                                "document_name": doc.notes or "Document",
-                                "room_title": room.title,
-                                "days": days,
-                                "expiry_date": doc.expires_on.isoformat(),
-                            }
-                            
-                            await self.create_notification(
-                                user_email=party.email,
-                                notification_type="document_expiring",
-                                room_id=room.id,
-                                data=notification_data,
-                                session=session
-                            )
-                            
-                            sent_counts[f"{level}_sent"] += 1
-                            sent_counts["total_sent"] += 1
-                    
-                    except Exception as e:
-                        logger.error(f"Error sending expiry alert: {e}")
-                        sent_counts["errors"] += 1
-        
+                await session.commit()
+            sent_counts["errors"] = 0
+            logger.info(
+                f"Expiry alerts sent: {sent_counts['total_sent']} "
+                f"for {sent_counts['documents']} documents"
+            )
+
         except Exception as e:
             logger.error(f"Error in send_expiry_alerts_scheduled: {e}")
-            sent_counts["errors"] += 1
+            sent_counts = {f"{level}_sent": 0 for level in thresholds}
+            sent_counts.update(total_sent=0, documents=0, errors=1)
         
         return sent_counts
 
@@ -481,11 +462,12 @@ class NotificationService:
                                 "approval_type": approval.approval_type or "Document",
                             }
                             
-                            await self.create_notification(
+                            await self.enqueue_notification(
                                 user_email=party.email,
                                 notification_type="approval_required",
                                 room_id=room.id,
                                 data=notification_data,
+                                dedup_key=f"approval_reminder:{approval.id}:{party.email}:{now:%Y-%m-%d}",
                                 session=session
                             )
                             
@@ -500,6 +482,9 @@ class NotificationService:
                     logger.error(f"Error sending approval reminder: {e}")
                     counts["errors"] += 1
         
+            # Reminders are queued in this transaction and sent once it commits
+            await session.commit()
+
         except Exception as e:
             logger.error(f"Error in send_approval_reminders: {e}")
             counts["errors"] += 1
@@ -509,3 +494,28 @@ class NotificationService:
 
 # Global instance
 notification_service = NotificationService()
+
+
+async def _send_notification_handler(task) -> Dict[str, Any]:
+    """Background task handler for queued notifications"""
+    notification_id = await notification_service.create_notification(
+        user_email=task.data["user_email"],
+        notification_type=task.data["notification_type"],
+        room_id=task.data.get("room_id"),
+        data=task.data.get("data"),
+        dedup_key=task.data.get("dedup_key"),
+    )
+    if not notification_id:
+        raise RuntimeError(f"Notification {task.data['notification_type']} was not delivered")
+    return {"notification_id": notification_id}
+
+
+background_task_service.register_handler(
+    "send_notification",
+    _send_notification_handler,
+    concurrency=4,
+    priority=TaskPriority.HIGH,
+    max_attempts=3,
+    retry_backoff_seconds=2.0,
+    timeout_seconds=30,
+)
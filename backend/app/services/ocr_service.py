@@ -1,23 +1,150 @@
 """
 OCR Service for STS Clearance system
 Extracts text from PDFs and images for searchability and indexing
+
+Extraction is CPU-bound (PDF parsing, rasterisation, Tesseract) and runs in
+a bounded process pool, never on the event loop. Long extractions go through
+the OCR job queue: jobs are bounded, time-limited and cached by content
+SHA-256. Jobs requested over HTTP are tasks in the durable background queue,
+so any API worker can run them and answer status polls.
 """
 
+import asyncio
+import hashlib
 import io
 import logging
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from enum import Enum
 from pathlib import Path
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from app.services.background_task_service import (BackgroundTask,
+                                                  TaskPriority,
+                                                  background_task_service)
+from app.services.expiry_extractor import expiry_extractor
+
+try:
+    from pypdf import PdfReader
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
 
 try:
     import pytesseract
     from pdf2image import convert_from_bytes
-    from pypdf import PdfReader
     PYTESSERACT_AVAILABLE = True
 except ImportError:
     PYTESSERACT_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+IMAGE_TYPES = [".jpg", ".jpeg", ".png", ".gif", ".tiff"]
+
+# File content handed to pool workers: bytes, or a path the worker reads itself
+Source = Union[bytes, str]
+
+# Background task type for durable OCR jobs
+OCR_TASK_TYPE = "ocr_extract"
+
+
+# ============================================================================
+# POOL WORKERS (module-level so they can be pickled)
+# ============================================================================
+
+def _read_source(source: Source) -> bytes:
+    if isinstance(source, bytes):
+        return source
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def _pdf_text_layer(source: Source) -> List[str]:
+    """Text layer of every page of a PDF (empty string for scanned pages)"""
+    reader = PdfReader(io.BytesIO(_read_source(source)))
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def _ocr_pdf_page(source: Source, page_number: int, timeout: float) -> str:
+    """Rasterise and OCR one PDF page (1-based page number)"""
+    images = convert_from_bytes(
+        _read_source(source), first_page=page_number, last_page=page_number
+    )
+    return "".join(pytesseract.image_to_string(image, timeout=timeout) for image in images)
+
+
+def _ocr_pdf_pages(source: Source, timeout: float) -> List[str]:
+    """Rasterise and OCR every page of a PDF"""
+    images = convert_from_bytes(_read_source(source))
+    return [pytesseract.image_to_string(image, timeout=timeout) for image in images]
+
+
+def _ocr_image(source: Source, timeout: float) -> str:
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(_read_source(source)))
+    return pytesseract.image_to_string(image, timeout=timeout)
+
+
+# ============================================================================
+# JOBS
+# ============================================================================
+
+class OCRJobStatus(Enum):
+    """OCR job execution status states"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class OCRQueueFullError(Exception):
+    """Raised when the OCR job queue is at capacity"""
+
+
+class OCRJob:
+    """Represents one text extraction request"""
+
+    def __init__(
+        self,
+        sha256: str,
+        file_type: str,
+        room_id: Optional[str] = None,
+        document_id: Optional[str] = None,
+    ):
+        self.job_id = str(uuid.uuid4())
+        self.sha256 = sha256
+        self.file_type = file_type
+        self.room_id = room_id
+        self.document_id = document_id
+        self.status = OCRJobStatus.QUEUED
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.completed_at: Optional[datetime] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.cached = False
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert job to dictionary"""
+        return {
+            "job_id": self.job_id,
+            "sha256": self.sha256,
+            "room_id": self.room_id,
+            "document_id": self.document_id,
+            "status": self.status.value,
+            "cached": self.cached,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
 
 class OCRService:
     """
@@ -25,143 +152,466 @@ class OCRService:
     Supports PDFs and images
     """
 
-    def __init__(self, enable_ocr: bool = True):
+    def __init__(
+        self,
+        enable_ocr: bool = True,
+        max_workers: Optional[int] = None,
+        max_queue_size: Optional[int] = None,
+        job_timeout_seconds: Optional[float] = None,
+        cache_max_entries: int = 1024,
+        max_finished_jobs: int = 1000,
+    ):
         """
         Initialize OCR service
 
         Args:
             enable_ocr: Whether to enable OCR features
+            max_workers: Size of the extraction process pool
+            max_queue_size: Jobs that may wait before submissions are refused
+            job_timeout_seconds: Wall-clock limit for a single job
+            cache_max_entries: Results kept in the SHA-256 cache
+            max_finished_jobs: Finished jobs kept for status polling
         """
         self.enable_ocr = enable_ocr and PYTESSERACT_AVAILABLE
         if not PYTESSERACT_AVAILABLE:
             logger.warning("pytesseract not installed. OCR features disabled.")
 
+        self.max_workers = max_workers or int(
+            os.getenv("OCR_MAX_WORKERS", min(4, os.cpu_count() or 1))
+        )
+        self.max_queue_size = max_queue_size or int(os.getenv("OCR_MAX_QUEUE_SIZE", 100))
+        self.job_timeout_seconds = job_timeout_seconds or float(
+            os.getenv("OCR_JOB_TIMEOUT_SECONDS", 300)
+        )
+        self.cache_max_entries = cache_max_entries
+        self.max_finished_jobs = max_finished_jobs
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumers: List[asyncio.Task] = []
+        self._sources: Dict[str, Source] = {}
+        self.jobs: "OrderedDict[str, OCRJob]" = OrderedDict()
+        self._inflight: Dict[str, OCRJob] = {}
+        self._followers: set = set()
+        # Called with each completed job (e.g. to index the text for search)
+        self._completion_listeners: List[Callable[["OCRJob"], Awaitable[None]]] = []
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "rejected": 0,
+            "cache_hits": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Process pool
+    # ------------------------------------------------------------------
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def _gather_pages(self, calls: List[Tuple[Any, ...]]) -> List[Any]:
+        """Run page-level calls in parallel; cancel the rest if one fails"""
+        futures = [asyncio.ensure_future(self._run(*call)) for call in calls]
+        try:
+            return await asyncio.gather(*futures)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    # ------------------------------------------------------------------
+    # Extraction
+    # ------------------------------------------------------------------
+
     async def extract_text_from_file(
-        self, file_content: bytes, file_type: str
+        self, file_content: Source, file_type: str
     ) -> Optional[str]:
         """
         Extract text from file content
 
         Args:
-            file_content: File bytes
+            file_content: File bytes, or a path the pool workers read
             file_type: File extension (e.g., .pdf, .jpg, .png)
 
         Returns:
             Extracted text or None if extraction fails
         """
-        if not self.enable_ocr:
-            return None
-
         try:
-            file_type = file_type.lower()
-
-            if file_type == ".pdf":
-                return await self._extract_from_pdf(file_content)
-            elif file_type in [".jpg", ".jpeg", ".png", ".gif", ".tiff"]:
-                return await self._extract_from_image(file_content)
-            else:
-                return None
-
+            return await self._extract(file_content, file_type)
         except Exception as e:
             logger.error(f"Error extracting text from {file_type} file: {e}")
             return None
 
-    async def _extract_from_pdf(self, file_content: bytes) -> Optional[str]:
+    async def _extract(self, file_content: Source, file_type: str) -> Optional[str]:
+        """Dispatch on file type; errors propagate to the caller"""
+        file_type = file_type.lower()
+
+        if file_type == ".pdf":
+            return await self._extract_from_pdf(file_content)
+        elif file_type in IMAGE_TYPES:
+            return await self._extract_from_image(file_content)
+        else:
+            return None
+
+    async def _extract_from_pdf(self, file_content: Source) -> Optional[str]:
         """
         Extract text from PDF using PyPDF (first try) + OCR (fallback)
 
+        Pages without a text layer are OCR'd individually, in parallel.
+
         Args:
-            file_content: PDF file bytes
+            file_content: PDF file bytes or path
 
         Returns:
             Extracted text or None
         """
-        try:
-            # First try: Use PyPDF for text extraction (fast, no OCR needed)
-            pdf_reader = PdfReader(io.BytesIO(file_content))
-            text = ""
-
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-
-            if text.strip():
-                logger.info(f"Extracted {len(text)} characters from PDF using PyPDF")
-                return text
-
-            # Fallback: Use OCR on PDF images
-            logger.info("No text found in PDF, attempting OCR...")
+        if not PYPDF_AVAILABLE:
             return await self._ocr_pdf_images(file_content)
 
-        except Exception as e:
-            logger.error(f"Error extracting text from PDF: {e}")
-            return None
-
-    async def _ocr_pdf_images(self, file_content: bytes) -> Optional[str]:
+        pages = await self._run(_pdf_text_layer, file_content)
+
+        scanned = [i for i, text in enumerate(pages) if not text.strip()]
+        if scanned and self.enable_ocr:
+            logger.info(f"OCR on {len(scanned)}/{len(pages)} PDF pages without a text layer")
+            ocr_texts = await self._gather_pages([
+                (_ocr_pdf_page, file_content, i + 1, self.job_timeout_seconds)
+                for i in scanned
+            ])
+            for i, text in zip(scanned, ocr_texts):
+                pages[i] = text
+
+        text = "\n".join(pages)
+        if text.strip():
+            logger.info(f"Extracted {len(text)} characters from {len(pages)}-page PDF")
+            return text
+        return None
+
+    async def _ocr_pdf_images(self, file_content: Source) -> Optional[str]:
         """
         Use OCR on PDF converted to images
 
         Args:
-            file_content: PDF file bytes
+            file_content: PDF file bytes or path
 
         Returns:
             Extracted text or None
         """
-        try:
-            if not PYTESSERACT_AVAILABLE:
-                return None
-
-            # Convert PDF to images
-            images = convert_from_bytes(file_content)
-            text = ""
-
-            for i, image in enumerate(images):
-                logger.info(f"Processing page {i + 1}/{len(images)} with OCR...")
-                page_text = pytesseract.image_to_string(image)
-                text += page_text + "\n"
-
-            if text.strip():
-                logger.info(
-                    f"Extracted {len(text)} characters from PDF using OCR on {len(images)} pages"
-                )
-                return text
-
+        if not self.enable_ocr:
             return None
 
-        except Exception as e:
-            logger.error(f"Error performing OCR on PDF: {e}")
-            return None
+        pages = await self._run(_ocr_pdf_pages, file_content, self.job_timeout_seconds)
+        text = "\n".join(pages)
+        if text.strip():
+            logger.info(
+                f"Extracted {len(text)} characters from PDF using OCR on {len(pages)} pages"
+            )
+            return text
+        return None
 
-    async def _extract_from_image(self, file_content: bytes) -> Optional[str]:
+    async def _extract_from_image(self, file_content: Source) -> Optional[str]:
         """
         Extract text from image using OCR
 
         Args:
-            file_content: Image file bytes
+            file_content: Image file bytes or path
 
         Returns:
             Extracted text or None
         """
-        try:
-            if not PYTESSERACT_AVAILABLE:
-                return None
+        if not self.enable_ocr:
+            return None
 
-            from PIL import Image
+        text = await self._run(_ocr_image, file_content, self.job_timeout_seconds)
+        if text.strip():
+            logger.info(f"Extracted {len(text)} characters from image using OCR")
+            return text
+        return None
+
+    # ------------------------------------------------------------------
+    # Job queue
+    # ------------------------------------------------------------------
+
+    async def submit_job(
+        self,
+        file_content: Union[bytes, Path],
+        file_type: str,
+        sha256: Optional[str] = None,
+        room_id: Optional[str] = None,
+        document_id: Optional[str] = None,
+    ) -> OCRJob:
+        """
+        Queue a text extraction job
 
-            # Load image
-            image = Image.open(io.BytesIO(file_content))
+        Content already extracted (same SHA-256) completes immediately from
+        the cache, and content already queued shares the pending job's work.
 
-            # Extract text
-            text = pytesseract.image_to_string(image)
+        Raises:
+            OCRQueueFullError: If the queue is at capacity
+        """
+        source: Source = str(file_content) if isinstance(file_content, Path) else file_content
+        if sha256 is None:
+            sha256 = await asyncio.to_thread(
+                lambda: hashlib.sha256(_read_source(source)).hexdigest()
+            )
+
+        job = OCRJob(sha256, file_type.lower(), room_id=room_id, document_id=document_id)
+        self.stats["submitted"] += 1
+
+        cached = self._cache.get(sha256)
+        if cached is not None:
+            self._cache.move_to_end(sha256)
+            self.stats["cache_hits"] += 1
+            job.cached = True
+            self._finish(job, OCRJobStatus.COMPLETED, result=cached)
+            self._remember(job)
+            return job
+
+        self._ensure_consumers()
+        leader = self._inflight.get(sha256)
+        if leader is None:
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                self.stats["rejected"] += 1
+                raise OCRQueueFullError(
+                    f"OCR queue is full ({self.max_queue_size} jobs waiting)"
+                )
+            self._inflight[sha256] = job
+            self._sources[job.job_id] = source
+        else:
+            follower = asyncio.create_task(self._follow(leader, job))
+            self._followers.add(follower)
+            follower.add_done_callback(self._followers.discard)
+
+        self._remember(job)
+        return job
+
+    def add_completion_listener(self, listener: Callable[[OCRJob], Awaitable[None]]) -> None:
+        """Register a coroutine function run for every successfully completed job"""
+        if listener not in self._completion_listeners:
+            self._completion_listeners.append(listener)
+
+    def get_job(self, job_id: str) -> Optional[OCRJob]:
+        """Get a job by id"""
+        return self.jobs.get(job_id)
+
+    async def wait_for_job(self, job_id: str, timeout: Optional[float] = None) -> OCRJob:
+        """Wait until a job finishes"""
+        job = self.jobs[job_id]
+        await asyncio.wait_for(job.done.wait(), timeout)
+        return job
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue and cache counters"""
+        return {
+            **self.stats,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "in_flight": len(self._inflight),
+            "cache_entries": len(self._cache),
+            "max_workers": self.max_workers,
+            "max_queue_size": self.max_queue_size,
+        }
+
+    async def shutdown(self) -> None:
+        """Stop the job consumers and the process pool"""
+        for consumer in self._consumers:
+            consumer.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._consumers = []
+        self._queue = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _ensure_consumers(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        if not self._consumers:
+            self._consumers = [
+                asyncio.create_task(self._consume())
+                for _ in range(self.max_workers)
+            ]
+
+    async def _consume(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: OCRJob) -> None:
+        source = self._sources.pop(job.job_id)
+        job.status = OCRJobStatus.RUNNING
+        job.started_at = datetime.utcnow()
+        try:
+            text = await asyncio.wait_for(
+                self._extract(source, job.file_type),
+                timeout=self.job_timeout_seconds,
+            )
+            expiry_date, confidence = expiry_extractor.extract_expiry_date(text or "")
+            result = {
+                "text": text,
+                "characters": len(text or ""),
+                "expiry_date": expiry_date.isoformat() if expiry_date else None,
+                "expiry_confidence": confidence,
+            }
+            self._cache_result(job.sha256, result)
+            self.stats["completed"] += 1
+            self._finish(job, OCRJobStatus.COMPLETED, result=result)
+        except asyncio.TimeoutError:
+            self.stats["timed_out"] += 1
+            self.stats["failed"] += 1
+            self._finish(
+                job, OCRJobStatus.FAILED,
+                error=f"Timed out after {self.job_timeout_seconds:.0f}s",
+            )
+        except Exception as e:
+            logger.error(f"OCR job {job.job_id} failed: {e}")
+            self.stats["failed"] += 1
+            self._finish(job, OCRJobStatus.FAILED, error=str(e))
+        finally:
+            self._inflight.pop(job.sha256, None)
+
+    async def _follow(self, leader: OCRJob, job: OCRJob) -> None:
+        job.status = OCRJobStatus.RUNNING
+        job.started_at = datetime.utcnow()
+        await leader.done.wait()
+        job.cached = True
+        self._finish(job, leader.status, result=leader.result, error=leader.error)
+
+    def _finish(
+        self,
+        job: OCRJob,
+        status: OCRJobStatus,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        job.status = status
+        job.result = result
+        job.error = error
+        job.completed_at = datetime.utcnow()
+        job.done.set()
+        if status == OCRJobStatus.COMPLETED:
+            for listener in self._completion_listeners:
+                task = asyncio.create_task(self._notify(listener, job))
+                self._followers.add(task)
+                task.add_done_callback(self._followers.discard)
+
+    async def _notify(self, listener: Callable[[OCRJob], Awaitable[None]], job: OCRJob) -> None:
+        try:
+            await listener(job)
+        except Exception as e:
+            logger.error(f"OCR completion listener failed for job {job.job_id}: {e}")
+
+    def _cache_result(self, sha256: str, result: Dict[str, Any]) -> None:
+        self._cache[sha256] = result
+        self._cache.move_to_end(sha256)
+        while len(self._cache) > self.cache_max_entries:
+            self._cache.popitem(last=False)
+
+    def _remember(self, job: OCRJob) -> None:
+        self.jobs[job.job_id] = job
+        while len(self.jobs) > self.max_finished_jobs:
+            oldest_id, oldest = next(iter(self.jobs.items()))
+            if not oldest.done.is_set():
+                break
+            self.jobs.pop(oldest_id)
+
+    # ------------------------------------------------------------------
+    # Durable jobs
+    # ------------------------------------------------------------------
+
+    async def enqueue_job(
+        self,
+        path: Path,
+        file_type: str,
+        room_id: str,
+        document_id: str,
+        sha256: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Queue extraction of a stored file as a durable task
 
-            if text.strip():
-                logger.info(f"Extracted {len(text)} characters from image using OCR")
-                return text
+        The task id carries the room, so status polls are scoped to it on
+        any worker. A request for a document that is already queued returns
+        that job.
 
+        Raises:
+            OCRQueueFullError: If max_queue_size jobs are already waiting
+        """
+        depth = await background_task_service.backend.stats([OCR_TASK_TYPE])
+        if sum(depth[OCR_TASK_TYPE]["pending"].values()) >= self.max_queue_size:
+            self.stats["rejected"] += 1
+            raise OCRQueueFullError(
+                f"OCR queue is full ({self.max_queue_size} jobs waiting)"
+            )
+
+        task_id = await background_task_service.create_task(
+            OCR_TASK_TYPE,
+            {
+                "path": str(path),
+                "file_type": file_type,
+                "sha256": sha256,
+                "room_id": room_id,
+                "document_id": document_id,
+            },
+            task_id=f"ocr-{room_id}-{uuid.uuid4().hex}",
+            dedup_key=f"ocr:{document_id}:{sha256 or path}",
+        )
+        return await self.get_queued_job(room_id, task_id)
+
+    async def get_queued_job(self, room_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a durable job, shaped like OCRJob.to_dict; None if not in this room"""
+        if not job_id.startswith(f"ocr-{room_id}-"):
             return None
-
-        except Exception as e:
-            logger.error(f"Error extracting text from image: {e}")
+        task = await background_task_service.get_task_status(job_id)
+        if task is None:
             return None
+        if task["status"] == "completed" and task["result"]:
+            return {**task["result"], "job_id": job_id}
+        return {
+            "job_id": job_id,
+            "room_id": room_id,
+            "status": {"pending": "queued", "cancelled": "failed"}.get(
+                task["status"], task["status"]
+            ),
+            "cached": False,
+            "attempts": task["attempts"],
+            "created_at": task["created_at"],
+            "started_at": task["started_at"],
+            "completed_at": task["completed_at"],
+            "result": None,
+            "error": task["error"],
+        }
+
+    async def run_task(self, task: BackgroundTask) -> Dict[str, Any]:
+        """Background task handler: run a durable job through this process's pool"""
+        data = task.data
+        job = await self.submit_job(
+            Path(data["path"]),
+            data["file_type"],
+            sha256=data.get("sha256"),
+            room_id=data["room_id"],
+            document_id=data["document_id"],
+        )
+        await job.done.wait()
+        if job.status == OCRJobStatus.FAILED:
+            raise RuntimeError(job.error)
+        return job.to_dict()
+
+    # ------------------------------------------------------------------
+    # Indexing helpers
+    # ------------------------------------------------------------------
 
     async def extract_and_index(
         self, file_content: bytes, file_type: str, document_id: str, session
@@ -227,4 +677,13 @@ class OCRService:
 
 
 # Global OCR service instance
-ocr_service = OCRService(enable_ocr=True)
\ No newline at end of file
+ocr_service = OCRService(enable_ocr=True)
+
+background_task_service.register_handler(
+    OCR_TASK_TYPE,
+    ocr_service.run_task,
+    concurrency=ocr_service.max_workers,
+    priority=TaskPriority.LOW,
+    max_attempts=3,
+    retry_backoff_seconds=5.0,
+)
@@ -0,0 +1,137 @@
+"""
+Password service for STS Clearance system
+bcrypt hashing and verification off the event loop
+
+A bcrypt call costs a few hundred milliseconds of CPU. Calls run in a small
+thread pool (bcrypt releases the GIL while it hashes), so a wave of logins
+never stalls the event loop. At most ``max_queue`` calls may wait for a
+worker; beyond that new calls fail fast with PasswordServiceBusy instead of
+piling up. Hashes made with an older cost are upgraded on successful login.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.monitoring.latency import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordServiceBusy(Exception):
+    """Too many hashing calls are already waiting for a worker"""
+
+
+class PasswordService:
+    """Bounded worker pool for bcrypt hash/verify calls"""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        rounds: Optional[int] = None,
+        rehash_on_login: Optional[bool] = None,
+    ):
+        self.workers = workers or int(
+            os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))
+        )
+        self.max_queue = max_queue or int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 200))
+        self.rounds = rounds or int(os.getenv("BCRYPT_ROUNDS", 12))
+        if rehash_on_login is None:
+            rehash_on_login = os.getenv("PASSWORD_REHASH_ON_LOGIN", "true").lower() == "true"
+        self.rehash_on_login = rehash_on_login
+
+        # Hashes with fewer (or more) rounds than configured need an update
+        self.context = CryptContext(
+            schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=self.rounds
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # Metrics
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.hash_latency = LatencyHistogram()
+
+    async def _run(self, func, *args):
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise PasswordServiceBusy(f"{self.waiting} password hashing calls already waiting")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="password-hash"
+            )
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        # Waiting here rather than in the executor queue keeps the backlog
+        # visible and cancellable
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.hash_latency.observe((time.perf_counter() - start) * 1000)
+            self.active -= 1
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        """bcrypt hash of a password at the configured cost"""
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        """Whether a password matches a stored hash"""
+        return await self._run(self.context.verify, password, password_hash)
+
+    async def verify_and_update(
+        self, password: str, password_hash: str
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password; also return a new hash when the stored one uses
+        outdated parameters and ``rehash_on_login`` is on (else None)
+        """
+        if not self.rehash_on_login:
+            return await self.verify(password, password_hash), None
+        verified, new_hash = await self._run(
+            self.context.verify_and_update, password, password_hash
+        )
+        if new_hash:
+            self.rehashed += 1
+        return verified, new_hash
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "rounds": self.rounds,
+            "rehash_on_login": self.rehash_on_login,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "latency": self.hash_latency.get_stats(),
+        }
+
+    def shutdown(self) -> None:
+        """Stop the worker threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._slots = None
+
+
+# Global password service instance
+password_service = PasswordService()
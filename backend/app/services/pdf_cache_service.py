@@ -4,9 +4,11 @@ Implements dual-layer caching: in-memory + disk cache
 Day 3 Enhancement: Content-addressed storage by SHA256 hash to avoid duplicate PDFs
 """
 
+import asyncio
 import hashlib
 import json
 import logging
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, Optional, Tuple, Any
@@ -54,12 +56,15 @@ class CacheEntry:
 class PDFCacheService:
     """
     Dual-layer PDF cache service: in-memory + disk
-    Content-addressed storage using SHA256 hashes
+    Content-addressed storage using SHA256 hashes of the snapshot input
     """
     
     def __init__(self, max_memory_cache_size_mb: int = 100):
-        self.memory_cache: Dict[str, CacheEntry] = {}
+        # LRU order: least recently used first
+        self.memory_cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.memory_bytes = 0
         self.max_memory_size = max_memory_cache_size_mb * 1024 * 1024
+        self._inflight: Dict[str, asyncio.Future] = {}
         self.cache_dir = Path("uploads/.pdf_cache")
         self.metadata_file = self.cache_dir / "cache_metadata.json"
         self.cache_dir.mkdir(parents=True, exist_ok=True)
@@ -82,8 +87,10 @@ class PDFCacheService:
         """
         Get cached PDF or generate new one
         
+        Concurrent requests for the same content share one generation.
+
         Args:
-            content_hash: SHA256 hash of content
+            content_hash: Key from calculate_content_hash
             generator_func: Async function to generate PDF
             metadata: Optional metadata to store with cache
             **generator_kwargs: Arguments to pass to generator function
@@ -95,6 +102,7 @@ class PDFCacheService:
         if content_hash in self.memory_cache:
             self.memory_hits += 1
             entry = self.memory_cache[content_hash]
+            self.memory_cache.move_to_end(content_hash)
             entry.last_accessed = datetime.utcnow()
             entry.access_count += 1
             logger.debug(f"Memory cache hit for {content_hash[:16]}... (access #{entry.access_count})")
@@ -112,24 +120,37 @@ class PDFCacheService:
             
             return disk_content, True
         
+        # Same content already being generated - wait for it
+        pending = self._inflight.get(content_hash)
+        if pending is not None:
+            self.memory_hits += 1
+            return await asyncio.shield(pending), True
+        
         # Cache miss - generate new PDF
         self.cache_misses += 1
         logger.debug(f"Cache miss for {content_hash[:16]}... - generating PDF")
         
-        pdf_content = await generator_func(**generator_kwargs)
-        
-        # Verify hash matches (security check)
-        actual_hash = hashlib.sha256(pdf_content).hexdigest()
-        if actual_hash != content_hash:
-            logger.warning(
-                f"Generated PDF hash mismatch. Expected {content_hash}, "
-                f"got {actual_hash}. Using actual hash."
-            )
-        
-        # Store in both caches
-        entry = CacheEntry(actual_hash, pdf_content, metadata)
-        await self._add_to_memory_cache(entry)
-        await self._add_to_disk_cache(entry)
+        pending = asyncio.get_running_loop().create_future()
+        self._inflight[content_hash] = pending
+        try:
+            pdf_content = await generator_func(**generator_kwargs)
+            
+            # Store in both caches, keyed by the input hash
+            metadata = {**(metadata or {}), "pdf_sha256": hashlib.sha256(pdf_content).hexdigest()}
+            entry = CacheEntry(content_hash, pdf_content, metadata)
+            await self._add_to_memory_cache(entry)
+            await self._add_to_disk_cache(entry)
+            pending.set_result(pdf_content)
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            # Waiters re-raise; silence "exception never retrieved" if there are none
+            pending.exception()
+            raise
+        finally:
+            self._inflight.pop(content_hash, None)
         
         return pdf_content, False
 
@@ -138,8 +159,9 @@ class PDFCacheService:
         success = False
         
         # Remove from memory
-        if content_hash in self.memory_cache:
-            del self.memory_cache[content_hash]
+        entry = self.memory_cache.pop(content_hash, None)
+        if entry is not None:
+            self.memory_bytes -= len(entry.pdf_content)
             success = True
         
         # Remove from disk
@@ -153,8 +175,8 @@ class PDFCacheService:
 
     async def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
-        total_memory_used = sum(len(e.pdf_content) for e in self.memory_cache.values())
-        total_disk_used = await self._calculate_disk_usage()
+        total_memory_used = self.memory_bytes
+        total_disk_used = await asyncio.to_thread(self._calculate_disk_usage)
         
         total_requests = self.memory_hits + self.disk_hits + self.cache_misses
         hit_rate = (
@@ -187,11 +209,12 @@ class PDFCacheService:
             if entry.last_accessed < cutoff_time
         ]
         for hash_key in entries_to_remove:
-            del self.memory_cache[hash_key]
+            entry = self.memory_cache.pop(hash_key)
+            self.memory_bytes -= len(entry.pdf_content)
             count += 1
         
         # Clear from disk
-        disk_removed = await self._clear_old_disk_entries(cutoff_time)
+        disk_removed = await asyncio.to_thread(self._clear_old_disk_entries, cutoff_time)
         count += disk_removed
         
         logger.info(f"Cleared {count} old cache entries")
@@ -205,65 +228,65 @@ class PDFCacheService:
         include_activity: bool
     ) -> str:
         """
-        Calculate SHA256 hash of PDF content parameters
-        Used to detect duplicate snapshots
+        Calculate SHA256 hash of the full snapshot input
+        
+        Canonical JSON (sorted keys, no whitespace) of everything the
+        renderer sees, so any change to documents, approvals, activity or
+        snapshot metadata produces a new key.
         """
-        # Create a deterministic string from content parameters
-        content_key = json.dumps({
-            "room_id": room_data.get("id"),
-            "room_title": room_data.get("title"),
-            "room_location": room_data.get("location"),
-            "room_sts_eta": str(room_data.get("sts_eta")),
-            "parties": sorted([
-                f"{p.get('name')}:{p.get('email')}" 
-                for p in room_data.get("parties", [])
-            ]),
-            "vessels": sorted([
-                f"{v.get('name')}:{v.get('imo_number')}"
-                for v in room_data.get("vessels", [])
-            ]),
-            "include_documents": include_documents,
-            "include_approvals": include_approvals,
-            "include_activity": include_activity,
-        }, sort_keys=True)
+        canonical = json.dumps(
+            {
+                "room_data": room_data,
+                "include_documents": include_documents,
+                "include_approvals": include_approvals,
+                "include_activity": include_activity,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=str,
+        )
         
-        return hashlib.sha256(content_key.encode()).hexdigest()
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
 
     async def _add_to_memory_cache(self, entry: CacheEntry) -> None:
         """Add entry to memory cache with eviction if needed"""
-        current_size = sum(len(e.pdf_content) for e in self.memory_cache.values())
         entry_size = len(entry.pdf_content)
+        if entry_size > self.max_memory_size:
+            return
+        
+        previous = self.memory_cache.pop(entry.content_hash, None)
+        if previous is not None:
+            self.memory_bytes -= len(previous.pdf_content)
         
         # Check if we need to evict
-        if current_size + entry_size > self.max_memory_size:
-            await self._evict_from_memory_cache(entry_size)
+        if self.memory_bytes + entry_size > self.max_memory_size:
+            await self._evict_from_memory_cache(
+                self.memory_bytes + entry_size - self.max_memory_size
+            )
         
         self.memory_cache[entry.content_hash] = entry
+        self.memory_bytes += entry_size
 
     async def _evict_from_memory_cache(self, needed_space: int) -> None:
         """Evict least recently used entries to make space"""
-        if not self.memory_cache:
-            return
-        
-        # Sort by last_accessed time (LRU)
-        sorted_entries = sorted(
-            self.memory_cache.items(),
-            key=lambda x: x[1].last_accessed
-        )
-        
         freed_space = 0
-        for hash_key, entry in sorted_entries:
-            if freed_space >= needed_space:
-                break
-            
-            freed_space += len(entry.pdf_content)
-            del self.memory_cache[hash_key]
+        evicted = 0
+        while self.memory_cache and freed_space < needed_space:
+            _, entry = self.memory_cache.popitem(last=False)
+            entry_size = len(entry.pdf_content)
+            freed_space += entry_size
+            self.memory_bytes -= entry_size
             self.cache_evictions += 1
+            evicted += 1
         
-        logger.info(f"Evicted {self.cache_evictions} entries from memory cache")
+        logger.info(f"Evicted {evicted} entries from memory cache")
 
     async def _add_to_disk_cache(self, entry: CacheEntry) -> None:
         """Add entry to disk cache"""
+        await asyncio.to_thread(self._write_disk_entry, entry)
+
+    def _write_disk_entry(self, entry: CacheEntry) -> None:
         try:
             # Store PDF content
             pdf_file = self.cache_dir / f"{entry.content_hash}.pdf"
@@ -281,6 +304,9 @@ class PDFCacheService:
 
     async def _load_from_disk(self, content_hash: str) -> Optional[bytes]:
         """Load PDF from disk cache"""
+        return await asyncio.to_thread(self._read_disk_entry, content_hash)
+
+    def _read_disk_entry(self, content_hash: str) -> Optional[bytes]:
         try:
             pdf_file = self.cache_dir / f"{content_hash}.pdf"
             if pdf_file.exists():
@@ -293,6 +319,9 @@ class PDFCacheService:
 
     async def _remove_from_disk(self, content_hash: str) -> bool:
         """Remove PDF from disk cache"""
+        return await asyncio.to_thread(self._delete_disk_entry, content_hash)
+
+    def _delete_disk_entry(self, content_hash: str) -> bool:
         try:
             pdf_file = self.cache_dir / f"{content_hash}.pdf"
             if pdf_file.exists():
@@ -306,7 +335,7 @@ class PDFCacheService:
         
         return False
 
-    async def _calculate_disk_usage(self) -> int:
+    def _calculate_disk_usage(self) -> int:
         """Calculate total disk space used by cache"""
         total = 0
         try:
@@ -318,7 +347,7 @@ class PDFCacheService:
         
         return total
 
-    async def _clear_old_disk_entries(self, cutoff_time: datetime) -> int:
+    def _clear_old_disk_entries(self, cutoff_time: datetime) -> int:
         """Clear old entries from disk cache"""
         count = 0
         try:
@@ -3,8 +3,11 @@ PDF Generator service for STS Clearance system
 Generates professional PDFs for room snapshots with ReportLab
 """
 
+import asyncio
 import io
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
@@ -524,5 +527,87 @@ class PDFGenerator:
         return elements
 
 
+def _render_room_snapshot(
+    room_data: Dict[str, Any],
+    include_documents: bool,
+    include_activity: bool,
+    include_approvals: bool,
+) -> bytes:
+    """Pool worker: render a snapshot with the worker process's generator"""
+    return pdf_generator.generate_room_snapshot(
+        room_data=room_data,
+        include_documents=include_documents,
+        include_activity=include_activity,
+        include_approvals=include_approvals,
+    )
+
+
+class PDFRenderPool:
+    """
+    Renders snapshots in worker processes so ReportLab never runs on the
+    event loop. At most ``max_concurrency`` renders run at once; further
+    requests wait for a slot.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_concurrency: Optional[int] = None):
+        self.max_workers = max_workers or int(
+            os.getenv("PDF_RENDER_WORKERS", min(2, os.cpu_count() or 1))
+        )
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("PDF_RENDER_MAX_CONCURRENCY", self.max_workers)
+        )
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active_renders = 0
+        self.completed_renders = 0
+
+    async def render_room_snapshot(
+        self,
+        room_data: Dict[str, Any],
+        include_documents: bool = True,
+        include_activity: bool = True,
+        include_approvals: bool = True,
+    ) -> bytes:
+        """Render a room snapshot PDF in the process pool"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            self.active_renders += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    self._executor,
+                    _render_room_snapshot,
+                    room_data,
+                    include_documents,
+                    include_activity,
+                    include_approvals,
+                )
+            finally:
+                self.active_renders -= 1
+                self.completed_renders += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "active_renders": self.active_renders,
+            "completed_renders": self.completed_renders,
+        }
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._semaphore = None
+
+
 # Global PDF generator instance
-pdf_generator = PDFGenerator()
\ No newline at end of file
+pdf_generator = PDFGenerator()
+
+# Global PDF render pool instance
+pdf_render_pool = PDFRenderPool()
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+Room Metrics Engine
+
+Set-based aggregation of per-room document, approval and party data.
+Loads everything a dashboard projection needs for a set of rooms in a
+fixed number of grouped queries, independent of how many rooms there are.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Approval, Document, Party
+
+logger = logging.getLogger(__name__)
+
+# Approval statuses that still wait for a decision
+PENDING_APPROVAL_STATUSES = ("pending", "under_review")
+
+# Default age after which a pending approval counts as stuck
+STUCK_APPROVAL_AGE = timedelta(hours=48)
+
+# Rooms per IN (...) clause; stays under the SQLite/asyncpg bind parameter limits
+ROOM_ID_CHUNK_SIZE = 10000
+
+
+@dataclass
+class PartySummary:
+    """Lightweight party row used by dashboard projections"""
+    id: str
+    role: str
+    name: str
+    email: str
+
+
+@dataclass
+class RoomAggregate:
+    """In-memory aggregate of one room's documents, approvals and parties"""
+    room_id: str
+    documents_by_status: Dict[str, int] = field(default_factory=dict)
+    approvals_by_status: Dict[str, int] = field(default_factory=dict)
+    # (party_role, approval_status) -> count
+    approvals_by_party_role: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    stuck_approvals: int = 0
+    parties: List[PartySummary] = field(default_factory=list)
+    # party_role -> approval updated_at timestamps (only loaded on request)
+    approval_timestamps_by_role: Dict[str, List[datetime]] = field(default_factory=dict)
+
+    @property
+    def total_documents(self) -> int:
+        return sum(self.documents_by_status.values())
+
+    @property
+    def total_approvals(self) -> int:
+        return sum(self.approvals_by_status.values())
+
+    def document_count(self, *statuses: str) -> int:
+        return sum(self.documents_by_status.get(s, 0) for s in statuses)
+
+    def approval_count(self, *statuses: str) -> int:
+        return sum(self.approvals_by_status.get(s, 0) for s in statuses)
+
+    def party_approval_count(self, role: str, *statuses: str) -> int:
+        return sum(self.approvals_by_party_role.get((role, s), 0) for s in statuses)
+
+    def parties_with_role(self, role: str) -> List[PartySummary]:
+        return [p for p in self.parties if p.role == role]
+
+    def first_party_name(self, role: str) -> Optional[str]:
+        parties = self.parties_with_role(role)
+        return parties[0].name if parties else None
+
+
+class RoomMetricsEngine:
+    """
+    Batch loader for per-room aggregates.
+
+    All role projections read from the table returned by ``load`` instead of
+    issuing COUNT queries per room.
+    """
+
+    def __init__(self, session: AsyncSession, now: Optional[datetime] = None):
+        self.session = session
+        self.now = now or datetime.utcnow()
+
+    async def load(
+        self,
+        room_ids: Iterable[str],
+        include_approval_timestamps: bool = False,
+        stuck_after: timedelta = STUCK_APPROVAL_AGE,
+    ) -> Dict[str, RoomAggregate]:
+        """
+        Build the aggregate table for the given rooms.
+
+        Issues three grouped queries per chunk of room IDs (documents,
+        approvals, parties) plus one when approval timestamps are requested.
+        """
+        ids = list(dict.fromkeys(room_ids))
+        table: Dict[str, RoomAggregate] = {rid: RoomAggregate(room_id=rid) for rid in ids}
+        if not ids:
+            return table
+
+        stuck_cutoff = self.now - stuck_after
+        for start in range(0, len(ids), ROOM_ID_CHUNK_SIZE):
+            chunk = ids[start:start + ROOM_ID_CHUNK_SIZE]
+            await self._load_document_counts(table, chunk)
+            await self._load_approval_counts(table, chunk, stuck_cutoff)
+            await self._load_parties(table, chunk)
+            if include_approval_timestamps:
+                await self._load_approval_timestamps(table, chunk)
+
+        return table
+
+    async def _load_document_counts(self, table: Dict[str, RoomAggregate], room_ids: List[str]) -> None:
+        stmt = (
+            select(Document.room_id, Document.status, func.count(Document.id))
+            .where(Document.room_id.in_(room_ids))
+            .group_by(Document.room_id, Document.status)
+        )
+        result = await self.session.execute(stmt)
+        for room_id, status, count in result.all():
+            table[room_id].documents_by_status[status or "missing"] = count
+
+    async def _load_approval_counts(
+        self, table: Dict[str, RoomAggregate], room_ids: List[str], stuck_cutoff: datetime
+    ) -> None:
+        stuck_case = case(
+            (
+                and_(
+                    Approval.status.in_(PENDING_APPROVAL_STATUSES),
+                    Approval.updated_at <= stuck_cutoff,
+                ),
+                1,
+            ),
+            else_=0,
+        )
+        stmt = (
+            select(
+                Approval.room_id,
+                Party.role,
+                Approval.status,
+                func.count(Approval.id),
+                func.sum(stuck_case),
+            )
+            .outerjoin(Party, Approval.party_id == Party.id)
+            .where(Approval.room_id.in_(room_ids))
+            .group_by(Approval.room_id, Party.role, Approval.status)
+        )
+        result = await self.session.execute(stmt)
+        for room_id, party_role, status, count, stuck in result.all():
+            aggregate = table[room_id]
+            status = status or "pending"
+            aggregate.approvals_by_status[status] = aggregate.approvals_by_status.get(status, 0) + count
+            if party_role:
+                key = (party_role, status)
+                aggregate.approvals_by_party_role[key] = aggregate.approvals_by_party_role.get(key, 0) + count
+            aggregate.stuck_approvals += int(stuck or 0)
+
+    async def _load_parties(self, table: Dict[str, RoomAggregate], room_ids: List[str]) -> None:
+        stmt = (
+            select(Party.id, Party.room_id, Party.role, Party.name, Party.email)
+            .where(Party.room_id.in_(room_ids))
+        )
+        result = await self.session.execute(stmt)
+        for party_id, room_id, role, name, email in result.all():
+            table[room_id].parties.append(
+                PartySummary(id=str(party_id), role=role, name=name, email=email)
+            )
+
+    async def _load_approval_timestamps(self, table: Dict[str, RoomAggregate], room_ids: List[str]) -> None:
+        stmt = (
+            select(Approval.room_id, Party.role, Approval.updated_at)
+            .join(Party, Approval.party_id == Party.id)
+            .where(
+                and_(
+                    Approval.room_id.in_(room_ids),
+                    Approval.updated_at.isnot(None),
+                )
+            )
+        )
+        result = await self.session.execute(stmt)
+        grouped: Dict[str, Dict[str, List[datetime]]] = defaultdict(lambda: defaultdict(list))
+        for room_id, role, updated_at in result.all():
+            grouped[room_id][role].append(updated_at)
+        for room_id, by_role in grouped.items():
+            table[room_id].approval_timestamps_by_role = dict(by_role)
@@ -0,0 +1,224 @@
+"""
+Room Readiness service for STS Clearance system
+Maintains the materialized room_readiness projection on write
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Approval, Document, DocumentType, Room, RoomReadiness
+
+logger = logging.getLogger(__name__)
+
+# Document statuses that count as resolved for required documents
+RESOLVED_STATUSES = ("approved", "under_review")
+
+# Document status -> RoomReadiness column
+DOCUMENT_STATUS_COLUMNS = {
+    "missing": "missing_documents",
+    "under_review": "under_review_documents",
+    "approved": "approved_documents",
+    "rejected": "rejected_documents",
+    "expired": "expired_documents",
+}
+
+# Approval status -> RoomReadiness column
+APPROVAL_STATUS_COLUMNS = {
+    "pending": "pending_approvals",
+    "approved": "approved_approvals",
+    "rejected": "rejected_approvals",
+}
+
+# Rooms recomputed per grouped query during a full rebuild
+REBUILD_CHUNK_SIZE = 1000
+
+COUNTER_COLUMNS = (
+    ["total_documents", "required_documents", "resolved_required_documents", "total_approvals"]
+    + list(DOCUMENT_STATUS_COLUMNS.values())
+    + list(APPROVAL_STATUS_COLUMNS.values())
+)
+
+
+class RoomReadinessService:
+    """
+    Service for the per-room readiness projection.
+
+    Writers call ``refresh`` before committing so the projection changes in
+    the same transaction as the documents/approvals it summarizes.
+    """
+
+    async def refresh(self, session: AsyncSession, room_id: str) -> RoomReadiness:
+        """
+        Recompute the readiness row for one room without committing.
+
+        Pending ORM changes are flushed first so the counters include them.
+        """
+        await session.flush()
+        rows = await self._compute(session, [room_id])
+        return await self._upsert(session, room_id, rows.get(room_id, {}))
+
+    async def get(self, session: AsyncSession, room_id: str) -> RoomReadiness:
+        """Primary-key lookup, building the row on first access"""
+        readiness = await session.get(RoomReadiness, room_id)
+        if readiness is None:
+            readiness = await self.refresh(session, room_id)
+            await session.commit()
+        return readiness
+
+    async def get_many(
+        self, session: AsyncSession, room_ids: Iterable[str]
+    ) -> Dict[str, RoomReadiness]:
+        """Readiness rows for several rooms, building any that are missing"""
+        ids = list(dict.fromkeys(str(rid) for rid in room_ids))
+        if not ids:
+            return {}
+
+        result = await session.execute(
+            select(RoomReadiness).where(RoomReadiness.room_id.in_(ids))
+        )
+        readiness = {str(r.room_id): r for r in result.scalars().all()}
+
+        missing = [rid for rid in ids if rid not in readiness]
+        if missing:
+            computed = await self._compute(session, missing)
+            for rid in missing:
+                readiness[rid] = await self._upsert(session, rid, computed.get(rid, {}))
+            await session.commit()
+
+        return readiness
+
+    async def rebuild_all(self, session: AsyncSession) -> int:
+        """
+        Reconcile the whole projection from the documents/approvals tables.
+
+        Returns the number of rooms rebuilt. The caller commits.
+        """
+        room_ids = [str(rid) for rid in (await session.execute(select(Room.id))).scalars().all()]
+
+        # Drop rows for rooms that no longer exist
+        await session.execute(
+            delete(RoomReadiness).where(RoomReadiness.room_id.notin_(select(Room.id)))
+        )
+
+        for start in range(0, len(room_ids), REBUILD_CHUNK_SIZE):
+            chunk = room_ids[start:start + REBUILD_CHUNK_SIZE]
+            computed = await self._compute(session, chunk)
+            for room_id in chunk:
+                await self._upsert(session, room_id, computed.get(room_id, {}))
+
+        logger.info(f"Rebuilt room readiness for {len(room_ids)} rooms")
+        return len(room_ids)
+
+    async def remove(self, session: AsyncSession, room_id: str) -> None:
+        """Delete the readiness row of a room being deleted (no commit)"""
+        await session.execute(delete(RoomReadiness).where(RoomReadiness.room_id == room_id))
+
+    @staticmethod
+    def to_dict(readiness: RoomReadiness) -> Dict:
+        """Serialize a readiness row for API responses"""
+        progress = 100.0
+        if readiness.required_documents:
+            progress = round(
+                readiness.resolved_required_documents / readiness.required_documents * 100, 1
+            )
+        return {
+            "room_id": str(readiness.room_id),
+            "documents": {
+                "total": readiness.total_documents,
+                "missing": readiness.missing_documents,
+                "under_review": readiness.under_review_documents,
+                "approved": readiness.approved_documents,
+                "rejected": readiness.rejected_documents,
+                "expired": readiness.expired_documents,
+            },
+            "required_documents": readiness.required_documents,
+            "resolved_required_documents": readiness.resolved_required_documents,
+            "progress_percentage": progress,
+            "approvals": {
+                "total": readiness.total_approvals,
+                "pending": readiness.pending_approvals,
+                "approved": readiness.approved_approvals,
+                "rejected": readiness.rejected_approvals,
+            },
+            "oldest_pending_approval_at": readiness.oldest_pending_approval_at,
+            "next_expiry_at": readiness.next_expiry_at,
+            "updated_at": readiness.updated_at,
+        }
+
+    async def _compute(self, session: AsyncSession, room_ids: List[str]) -> Dict[str, Dict]:
+        """Grouped aggregation of documents and approvals for the given rooms"""
+        counters: Dict[str, Dict] = defaultdict(lambda: {column: 0 for column in COUNTER_COLUMNS})
+        if not room_ids:
+            return counters
+
+        not_expired_expiry = case(
+            (Document.status != "expired", Document.expires_on), else_=None
+        )
+        docs_result = await session.execute(
+            select(
+                Document.room_id,
+                Document.status,
+                DocumentType.required,
+                func.count(Document.id),
+                func.min(not_expired_expiry),
+            )
+            .outerjoin(DocumentType, Document.type_id == DocumentType.id)
+            .where(Document.room_id.in_(room_ids))
+            .group_by(Document.room_id, Document.status, DocumentType.required)
+        )
+        for room_id, doc_status, required, count, next_expiry in docs_result.all():
+            room_counters = counters[str(room_id)]
+            room_counters["total_documents"] += count
+            column = DOCUMENT_STATUS_COLUMNS.get(doc_status or "missing")
+            if column:
+                room_counters[column] += count
+            if required:
+                room_counters["required_documents"] += count
+                if doc_status in RESOLVED_STATUSES:
+                    room_counters["resolved_required_documents"] += count
+            if next_expiry is not None:
+                current = room_counters.get("next_expiry_at")
+                room_counters["next_expiry_at"] = min(current, next_expiry) if current else next_expiry
+
+        approvals_result = await session.execute(
+            select(
+                Approval.room_id,
+                Approval.status,
+                func.count(Approval.id),
+                func.min(Approval.updated_at),
+            )
+            .where(Approval.room_id.in_(room_ids))
+            .group_by(Approval.room_id, Approval.status)
+        )
+        for room_id, approval_status, count, oldest in approvals_result.all():
+            room_counters = counters[str(room_id)]
+            room_counters["total_approvals"] += count
+            column = APPROVAL_STATUS_COLUMNS.get(approval_status or "pending")
+            if column:
+                room_counters[column] += count
+            if (approval_status or "pending") == "pending":
+                room_counters["oldest_pending_approval_at"] = oldest
+
+        return counters
+
+    async def _upsert(self, session: AsyncSession, room_id: str, values: Dict) -> RoomReadiness:
+        readiness = await session.get(RoomReadiness, room_id)
+        if readiness is None:
+            readiness = RoomReadiness(room_id=room_id)
+            session.add(readiness)
+
+        for column in COUNTER_COLUMNS:
+            setattr(readiness, column, values.get(column, 0))
+        readiness.oldest_pending_approval_at = values.get("oldest_pending_approval_at")
+        readiness.next_expiry_at = values.get("next_expiry_at")
+        readiness.updated_at = datetime.utcnow()
+        return readiness
+
+
+# Global room readiness service instance
+room_readiness_service = RoomReadinessService()
@@ -0,0 +1,380 @@
+"""
+Search Index service for STS Clearance system
+Full-text index over rooms, documents, messages and vessels
+
+Every indexed entity has one row in search_index (title, body, OCR text),
+written by a session flush listener in the same transaction as the entity
+itself. Matching and ranking run inside the database: FTS5 with bm25 on
+SQLite, a weighted tsvector with ts_rank_cd on PostgreSQL. Each query term
+is matched as a prefix so the same index serves typeahead suggestions.
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import bindparam, delete, event, inspect, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import (Document, DocumentType, Message, Room, SearchIndexEntry,
+                        UUIDType, Vessel)
+
+logger = logging.getLogger(__name__)
+
+ROOM = "room"
+DOCUMENT = "document"
+MESSAGE = "message"
+VESSEL = "vessel"
+
+# At most this many terms of a query are matched
+MAX_QUERY_TERMS = 8
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+_index = SearchIndexEntry.__table__
+
+_ENTITY_TYPES = {Room: ROOM, Document: DOCUMENT, Message: MESSAGE, Vessel: VESSEL}
+
+# Attributes whose changes require re-indexing an entity
+_INDEXED_ATTRIBUTES = {
+    Room: ("title", "location", "description"),
+    Document: ("type_id", "notes", "uploaded_by"),
+    Message: ("content", "sender_name"),
+    Vessel: ("name", "imo", "vessel_type", "flag"),
+}
+
+
+@dataclass
+class SearchHit:
+    """One ranked match from the index"""
+    entity_type: str
+    entity_id: str
+    room_id: str
+    title: str
+    rank: float
+
+
+def query_terms(query: str) -> List[str]:
+    """Lower-cased word terms of a user query"""
+    return [term.lower() for term in _TERM.findall(query or "")][:MAX_QUERY_TERMS]
+
+
+def title_matches(title: str, terms: Sequence[str]) -> bool:
+    """Whether every term is a prefix of some word of a title (as the index matches)"""
+    words = [word.lower() for word in _TERM.findall(title or "")]
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+
+def order_by_rank(rows: Iterable[Any], hits: Sequence[SearchHit], key) -> List[Any]:
+    """Sort hydrated rows into index rank order (rows without a hit are dropped)"""
+    position = {hit.entity_id: i for i, hit in enumerate(hits)}
+    ranked = [row for row in rows if str(key(row)) in position]
+    ranked.sort(key=lambda row: position[str(key(row))])
+    return ranked
+
+
+def _join(*parts: Optional[str]) -> str:
+    return " ".join(part for part in parts if part)
+
+
+class SearchIndexService:
+    """Keeps search_index in sync and runs ranked full-text queries"""
+
+    # ------------------------------------------------------------------
+    # Entries
+    # ------------------------------------------------------------------
+
+    def _entry(self, instance: Any, doc_types: Dict[str, Any]) -> Dict[str, Any]:
+        """Index row for an entity (documents take their title from the type)"""
+        if isinstance(instance, Room):
+            return {
+                "entity_type": ROOM, "entity_id": instance.id, "room_id": instance.id,
+                "title": instance.title or "",
+                "body": _join(instance.location, instance.description),
+            }
+        if isinstance(instance, Message):
+            return {
+                "entity_type": MESSAGE, "entity_id": instance.id, "room_id": instance.room_id,
+                "title": instance.sender_name or "",
+                "body": instance.content,
+            }
+        if isinstance(instance, Vessel):
+            return {
+                "entity_type": VESSEL, "entity_id": instance.id, "room_id": instance.room_id,
+                "title": instance.name or "",
+                "body": _join(instance.imo, instance.vessel_type, instance.flag),
+            }
+        # Document instance or documents row
+        doc_type = doc_types.get(str(instance.type_id))
+        return {
+            "entity_type": DOCUMENT, "entity_id": instance.id, "room_id": instance.room_id,
+            "title": doc_type.name if doc_type else "",
+            "body": _join(doc_type.code if doc_type else None, instance.notes, instance.uploaded_by),
+        }
+
+    def _changed(self, instance: Any) -> bool:
+        state = inspect(instance)
+        return any(
+            state.attrs[name].history.has_changes()
+            for name in _INDEXED_ATTRIBUTES[type(instance)]
+        )
+
+    def sync(self, session: Session) -> None:
+        """
+        Reflect the entities of a flush in search_index (flush listener).
+
+        New rows are inserted, rows whose indexed attributes changed are
+        rewritten and deleted rows are removed; other updates cost nothing.
+        """
+        inserts, updates, removals = [], [], []
+        renamed_types: Set[Any] = set()
+
+        for instance in session.new:
+            if type(instance) in _INDEXED_ATTRIBUTES:
+                inserts.append(instance)
+        for instance in session.dirty:
+            if type(instance) in _INDEXED_ATTRIBUTES:
+                if self._changed(instance):
+                    updates.append(instance)
+            elif isinstance(instance, DocumentType):
+                state = inspect(instance)
+                if state.attrs.name.history.has_changes() or state.attrs.code.history.has_changes():
+                    renamed_types.add(instance.id)
+        for instance in session.deleted:
+            if type(instance) in _INDEXED_ATTRIBUTES:
+                removals.append(instance)
+
+        if not (inserts or updates or removals or renamed_types):
+            return
+
+        connection = session.connection()
+
+        if renamed_types:
+            # Every document of a renamed type changes title
+            updates.extend(
+                connection.execute(
+                    select(
+                        Document.id, Document.room_id, Document.type_id,
+                        Document.notes, Document.uploaded_by,
+                    ).where(Document.type_id.in_(renamed_types))
+                ).all()
+            )
+
+        type_ids = {
+            str(item.type_id) for item in inserts + updates
+            if not isinstance(item, (Room, Message, Vessel)) and item.type_id
+        }
+        doc_types = {}
+        if type_ids:
+            rows = connection.execute(
+                select(DocumentType.id, DocumentType.name, DocumentType.code)
+                .where(DocumentType.id.in_(type_ids))
+            ).all()
+            doc_types = {str(row.id): row for row in rows}
+
+        for instance in removals:
+            if isinstance(instance, Room):
+                connection.execute(delete(_index).where(_index.c.room_id == instance.id))
+            else:
+                connection.execute(
+                    delete(_index).where(
+                        _index.c.entity_type == _ENTITY_TYPES[type(instance)],
+                        _index.c.entity_id == instance.id,
+                    )
+                )
+
+        entries = [self._entry(instance, doc_types) for instance in inserts]
+        for item in updates:
+            entry = self._entry(item, doc_types)
+            result = connection.execute(
+                update(_index)
+                .where(
+                    _index.c.entity_type == entry["entity_type"],
+                    _index.c.entity_id == entry["entity_id"],
+                )
+                .values(title=entry["title"], body=entry["body"])
+            )
+            if result.rowcount == 0:
+                entries.append(entry)
+
+        if entries:
+            connection.execute(_index.insert(), entries)
+
+    async def index_ocr_text(self, session: AsyncSession, document_id: str, ocr_text: str) -> bool:
+        """Attach extracted text to a document's entry; the caller commits"""
+        result = await session.execute(
+            update(_index)
+            .where(_index.c.entity_type == DOCUMENT, _index.c.entity_id == document_id)
+            .values(ocr_text=ocr_text)
+        )
+        return result.rowcount > 0
+
+    async def index_ocr_job(self, job) -> None:
+        """OCR completion listener: store a document's extracted text in its entry"""
+        text = (job.result or {}).get("text")
+        if not job.document_id or not text:
+            return
+        from app.database import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as session:
+            if await self.index_ocr_text(session, job.document_id, text):
+                await session.commit()
+
+    async def rebuild(self, session: AsyncSession, batch_size: int = 1000) -> int:
+        """
+        Re-create every entry from the source tables; the caller commits
+
+        OCR text is not stored elsewhere and is lost; re-run extraction for
+        documents that need it.
+        """
+        await session.execute(delete(_index))
+        doc_types = {
+            str(row.id): row
+            for row in (
+                await session.execute(select(DocumentType.id, DocumentType.name, DocumentType.code))
+            ).all()
+        }
+        count = 0
+        for model in _ENTITY_TYPES:
+            last_id = None
+            while True:
+                query = select(model).order_by(model.id).limit(batch_size)
+                if last_id is not None:
+                    query = query.where(model.id > last_id)
+                batch = (await session.execute(query)).scalars().all()
+                if not batch:
+                    break
+                await session.execute(
+                    _index.insert(), [self._entry(instance, doc_types) for instance in batch]
+                )
+                count += len(batch)
+                last_id = batch[-1].id
+                session.expunge_all()
+        return count
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    async def search(
+        self,
+        session: AsyncSession,
+        query: str,
+        room_ids: Sequence[str],
+        entity_type: str,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[SearchHit]:
+        """Best matches of one entity type in the given rooms, best first"""
+        terms = query_terms(query)
+        if not terms or not room_ids:
+            return []
+        return await self._match(
+            session, terms, room_ids, [entity_type], limit, titles_only=False, offset=offset
+        )
+
+    async def suggest(
+        self,
+        session: AsyncSession,
+        prefix: str,
+        room_ids: Sequence[str],
+        entity_types: Sequence[str] = (ROOM, DOCUMENT, VESSEL),
+        limit: int = 10,
+    ) -> List[SearchHit]:
+        """Distinct titles starting with the typed words, best first"""
+        suggestions, _ = await self.suggest_complete(session, prefix, room_ids, entity_types, limit)
+        return suggestions
+
+    async def suggest_complete(
+        self,
+        session: AsyncSession,
+        prefix: str,
+        room_ids: Sequence[str],
+        entity_types: Sequence[str] = (ROOM, DOCUMENT, VESSEL),
+        limit: int = 10,
+    ) -> Tuple[List[SearchHit], bool]:
+        """``suggest``, plus whether these are all the titles matching the prefix"""
+        terms = query_terms(prefix)
+        if not terms or not room_ids:
+            return [], True
+        # Over-fetch: several entities may share a title
+        fetch = limit * 3
+        hits = await self._match(session, terms, room_ids, entity_types, fetch, titles_only=True)
+        seen, suggestions = set(), []
+        for hit in hits:
+            key = (hit.entity_type, hit.title.lower())
+            if hit.title and key not in seen:
+                seen.add(key)
+                suggestions.append(hit)
+        return suggestions[:limit], len(hits) < fetch and len(suggestions) <= limit
+
+    async def _match(
+        self,
+        session: AsyncSession,
+        terms: List[str],
+        room_ids: Sequence[str],
+        entity_types: Sequence[str],
+        limit: int,
+        titles_only: bool,
+        offset: int = 0,
+    ) -> List[SearchHit]:
+        # Ties in rank are broken by doc_rowid so consecutive pages neither
+        # repeat nor skip a match
+        if session.get_bind().dialect.name == "sqlite":
+            column = "title : " if titles_only else ""
+            match = " AND ".join(f'{column}"{term}"*' for term in terms)
+            statement = text(
+                "SELECT s.entity_type, s.entity_id, s.room_id, s.title, "
+                "-bm25(search_index_fts, 10.0, 4.0, 1.0) AS rank "
+                "FROM search_index_fts JOIN search_index s ON s.doc_rowid = search_index_fts.rowid "
+                "WHERE search_index_fts MATCH :match "
+                "AND s.entity_type IN :entity_types AND s.room_id IN :room_ids "
+                "ORDER BY rank DESC, s.doc_rowid LIMIT :limit OFFSET :offset"
+            )
+        else:
+            weight = "A" if titles_only else ""
+            match = " & ".join(f"{term}:*{weight}" for term in terms)
+            statement = text(
+                "SELECT entity_type, entity_id, room_id, title, "
+                "ts_rank_cd(search_vector, q) AS rank "
+                "FROM search_index, to_tsquery('simple', :match) AS q "
+                "WHERE search_vector @@ q "
+                "AND entity_type IN :entity_types AND room_id IN :room_ids "
+                "ORDER BY rank DESC, doc_rowid LIMIT :limit OFFSET :offset"
+            )
+
+        statement = statement.bindparams(
+            bindparam("entity_types", expanding=True),
+            bindparam("room_ids", expanding=True, type_=UUIDType),
+        )
+        result = await session.execute(
+            statement,
+            {
+                "match": match,
+                "entity_types": list(entity_types),
+                "room_ids": list(room_ids),
+                "limit": limit,
+                "offset": offset,
+            },
+        )
+        return [
+            SearchHit(
+                entity_type=row.entity_type,
+                entity_id=str(row.entity_id),
+                room_id=str(row.room_id),
+                title=row.title,
+                rank=float(row.rank or 0.0),
+            )
+            for row in result.all()
+        ]
+
+
+# Global search index service instance
+search_index_service = SearchIndexService()
+
+
+@event.listens_for(Session, "after_flush")
+def _index_after_flush(session: Session, flush_context) -> None:
+    search_index_service.sync(session)
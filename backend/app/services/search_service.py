@@ -1,30 +1,66 @@
 """
 Advanced search service for STS Clearance system
 Provides comprehensive search capabilities across all entities
+
+Rooms, documents, messages and vessels are matched and ranked by the
+full-text index (see search_index_service); this module hydrates the
+matches and applies filters, reading further index pages until enough
+matches pass them.
+
+Categories are searched concurrently, each on its own session with a
+timeout, and complete results are cached briefly per access set so faceted
+searches, repeated queries and typeahead reuse them.
 """
 
+import asyncio
+import hashlib
 import logging
+import os
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from sqlalchemy import and_, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 
 from app.models import ActivityLog, Document, DocumentType, Message, Party, Room, Vessel
+from app.services.search_index_service import (DOCUMENT, MESSAGE, ROOM, VESSEL,
+                                               SearchHit, order_by_rank,
+                                               query_terms, search_index_service,
+                                               title_matches)
 
 logger = logging.getLogger(__name__)
 
+SUGGESTION_TYPES = {ROOM: "room_title", DOCUMENT: "document_type", VESSEL: "vessel_name"}
+SUGGESTION_CATEGORIES = {ROOM: "Rooms", DOCUMENT: "Documents", VESSEL: "Vessels"}
+
+SEARCH_CATEGORIES = ("rooms", "documents", "messages", "vessels", "activities")
+
 
 class SearchService:
     """Advanced search service for comprehensive data discovery"""
 
-    def __init__(self):
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
         self.search_config = {
             "max_results": 100,
             "highlight_length": 100,
             "suggestion_limit": 10,
-            "recent_days": 30
+            "recent_days": 30,
+            "category_timeout_seconds": float(os.getenv("SEARCH_CATEGORY_TIMEOUT_SECONDS", 2)),
+            "cache_ttl_seconds": float(os.getenv("SEARCH_CACHE_TTL_SECONDS", 30)),
+            "cache_max_entries": int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 1000)),
         }
+        # key -> (value, expires_at); LRU order
+        self._cache: "OrderedDict[Tuple, Tuple[Any, float]]" = OrderedDict()
+
+        # Metrics
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.category_timeouts = 0
+        self.category_failures = 0
 
     async def global_search(
         self,
@@ -41,28 +77,12 @@ class SearchService:
             if not user_room_ids:
                 return self._empty_search_result(query)
 
-            search_term = f"%{query.lower()}%"
-            filters = filters or {}
-            
-            # Execute parallel searches
-            results = {
-                "rooms": await self._search_rooms(search_term, user_room_ids, filters, session),
-                "documents": await self._search_documents(search_term, user_room_ids, filters, session),
-                "messages": await self._search_messages(search_term, user_room_ids, filters, session),
-                "vessels": await self._search_vessels(search_term, user_room_ids, filters, session),
-                "activities": await self._search_activities(search_term, user_room_ids, filters, session)
-            }
+            if not query_terms(query):
+                return self._empty_search_result(query)
 
-            # Calculate total results and add metadata
-            total_results = sum(len(results[key]) for key in results)
-            
-            return {
-                "query": query,
-                "results": results,
-                "total_results": total_results,
-                "filters_applied": filters,
-                "search_timestamp": datetime.utcnow().isoformat()
-            }
+            filters = filters or {}
+            search = await self.search_categories(query, user_room_ids, filters, session=session)
+            return self._search_result(query, search, filters)
 
         except Exception as e:
             logger.error(f"Error in global search: {e}")
@@ -81,14 +101,14 @@ class SearchService:
             if not user_room_ids:
                 return self._empty_search_result(query)
 
-            search_term = f"%{query.lower()}%"
-            
-            # Get results with facets
-            results = await self.global_search(query, user_email, {}, session)
-            
-            # Add facets for filtering
-            facets = await self._generate_search_facets(search_term, user_room_ids, session)
-            
+            # Results and facets in one concurrent pass, each served from
+            # the cache when a recent search already computed it
+            search, facets = await asyncio.gather(
+                self.search_categories(query, user_room_ids, {}, session=session),
+                self._cached_facets(user_room_ids, session),
+            )
+
+            results = self._search_result(query, search, {})
             results["facets"] = facets
             return results
 
@@ -96,11 +116,105 @@ class SearchService:
             logger.error(f"Error in faceted search: {e}")
             return self._empty_search_result(query)
 
+    async def search_categories(
+        self,
+        query: str,
+        user_room_ids: List[str],
+        filters: Optional[Dict] = None,
+        categories: Sequence[str] = SEARCH_CATEGORIES,
+        limit: Optional[int] = None,
+        session: AsyncSession = None
+    ) -> Dict:
+        """
+        Search several categories concurrently, each on its own session
+
+        Returns ``{"results": {category: [...]}, "timed_out": [...],
+        "failed": [...]}``. A category that does not answer within
+        ``category_timeout_seconds`` contributes no results and is listed in
+        ``timed_out``; one that raises is listed in ``failed``. Complete
+        results are cached for ``cache_ttl_seconds`` per access set, query,
+        filters, categories and limit.
+        """
+        filters = filters or {}
+        if not query_terms(query):
+            return {
+                "results": {category: [] for category in categories},
+                "timed_out": [],
+                "failed": [],
+            }
+
+        key = (
+            "search",
+            self._access_key(user_room_ids),
+            " ".join(query.lower().split()),
+            tuple(sorted((name, str(value)) for name, value in filters.items() if value)),
+            tuple(categories),
+            limit,
+        )
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        session_factory = self._factory_for(session)
+        answers = await asyncio.gather(*(
+            self._run_category(category, query, user_room_ids, filters, limit, session_factory)
+            for category in categories
+        ))
+
+        search = {
+            "results": {category: rows or [] for category, (rows, _) in zip(categories, answers)},
+            "timed_out": [category for category, (_, outcome) in zip(categories, answers)
+                          if outcome == "timed_out"],
+            "failed": [category for category, (_, outcome) in zip(categories, answers)
+                       if outcome == "failed"],
+        }
+        # Partial results are not cached so the next request retries
+        if not search["timed_out"] and not search["failed"]:
+            self._cache_set(key, search)
+        return search
+
+    async def _run_category(
+        self,
+        category: str,
+        query: str,
+        user_room_ids: List[str],
+        filters: Dict,
+        limit: Optional[int],
+        session_factory
+    ) -> Tuple[Optional[List[Dict]], Optional[str]]:
+        """One category's results, or None and ``"timed_out"``/``"failed"``"""
+        search = getattr(self, f"_search_{category}")
+        try:
+            async with session_factory() as session:
+                return await asyncio.wait_for(
+                    search(query, user_room_ids, filters, session, limit),
+                    timeout=self.search_config["category_timeout_seconds"],
+                ), None
+        except asyncio.TimeoutError:
+            self.category_timeouts += 1
+            logger.warning(f"Search category {category} timed out for query {query!r}")
+            return None, "timed_out"
+        except Exception as e:
+            self.category_failures += 1
+            logger.error(f"Error searching {category}: {e}")
+            return None, "failed"
+
+    async def _cached_facets(self, user_room_ids: List[str], session: AsyncSession) -> Dict:
+        key = ("facets", self._access_key(user_room_ids))
+        facets = self._cache_get(key)
+        if facets is None:
+            async with self._factory_for(session)() as facet_session:
+                facets = await self._generate_search_facets(user_room_ids, facet_session)
+            if facets:
+                self._cache_set(key, facets)
+        return facets
+
     async def get_search_suggestions(
         self,
         partial_query: str,
         user_email: str,
-        session: AsyncSession = None
+        session: AsyncSession = None,
+        limit: Optional[int] = None
     ) -> List[Dict]:
         """Get search suggestions based on partial query"""
         try:
@@ -112,78 +226,124 @@ class SearchService:
             if not user_room_ids:
                 return []
 
-            search_term = f"{partial_query.lower()}%"
-            suggestions = []
-
-            # Room title suggestions
-            rooms_result = await session.execute(
-                select(Room.title.distinct())
-                .where(
-                    and_(
-                        Room.id.in_(user_room_ids),
-                        func.lower(Room.title).like(search_term)
-                    )
-                )
-                .limit(self.search_config["suggestion_limit"])
-            )
-
-            for title in rooms_result.scalars().all():
-                suggestions.append({
-                    "text": title,
-                    "type": "room_title",
-                    "category": "Rooms",
-                    "relevance": 1.0
-                })
-
-            # Document type suggestions
-            doc_types_result = await session.execute(
-                select(DocumentType.name.distinct())
-                .join(Document, DocumentType.id == Document.type_id)
-                .where(
-                    and_(
-                        Document.room_id.in_(user_room_ids),
-                        func.lower(DocumentType.name).like(search_term)
-                    )
-                )
-                .limit(self.search_config["suggestion_limit"])
+            hits = await self.suggest_titles(
+                partial_query, user_room_ids, limit or self.search_config["suggestion_limit"], session
             )
 
-            for doc_type in doc_types_result.scalars().all():
-                suggestions.append({
-                    "text": doc_type,
-                    "type": "document_type",
-                    "category": "Documents",
-                    "relevance": 0.9
-                })
-
-            # Vessel name suggestions
-            vessels_result = await session.execute(
-                select(Vessel.name.distinct())
-                .where(
-                    and_(
-                        Vessel.room_id.in_(user_room_ids),
-                        func.lower(Vessel.name).like(search_term)
-                    )
-                )
-                .limit(self.search_config["suggestion_limit"])
-            )
-
-            for vessel_name in vessels_result.scalars().all():
-                suggestions.append({
-                    "text": vessel_name,
-                    "type": "vessel_name",
-                    "category": "Vessels",
-                    "relevance": 0.8
-                })
-
-            # Sort by relevance and limit
-            suggestions.sort(key=lambda x: x["relevance"], reverse=True)
-            return suggestions[:self.search_config["suggestion_limit"]]
+            return [
+                {
+                    "text": hit.title,
+                    "type": SUGGESTION_TYPES[hit.entity_type],
+                    "category": SUGGESTION_CATEGORIES[hit.entity_type],
+                    "relevance": round(hit.rank, 4),
+                }
+                for hit in hits
+            ]
 
         except Exception as e:
             logger.error(f"Error getting search suggestions: {e}")
             return []
 
+    async def suggest_titles(
+        self,
+        prefix: str,
+        user_room_ids: List[str],
+        limit: int,
+        session: AsyncSession
+    ) -> List[SearchHit]:
+        """
+        Typeahead titles for a prefix, served from the cache where possible
+
+        Each keystroke extends the previous prefix. When a shorter prefix's
+        titles were all the titles matching it, the longer prefix's titles
+        are found by filtering that list instead of querying the index again.
+        """
+        terms = query_terms(prefix)
+        if not terms:
+            return []
+
+        access = self._access_key(user_room_ids)
+        normalized = " ".join(terms)
+        key = ("suggest", access, normalized, limit)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached[0]
+
+        entry = None
+        for end in range(len(normalized) - 1, 0, -1):
+            shorter = self._cache_peek(("suggest", access, normalized[:end].rstrip(), limit))
+            if shorter is not None:
+                hits, complete = shorter
+                if complete:
+                    entry = ([hit for hit in hits if title_matches(hit.title, terms)], True)
+                break
+
+        if entry is None:
+            entry = await search_index_service.suggest_complete(
+                session, prefix, user_room_ids, limit=limit
+            )
+        self._cache_set(key, entry)
+        return entry[0]
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    def _factory_for(self, session: Optional[AsyncSession]):
+        """Session factory for per-category sessions (the caller's engine by default)"""
+        if self._session_factory is not None:
+            return self._session_factory
+        if session is not None:
+            return sessionmaker(session.bind, class_=AsyncSession, expire_on_commit=False)
+        from app.database import AsyncSessionLocal
+        return AsyncSessionLocal
+
+    @staticmethod
+    def _access_key(user_room_ids: Sequence[str]) -> str:
+        """Stable digest of an access set (users with the same rooms share entries)"""
+        return hashlib.sha1(",".join(sorted(map(str, user_room_ids))).encode()).hexdigest()
+
+    def _cache_peek(self, key: Tuple) -> Any:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._cache[key]
+            return None
+        return value
+
+    def _cache_get(self, key: Tuple) -> Any:
+        value = self._cache_peek(key)
+        if value is None:
+            self.cache_misses += 1
+            return None
+        self._cache.move_to_end(key)
+        self.cache_hits += 1
+        return value
+
+    def _cache_set(self, key: Tuple, value: Any) -> None:
+        self._cache[key] = (value, time.monotonic() + self.search_config["cache_ttl_seconds"])
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.search_config["cache_max_entries"]:
+            self._cache.popitem(last=False)
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "entries": len(self._cache),
+            "max_entries": self.search_config["cache_max_entries"],
+            "ttl_seconds": self.search_config["cache_ttl_seconds"],
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / lookups, 3) if lookups else 0.0,
+            "category_timeouts": self.category_timeouts,
+            "category_failures": self.category_failures,
+        }
+
     async def get_recent_searches(
         self,
         user_email: str,
@@ -215,70 +375,88 @@ class SearchService:
             logger.error(f"Error getting user accessible rooms: {e}")
             return []
 
+    async def _ranked_rows(
+        self,
+        entity_type: str,
+        query: str,
+        user_room_ids: List[str],
+        rows_for,
+        filtered: bool,
+        session: AsyncSession,
+        limit: Optional[int] = None
+    ) -> Tuple[List[Any], Dict[str, float]]:
+        """
+        Best ``limit`` rows of one category and the rank of every match
+
+        ``rows_for(entity_ids)`` builds the statement that hydrates a page of
+        index matches and applies the category's filters; its first column
+        is the entity. With filters the index is read in over-fetched pages
+        until ``limit`` rows pass them or the matches run out.
+        """
+        limit = limit or self.search_config["max_results"] // 5
+        page_size = limit * 3 if filtered else limit
+        rows, rank, offset = [], {}, 0
+        while len(rows) < limit:
+            hits = await search_index_service.search(
+                session, query, user_room_ids, entity_type, page_size, offset=offset
+            )
+            if not hits:
+                break
+            result = await session.execute(rows_for([hit.entity_id for hit in hits]))
+            rows.extend(order_by_rank(result.all(), hits, lambda row: row[0].id))
+            rank.update((hit.entity_id, hit.rank) for hit in hits)
+            if len(hits) < page_size:
+                break
+            offset += page_size
+        return rows[:limit], rank
+
     async def _search_rooms(
         self,
-        search_term: str,
+        query: str,
         user_room_ids: List[str],
         filters: Dict,
-        session: AsyncSession
+        session: AsyncSession,
+        limit: Optional[int] = None
     ) -> List[Dict]:
         """Search rooms"""
-        try:
-            conditions = [
-                Room.id.in_(user_room_ids),
-                or_(
-                    func.lower(Room.title).like(search_term),
-                    func.lower(Room.location).like(search_term),
-                    func.lower(Room.description).like(search_term)
-                )
-            ]
+        def rows_for(ids):
+            conditions = [Room.id.in_(ids)]
 
             if filters.get("room_status"):
                 conditions.append(Room.status == filters["room_status"])
 
-            result = await session.execute(
-                select(Room)
-                .where(and_(*conditions))
-                .limit(self.search_config["max_results"] // 5)
-            )
-
-            return [
-                {
-                    "id": str(room.id),
-                    "title": room.title,
-                    "location": room.location,
-                    "description": room.description,
-                    "status": room.status,
-                    "sts_eta": room.sts_eta,
-                    "created_at": room.created_at,
-                    "type": "room",
-                    "relevance_score": self._calculate_relevance(room.title, search_term)
-                }
-                for room in result.scalars().all()
-            ]
-
-        except Exception as e:
-            logger.error(f"Error searching rooms: {e}")
-            return []
+            return select(Room).where(and_(*conditions))
+
+        rows, rank = await self._ranked_rows(
+            ROOM, query, user_room_ids, rows_for, bool(filters.get("room_status")), session, limit
+        )
+
+        return [
+            {
+                "id": str(room.id),
+                "title": room.title,
+                "location": room.location,
+                "description": room.description,
+                "status": room.status,
+                "sts_eta": room.sts_eta,
+                "created_at": room.created_at,
+                "type": "room",
+                "relevance_score": rank[str(room.id)]
+            }
+            for room, in rows
+        ]
 
     async def _search_documents(
         self,
-        search_term: str,
+        query: str,
         user_room_ids: List[str],
         filters: Dict,
-        session: AsyncSession
+        session: AsyncSession,
+        limit: Optional[int] = None
     ) -> List[Dict]:
         """Search documents"""
-        try:
-            conditions = [
-                Document.room_id.in_(user_room_ids),
-                or_(
-                    func.lower(DocumentType.name).like(search_term),
-                    func.lower(DocumentType.code).like(search_term),
-                    func.lower(Document.uploaded_by).like(search_term),
-                    func.lower(Document.notes).like(search_term)
-                )
-            ]
+        def rows_for(ids):
+            conditions = [Document.id.in_(ids)]
 
             if filters.get("document_status"):
                 conditions.append(Document.status == filters["document_status"])
@@ -286,53 +464,48 @@ class SearchService:
             if filters.get("criticality"):
                 conditions.append(DocumentType.criticality == filters["criticality"])
 
-            result = await session.execute(
+            return (
                 select(Document, DocumentType, Room)
                 .join(DocumentType, Document.type_id == DocumentType.id)
                 .join(Room, Document.room_id == Room.id)
                 .where(and_(*conditions))
-                .limit(self.search_config["max_results"] // 5)
             )
 
-            return [
-                {
-                    "id": str(doc.id),
-                    "type_name": doc_type.name,
-                    "type_code": doc_type.code,
-                    "status": doc.status,
-                    "priority": doc.priority,
-                    "criticality": doc_type.criticality,
-                    "room_title": room.title,
-                    "room_id": str(room.id),
-                    "uploaded_by": doc.uploaded_by,
-                    "uploaded_at": doc.uploaded_at,
-                    "expires_on": doc.expires_on,
-                    "type": "document",
-                    "relevance_score": self._calculate_relevance(doc_type.name, search_term)
-                }
-                for doc, doc_type, room in result.all()
-            ]
-
-        except Exception as e:
-            logger.error(f"Error searching documents: {e}")
-            return []
+        filtered = bool(filters.get("document_status") or filters.get("criticality"))
+        rows, rank = await self._ranked_rows(
+            DOCUMENT, query, user_room_ids, rows_for, filtered, session, limit
+        )
+
+        return [
+            {
+                "id": str(doc.id),
+                "type_name": doc_type.name,
+                "type_code": doc_type.code,
+                "status": doc.status,
+                "priority": doc.priority,
+                "criticality": doc_type.criticality,
+                "room_title": room.title,
+                "room_id": str(room.id),
+                "uploaded_by": doc.uploaded_by,
+                "uploaded_at": doc.uploaded_at,
+                "expires_on": doc.expires_on,
+                "type": "document",
+                "relevance_score": rank[str(doc.id)]
+            }
+            for doc, doc_type, room in rows
+        ]
 
     async def _search_messages(
         self,
-        search_term: str,
+        query: str,
         user_room_ids: List[str],
         filters: Dict,
-        session: AsyncSession
+        session: AsyncSession,
+        limit: Optional[int] = None
     ) -> List[Dict]:
         """Search messages"""
-        try:
-            conditions = [
-                Message.room_id.in_(user_room_ids),
-                or_(
-                    func.lower(Message.content).like(search_term),
-                    func.lower(Message.sender_name).like(search_term)
-                )
-            ]
+        def rows_for(ids):
+            conditions = [Message.id.in_(ids)]
 
             if filters.get("date_from"):
                 conditions.append(Message.created_at >= filters["date_from"])
@@ -340,51 +513,43 @@ class SearchService:
             if filters.get("date_to"):
                 conditions.append(Message.created_at <= filters["date_to"])
 
-            result = await session.execute(
+            return (
                 select(Message, Room)
                 .join(Room, Message.room_id == Room.id)
                 .where(and_(*conditions))
-                .order_by(Message.created_at.desc())
-                .limit(self.search_config["max_results"] // 5)
             )
 
-            return [
-                {
-                    "id": str(message.id),
-                    "sender_name": message.sender_name,
-                    "sender_email": message.sender_email,
-                    "content_preview": self._truncate_text(message.content, self.search_config["highlight_length"]),
-                    "room_title": room.title,
-                    "room_id": str(room.id),
-                    "created_at": message.created_at,
-                    "type": "message",
-                    "relevance_score": self._calculate_relevance(message.content, search_term)
-                }
-                for message, room in result.all()
-            ]
-
-        except Exception as e:
-            logger.error(f"Error searching messages: {e}")
-            return []
+        filtered = bool(filters.get("date_from") or filters.get("date_to"))
+        rows, rank = await self._ranked_rows(
+            MESSAGE, query, user_room_ids, rows_for, filtered, session, limit
+        )
+
+        return [
+            {
+                "id": str(message.id),
+                "sender_name": message.sender_name,
+                "sender_email": message.sender_email,
+                "content_preview": self._truncate_text(message.content, self.search_config["highlight_length"]),
+                "room_title": room.title,
+                "room_id": str(room.id),
+                "created_at": message.created_at,
+                "type": "message",
+                "relevance_score": rank[str(message.id)]
+            }
+            for message, room in rows
+        ]
 
     async def _search_vessels(
         self,
-        search_term: str,
+        query: str,
         user_room_ids: List[str],
         filters: Dict,
-        session: AsyncSession
+        session: AsyncSession,
+        limit: Optional[int] = None
     ) -> List[Dict]:
         """Search vessels"""
-        try:
-            conditions = [
-                Vessel.room_id.in_(user_room_ids),
-                or_(
-                    func.lower(Vessel.name).like(search_term),
-                    func.lower(Vessel.imo).like(search_term),
-                    func.lower(Vessel.vessel_type).like(search_term),
-                    func.lower(Vessel.flag).like(search_term)
-                )
-            ]
+        def rows_for(ids):
+            conditions = [Vessel.id.in_(ids)]
 
             if filters.get("vessel_type"):
                 conditions.append(Vessel.vessel_type == filters["vessel_type"])
@@ -392,83 +557,86 @@ class SearchService:
             if filters.get("flag"):
                 conditions.append(Vessel.flag == filters["flag"])
 
-            result = await session.execute(
+            return (
                 select(Vessel, Room)
                 .join(Room, Vessel.room_id == Room.id)
                 .where(and_(*conditions))
-                .limit(self.search_config["max_results"] // 5)
             )
 
-            return [
-                {
-                    "id": str(vessel.id),
-                    "name": vessel.name,
-                    "imo": vessel.imo,
-                    "vessel_type": vessel.vessel_type,
-                    "flag": vessel.flag,
-                    "status": vessel.status,
-                    "room_title": room.title,
-                    "room_id": str(room.id),
-                    "type": "vessel",
-                    "relevance_score": self._calculate_relevance(vessel.name, search_term)
-                }
-                for vessel, room in result.all()
-            ]
-
-        except Exception as e:
-            logger.error(f"Error searching vessels: {e}")
-            return []
+        filtered = bool(filters.get("vessel_type") or filters.get("flag"))
+        rows, rank = await self._ranked_rows(
+            VESSEL, query, user_room_ids, rows_for, filtered, session, limit
+        )
+
+        return [
+            {
+                "id": str(vessel.id),
+                "name": vessel.name,
+                "imo": vessel.imo,
+                "vessel_type": vessel.vessel_type,
+                "flag": vessel.flag,
+                "status": vessel.status,
+                "room_title": room.title,
+                "room_id": str(room.id),
+                "type": "vessel",
+                "relevance_score": rank[str(vessel.id)]
+            }
+            for vessel, room in rows
+        ]
 
     async def _search_activities(
         self,
-        search_term: str,
+        query: str,
         user_room_ids: List[str],
         filters: Dict,
-        session: AsyncSession
+        session: AsyncSession,
+        limit: Optional[int] = None
     ) -> List[Dict]:
-        """Search activity logs"""
-        try:
-            conditions = [
-                ActivityLog.room_id.in_(user_room_ids),
-                or_(
-                    func.lower(ActivityLog.action).like(search_term),
-                    func.lower(ActivityLog.actor).like(search_term)
-                )
-            ]
-
-            if filters.get("action_type"):
-                conditions.append(ActivityLog.action == filters["action_type"])
-
-            result = await session.execute(
-                select(ActivityLog, Room)
-                .join(Room, ActivityLog.room_id == Room.id)
-                .where(and_(*conditions))
-                .order_by(ActivityLog.ts.desc())
-                .limit(self.search_config["max_results"] // 5)
+        """
+        Search recent activity logs
+
+        Activity rows are not in the full-text index; the (room_id, ts)
+        index bounds the scan to the last ``recent_days`` days.
+        """
+        search_term = f"%{query.lower()}%"
+        since = datetime.utcnow() - timedelta(days=self.search_config["recent_days"])
+        conditions = [
+            ActivityLog.room_id.in_(user_room_ids),
+            ActivityLog.ts >= since,
+            or_(
+                func.lower(ActivityLog.action).like(search_term),
+                func.lower(ActivityLog.actor).like(search_term)
             )
-
-            return [
-                {
-                    "id": str(activity.id),
-                    "action": activity.action,
-                    "actor": activity.actor,
-                    "room_title": room.title,
-                    "room_id": str(room.id),
-                    "timestamp": activity.ts,
-                    "meta": activity.meta_json,
-                    "type": "activity",
-                    "relevance_score": self._calculate_relevance(activity.action, search_term)
-                }
-                for activity, room in result.all()
-            ]
-
-        except Exception as e:
-            logger.error(f"Error searching activities: {e}")
-            return []
+        ]
+
+        if filters.get("action_type"):
+            conditions.append(ActivityLog.action == filters["action_type"])
+
+        result = await session.execute(
+            select(ActivityLog, Room)
+            .join(Room, ActivityLog.room_id == Room.id)
+            .where(and_(*conditions))
+            .order_by(ActivityLog.ts.desc())
+            .limit(limit or self.search_config["max_results"] // 5)
+        )
+
+        return [
+            {
+                "id": str(activity.id),
+                "action": activity.action,
+                "actor": activity.actor,
+                "room_title": room.title,
+                "room_id": str(room.id),
+                "timestamp": activity.ts,
+                "meta": activity.meta_json,
+                "type": "activity",
+                "relevance_score": None
+            }
+            for activity, room in result.all()
+        ]
 
     async def _generate_search_facets(
         self,
-        search_term: str,
         user_room_ids: List[str],
         session: AsyncSession
     ) -> Dict:
@@ -508,27 +676,6 @@ class SearchService:
             logger.error(f"Error generating search facets: {e}")
             return {}
 
-    def _calculate_relevance(self, text: str, search_term: str) -> float:
-        """Calculate relevance score for search results"""
-        try:
-            if not text or not search_term:
-                return 0.0
-
-            text_lower = text.lower()
-            search_lower = search_term.lower().replace('%', '')
-
-            # Exact match gets highest score
-            if search_lower in text_lower:
-                return 1.0
-
-            # Partial match gets lower score
-            words = search_lower.split()
-            matches = sum(1 for word in words if word in text_lower)
-            return matches / len(words) if words else 0.0
-
-        except Exception:
-            return 0.0
-
     def _truncate_text(self, text: str, max_length: int) -> str:
         """Truncate text to specified length with ellipsis"""
         if not text:
@@ -539,6 +686,19 @@ class SearchService:
         
         return text[:max_length] + "..."
 
+    def _search_result(self, query: str, search: Dict, filters: Dict) -> Dict:
+        results = search["results"]
+        return {
+            "query": query,
+            "results": results,
+            "total_results": sum(len(results[key]) for key in results),
+            "filters_applied": filters,
+            "search_timestamp": datetime.utcnow().isoformat(),
+            "partial": bool(search["timed_out"] or search["failed"]),
+            "timed_out_categories": search["timed_out"],
+            "failed_categories": search["failed"]
+        }
+
     def _empty_search_result(self, query: str) -> Dict:
         """Return empty search result"""
         return {
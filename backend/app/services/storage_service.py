@@ -3,16 +3,18 @@ Storage service for STS clearance documents
 Handles file uploads, storage, and retrieval
 """
 
-import hashlib
+import asyncio
 import logging
 import os
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 from fastapi import HTTPException, UploadFile
 
+from app.services.file_service import TEMP_DIR_NAME, stream_upload
+
 logger = logging.getLogger(__name__)
 
 
@@ -63,6 +65,38 @@ class StorageService:
         """
         raise NotImplementedError
 
+    # Content-addressed blobs (see app.services.blob_store)
+
+    def blob_url(self, key: str) -> str:
+        """file_url recorded for a blob key such as ``blobs/ab/cd/<sha256>``"""
+        raise NotImplementedError
+
+    async def blob_exists(self, key: str) -> bool:
+        """Whether the blob is present in the backend"""
+        raise NotImplementedError
+
+    async def put_blob(self, staged_path: Path, key: str, content_type: str) -> str:
+        """
+        Move a fully written staging file into the blob layout
+
+        Args:
+            staged_path: Local staging file (consumed)
+            key: Blob key
+            content_type: MIME type of the content
+
+        Returns:
+            file_url of the stored blob
+        """
+        raise NotImplementedError
+
+    async def delete_blob(self, key: str) -> bool:
+        """Remove a blob from the backend"""
+        raise NotImplementedError
+
+    def list_blob_keys(self) -> List[str]:
+        """Blob keys present in the backend (used by the orphan sweep)"""
+        return []
+
 
 class LocalStorageService(StorageService):
     """Local filesystem storage implementation"""
@@ -112,26 +146,29 @@ class LocalStorageService(StorageService):
             file_dir = self.base_path / room_id / document_type
         else:
             file_dir = self.base_path / room_id
-        file_dir.mkdir(parents=True, exist_ok=True)
 
         # Generate unique filename
         file_extension = Path(file.filename).suffix if file.filename else ".pdf"
         unique_filename = f"{uuid.uuid4()}{file_extension}"
         file_path = file_dir / unique_filename
 
-        # Read file content and calculate hash
-        content = await file.read()
-        sha256_hash = hashlib.sha256(content).hexdigest()
-        size_bytes = len(content)
-
-        # Write file to disk
+        # Stream to disk, hashing and enforcing the size limit per chunk
         try:
-            with open(file_path, "wb") as f:
-                f.write(content)
+            stored = await stream_upload(
+                file,
+                file_path,
+                self.base_path / TEMP_DIR_NAME,
+                max_size=self.max_file_size,
+            )
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Failed to write file {file_path}: {e}")
             raise HTTPException(status_code=500, detail="Failed to store file")
 
+        sha256_hash = stored.sha256
+        size_bytes = stored.size_bytes
+
         # Return relative path as file_url
         file_url = str(file_path.relative_to(self.base_path))
 
@@ -180,6 +217,38 @@ class LocalStorageService(StorageService):
 
         return False
 
+    def blob_url(self, key: str) -> str:
+        # Served by the /api/v1/files/{path} route, like other local uploads
+        return f"/api/v1/files/{key}"
+
+    async def blob_exists(self, key: str) -> bool:
+        return (self.base_path / key).is_file()
+
+    async def put_blob(self, staged_path: Path, key: str, content_type: str) -> str:
+        blob_path = self.base_path / key
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        # Always move into place: a copy already on disk may belong to a blob
+        # the GC is deleting, and replacing identical content is atomic
+        os.replace(staged_path, blob_path)
+        return self.blob_url(key)
+
+    async def delete_blob(self, key: str) -> bool:
+        try:
+            (self.base_path / key).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def list_blob_keys(self) -> List[str]:
+        blob_root = self.base_path / "blobs"
+        if not blob_root.exists():
+            return []
+        return [
+            str(path.relative_to(self.base_path))
+            for path in blob_root.glob("*/*/*")
+            if path.is_file()
+        ]
+
     def get_absolute_path(self, file_url: str) -> Path:
         """
         Get absolute file path
@@ -270,11 +339,6 @@ class S3StorageService(StorageService):
                 detail=f"File type not allowed. Allowed types: {', '.join(self.allowed_mime_types)}",
             )
 
-        # Read file content and calculate hash
-        content = await file.read()
-        sha256_hash = hashlib.sha256(content).hexdigest()
-        size_bytes = len(content)
-
         # Create S3 key: s3://bucket/room_id/document_type/uuid_filename
         file_extension = Path(file.filename).suffix if file.filename else ".pdf"
         unique_filename = f"{uuid.uuid4()}{file_extension}"
@@ -284,18 +348,33 @@ class S3StorageService(StorageService):
         else:
             s3_key = f"{room_id}/{unique_filename}"
 
+        # Stage the upload on local disk in chunks so the hash is known
+        # before the object is written and memory stays bounded
+        staging_dir = self.base_path / TEMP_DIR_NAME
+        stored = await stream_upload(
+            file,
+            staging_dir / unique_filename,
+            staging_dir,
+            max_size=self.max_file_size,
+        )
+        sha256_hash = stored.sha256
+        size_bytes = stored.size_bytes
+
         try:
-            # Upload to S3 with metadata
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=content,
-                ContentType=file.content_type,
-                Metadata={
-                    "sha256": sha256_hash,
-                    "original_filename": file.filename or "document",
-                    "uploaded_at": datetime.utcnow().isoformat(),
-                }
+            # Multipart upload from the staged file, off the event loop
+            await asyncio.to_thread(
+                self.s3_client.upload_file,
+                str(stored.path),
+                self.bucket_name,
+                s3_key,
+                ExtraArgs={
+                    "ContentType": file.content_type,
+                    "Metadata": {
+                        "sha256": sha256_hash,
+                        "original_filename": file.filename or "document",
+                        "uploaded_at": datetime.utcnow().isoformat(),
+                    },
+                },
             )
             
             # Return S3 URL as file_url
@@ -310,6 +389,8 @@ class S3StorageService(StorageService):
         except Exception as e:
             logger.error(f"Failed to upload to S3: {e}")
             raise HTTPException(status_code=500, detail="Failed to store file in cloud")
+        finally:
+            stored.path.unlink(missing_ok=True)
 
     async def get_file(self, file_url: str) -> Optional[bytes]:
         """
@@ -370,6 +451,44 @@ class S3StorageService(StorageService):
             logger.error(f"Failed to delete from S3: {e}")
             return False
 
+    def blob_url(self, key: str) -> str:
+        return f"s3://{self.bucket_name}/{key}"
+
+    async def blob_exists(self, key: str) -> bool:
+        try:
+            await asyncio.to_thread(
+                self.s3_client.head_object, Bucket=self.bucket_name, Key=key
+            )
+            return True
+        except Exception:
+            return False
+
+    async def put_blob(self, staged_path: Path, key: str, content_type: str) -> str:
+        try:
+            await asyncio.to_thread(
+                self.s3_client.upload_file,
+                str(staged_path),
+                self.bucket_name,
+                key,
+                ExtraArgs={"ContentType": content_type},
+            )
+        except Exception as e:
+            logger.error(f"Failed to upload blob to S3: {e}")
+            raise HTTPException(status_code=500, detail="Failed to store file in cloud")
+        finally:
+            staged_path.unlink(missing_ok=True)
+        return self.blob_url(key)
+
+    async def delete_blob(self, key: str) -> bool:
+        try:
+            await asyncio.to_thread(
+                self.s3_client.delete_object, Bucket=self.bucket_name, Key=key
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Failed to delete blob from S3: {e}")
+            return False
+
     def get_presigned_url(self, file_url: str, expiration: int = 3600) -> str:
         """
         Generate presigned URL for direct S3 access
@@ -24,6 +24,7 @@ from app.models import (
     OperationVessel,
     StsOperationCode,
 )
+from app.regions import operation_region
 from app.services.email_service import EmailService  # PR-2: Email notifications
 
 logger = logging.getLogger(__name__)
@@ -61,7 +62,7 @@ class StsOperationService:
             operation = StsOperationSession(
                 title=title,
                 location=location,
-                region=region or self._extract_region(location),
+                region=operation_region(region, location),
                 scheduled_start_date=scheduled_start_date,
                 scheduled_end_date=scheduled_end_date,
                 sts_operation_code=operation_code,
@@ -384,25 +385,3 @@ class StsOperationService:
         except Exception as e:
             logger.error(f"Error generating operation code: {e}", exc_info=True)
             raise
-
-    def _extract_region(self, location: str) -> Optional[str]:
-        """
-        Extract region from location string.
-        
-        Simple implementation - can be enhanced with geocoding.
-        """
-        # Simple mapping of regions based on location
-        region_keywords = {
-            "Asia": ["Singapore", "China", "Japan", "Korea", "Malaysia"],
-            "Europe": ["Rotterdam", "Antwerp", "London", "Hamburg", "Spain"],
-            "Middle East": ["Dubai", "Kuwait", "Qatar", "Saudi", "UAE"],
-            "Americas": ["Houston", "Mexico", "Canada", "Brazil"],
-            "Africa": ["South Africa", "Nigeria", "Ghana"],
-        }
-
-        location_upper = location.upper()
-        for region, keywords in region_keywords.items():
-            if any(keyword.upper() in location_upper for keyword in keywords):
-                return region
-
-        return None
\ No newline at end of file
@@ -0,0 +1,603 @@
+"""
+Task queue backends for STS Clearance system
+SQL table (SQLite/PostgreSQL) and Redis streams storage for background tasks
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, delete, event, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import BackgroundTaskRecord
+from app.services.background_task_service import (FINAL_STATUSES, BackgroundTask,
+                                                  TaskPriority, TaskQueueBackend,
+                                                  TaskStatus)
+
+logger = logging.getLogger(__name__)
+
+# Redis tasks waiting for the enqueuing transaction to commit
+PENDING_REDIS_TASKS_KEY = "redis_tasks_pending"
+
+
+def _task_from_record(record: BackgroundTaskRecord) -> BackgroundTask:
+    task = BackgroundTask(
+        record.id,
+        record.task_type,
+        record.data or {},
+        priority=TaskPriority(record.priority),
+        max_attempts=record.max_attempts,
+        dedup_key=record.dedup_key,
+    )
+    task.status = TaskStatus(record.status)
+    task.created_at = record.created_at
+    task.available_at = record.available_at
+    task.started_at = record.started_at
+    task.completed_at = record.completed_at
+    task.result = record.result
+    task.error = record.error
+    task.progress = record.progress or 0.0
+    task.attempts = record.attempts
+    task.worker_id = record.worker_id
+    return task
+
+
+class SQLTaskQueueBackend(TaskQueueBackend):
+    """
+    Queue stored in the background_tasks table.
+
+    Workers claim rows with a conditional UPDATE, so concurrent workers in
+    other processes never run the same delivery twice; a running row whose
+    lease has lapsed is claimable again.
+    """
+
+    name = "sql"
+
+    def __init__(self, session_factory=None):
+        if session_factory is None:
+            from app.database import AsyncSessionLocal
+            session_factory = AsyncSessionLocal
+        self.session_factory = session_factory
+
+    async def enqueue(self, task: BackgroundTask, session=None) -> str:
+        if session is not None:
+            return await self._insert(session, task)
+
+        async with self.session_factory() as own_session:
+            task_id = await self._insert(own_session, task)
+            await own_session.commit()
+            return task_id
+
+    async def _insert(self, session, task: BackgroundTask) -> str:
+        if task.dedup_key:
+            existing = await session.execute(
+                select(BackgroundTaskRecord.id).where(
+                    BackgroundTaskRecord.dedup_key == task.dedup_key
+                )
+            )
+            existing_id = existing.scalar_one_or_none()
+            if existing_id:
+                return existing_id
+
+        try:
+            async with session.begin_nested():
+                session.add(BackgroundTaskRecord(
+                    id=task.task_id,
+                    task_type=task.task_type,
+                    priority=int(task.priority),
+                    status=TaskStatus.PENDING.value,
+                    dedup_key=task.dedup_key,
+                    data=task.data,
+                    progress=0.0,
+                    attempts=0,
+                    max_attempts=task.max_attempts,
+                    available_at=task.available_at,
+                    created_at=task.created_at,
+                ))
+        except IntegrityError:
+            # A concurrent enqueue took the dedup key (or task id) first
+            if task.dedup_key:
+                existing = await session.execute(
+                    select(BackgroundTaskRecord.id).where(
+                        BackgroundTaskRecord.dedup_key == task.dedup_key
+                    )
+                )
+                existing_id = existing.scalar_one_or_none()
+                if existing_id:
+                    return existing_id
+            # Same task id queued twice: the first one stands
+            return task.task_id
+        return task.task_id
+
+    @staticmethod
+    def _claimable(now: datetime):
+        return or_(
+            and_(
+                BackgroundTaskRecord.status == TaskStatus.PENDING.value,
+                BackgroundTaskRecord.available_at <= now,
+            ),
+            and_(
+                BackgroundTaskRecord.status == TaskStatus.RUNNING.value,
+                BackgroundTaskRecord.lease_expires_at < now,
+            ),
+        )
+
+    async def claim(
+        self, task_type: str, worker_id: str, limit: int, visibility_timeout: float
+    ) -> List[BackgroundTask]:
+        now = datetime.utcnow()
+        lease = now + timedelta(seconds=visibility_timeout)
+
+        async with self.session_factory() as session:
+            candidates = await session.execute(
+                select(BackgroundTaskRecord.id)
+                .where(BackgroundTaskRecord.task_type == task_type, self._claimable(now))
+                .order_by(BackgroundTaskRecord.priority, BackgroundTaskRecord.available_at)
+                .limit(limit * 2)
+            )
+
+            claimed = []
+            for task_id in candidates.scalars().all():
+                if len(claimed) >= limit:
+                    break
+                result = await session.execute(
+                    update(BackgroundTaskRecord)
+                    .where(BackgroundTaskRecord.id == task_id, self._claimable(now))
+                    .values(
+                        status=TaskStatus.RUNNING.value,
+                        attempts=BackgroundTaskRecord.attempts + 1,
+                        lease_expires_at=lease,
+                        worker_id=worker_id,
+                        started_at=func.coalesce(BackgroundTaskRecord.started_at, now),
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount:
+                    claimed.append(task_id)
+            await session.commit()
+
+            if not claimed:
+                return []
+            records = await session.execute(
+                select(BackgroundTaskRecord)
+                .where(BackgroundTaskRecord.id.in_(claimed))
+                .order_by(BackgroundTaskRecord.priority, BackgroundTaskRecord.available_at)
+            )
+            return [_task_from_record(record) for record in records.scalars().all()]
+
+    async def _update_owned(self, task: BackgroundTask, **values) -> bool:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(BackgroundTaskRecord)
+                .where(
+                    BackgroundTaskRecord.id == task.task_id,
+                    BackgroundTaskRecord.worker_id == task.worker_id,
+                    BackgroundTaskRecord.status == TaskStatus.RUNNING.value,
+                )
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            return bool(result.rowcount)
+
+    async def heartbeat(self, task: BackgroundTask, visibility_timeout: float) -> bool:
+        return await self._update_owned(
+            task,
+            lease_expires_at=datetime.utcnow() + timedelta(seconds=visibility_timeout),
+            progress=task.progress,
+        )
+
+    async def complete(self, task: BackgroundTask) -> None:
+        await self._update_owned(
+            task,
+            status=TaskStatus.COMPLETED.value,
+            result=task.result,
+            progress=100.0,
+            completed_at=task.completed_at,
+            lease_expires_at=None,
+            dedup_key=None,
+        )
+
+    async def retry(self, task: BackgroundTask, available_at: datetime) -> None:
+        await self._update_owned(
+            task,
+            status=TaskStatus.PENDING.value,
+            error=task.error,
+            available_at=available_at,
+            lease_expires_at=None,
+        )
+
+    async def fail(self, task: BackgroundTask) -> None:
+        await self._update_owned(
+            task,
+            status=TaskStatus.FAILED.value,
+            error=task.error,
+            completed_at=task.completed_at,
+            lease_expires_at=None,
+            dedup_key=None,
+        )
+
+    async def cancel(self, task_id: str) -> bool:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(BackgroundTaskRecord)
+                .where(
+                    BackgroundTaskRecord.id == task_id,
+                    BackgroundTaskRecord.status == TaskStatus.PENDING.value,
+                )
+                .values(
+                    status=TaskStatus.CANCELLED.value,
+                    completed_at=datetime.utcnow(),
+                    dedup_key=None,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            return bool(result.rowcount)
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        async with self.session_factory() as session:
+            record = await session.get(BackgroundTaskRecord, task_id)
+            return _task_from_record(record).to_dict() if record else None
+
+    async def stats(self, task_types: List[str]) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        async with self.session_factory() as session:
+            rows = await session.execute(
+                select(
+                    BackgroundTaskRecord.task_type,
+                    BackgroundTaskRecord.status,
+                    BackgroundTaskRecord.priority,
+                    func.count(),
+                    func.min(BackgroundTaskRecord.available_at),
+                )
+                .where(BackgroundTaskRecord.status.in_(
+                    [TaskStatus.PENDING.value, TaskStatus.RUNNING.value]
+                ))
+                .group_by(
+                    BackgroundTaskRecord.task_type,
+                    BackgroundTaskRecord.status,
+                    BackgroundTaskRecord.priority,
+                )
+            )
+            return _depth_summary(
+                task_types,
+                [
+                    (task_type, status, priority, count, oldest)
+                    for task_type, status, priority, count, oldest in rows.all()
+                ],
+                now,
+            )
+
+    async def cleanup(self, older_than: datetime) -> int:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(BackgroundTaskRecord).where(
+                    BackgroundTaskRecord.status.in_([s.value for s in FINAL_STATUSES]),
+                    BackgroundTaskRecord.completed_at < older_than,
+                )
+            )
+            await session.commit()
+            return result.rowcount or 0
+
+
+def _depth_summary(task_types: List[str], rows, now: datetime) -> Dict[str, Any]:
+    """Shape (type, status, priority, count, oldest_available_at) rows for stats()"""
+    summary: Dict[str, Any] = {
+        task_type: {
+            "pending": {lane.name.lower(): 0 for lane in TaskPriority},
+            "running": 0,
+            "oldest_pending_age_seconds": 0.0,
+        }
+        for task_type in task_types
+    }
+    for task_type, status, priority, count, oldest in rows:
+        entry = summary.setdefault(task_type, {
+            "pending": {lane.name.lower(): 0 for lane in TaskPriority},
+            "running": 0,
+            "oldest_pending_age_seconds": 0.0,
+        })
+        if status == TaskStatus.RUNNING.value:
+            entry["running"] += count
+            continue
+        entry["pending"][TaskPriority(priority).name.lower()] += count
+        if oldest is not None and oldest <= now:
+            entry["oldest_pending_age_seconds"] = max(
+                entry["oldest_pending_age_seconds"], round((now - oldest).total_seconds(), 3)
+            )
+    return summary
+
+
+class RedisStreamTaskQueueBackend(TaskQueueBackend):
+    """
+    Queue stored in Redis streams, one stream per task type and lane.
+
+    Deliveries are read through a consumer group; entries left unacknowledged
+    longer than the visibility timeout are reclaimed with XAUTOCLAIM. Retries
+    wait in a sorted set until they are due. Task state is a JSON document per
+    task so status polling does not touch the streams.
+    """
+
+    name = "redis"
+
+    GROUP = "workers"
+    STATE_TTL_SECONDS = 7 * 24 * 3600
+
+    def __init__(self, redis_client, prefix: str = "tq"):
+        self.redis = redis_client
+        self.prefix = prefix
+        self._groups: set = set()
+
+    def _stream(self, task_type: str, priority: TaskPriority) -> str:
+        return f"{self.prefix}:stream:{task_type}:{int(priority)}"
+
+    def _state_key(self, task_id: str) -> str:
+        return f"{self.prefix}:task:{task_id}"
+
+    def _dedup_key(self, key: str) -> str:
+        return f"{self.prefix}:dedup:{key}"
+
+    def _delayed_key(self, task_type: str) -> str:
+        return f"{self.prefix}:delayed:{task_type}"
+
+    async def _ensure_group(self, stream: str) -> None:
+        if stream in self._groups:
+            return
+        try:
+            await self.redis.xgroup_create(stream, self.GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._groups.add(stream)
+
+    @staticmethod
+    def _encode(task: BackgroundTask) -> str:
+        state = task.to_dict()
+        state.update({
+            "data": task.data,
+            "priority": int(task.priority),
+            "dedup_key": task.dedup_key,
+            "available_at": task.available_at.isoformat(),
+            "worker_id": task.worker_id,
+        })
+        return json.dumps(state, default=str)
+
+    @staticmethod
+    def _decode(raw: str) -> BackgroundTask:
+        state = json.loads(raw)
+        task = BackgroundTask(
+            state["task_id"],
+            state["task_type"],
+            state.get("data") or {},
+            priority=TaskPriority(state["priority"]),
+            max_attempts=state["max_attempts"],
+            dedup_key=state.get("dedup_key"),
+        )
+        task.status = TaskStatus(state["status"])
+        task.created_at = datetime.fromisoformat(state["created_at"])
+        task.available_at = datetime.fromisoformat(state["available_at"])
+        if state.get("started_at"):
+            task.started_at = datetime.fromisoformat(state["started_at"])
+        if state.get("completed_at"):
+            task.completed_at = datetime.fromisoformat(state["completed_at"])
+        task.result = state.get("result")
+        task.error = state.get("error")
+        task.progress = state.get("progress", 0.0)
+        task.attempts = state.get("attempts", 0)
+        task.worker_id = state.get("worker_id")
+        return task
+
+    async def _save(self, task: BackgroundTask) -> None:
+        await self.redis.set(self._state_key(task.task_id), self._encode(task), ex=self.STATE_TTL_SECONDS)
+
+    async def enqueue(self, task: BackgroundTask, session=None) -> str:
+        if session is not None:
+            # Published once the caller's transaction commits, dropped if it
+            # rolls back, like a task row inserted on the SQL backend
+            if task.dedup_key:
+                existing = await self.redis.get(self._dedup_key(task.dedup_key))
+                if existing:
+                    return existing
+            # Begin the transaction the task is tied to
+            await session.connection()
+            session.sync_session.info.setdefault(PENDING_REDIS_TASKS_KEY, []).append((self, task))
+            return task.task_id
+
+        if task.dedup_key:
+            taken = await self.redis.set(
+                self._dedup_key(task.dedup_key), task.task_id, nx=True, ex=self.STATE_TTL_SECONDS
+            )
+            if not taken:
+                existing = await self.redis.get(self._dedup_key(task.dedup_key))
+                if existing:
+                    return existing
+
+        await self._save(task)
+        if task.available_at > datetime.utcnow():
+            await self.redis.zadd(
+                self._delayed_key(task.task_type),
+                {task.task_id: task.available_at.timestamp()},
+            )
+        else:
+            await self._publish(task)
+        return task.task_id
+
+    async def _publish(self, task: BackgroundTask) -> None:
+        stream = self._stream(task.task_type, task.priority)
+        await self._ensure_group(stream)
+        await self.redis.xadd(stream, {"task_id": task.task_id})
+
+    async def _promote_due(self, task_type: str) -> None:
+        delayed = self._delayed_key(task_type)
+        due = await self.redis.zrangebyscore(delayed, 0, time.time())
+        for task_id in due:
+            # ZREM decides which worker promotes the entry
+            if await self.redis.zrem(delayed, task_id):
+                raw = await self.redis.get(self._state_key(task_id))
+                if raw:
+                    await self._publish(self._decode(raw))
+
+    async def claim(
+        self, task_type: str, worker_id: str, limit: int, visibility_timeout: float
+    ) -> List[BackgroundTask]:
+        await self._promote_due(task_type)
+
+        claimed: List[BackgroundTask] = []
+        for lane in TaskPriority:
+            if len(claimed) >= limit:
+                break
+            stream = self._stream(task_type, lane)
+            await self._ensure_group(stream)
+
+            # Deliveries whose worker stopped heartbeating
+            _, stale, *_ = await self.redis.xautoclaim(
+                stream, self.GROUP, worker_id,
+                min_idle_time=int(visibility_timeout * 1000),
+                start_id="0-0", count=limit - len(claimed),
+            )
+            entries = list(stale)
+            if len(entries) < limit - len(claimed):
+                fresh = await self.redis.xreadgroup(
+                    self.GROUP, worker_id, {stream: ">"},
+                    count=limit - len(claimed) - len(entries),
+                )
+                for _, stream_entries in fresh or []:
+                    entries.extend(stream_entries)
+
+            for entry_id, fields in entries:
+                task = await self._start(stream, entry_id, fields, worker_id)
+                if task is not None:
+                    claimed.append(task)
+        return claimed
+
+    async def _start(self, stream: str, entry_id: str, fields: Dict[str, str], worker_id: str):
+        raw = await self.redis.get(self._state_key(fields.get("task_id", "")))
+        task = self._decode(raw) if raw else None
+        if task is None or task.status in FINAL_STATUSES:
+            await self._ack(stream, entry_id)
+            return None
+
+        task.status = TaskStatus.RUNNING
+        task.attempts += 1
+        task.worker_id = worker_id
+        task.started_at = task.started_at or datetime.utcnow()
+        task.receipt = (stream, entry_id)
+        await self._save(task)
+        return task
+
+    async def _ack(self, stream: str, entry_id: str) -> None:
+        await self.redis.xack(stream, self.GROUP, entry_id)
+        await self.redis.xdel(stream, entry_id)
+
+    async def heartbeat(self, task: BackgroundTask, visibility_timeout: float) -> bool:
+        stream, entry_id = task.receipt
+        # XCLAIM with zero idle time resets the idle clock if we still own it
+        owned = await self.redis.xclaim(
+            stream, self.GROUP, task.worker_id, min_idle_time=0,
+            message_ids=[entry_id], justid=True,
+        )
+        await self._save(task)
+        return bool(owned)
+
+    async def _finish(self, task: BackgroundTask) -> None:
+        stream, entry_id = task.receipt
+        await self._save(task)
+        await self._ack(stream, entry_id)
+        if task.dedup_key:
+            await self.redis.delete(self._dedup_key(task.dedup_key))
+
+    async def complete(self, task: BackgroundTask) -> None:
+        await self._finish(task)
+
+    async def fail(self, task: BackgroundTask) -> None:
+        await self._finish(task)
+
+    async def retry(self, task: BackgroundTask, available_at: datetime) -> None:
+        stream, entry_id = task.receipt
+        task.available_at = available_at
+        await self._save(task)
+        await self.redis.zadd(
+            self._delayed_key(task.task_type), {task.task_id: available_at.timestamp()}
+        )
+        await self._ack(stream, entry_id)
+
+    async def cancel(self, task_id: str) -> bool:
+        raw = await self.redis.get(self._state_key(task_id))
+        if not raw:
+            return False
+        task = self._decode(raw)
+        if task.status != TaskStatus.PENDING:
+            return False
+        # The stream entry is acknowledged and dropped when a worker reads it
+        task.status = TaskStatus.CANCELLED
+        task.completed_at = datetime.utcnow()
+        await self._save(task)
+        await self.redis.zrem(self._delayed_key(task.task_type), task_id)
+        if task.dedup_key:
+            await self.redis.delete(self._dedup_key(task.dedup_key))
+        return True
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self.redis.get(self._state_key(task_id))
+        return self._decode(raw).to_dict() if raw else None
+
+    async def stats(self, task_types: List[str]) -> Dict[str, Any]:
+        rows = []
+        now = datetime.utcnow()
+        for task_type in task_types:
+            for lane in TaskPriority:
+                stream = self._stream(task_type, lane)
+                await self._ensure_group(stream)
+                length = await self.redis.xlen(stream)
+                pending = await self.redis.xpending(stream, self.GROUP)
+                running = pending.get("pending", 0) if isinstance(pending, dict) else 0
+                rows.append((task_type, TaskStatus.RUNNING.value, int(lane), running, None))
+                oldest = None
+                head = await self.redis.xrange(stream, count=1)
+                if head:
+                    oldest = datetime.utcfromtimestamp(int(head[0][0].split("-")[0]) / 1000)
+                rows.append((task_type, TaskStatus.PENDING.value, int(lane), length - running, oldest))
+        summary = _depth_summary(task_types, rows, now)
+        for task_type in task_types:
+            # Retries waiting for their backoff to pass
+            summary[task_type]["delayed"] = await self.redis.zcard(self._delayed_key(task_type))
+        return summary
+
+    async def cleanup(self, older_than: datetime) -> int:
+        # Task state documents expire on their own (STATE_TTL_SECONDS)
+        return 0
+
+
+_publishing: set = set()
+
+
+async def _publish_committed(pending) -> None:
+    for backend, task in pending:
+        try:
+            await backend.enqueue(task)
+        except Exception as e:
+            logger.error(f"Failed to publish task {task.task_id} to Redis: {e}")
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session: Session) -> None:
+    pending = session.info.pop(PENDING_REDIS_TASKS_KEY, None)
+    if not pending:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(_publish_committed(pending))
+    _publishing.add(task)
+    task.add_done_callback(_publishing.discard)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(PENDING_REDIS_TASKS_KEY, None)
@@ -10,6 +10,8 @@ from typing import Dict, List, Optional
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.identity_cache import identity_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -230,6 +232,9 @@ class VesselIntegrationService:
             )
             await session.execute(update_stmt)
             await session.commit()
+
+            # Owner changes affect vessel access; bulk updates bypass the ORM flush hooks
+            identity_cache.invalidate(room_id=str(vessel.room_id))
             
             # Return updated vessel
             vessel_query = select(Vessel).where(Vessel.id == vessel_id)
@@ -0,0 +1,279 @@
+"""
+Vessel access for STS Clearance system
+Materialized user -> vessel grants, and the one lookup API on top of them
+
+Brokers see every vessel; owners and charterers see the vessels whose
+owner (charterer) name and their company name contain one another,
+ignoring case. Grants of owners and
+charterers are kept in the user_vessel_access table, recomputed with
+set-based SQL in the flush that changes a vessel or a user's role, company
+or email. Access checks are then indexed lookups: a batch of rooms costs
+one query, and a list endpoint filters, counts and paginates in the
+database, so a page is never short because rows were dropped after the
+LIMIT.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import (and_, case, delete, event, exists, false, func, insert, inspect,
+                        or_, select, true, union_all)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from app.models import (Approval, Document, Message, Room, User, UserVesselAccess,
+                        Vessel)
+from app.pagination import keyset_page, split_page
+
+# Roles that can be granted vessel access
+ACCESS_ROLES = ("broker", "owner", "charterer")
+
+# Roles that see every vessel without grant rows
+FULL_ACCESS_ROLES = ("broker",)
+
+# Roles granted vessels whose column names their company
+GRANT_COLUMNS = {"owner": Vessel.owner, "charterer": Vessel.charterer}
+
+# User attributes that change grants
+USER_GRANT_ATTRIBUTES = ("email", "role", "company")
+VESSEL_GRANT_ATTRIBUTES = ("owner", "charterer", "room_id")
+
+_grants = UserVesselAccess.__table__
+
+
+# Lookups ----------------------------------------------------------------------
+
+def vessel_access_clause(user):
+    """SQL condition on Vessel: ``user`` (with .email and .role) may see the vessel"""
+    if user.role in FULL_ACCESS_ROLES:
+        return true()
+    if user.role not in GRANT_COLUMNS:
+        return false()
+    return exists().where(
+        UserVesselAccess.user_email == user.email, UserVesselAccess.vessel_id == Vessel.id
+    )
+
+
+def room_access_clause(user):
+    """SQL condition on Room: ``user`` may see at least one of its vessels"""
+    if user.role in FULL_ACCESS_ROLES:
+        return exists().where(Vessel.room_id == Room.id)
+    if user.role not in GRANT_COLUMNS:
+        return false()
+    return exists().where(
+        UserVesselAccess.user_email == user.email, UserVesselAccess.room_id == Room.id
+    )
+
+
+async def accessible_vessels_by_room(
+    session: AsyncSession, user, room_ids: Iterable
+) -> Dict[str, List[str]]:
+    """Ids of the vessels ``user`` may see in each of ``room_ids``, in one query"""
+    room_ids = list({str(room_id) for room_id in room_ids})
+    access: Dict[str, List[str]] = {room_id: [] for room_id in room_ids}
+    if not room_ids or user.role not in ACCESS_ROLES:
+        return access
+
+    if user.role in FULL_ACCESS_ROLES:
+        query = select(Vessel.room_id, Vessel.id).where(Vessel.room_id.in_(room_ids))
+    else:
+        query = select(UserVesselAccess.room_id, UserVesselAccess.vessel_id).where(
+            UserVesselAccess.user_email == user.email,
+            UserVesselAccess.room_id.in_(room_ids),
+        )
+    for room_id, vessel_id in await session.execute(query):
+        access[str(room_id)].append(str(vessel_id))
+    return access
+
+
+def operation_role(user_role: str) -> str:
+    """The user's role in an operation they can access"""
+    return user_role if user_role in ACCESS_ROLES else "viewer"
+
+
+@dataclass
+class OperationRow:
+    """An accessible operation with its vessel counts and last activity"""
+
+    room: Room
+    vessel_count: int
+    user_vessels: int
+    last_activity: Optional[datetime]
+
+    @property
+    def id(self):
+        return self.room.id
+
+    @property
+    def created_at(self):
+        return self.room.created_at
+
+
+async def accessible_operations(
+    session: AsyncSession,
+    user,
+    filters: Sequence = (),
+    limit: Optional[int] = None,
+    offset: int = 0,
+    cursor: Optional[Tuple[Optional[datetime], str]] = None,
+) -> Tuple[List[OperationRow], Optional[str]]:
+    """
+    Rooms matching ``filters`` that ``user`` can access, newest first, and
+    the next page's cursor; every room when ``limit`` is None
+
+    The page is selected first; vessel counts and last activity are grouped
+    over the page's rooms only, all in one statement.
+    """
+    access = vessel_access_clause(user)
+    rooms = select(Room).where(*filters, room_access_clause(user))
+    if limit is not None:
+        rooms = keyset_page(rooms, Room.created_at, Room.id, cursor, limit)
+        if offset and cursor is None:
+            rooms = rooms.offset(offset)
+    page = rooms.cte("page")
+    room = aliased(Room, page)
+    room_ids = select(page.c.id)
+
+    vessels = (
+        select(
+            Vessel.room_id,
+            func.count().label("vessel_count"),
+            func.sum(case((access, 1), else_=0)).label("user_vessels"),
+        )
+        .where(Vessel.room_id.in_(room_ids))
+        .group_by(Vessel.room_id)
+        .subquery()
+    )
+    events = union_all(
+        select(Message.room_id.label("room_id"), func.max(Message.created_at).label("at"))
+        .where(Message.room_id.in_(room_ids)).group_by(Message.room_id),
+        select(Approval.room_id, func.max(Approval.updated_at))
+        .where(Approval.room_id.in_(room_ids)).group_by(Approval.room_id),
+        select(Document.room_id, func.max(Document.uploaded_at))
+        .where(Document.room_id.in_(room_ids)).group_by(Document.room_id),
+    ).subquery()
+    activity = (
+        select(events.c.room_id, func.max(events.c.at).label("last_activity"))
+        .group_by(events.c.room_id)
+        .subquery()
+    )
+
+    result = await session.execute(
+        select(room, vessels.c.vessel_count, vessels.c.user_vessels, activity.c.last_activity)
+        .outerjoin(vessels, vessels.c.room_id == room.id)
+        .outerjoin(activity, activity.c.room_id == room.id)
+        .order_by(room.created_at.desc(), room.id.desc())
+    )
+    rows = [
+        OperationRow(room_row, vessel_count or 0, user_vessels or 0, last_activity)
+        for room_row, vessel_count, user_vessels, last_activity in result.all()
+    ]
+    if limit is None:
+        return rows, None
+    return split_page(rows, limit, "created_at")
+
+
+# Maintenance ------------------------------------------------------------------
+
+def _names_match(dialect_name: str, vessel_company, user_company):
+    """Either company name contains the other, ignoring case (not a LIKE pattern)"""
+    position = func.instr if dialect_name == "sqlite" else func.strpos
+    vessel_company, user_company = func.lower(vessel_company), func.lower(user_company)
+    return and_(
+        vessel_company != "",
+        user_company != "",
+        or_(position(vessel_company, user_company) > 0, position(user_company, vessel_company) > 0),
+    )
+
+
+def _grant_rows(dialect_name: str):
+    """SELECT of (user_email, vessel_id, room_id, reason) for every grant"""
+    rule = or_(*[
+        and_(User.role == role, _names_match(dialect_name, column, User.company))
+        for role, column in GRANT_COLUMNS.items()
+    ])
+    return (
+        select(User.email, Vessel.id, Vessel.room_id, User.role)
+        .select_from(User)
+        .join(Vessel, rule)
+    )
+
+
+def refresh_grants(
+    connection,
+    vessel_ids: Iterable = (),
+    user_emails: Iterable = (),
+    deleted_vessel_ids: Iterable = (),
+    deleted_user_emails: Iterable = (),
+) -> None:
+    """Recompute the grants of some vessels and users"""
+    vessel_ids, user_emails = set(vessel_ids), set(user_emails)
+    stale_vessels = vessel_ids | set(deleted_vessel_ids)
+    stale_users = user_emails | set(deleted_user_emails)
+    if stale_vessels:
+        connection.execute(delete(_grants).where(_grants.c.vessel_id.in_(stale_vessels)))
+    if stale_users:
+        connection.execute(delete(_grants).where(_grants.c.user_email.in_(stale_users)))
+
+    columns = ["user_email", "vessel_id", "room_id", "reason"]
+    grants = _grant_rows(connection.dialect.name)
+    if vessel_ids:
+        connection.execute(
+            insert(_grants).from_select(columns, grants.where(Vessel.id.in_(vessel_ids)))
+        )
+    if user_emails:
+        # Grants of vessels recomputed above are already in place
+        connection.execute(insert(_grants).from_select(columns, grants.where(
+            User.email.in_(user_emails), Vessel.id.notin_(vessel_ids)
+        )))
+
+
+async def rebuild_vessel_access(session: AsyncSession) -> int:
+    """Recompute every grant, e.g. after bulk loads that bypass the ORM; the caller commits"""
+    def rebuild(sync_session: Session) -> int:
+        connection = sync_session.connection()
+        connection.execute(delete(_grants))
+        connection.execute(insert(_grants).from_select(
+            ["user_email", "vessel_id", "room_id", "reason"],
+            _grant_rows(connection.dialect.name),
+        ))
+        return connection.execute(select(func.count()).select_from(_grants)).scalar()
+
+    return await session.run_sync(rebuild)
+
+
+def _changed(instance, attributes) -> bool:
+    state = inspect(instance)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_grants_after_flush(session: Session, flush_context) -> None:
+    vessel_ids: Set = set()
+    user_emails: Set[str] = set()
+    deleted_vessel_ids: Set = set()
+    deleted_user_emails: Set[str] = set()
+
+    for instance in session.new:
+        if isinstance(instance, Vessel):
+            vessel_ids.add(instance.id)
+        elif isinstance(instance, User):
+            user_emails.add(instance.email)
+    for instance in session.dirty:
+        if isinstance(instance, Vessel) and _changed(instance, VESSEL_GRANT_ATTRIBUTES):
+            vessel_ids.add(instance.id)
+        elif isinstance(instance, User) and _changed(instance, USER_GRANT_ATTRIBUTES):
+            user_emails.add(instance.email)
+            # Grants recorded under a previous email
+            deleted_user_emails.update(inspect(instance).attrs.email.history.deleted)
+    for instance in session.deleted:
+        if isinstance(instance, Vessel):
+            deleted_vessel_ids.add(instance.id)
+        elif isinstance(instance, User):
+            deleted_user_emails.add(instance.email)
+
+    if vessel_ids or user_emails or deleted_vessel_ids or deleted_user_emails:
+        refresh_grants(
+            session.connection(), vessel_ids, user_emails, deleted_vessel_ids, deleted_user_emails
+        )
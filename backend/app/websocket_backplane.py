@@ -0,0 +1,330 @@
+"""
+WebSocket broadcast backplane for STS Clearance system
+Carries room events and presence between API worker processes
+
+Every worker keeps its own websocket connections. A room event is delivered
+to the local connections first and published once on the backplane; every
+other worker receives it and fans it out to its own connections. Presence
+(who is online in a room) is stored in the backplane so any worker can list
+all members of a room.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# deliver(room_id, text, **target) fans a serialized event out to local connections
+Deliver = Callable[..., Awaitable[None]]
+
+
+class BackplaneTransport:
+    """Message bus and presence store shared by all workers"""
+
+    name = "base"
+
+    async def start(self, on_event: Callable[[str], Awaitable[None]], worker_id: str) -> None:
+        """Begin delivering published envelopes to ``on_event``"""
+        raise NotImplementedError
+
+    async def stop(self) -> None:
+        raise NotImplementedError
+
+    async def publish(self, envelope: str) -> None:
+        raise NotImplementedError
+
+    async def presence_add(self, scope: str, room_id: str, connection_id: str, info: Dict) -> None:
+        raise NotImplementedError
+
+    async def presence_remove(self, scope: str, room_id: str, connection_id: str) -> None:
+        raise NotImplementedError
+
+    async def presence_list(self, scope: str, room_id: str) -> List[Dict]:
+        raise NotImplementedError
+
+
+class LocalBus:
+    """In-process stand-in for a shared bus; share one between transports to simulate workers"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Callable[[str], Awaitable[None]]] = {}
+        # (scope, room_id) -> {connection_id -> info}
+        self.presence: Dict[tuple, Dict[str, Dict]] = {}
+
+
+class LocalTransport(BackplaneTransport):
+    """
+    Backplane within one process (single worker and tests).
+
+    Transports created on the same LocalBus behave like separate workers
+    attached to one Redis.
+    """
+
+    name = "local"
+
+    def __init__(self, bus: Optional[LocalBus] = None):
+        self.bus = bus or LocalBus()
+        self._worker_id: Optional[str] = None
+
+    async def start(self, on_event, worker_id: str) -> None:
+        self._worker_id = worker_id
+        self.bus.subscribers[worker_id] = on_event
+
+    async def stop(self) -> None:
+        if self._worker_id is not None:
+            self.bus.subscribers.pop(self._worker_id, None)
+            for members in self.bus.presence.values():
+                for connection_id in [
+                    cid for cid, info in members.items() if info.get("worker_id") == self._worker_id
+                ]:
+                    members.pop(connection_id, None)
+            self._worker_id = None
+
+    async def publish(self, envelope: str) -> None:
+        for worker_id, on_event in list(self.bus.subscribers.items()):
+            if worker_id != self._worker_id:
+                await on_event(envelope)
+
+    async def presence_add(self, scope, room_id, connection_id, info) -> None:
+        self.bus.presence.setdefault((scope, room_id), {})[connection_id] = info
+
+    async def presence_remove(self, scope, room_id, connection_id) -> None:
+        members = self.bus.presence.get((scope, room_id))
+        if members is not None:
+            members.pop(connection_id, None)
+            if not members:
+                del self.bus.presence[(scope, room_id)]
+
+    async def presence_list(self, scope, room_id) -> List[Dict]:
+        return list(self.bus.presence.get((scope, room_id), {}).values())
+
+
+class RedisTransport(BackplaneTransport):
+    """
+    Backplane on Redis: pub/sub for events, one hash per room for presence.
+
+    Each worker refreshes a liveness key; presence entries left behind by a
+    worker that died are dropped when the room is next listed.
+    """
+
+    name = "redis"
+
+    def __init__(self, redis_client, prefix: str = "ws", worker_ttl_seconds: int = 30):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.channel = f"{prefix}:events"
+        self.worker_ttl_seconds = worker_ttl_seconds
+        self._worker_id: Optional[str] = None
+        self._pubsub = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _presence_key(self, scope: str, room_id: str) -> str:
+        return f"{self.prefix}:presence:{scope}:{room_id}"
+
+    def _worker_key(self, worker_id: str) -> str:
+        return f"{self.prefix}:worker:{worker_id}"
+
+    async def start(self, on_event, worker_id: str) -> None:
+        self._worker_id = worker_id
+        await self.redis.set(self._worker_key(worker_id), "1", ex=self.worker_ttl_seconds)
+        self._pubsub = self.redis.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._tasks = [
+            asyncio.create_task(self._listen(on_event)),
+            asyncio.create_task(self._keepalive()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(self.channel)
+                await self._pubsub.close()
+            except Exception as e:
+                logger.warning(f"Error closing backplane subscription: {e}")
+            self._pubsub = None
+        if self._worker_id is not None:
+            await self.redis.delete(self._worker_key(self._worker_id))
+
+    async def _listen(self, on_event) -> None:
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    await on_event(data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Backplane subscription error: {e}")
+                await asyncio.sleep(1)
+
+    async def _keepalive(self) -> None:
+        while True:
+            await asyncio.sleep(self.worker_ttl_seconds / 3)
+            try:
+                await self.redis.set(
+                    self._worker_key(self._worker_id), "1", ex=self.worker_ttl_seconds
+                )
+            except Exception as e:
+                logger.warning(f"Backplane keepalive failed: {e}")
+
+    async def publish(self, envelope: str) -> None:
+        await self.redis.publish(self.channel, envelope)
+
+    async def presence_add(self, scope, room_id, connection_id, info) -> None:
+        await self.redis.hset(self._presence_key(scope, room_id), connection_id, json.dumps(info))
+
+    async def presence_remove(self, scope, room_id, connection_id) -> None:
+        await self.redis.hdel(self._presence_key(scope, room_id), connection_id)
+
+    async def presence_list(self, scope, room_id) -> List[Dict]:
+        key = self._presence_key(scope, room_id)
+        entries = {cid: json.loads(raw) for cid, raw in (await self.redis.hgetall(key)).items()}
+        if not entries:
+            return []
+
+        workers = sorted({info.get("worker_id") for info in entries.values()})
+        alive = await self.redis.mget([self._worker_key(w) for w in workers])
+        live_workers = {w for w, flag in zip(workers, alive) if flag}
+
+        stale = [cid for cid, info in entries.items() if info.get("worker_id") not in live_workers]
+        if stale:
+            await self.redis.hdel(key, *stale)
+        return [info for info in entries.values() if info.get("worker_id") in live_workers]
+
+
+class WebSocketBackplane:
+    """
+    Routes room events between workers for registered connection managers.
+
+    Each manager registers under a scope name with a local deliver callback;
+    ``publish`` sends the serialized event to every other worker, where the
+    manager with the same scope delivers it to its own connections.
+    """
+
+    def __init__(self, transport: Optional[BackplaneTransport] = None):
+        self.transport = transport or LocalTransport()
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._scopes: Dict[str, Deliver] = {}
+        self._started = False
+
+        # Metrics
+        self.events_published = 0
+        self.events_received = 0
+        self.publish_errors = 0
+
+    def register(self, scope: str, deliver: Deliver) -> None:
+        """Register a manager's local fan-out for events in ``scope``"""
+        self._scopes[scope] = deliver
+
+    async def start(self, transport: Optional[BackplaneTransport] = None) -> None:
+        """Attach to the bus (optionally switching transport first)"""
+        if self._started:
+            await self.stop()
+        if transport is not None:
+            self.transport = transport
+        await self.transport.start(self._on_event, self.worker_id)
+        self._started = True
+        logger.info(f"WebSocket backplane started ({self.transport.name}, worker {self.worker_id})")
+
+    async def stop(self) -> None:
+        if self._started:
+            await self.transport.stop()
+            self._started = False
+
+    async def publish(self, scope: str, room_id: str, text: str, **target: Any) -> None:
+        """
+        Send a serialized room event to the other workers
+
+        ``target`` holds JSON-serialisable keyword filters (e.g. a role)
+        passed through to the receiving manager's deliver callback.
+        """
+        if not self._started:
+            return
+        envelope = json.dumps({
+            "origin": self.worker_id,
+            "scope": scope,
+            "room_id": room_id,
+            "text": text,
+            "target": target,
+        })
+        try:
+            await self.transport.publish(envelope)
+            self.events_published += 1
+        except Exception as e:
+            # Local members already have the event; remote ones miss it
+            self.publish_errors += 1
+            logger.error(f"Backplane publish failed for room {room_id}: {e}")
+
+    async def _on_event(self, envelope: str) -> None:
+        try:
+            event = json.loads(envelope)
+        except ValueError:
+            logger.warning("Dropping malformed backplane event")
+            return
+        if event.get("origin") == self.worker_id:
+            return
+        deliver = self._scopes.get(event.get("scope"))
+        if deliver is None:
+            return
+        self.events_received += 1
+        try:
+            await deliver(event["room_id"], event["text"], **(event.get("target") or {}))
+        except Exception as e:
+            logger.error(f"Error delivering backplane event to room {event.get('room_id')}: {e}")
+
+    async def add_presence(self, scope: str, room_id: str, connection_id: str, info: Dict[str, Any]) -> None:
+        if not self._started:
+            return
+        try:
+            await self.transport.presence_add(
+                scope, room_id, connection_id, {**info, "worker_id": self.worker_id}
+            )
+        except Exception as e:
+            logger.warning(f"Backplane presence update failed: {e}")
+
+    async def remove_presence(self, scope: str, room_id: str, connection_id: str) -> None:
+        if not self._started:
+            return
+        try:
+            await self.transport.presence_remove(scope, room_id, connection_id)
+        except Exception as e:
+            logger.warning(f"Backplane presence update failed: {e}")
+
+    async def room_presence(self, scope: str, room_id: str) -> Optional[List[Dict]]:
+        """Members of a room on all workers; None if the backplane is unavailable"""
+        if not self._started:
+            return None
+        try:
+            members = await self.transport.presence_list(scope, room_id)
+        except Exception as e:
+            logger.warning(f"Backplane presence lookup failed: {e}")
+            return None
+        return [{k: v for k, v in info.items() if k != "worker_id"} for info in members]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "transport": self.transport.name,
+            "worker_id": self.worker_id,
+            "started": self._started,
+            "scopes": sorted(self._scopes),
+            "events_published": self.events_published,
+            "events_received": self.events_received,
+            "publish_errors": self.publish_errors,
+        }
+
+
+# Global backplane shared by the connection managers of this process
+websocket_backplane = WebSocketBackplane()
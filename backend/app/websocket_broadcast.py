@@ -0,0 +1,285 @@
+"""
+WebSocket broadcast engine for STS Clearance system
+Per-connection bounded outbound queues drained by one writer task each
+
+Broadcasting only enqueues the already-serialized event for every
+recipient, so a slow client never delays its peers. When a client's queue
+is full, coalescable events (typing indicators, heartbeats) are dropped for
+that client; if it is still full, or a single send has been stuck for longer
+than the send timeout, the client is disconnected as a slow consumer.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# Event types that may be skipped for a client that is behind
+COALESCABLE_EVENT_TYPES = frozenset({"typing", "heartbeat"})
+
+# Close code sent to clients dropped for falling behind (1013: try again later)
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class ConnectionSender:
+    """Outbound queue and writer task for one websocket"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue: int,
+        send_timeout: float,
+        on_close: Optional[Callable[[str], None]] = None,
+        label: Optional[str] = None,
+        tasks: Optional[Set[asyncio.Task]] = None,
+    ):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.on_close = on_close
+        self.label = label or hex(id(websocket))
+
+        # (text, enqueued_at, coalescable)
+        self.queue: Deque[Tuple[str, float, bool]] = deque()
+        self.closed = False
+        self.close_reason: Optional[str] = None
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Every task spawned for this connection, so an owner can await them
+        self._tasks: Set[asyncio.Task] = tasks if tasks is not None else set()
+        # monotonic start of the send in progress, None while idle
+        self._sending_since: Optional[float] = None
+
+        # Stats
+        self.sent = 0
+        self.bytes_sent = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def start(self) -> None:
+        self._task = self._spawn(self._run())
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def offer(self, text: str, coalescable: bool = False) -> bool:
+        """Queue an event without blocking; False if it was not queued"""
+        if self.closed:
+            return False
+
+        # Checked here rather than with a timer per send: a stuck send is
+        # only a problem once there is something else to deliver
+        if (
+            self._sending_since is not None
+            and time.monotonic() - self._sending_since > self.send_timeout
+        ):
+            self.close("send timeout")
+            return False
+
+        if len(self.queue) >= self.max_queue:
+            if coalescable:
+                self.coalesced += 1
+                return False
+            if not self._evict_coalescable():
+                self.close("slow consumer")
+                return False
+
+        self.queue.append((text, time.monotonic(), coalescable))
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self._ready.set()
+        return True
+
+    def _evict_coalescable(self) -> bool:
+        for index, (_, _, coalescable) in enumerate(self.queue):
+            if coalescable:
+                del self.queue[index]
+                self.coalesced += 1
+                return True
+        return False
+
+    async def _run(self) -> None:
+        while True:
+            if not self.queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            text, enqueued_at, _ = self.queue.popleft()
+            self._sending_since = time.monotonic()
+            try:
+                await self.websocket.send_text(text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.info(f"Websocket {self.label} send failed: {e}")
+                self.close("send failed", notify_client=False)
+                return
+            finally:
+                self._sending_since = None
+
+            self.sent += 1
+            self.bytes_sent += len(text)
+            self.last_lag_ms = (time.monotonic() - enqueued_at) * 1000
+            self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+
+    def close(self, reason: str, notify_client: bool = True) -> None:
+        """Stop writing to this connection and tell its owner"""
+        if self.closed:
+            return
+        self.closed = True
+        self.close_reason = reason
+        self.queue.clear()
+        self.stop()
+        if reason in ("slow consumer", "send timeout"):
+            logger.warning(f"Dropping slow websocket consumer {self.label}")
+        if notify_client:
+            self._spawn(self._close_socket(reason))
+        if self.on_close is not None:
+            try:
+                self.on_close(reason)
+            except Exception as e:
+                logger.error(f"Error in websocket close callback: {e}")
+
+    async def _close_socket(self, reason: str) -> None:
+        try:
+            await self.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE, reason=reason)
+        except Exception:
+            pass
+
+    def stop(self) -> None:
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        oldest_ms = (now - self.queue[0][1]) * 1000 if self.queue else 0.0
+        return {
+            "connection": self.label,
+            "queue_depth": len(self.queue),
+            "max_queue_depth": self.max_depth,
+            "sent": self.sent,
+            "bytes_sent": self.bytes_sent,
+            "coalesced": self.coalesced,
+            "lag_ms": round(oldest_ms, 2),
+            "sending_for_ms": (
+                round((now - self._sending_since) * 1000, 2) if self._sending_since is not None else 0.0
+            ),
+            "max_lag_ms": round(self.max_lag_ms, 2),
+        }
+
+
+class BroadcastEngine:
+    """
+    Fans serialized events out to attached websockets through their senders.
+
+    Managers attach a websocket when it connects, detach it when it goes
+    away, and pass every event as text that was serialized once.
+    """
+
+    def __init__(self, max_queue: Optional[int] = None, send_timeout: Optional[float] = None):
+        self.max_queue = max_queue or int(os.getenv("WS_MAX_OUTBOUND_QUEUE", 256))
+        self.send_timeout = send_timeout or float(os.getenv("WS_SEND_TIMEOUT_SECONDS", 10))
+        self.senders: Dict[WebSocket, ConnectionSender] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        # Metrics
+        self.events_broadcast = 0
+        self.deliveries_queued = 0
+        self.slow_consumers_dropped = 0
+
+    def attach(
+        self,
+        websocket: WebSocket,
+        on_close: Optional[Callable[[str], None]] = None,
+        label: Optional[str] = None,
+    ) -> ConnectionSender:
+        """Start a writer for a newly accepted websocket"""
+        sender = self.senders.get(websocket)
+        if sender is None:
+            def closed(reason: str) -> None:
+                self.senders.pop(websocket, None)
+                if reason in ("slow consumer", "send timeout"):
+                    self.slow_consumers_dropped += 1
+                if on_close is not None:
+                    on_close(reason)
+
+            sender = ConnectionSender(
+                websocket, self.max_queue, self.send_timeout, on_close=closed, label=label,
+                tasks=self._tasks,
+            )
+            self.senders[websocket] = sender
+            sender.start()
+        return sender
+
+    def detach(self, websocket: WebSocket) -> None:
+        """Stop the writer of a websocket that disconnected (pending events are dropped)"""
+        sender = self.senders.pop(websocket, None)
+        if sender is not None:
+            sender.closed = True
+            sender.stop()
+
+    async def close(self) -> None:
+        """Detach every websocket and wait for the writer tasks to finish"""
+        for websocket in list(self.senders):
+            self.detach(websocket)
+        current = asyncio.current_task()
+        await asyncio.gather(
+            *(task for task in list(self._tasks) if task is not current),
+            return_exceptions=True,
+        )
+
+    def is_attached(self, websocket: WebSocket) -> bool:
+        return websocket in self.senders
+
+    def send(self, websocket: WebSocket, text: str, coalescable: bool = False) -> bool:
+        sender = self.senders.get(websocket)
+        if sender is None:
+            return False
+        queued = sender.offer(text, coalescable)
+        if queued:
+            self.deliveries_queued += 1
+        return queued
+
+    def fanout(
+        self,
+        websockets: Iterable[WebSocket],
+        text: str,
+        exclude: Optional[WebSocket] = None,
+        coalescable: bool = False,
+    ) -> int:
+        """Queue one serialized event for every websocket; returns recipients queued"""
+        self.events_broadcast += 1
+        queued = 0
+        for websocket in list(websockets):
+            if websocket is exclude:
+                continue
+            if self.send(websocket, text, coalescable):
+                queued += 1
+        return queued
+
+    def get_stats(self, include_connections: bool = True) -> Dict[str, Any]:
+        connections = [sender.get_stats() for sender in self.senders.values()]
+        stats = {
+            "connections": len(connections),
+            "events_broadcast": self.events_broadcast,
+            "deliveries_queued": self.deliveries_queued,
+            "slow_consumers_dropped": self.slow_consumers_dropped,
+            "total_queue_depth": sum(c["queue_depth"] for c in connections),
+            "max_lag_ms": max((c["max_lag_ms"] for c in connections), default=0.0),
+            "max_queue": self.max_queue,
+        }
+        if include_connections:
+            stats["per_connection"] = connections
+        return stats
@@ -2,27 +2,48 @@
 WebSocket connection manager for real-time chat
 """
 
+import asyncio
 import json
 import logging
+import uuid
 from datetime import datetime
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set
 
 from fastapi import WebSocket, WebSocketDisconnect
 
+from app.websocket_backplane import WebSocketBackplane, websocket_backplane
+from app.websocket_broadcast import COALESCABLE_EVENT_TYPES, BroadcastEngine
+
 logger = logging.getLogger(__name__)
 
 
 class ConnectionManager:
     """
     Manages WebSocket connections for real-time chat
+
+    Connections are local to this worker; with a backplane, room events and
+    presence are shared with the other workers. With a broadcast engine,
+    every connection is written by its own task from a bounded queue so a
+    slow client cannot hold up the room.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        backplane: Optional[WebSocketBackplane] = None,
+        scope: str = "chat",
+        engine: Optional[BroadcastEngine] = None,
+    ):
         # room_id -> set of websockets
         self.active_connections: Dict[str, Set[WebSocket]] = {}
         # websocket -> user info
         self.connection_info: Dict[WebSocket, Dict] = {}
 
+        self.backplane = backplane
+        self.scope = scope
+        self.engine = engine
+        if backplane is not None:
+            backplane.register(scope, self._deliver_local)
+
     async def connect(
         self, websocket: WebSocket, room_id: str, user_email: str, user_name: str
     ):
@@ -36,14 +57,29 @@ class ConnectionManager:
             self.active_connections[room_id] = set()
         self.active_connections[room_id].add(websocket)
 
+        if self.engine is not None:
+            self.engine.attach(
+                websocket, on_close=lambda reason: self.disconnect(websocket), label=user_email
+            )
+
         # Store connection info
+        connected_at = datetime.utcnow()
+        connection_id = str(uuid.uuid4())
         self.connection_info[websocket] = {
+            "connection_id": connection_id,
             "room_id": room_id,
             "user_email": user_email,
             "user_name": user_name,
-            "connected_at": datetime.utcnow(),
+            "connected_at": connected_at,
         }
 
+        if self.backplane is not None:
+            await self.backplane.add_presence(self.scope, room_id, connection_id, {
+                "user_email": user_email,
+                "user_name": user_name,
+                "connected_at": connected_at.isoformat(),
+            })
+
         logger.info(f"User {user_email} connected to room {room_id}")
 
         # Notify other users in the room
@@ -76,13 +112,18 @@ class ConnectionManager:
 
             # Remove connection info
             del self.connection_info[websocket]
+            if self.engine is not None:
+                self.engine.detach(websocket)
 
             logger.info(f"User {user_email} disconnected from room {room_id}")
 
-            # Notify other users in the room
-            if room_id in self.active_connections:
-                import asyncio
+            if self.backplane is not None:
+                asyncio.create_task(
+                    self.backplane.remove_presence(self.scope, room_id, info["connection_id"])
+                )
 
+            # Notify other users in the room (possibly on other workers)
+            if room_id in self.active_connections or self.backplane is not None:
                 asyncio.create_task(
                     self.broadcast_to_room(
                         room_id,
@@ -99,6 +140,9 @@ class ConnectionManager:
         """
         Send a message to a specific websocket
         """
+        if self.engine is not None and self.engine.is_attached(websocket):
+            self.engine.send(websocket, json.dumps(message))
+            return
         try:
             await websocket.send_text(json.dumps(message))
         except Exception as e:
@@ -108,12 +152,34 @@ class ConnectionManager:
         self, room_id: str, message: dict, exclude_websocket: WebSocket = None
     ):
         """
-        Broadcast a message to all users in a room
+        Broadcast a message to all users in a room, on every worker
         """
+        message_text = json.dumps(message)
+        coalescable = message.get("type") in COALESCABLE_EVENT_TYPES
+        await self._deliver_local(room_id, message_text, exclude_websocket, coalescable)
+        if self.backplane is not None:
+            await self.backplane.publish(
+                self.scope, room_id, message_text, coalescable=coalescable
+            )
+
+    async def _deliver_local(
+        self,
+        room_id: str,
+        message_text: str,
+        exclude_websocket: WebSocket = None,
+        coalescable: bool = False,
+    ):
+        """Send a serialized event to this worker's connections in a room"""
         if room_id not in self.active_connections:
             return
 
-        message_text = json.dumps(message)
+        if self.engine is not None:
+            self.engine.fanout(
+                self.active_connections[room_id], message_text,
+                exclude=exclude_websocket, coalescable=coalescable,
+            )
+            return
+
         disconnected_websockets = []
 
         for websocket in self.active_connections[room_id].copy():
@@ -194,10 +260,15 @@ class ConnectionManager:
 
         await self.broadcast_to_room(room_id, activity)
 
-    def get_room_users(self, room_id: str) -> List[Dict]:
+    async def get_room_users(self, room_id: str) -> List[Dict]:
         """
-        Get list of users currently connected to a room
+        Get list of users currently connected to a room (all workers)
         """
+        if self.backplane is not None:
+            members = await self.backplane.room_presence(self.scope, room_id)
+            if members is not None:
+                return members
+
         if room_id not in self.active_connections:
             return []
 
@@ -231,4 +302,4 @@ class ConnectionManager:
 
 
 # Global connection manager instance
-manager = ConnectionManager()
+manager = ConnectionManager(backplane=websocket_backplane, scope="chat", engine=BroadcastEngine())
@@ -16,6 +16,9 @@ from typing import Dict, List, Optional, Set, Callable, Any
 
 from fastapi import WebSocket, WebSocketDisconnect
 
+from app.websocket_backplane import WebSocketBackplane, websocket_backplane
+from app.websocket_broadcast import COALESCABLE_EVENT_TYPES, BroadcastEngine
+
 logger = logging.getLogger(__name__)
 
 
@@ -209,6 +212,9 @@ class WebSocketManagerV2:
         heartbeat_timeout: int = 300,
         max_queue_size: int = 1000,
         message_ttl_seconds: int = 3600,
+        backplane: Optional[WebSocketBackplane] = None,
+        scope: str = "v2",
+        engine: Optional[BroadcastEngine] = None,
     ):
         self.pool = ConnectionPool(max_connections_per_room)
         self.message_queue = MessageQueue(max_queue_size, message_ttl_seconds)
@@ -224,6 +230,17 @@ class WebSocketManagerV2:
         self.total_messages_received = 0
         self.total_connections_created = 0
         self.total_connections_closed = 0
+
+        # Cross-worker fan-out and presence (None: this process only)
+        self.backplane = backplane
+        self.scope = scope
+        if backplane is not None:
+            backplane.register(scope, self._deliver_local)
+
+        # Per-connection outbound queues (None: send inline)
+        self.engine = engine
+        # connection_id -> websocket, to detach writers on disconnect
+        self.connection_sockets: Dict[str, WebSocket] = {}
     
     def register_message_handler(self, message_type: str, handler: Callable):
         """Register handler for specific message type"""
@@ -260,6 +277,23 @@ class WebSocketManagerV2:
                 websocket, room_id, user_id, user_email, user_role
             )
             self.total_connections_created += 1
+            self.connection_sockets[connection_id] = websocket
+            if self.engine is not None:
+                self.engine.attach(
+                    websocket,
+                    on_close=lambda reason: asyncio.create_task(self.disconnect(connection_id)),
+                    label=connection_id,
+                )
+
+            if self.backplane is not None:
+                await self.backplane.add_presence(self.scope, room_id, connection_id, {
+                    "connection_id": connection_id,
+                    "user_id": user_id,
+                    "user_email": user_email,
+                    "user_role": user_role,
+                    "connected_at": datetime.utcnow().isoformat(),
+                    "message_count": 0,
+                })
             
             # Send queued messages to user
             queued_messages = await self.message_queue.dequeue_all(user_id)
@@ -278,8 +312,13 @@ class WebSocketManagerV2:
         """Disconnect user"""
         room_id = await self.pool.remove_connection(connection_id)
         self.total_connections_closed += 1
+        websocket = self.connection_sockets.pop(connection_id, None)
+        if websocket is not None and self.engine is not None:
+            self.engine.detach(websocket)
         
         if room_id:
+            if self.backplane is not None:
+                await self.backplane.remove_presence(self.scope, room_id, connection_id)
             logger.info(f"User disconnected from room {room_id}")
     
     async def send_personal_message(
@@ -288,6 +327,11 @@ class WebSocketManagerV2:
         websocket: WebSocket
     ) -> bool:
         """Send message to specific connection"""
+        if self.engine is not None and self.engine.is_attached(websocket):
+            queued = self.engine.send(websocket, message.to_json())
+            if queued:
+                self.total_messages_sent += 1
+            return queued
         try:
             await websocket.send_text(message.to_json())
             self.total_messages_sent += 1
@@ -302,18 +346,56 @@ class WebSocketManagerV2:
         message: WebSocketMessage,
         exclude_connection_id: Optional[str] = None
     ):
-        """Broadcast message to all connections in room"""
+        """Broadcast message to all connections in room, on every worker"""
+        text = message.to_json()
+        coalescable = message.type in COALESCABLE_EVENT_TYPES
+        await self._deliver_local(
+            room_id, text, exclude_connection_id=exclude_connection_id, coalescable=coalescable
+        )
+        if self.backplane is not None:
+            await self.backplane.publish(self.scope, room_id, text, coalescable=coalescable)
+    
+    async def broadcast_to_user_role(
+        self,
+        room_id: str,
+        role: str,
+        message: WebSocketMessage
+    ):
+        """Broadcast message to all users with specific role in room, on every worker"""
+        text = message.to_json()
+        await self._deliver_local(room_id, text, role=role)
+        if self.backplane is not None:
+            await self.backplane.publish(self.scope, room_id, text, role=role)
+    
+    async def _deliver_local(
+        self,
+        room_id: str,
+        text: str,
+        role: Optional[str] = None,
+        exclude_connection_id: Optional[str] = None,
+        coalescable: bool = False,
+    ):
+        """Send a serialized message to this worker's connections in a room"""
         connections = await self.pool.get_room_connections(room_id)
         disconnected = []
         
         for conn_id, (websocket, metadata) in connections.items():
             if conn_id == exclude_connection_id:
                 continue
+            if role is not None and metadata.user_role != role:
+                continue
+
+            if self.engine is not None:
+                # Queued for the connection's writer task; slow clients are shed there
+                if self.engine.send(websocket, text, coalescable):
+                    self.total_messages_sent += 1
+                    metadata.bytes_sent += len(text)
+                continue
             
             try:
-                await websocket.send_text(message.to_json())
+                await websocket.send_text(text)
                 self.total_messages_sent += 1
-                metadata.bytes_sent += len(message.to_json())
+                metadata.bytes_sent += len(text)
             except Exception as e:
                 logger.error(f"Error broadcasting to {conn_id}: {e}")
                 disconnected.append(conn_id)
@@ -322,23 +404,6 @@ class WebSocketManagerV2:
         for conn_id in disconnected:
             await self.disconnect(conn_id)
     
-    async def broadcast_to_user_role(
-        self,
-        room_id: str,
-        role: str,
-        message: WebSocketMessage
-    ):
-        """Broadcast message to all users with specific role in room"""
-        connections = await self.pool.get_room_connections(room_id)
-        
-        for conn_id, (websocket, metadata) in connections.items():
-            if metadata.user_role == role:
-                try:
-                    await websocket.send_text(message.to_json())
-                    self.total_messages_sent += 1
-                except Exception as e:
-                    logger.error(f"Error broadcasting to role {role}: {e}")
-    
     async def send_heartbeat(self, room_id: str):
         """Send heartbeat to all connections in room"""
         message = WebSocketMessage(
@@ -346,16 +411,26 @@ class WebSocketManagerV2:
             timestamp=datetime.utcnow().isoformat()
         )
         
+        text = message.to_json()
         connections = await self.pool.get_room_connections(room_id)
         for conn_id, (websocket, metadata) in connections.items():
+            if self.engine is not None:
+                if self.engine.send(websocket, text, coalescable=True):
+                    metadata.update_heartbeat()
+                continue
             try:
-                await websocket.send_text(message.to_json())
+                await websocket.send_text(text)
                 metadata.update_heartbeat()
             except Exception as e:
                 logger.error(f"Heartbeat failed for {conn_id}: {e}")
     
     async def get_room_users(self, room_id: str) -> List[Dict]:
-        """Get list of users in room"""
+        """Get list of users in room (all workers when a backplane is attached)"""
+        if self.backplane is not None:
+            members = await self.backplane.room_presence(self.scope, room_id)
+            if members is not None:
+                return members
+        
         connections = await self.pool.get_room_connections(room_id)
         users = []
         
@@ -384,6 +459,9 @@ class WebSocketManagerV2:
             "message_queue_size": sum(
                 len(queue) for queue in self.message_queue.queues.values()
             ),
+            "broadcast": (
+                self.engine.get_stats(include_connections=False) if self.engine is not None else None
+            ),
             "timestamp": datetime.utcnow().isoformat(),
         }
     
@@ -394,4 +472,4 @@ class WebSocketManagerV2:
 
 
 # Global manager instance
-manager_v2 = WebSocketManagerV2()
\ No newline at end of file
+manager_v2 = WebSocketManagerV2(backplane=websocket_backplane, scope="v2", engine=BroadcastEngine())
\ No newline at end of file
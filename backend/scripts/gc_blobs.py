@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Blob Garbage Collection Script
+Deletes unreferenced content-addressed blobs and abandoned staging files
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import get_async_session_factory, init_db
+from app.services.blob_store import blob_store
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+async def gc_blobs(grace_hours: float) -> dict:
+    """Run one GC sweep over the blob store"""
+    # Ensure the document_blobs table exists
+    await init_db()
+
+    session_factory = get_async_session_factory()
+    async with session_factory() as session:
+        stats = await blob_store.collect_garbage(
+            session, grace_period=timedelta(hours=grace_hours)
+        )
+
+    logger.info(f"Blob GC: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Garbage-collect unreferenced blobs")
+    parser.add_argument(
+        "--grace-hours",
+        type=float,
+        default=1.0,
+        help="Only delete blobs unreferenced for at least this long",
+    )
+    args = parser.parse_args()
+    asyncio.run(gc_blobs(args.grace_hours))
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Room Readiness Rebuild Script
+Reconciles the room_readiness projection from the documents/approvals tables
+"""
+
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import get_async_session_factory, init_db
+from app.services.room_readiness_service import room_readiness_service
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+async def rebuild_room_readiness() -> int:
+    """Rebuild every room's readiness row from scratch"""
+    # Ensure the room_readiness table exists
+    await init_db()
+
+    session_factory = get_async_session_factory()
+    async with session_factory() as session:
+        rebuilt = await room_readiness_service.rebuild_all(session)
+        await session.commit()
+
+    logger.info(f"Room readiness rebuilt for {rebuilt} rooms")
+    return rebuilt
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_room_readiness())
@@ -8,6 +8,7 @@ import os
 import shutil
 import tempfile
 import uuid
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import AsyncGenerator, Generator
 from unittest.mock import AsyncMock, MagicMock
@@ -17,6 +18,7 @@ import pytest_asyncio
 import redis.asyncio as redis
 # FastAPI and SQLAlchemy imports
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
@@ -119,6 +121,31 @@ def mock_redis():
     return mock_redis
 
 
+@pytest.fixture
+def query_counter():
+    """
+    Record the SQL statements sent to the test database.
+
+    ``with query_counter() as statements:`` collects every statement
+    executed inside the block, in order.
+    """
+
+    @contextmanager
+    def count():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+
+    return count
+
+
 @pytest.fixture
 def test_user():
     """Create a test user."""
@@ -0,0 +1,140 @@
+"""
+Unit tests for authentication
+Tests cached identities, token revocation, the permission cache and
+password hashing
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.dependencies import create_access_token, user_token_claims
+from app.identity_cache import identity_cache, user_cache
+from app.models import Party, Room, User
+from app.permission_cache import PermissionCache
+from app.services.password_service import PasswordService, PasswordServiceBusy
+
+
+@pytest.mark.unit
+@pytest.mark.security
+@pytest.mark.asyncio
+class TestCachedIdentity:
+    """Cached identities and access follow writes to users and parties."""
+
+    async def test_party_change_invalidates_cached_access(self, async_client, db_session):
+        """Removing a party revokes cached room access."""
+        user = User(
+            id=str(uuid.uuid4()),
+            email="auth.revoke@maritime.com",
+            name="Auth Revoke",
+            role="seller",
+        )
+        room = Room(
+            id=str(uuid.uuid4()),
+            title="Auth Revoke Room",
+            location="Fujairah",
+            sts_eta=datetime.utcnow() + timedelta(days=3),
+            created_by="someone.else@maritime.com",
+        )
+        party = Party(room_id=room.id, role="seller", name=user.name, email=user.email)
+        db_session.add_all([user, room, party])
+        await db_session.commit()
+        identity_cache.clear()
+
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': user.email})}"}
+        url = f"/api/v1/rooms/{room.id}/messages"
+
+        assert (await async_client.get(url, headers=headers)).status_code == 200
+
+        await db_session.delete(party)
+        await db_session.commit()
+
+        assert (await async_client.get(url, headers=headers)).status_code == 403
+
+    async def test_role_change_revokes_signed_claims(self, async_client, db_session):
+        """A role change bumps the token version: older tokens are refused."""
+        user = User(
+            id=str(uuid.uuid4()),
+            email="auth.claims@maritime.com",
+            name="Auth Claims",
+            role="broker",
+            company="Claims Shipping",
+        )
+        db_session.add(user)
+        await db_session.commit()
+        user_cache.clear()
+
+        headers = {"Authorization": f"Bearer {create_access_token(user_token_claims(user))}"}
+        assert (await async_client.get("/api/v1/auth/me", headers=headers)).status_code == 200
+
+        user.role = "viewer"
+        await db_session.commit()
+        assert user.token_version == 1
+        assert (await async_client.get("/api/v1/auth/me", headers=headers)).status_code == 401
+
+        headers = {"Authorization": f"Bearer {create_access_token(user_token_claims(user))}"}
+        response = await async_client.get("/api/v1/auth/me", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["role"] == "viewer"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestPermissionCache:
+    """Test permission cache invalidation and reporting."""
+
+    async def test_invalidation_bumps_user_version(self):
+        """Invalidating a user hides older entries without scanning keys."""
+        cache = PermissionCache()
+        await cache.set_permission("role@maritime.com", "documents", "delete", True)
+        await cache.set_permission("other@maritime.com", "documents", "delete", True)
+        assert await cache.get_permission("role@maritime.com", "documents", "delete") is True
+
+        await cache.invalidate_user_permissions("role@maritime.com")
+
+        assert await cache.get_permission("role@maritime.com", "documents", "delete") is None
+        assert await cache.get_permission("other@maritime.com", "documents", "delete") is True
+
+        await cache.clear_all_permissions()
+        assert await cache.get_permission("other@maritime.com", "documents", "delete") is None
+
+    async def test_cache_stats_endpoint_reports_permission_cache(self, async_client):
+        """Permission cache counters are exposed through /api/v1/cache/stats."""
+        response = await async_client.get("/api/v1/cache/stats")
+
+        assert response.status_code == 200
+        stats = response.json()["permission_cache"]
+        for key in ["l1_hits", "l2_hits", "misses", "redis_avg_latency_ms"]:
+            assert key in stats
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestPasswordService:
+    """Test the bcrypt worker pool."""
+
+    async def test_rehash_on_login(self):
+        """A hash made with an older cost is replaced on the next good login."""
+        old = PasswordService(rounds=4)
+        current = PasswordService(rounds=6)
+        old_hash = await old.hash("Sup3r-Secret!")
+
+        verified, new_hash = await current.verify_and_update("Sup3r-Secret!", old_hash)
+        assert verified and new_hash and new_hash.startswith("$2b$06$")
+        assert await current.verify_and_update("Sup3r-Secret!", new_hash) == (True, None)
+        assert await current.verify_and_update("wrong", old_hash) == (False, None)
+        assert current.get_stats()["rehashed"] == 1
+        old.shutdown()
+        current.shutdown()
+
+    async def test_overflow_is_refused(self):
+        """Beyond the queue limit calls are refused instead of piling up."""
+        small = PasswordService(workers=1, max_queue=1, rounds=10)
+        outcomes = await asyncio.gather(
+            *(small.hash("x") for _ in range(4)), return_exceptions=True
+        )
+        assert any(isinstance(outcome, PasswordServiceBusy) for outcome in outcomes)
+        assert small.get_stats()["rejected"] >= 1
+        small.shutdown()
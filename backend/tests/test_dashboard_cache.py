@@ -0,0 +1,165 @@
+"""
+Unit tests for the role dashboard cache
+Tests single-flight builds, stale refresh, scoped invalidation and bounds
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.dashboard_cache import DashboardCache, dashboard_cache
+from app.models import Document, DocumentType, Party, Room, User, Vessel
+from app.routers.dashboard_api_v2 import _build_role_dashboard, _session_factory
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestDashboardCache:
+    """Role dashboards are built once per scope and dropped on scoped writes."""
+
+    async def test_single_flight_stale_refresh_and_scoped_invalidation(self, db_session):
+        """Concurrent misses share one build; writes only drop affected scopes."""
+        await dashboard_cache.clear()
+        broker = User(
+            id=str(uuid.uuid4()),
+            email="cache.broker@maritime.com",
+            name="Cache Broker",
+            role="broker",
+        )
+        doc_type = DocumentType(
+            id=str(uuid.uuid4()), code="CACHE", name="Cache Document", criticality="high"
+        )
+        rooms = [
+            Room(
+                id=str(uuid.uuid4()),
+                title=f"Cache Room {i}",
+                location="Fujairah",
+                sts_eta=datetime.utcnow() + timedelta(days=10),
+                created_by=broker.email,
+            )
+            for i in range(2)
+        ]
+        db_session.add_all([broker, doc_type, *rooms])
+        db_session.add(Party(room_id=rooms[0].id, role="broker", name="Cache Broker",
+                             email=broker.email))
+        await db_session.commit()
+
+        builds = 0
+        factory = _session_factory(db_session)
+
+        async def build():
+            nonlocal builds
+            builds += 1
+            await asyncio.sleep(0.1)
+            return await _build_role_dashboard(factory, broker)
+
+        entries = await asyncio.gather(*(
+            dashboard_cache.get_or_build(broker.role, broker.email, build) for _ in range(50)
+        ))
+        assert builds == 1
+        assert all(entry is entries[0] for entry in entries)
+        assert entries[0].room_ids == {rooms[0].id}
+
+        # Fresh hit: no build, true age reported
+        entry = await dashboard_cache.get_or_build(broker.role, broker.email, build)
+        assert entry is entries[0] and builds == 1
+        assert entry.age_seconds < 1
+
+        # Stale hit: served at once, refreshed in the background
+        entry.stored_at -= dashboard_cache.ttl_seconds + 1
+        stale = await dashboard_cache.get_or_build(broker.role, broker.email, build)
+        assert stale is entry and stale.age_seconds > dashboard_cache.ttl_seconds
+        await asyncio.sleep(0.3)
+        assert builds == 2
+        fresh = await dashboard_cache.get_or_build(broker.role, broker.email, build)
+        assert fresh is not entry and fresh.age_seconds < 1
+
+        # A document outside the broker's rooms leaves the entry alone...
+        db_session.add(Document(room_id=rooms[1].id, type_id=doc_type.id, status="missing"))
+        await db_session.commit()
+        assert await dashboard_cache.get_or_build(broker.role, broker.email, build) is fresh
+
+        # ...one inside drops it
+        db_session.add(Document(room_id=rooms[0].id, type_id=doc_type.id, status="missing"))
+        await db_session.commit()
+        await dashboard_cache.get_or_build(broker.role, broker.email, build)
+        assert builds == 3
+
+        # A build racing with a write in its scope is served but not kept
+        async def racing_build():
+            data = await build()
+            db_session.add(Party(room_id=rooms[1].id, role="broker", name="Cache Broker",
+                                 email=broker.email))
+            await db_session.commit()
+            return data
+
+        await dashboard_cache.clear()
+        await dashboard_cache.get_or_build(broker.role, broker.email, racing_build)
+        assert dashboard_cache.get_stats()["discarded"] >= 1
+        entry = await dashboard_cache.get_or_build(broker.role, broker.email, build)
+        assert builds == 5
+        assert entry.room_ids == {rooms[0].id, rooms[1].id}
+        await dashboard_cache.clear()
+
+    async def test_owner_scope_follows_vessel_rooms(self, db_session):
+        """Owner dashboards cover their vessels' rooms and drop on writes there."""
+        await dashboard_cache.clear()
+        owner = User(
+            id=str(uuid.uuid4()),
+            email="cache.owner@maritime.com",
+            name="Cache Owner",
+            role="owner",
+            company="Nordic Tankers",
+        )
+        room = Room(
+            id=str(uuid.uuid4()),
+            title="Owner Cache Room",
+            location="Fujairah",
+            sts_eta=datetime.utcnow() + timedelta(days=10),
+            created_by="broker@maritime.com",
+        )
+        doc_type = DocumentType(
+            id=str(uuid.uuid4()), code="OWNCACHE", name="Owner Cache Document", criticality="high"
+        )
+        # No party row: the owner reaches the room only through the vessel
+        db_session.add_all([owner, room, doc_type])
+        db_session.add(Vessel(room_id=room.id, name="Nordic Dawn", vessel_type="Crude Tanker",
+                              flag="Norway", imo="9555001", owner="Nordic Tankers ASA"))
+        await db_session.commit()
+
+        builds = 0
+        factory = _session_factory(db_session)
+
+        async def build():
+            nonlocal builds
+            builds += 1
+            return await _build_role_dashboard(factory, owner)
+
+        entry = await dashboard_cache.get_or_build(owner.role, owner.email, build)
+        assert entry.room_ids == {room.id}
+
+        db_session.add(Document(room_id=room.id, type_id=doc_type.id, status="missing"))
+        await db_session.commit()
+        await dashboard_cache.get_or_build(owner.role, owner.email, build)
+        assert builds == 2
+        await dashboard_cache.clear()
+
+    async def test_memory_tier_is_bounded(self):
+        """The least recently used scope is evicted past max_entries."""
+        cache = DashboardCache(ttl_seconds=60, stale_seconds=0, max_entries=2)
+
+        async def build():
+            return {"ok": True}, []
+
+        for email in ("a@x.test", "b@x.test"):
+            await cache.get_or_build("broker", email, build)
+        await cache.get_or_build("broker", "a@x.test", build)
+        await cache.get_or_build("broker", "c@x.test", build)
+
+        stats = cache.get_stats()
+        assert stats["entries"] == 2 and stats["evictions"] == 1
+        assert stats["hits"] == 1
+        await cache.get_or_build("broker", "b@x.test", build)
+        assert cache.get_stats()["builds"] == 4
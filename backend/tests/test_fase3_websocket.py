@@ -594,5 +594,195 @@ class TestErrorHandling:
         assert ws3.send_text.call_count >= 1
 
 
+
+# ============================================================================
+# MULTI-WORKER TESTS: Broadcast Backplane
+# ============================================================================
+
+@pytest.mark.asyncio
+class TestWebSocketBackplane:
+    """Two managers on one LocalBus behave like two uvicorn workers"""
+    
+    async def _workers(self, factory):
+        from app.websocket_backplane import LocalBus, LocalTransport, WebSocketBackplane
+        
+        bus = LocalBus()
+        workers = []
+        for _ in range(2):
+            backplane = WebSocketBackplane()
+            manager = factory(backplane)
+            await backplane.start(LocalTransport(bus))
+            workers.append((backplane, manager))
+        return workers
+    
+    async def test_room_broadcast_reaches_other_worker(self):
+        """A broadcast on worker A is delivered once to members connected to worker B"""
+        (plane_a, manager_a), (plane_b, manager_b) = await self._workers(
+            lambda backplane: WebSocketManagerV2(backplane=backplane)
+        )
+        ws_a = AsyncMock()
+        ws_b = AsyncMock()
+        await manager_a.connect(ws_a, "room1", "user1", "user1@test.com", "admin")
+        await manager_b.connect(ws_b, "room1", "user2", "user2@test.com", "user")
+        
+        msg = WebSocketMessage(type="notification", data={"title": "Cross-worker"})
+        await manager_a.broadcast_to_room("room1", msg)
+        
+        ws_a.send_text.assert_called_once_with(msg.to_json())
+        ws_b.send_text.assert_called_once_with(msg.to_json())
+        assert plane_a.events_published == 1
+        assert plane_b.events_received == 1
+        
+        # Role filters travel with the event
+        await manager_b.broadcast_to_user_role("room1", "admin", WebSocketMessage(type="alert"))
+        assert ws_a.send_text.call_count == 2
+        assert ws_b.send_text.call_count == 1
+    
+    async def test_presence_is_aggregated_across_workers(self):
+        """get_room_users lists members on every worker and forgets departed ones"""
+        (plane_a, manager_a), (plane_b, manager_b) = await self._workers(
+            lambda backplane: WebSocketManagerV2(backplane=backplane)
+        )
+        conn_a = await manager_a.connect(AsyncMock(), "room1", "user1", "user1@test.com", "admin")
+        await manager_b.connect(AsyncMock(), "room1", "user2", "user2@test.com", "user")
+        
+        for manager in (manager_a, manager_b):
+            users = await manager.get_room_users("room1")
+            assert sorted(u["user_email"] for u in users) == ["user1@test.com", "user2@test.com"]
+        
+        await manager_a.disconnect(conn_a)
+        users = await manager_b.get_room_users("room1")
+        assert [u["user_email"] for u in users] == ["user2@test.com"]
+        
+        # A worker that shuts down takes its members with it
+        await plane_b.stop()
+        assert await manager_a.get_room_users("room1") == []
+    
+    async def test_chat_manager_fan_out(self):
+        """The chat ConnectionManager used by the messages router fans out too"""
+        from app.websocket_manager import ConnectionManager
+        
+        (_, chat_a), (_, chat_b) = await self._workers(
+            lambda backplane: ConnectionManager(backplane=backplane, scope="chat")
+        )
+        ws_a = AsyncMock()
+        ws_b = AsyncMock()
+        await chat_a.connect(ws_a, "room1", "user1@test.com", "User One")
+        await chat_b.connect(ws_b, "room1", "user2@test.com", "User Two")
+        
+        await chat_a.send_message_to_room("room1", "user1@test.com", "User One", "hello")
+        
+        payload = json.loads(ws_b.send_text.call_args_list[-1].args[0])
+        assert payload["type"] == "message"
+        assert payload["content"] == "hello"
+        users = await chat_b.get_room_users("room1")
+        assert sorted(u["user_email"] for u in users) == ["user1@test.com", "user2@test.com"]
+
+
+@pytest.mark.asyncio
+class TestBroadcastEngine:
+    """Per-connection outbound queues isolate slow clients"""
+    
+    async def _drain(self):
+        for _ in range(5):
+            await asyncio.sleep(0)
+    
+    async def test_serializes_once_per_broadcast(self):
+        """to_json runs once per event, not once per recipient"""
+        from app.websocket_broadcast import BroadcastEngine
+        
+        manager = WebSocketManagerV2(engine=BroadcastEngine())
+        sockets = [AsyncMock() for _ in range(5)]
+        for i, ws in enumerate(sockets):
+            await manager.connect(ws, "room1", f"user{i}", f"user{i}@test.com", "user")
+        
+        msg = WebSocketMessage(type="notification", data={"title": "Once"})
+        with patch.object(WebSocketMessage, "to_json", autospec=True, side_effect=lambda m: "{}") as to_json:
+            await manager.broadcast_to_room("room1", msg)
+        await self._drain()
+        
+        assert to_json.call_count == 1
+        for ws in sockets:
+            ws.send_text.assert_called_once_with("{}")
+        await manager.engine.close()
+    
+    async def test_slow_consumer_dropped_without_blocking_peers(self):
+        """A client whose queue overflows is disconnected; the others keep receiving"""
+        from app.websocket_broadcast import BroadcastEngine
+        
+        engine = BroadcastEngine(max_queue=4)
+        manager = WebSocketManagerV2(engine=engine)
+        stalled = asyncio.Event()
+        
+        async def stall(text):
+            await stalled.wait()
+        
+        slow = AsyncMock()
+        slow.send_text.side_effect = stall
+        fast = AsyncMock()
+        slow_id = await manager.connect(slow, "room1", "slow", "slow@test.com", "user")
+        await manager.connect(fast, "room1", "fast", "fast@test.com", "user")
+        
+        for i in range(10):
+            await manager.broadcast_to_room("room1", WebSocketMessage(type="alert", data={"n": i}))
+            await self._drain()
+        
+        assert fast.send_text.call_count == 10
+        assert engine.slow_consumers_dropped == 1
+        assert slow_id not in manager.pool.metadata
+        slow.close.assert_called_once()
+        await engine.close()
+    
+    async def test_coalescable_events_are_shed_first(self):
+        """Typing indicators are skipped for a lagging client instead of dropping it"""
+        from app.websocket_broadcast import BroadcastEngine
+        
+        engine = BroadcastEngine(max_queue=3)
+        manager = WebSocketManagerV2(engine=engine)
+        stalled = asyncio.Event()
+        
+        async def stall(text):
+            await stalled.wait()
+        
+        slow = AsyncMock()
+        slow.send_text.side_effect = stall
+        await manager.connect(slow, "room1", "slow", "slow@test.com", "user")
+        
+        for _ in range(10):
+            await manager.broadcast_to_room("room1", WebSocketMessage(type="typing"))
+        await self._drain()
+        await manager.broadcast_to_room("room1", WebSocketMessage(type="typing"))
+        # A regular event evicts a queued typing indicator
+        await manager.broadcast_to_room("room1", WebSocketMessage(type="message"))
+        
+        stats = engine.get_stats()
+        connection = stats["per_connection"][0]
+        assert stats["slow_consumers_dropped"] == 0
+        assert connection["queue_depth"] == 3
+        assert connection["coalesced"] == 8
+        assert connection["lag_ms"] >= 0
+        await engine.close()
+        assert engine.get_stats()["connections"] == 0
+    
+    async def test_failed_send_disconnects(self):
+        """A send error removes the connection from the manager"""
+        from app.websocket_broadcast import BroadcastEngine
+        from app.websocket_manager import ConnectionManager
+        
+        manager = ConnectionManager(engine=BroadcastEngine())
+        broken = AsyncMock()
+        broken.send_text.side_effect = RuntimeError("socket closed")
+        healthy = AsyncMock()
+        await manager.connect(broken, "room1", "a@test.com", "A")
+        await manager.connect(healthy, "room1", "b@test.com", "B")
+        
+        await manager.send_activity_to_room("room1", "b@test.com", "ping")
+        await self._drain()
+        
+        assert manager.get_connection_count("room1") == 1
+        assert broken not in manager.engine.senders
+        await manager.engine.close()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
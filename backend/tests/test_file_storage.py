@@ -0,0 +1,189 @@
+"""
+Unit tests for file storage
+Tests streamed uploads, the content-addressed blob store and conditional
+file serving
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import func, select
+
+from app.models import DocumentBlob, DocumentVersion
+from app.services.blob_store import BlobStore, blob_key
+from app.services.file_service import FileService
+from app.services.storage_service import LocalStorageService
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestStreamingUpload:
+    """Test limits of the chunked upload pipeline."""
+
+    async def test_oversized_upload_is_rejected_while_streaming(self, tmp_path):
+        """The size limit is enforced as bytes arrive and no partial file is left behind."""
+        source = tmp_path / "oversized.pdf"
+        source.write_bytes(os.urandom(3 * 1024 * 1024))
+        service = FileService(
+            upload_dir=str(tmp_path / "uploads"), max_file_size=2 * 1024 * 1024
+        )
+
+        with open(source, "rb") as handle:
+            upload = UploadFile(file=handle, filename="oversized.pdf")
+            with pytest.raises(HTTPException) as exc_info:
+                await service.save_upload(upload, "bench-room")
+
+        assert exc_info.value.status_code == 413
+        leftovers = [
+            p for p in (tmp_path / "uploads").rglob("*") if p.is_file()
+        ]
+        assert leftovers == []
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestBlobStoreDeduplication:
+    """Test the content-addressed document store."""
+
+    async def test_reupload_skips_write_and_gc_reclaims(self, db_session, tmp_path):
+        """Identical uploads share one blob; releasing every reference lets GC delete it."""
+        store = BlobStore(LocalStorageService(base_path=str(tmp_path / "uploads")))
+        content = os.urandom(256 * 1024)
+
+        first = await store.ingest(
+            db_session, UploadFile(file=io.BytesIO(content), filename="class_cert.pdf")
+        )
+        await db_session.commit()
+        blob_path = tmp_path / "uploads" / blob_key(first.sha256)
+        first_mtime = blob_path.stat().st_mtime_ns
+
+        second = await store.ingest(
+            db_session, UploadFile(file=io.BytesIO(content), filename="copy.pdf")
+        )
+        await db_session.commit()
+
+        assert first.deduplicated is False
+        assert second.deduplicated is True
+        assert second.file_url == first.file_url
+        assert blob_path.stat().st_mtime_ns == first_mtime
+        assert len(store.backend.list_blob_keys()) == 1
+
+        blob = await db_session.get(DocumentBlob, first.sha256, populate_existing=True)
+        assert blob.ref_count == 2
+
+        versions = [
+            DocumentVersion(file_url=stored.file_url, sha256=stored.sha256)
+            for stored in (first, second)
+        ]
+        await store.release(db_session, versions[0])
+        await db_session.commit()
+
+        # Still referenced by the second version
+        stats = await store.collect_garbage(db_session, grace_period=timedelta(0))
+        assert stats["blobs_deleted"] == 0
+        assert blob_path.exists()
+
+        await store.release(db_session, versions[1])
+        await db_session.commit()
+
+        stats = await store.collect_garbage(db_session, grace_period=timedelta(0))
+        assert stats["blobs_deleted"] == 1
+        assert not blob_path.exists()
+        remaining = await db_session.execute(
+            select(func.count()).select_from(DocumentBlob)
+        )
+        assert remaining.scalar() == 0
+
+    async def test_upload_racing_gc_keeps_its_content(self, db_session, tmp_path):
+        """A file left on disk is replaced by new uploads, and GC keeps rows it cannot clean."""
+        store = BlobStore(LocalStorageService(base_path=str(tmp_path / "uploads")))
+        content = os.urandom(64 * 1024)
+        stored = await store.ingest(
+            db_session, UploadFile(file=io.BytesIO(content), filename="q88.pdf")
+        )
+        await db_session.commit()
+        blob_path = tmp_path / "uploads" / blob_key(stored.sha256)
+
+        # The row of a blob being collected is gone but its file is still there
+        await store.release(db_session, DocumentVersion(file_url=stored.file_url,
+                                                        sha256=stored.sha256))
+        await db_session.delete(await db_session.get(DocumentBlob, stored.sha256))
+        await db_session.commit()
+        stale_inode = blob_path.stat().st_ino
+
+        again = await store.ingest(
+            db_session, UploadFile(file=io.BytesIO(content), filename="q88.pdf")
+        )
+        await db_session.commit()
+        assert again.deduplicated is False
+        assert blob_path.stat().st_ino != stale_inode
+        assert blob_path.read_bytes() == content
+
+        # A failed file delete leaves the index row for the next sweep
+        await store.release(db_session, DocumentVersion(file_url=again.file_url,
+                                                        sha256=again.sha256))
+        await db_session.commit()
+        store.backend.delete_blob = AsyncMock(side_effect=OSError("disk busy"))
+        stats = await store.collect_garbage(db_session, grace_period=timedelta(0))
+        assert stats["blobs_deleted"] == 0
+        assert await db_session.get(DocumentBlob, stored.sha256, populate_existing=True)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestConditionalFileServing:
+    """Test revalidation and partial downloads of stored files."""
+
+    async def test_etag_revalidation_and_byte_ranges(self, async_client):
+        """Repeat views revalidate with a 304 and PDF viewers can fetch byte ranges."""
+        content = os.urandom(512 * 1024)
+        folder = Path("uploads") / f"etag-test-{uuid.uuid4()}"
+        folder.mkdir(parents=True)
+        (folder / "certificate.pdf").write_bytes(content)
+        url = f"/api/v1/files/{folder.name}/certificate.pdf"
+
+        try:
+            response = await async_client.get(url)
+            assert response.status_code == 200
+            assert response.content == content
+            assert response.headers["content-type"] == "application/pdf"
+            assert response.headers["accept-ranges"] == "bytes"
+            etag = response.headers["etag"]
+            assert etag == f'"{hashlib.sha256(content).hexdigest()}"'
+
+            cached = await async_client.get(url, headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+            assert cached.content == b""
+            assert cached.headers["etag"] == etag
+
+            partial = await async_client.get(url, headers={"Range": "bytes=1024-2047"})
+            assert partial.status_code == 206
+            assert partial.content == content[1024:2048]
+            assert partial.headers["content-range"] == f"bytes 1024-2047/{len(content)}"
+
+            suffix = await async_client.get(url, headers={"Range": "bytes=-100"})
+            assert suffix.status_code == 206
+            assert suffix.content == content[-100:]
+
+            # A stale If-Range validator falls back to the full file
+            stale = await async_client.get(
+                url, headers={"Range": "bytes=0-99", "If-Range": '"stale"'}
+            )
+            assert stale.status_code == 200
+            assert len(stale.content) == len(content)
+
+            outside = await async_client.get(
+                url, headers={"Range": f"bytes={len(content)}-"}
+            )
+            assert outside.status_code == 416
+            assert outside.headers["content-range"] == f"bytes */{len(content)}"
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
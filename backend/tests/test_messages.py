@@ -0,0 +1,84 @@
+"""
+Unit tests for room messages
+Tests the per-user unread counters
+"""
+
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.models import Message, MessageRead, Room
+from app.services.message_read_service import (MessageReadService,
+                                               message_read_service)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestUnreadCounters:
+    """Test the lazily built unread counter rows."""
+
+    async def test_first_lookup_neither_commits_nor_races(self, db_session):
+        """The lazily built counter row tolerates a concurrent insert and leaves commits to the caller."""
+        room = Room(id=str(uuid.uuid4()), title="Race Room", location="Fujairah",
+                    sts_eta=datetime.utcnow(), created_by="ops@bench.test")
+        db_session.add(room)
+        db_session.add_all([
+            Message(room_id=room.id, sender_email="seller@bench.test",
+                    sender_name="Seller", content=f"m{n}")
+            for n in range(3)
+        ])
+        await db_session.commit()
+
+        class RacingService(MessageReadService):
+            async def _count_unread(self, session, room_id, user_email, after):
+                counted = await super()._count_unread(session, room_id, user_email, after)
+                # Another request builds the same row between lookup and insert
+                await session.execute(insert(MessageRead).values(
+                    room_id=room_id, user_email=user_email, unread_count=counted
+                ))
+                return counted
+
+        room_id = room.id
+        assert await RacingService().get_unread_count(db_session, room_id, "buyer@bench.test") == 3
+
+        # Nothing was committed on the caller's behalf; the rollback expires room
+        await db_session.rollback()
+        remaining = await db_session.execute(
+            select(MessageRead).where(MessageRead.room_id == room_id)
+        )
+        assert remaining.scalars().all() == []
+
+    async def test_readers_column_follows_read_marks(self, db_session):
+        """Each message lists the users whose read mark has reached it."""
+        room = Room(id=str(uuid.uuid4()), title="Receipts Room", location="Fujairah",
+                    sts_eta=datetime.utcnow(), created_by="ops@bench.test")
+        base = datetime.utcnow() - timedelta(hours=1)
+        messages = [
+            Message(room_id=room.id, sender_email="seller@bench.test", sender_name="Seller",
+                    content=f"m{n}", created_at=base + timedelta(minutes=n))
+            for n in range(3)
+        ]
+        db_session.add(room)
+        db_session.add_all(messages)
+        await db_session.commit()
+
+        await message_read_service.mark_read(db_session, room.id, "buyer@bench.test", messages[1])
+        await message_read_service.mark_read(db_session, room.id, "broker@bench.test", messages[0])
+        await db_session.commit()
+
+        result = await db_session.execute(
+            select(Message.content, message_read_service.readers_column(db_session))
+            .where(Message.room_id == room.id)
+        )
+        readers = {
+            content: sorted(json.loads(read_by)) if read_by else []
+            for content, read_by in result.all()
+        }
+        assert readers == {
+            "m0": ["broker@bench.test", "buyer@bench.test"],
+            "m1": ["buyer@bench.test"],
+            "m2": [],
+        }
@@ -0,0 +1,88 @@
+"""
+Unit tests for the notification inbox
+Tests producers, the expiry scanner and per-user read state
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models import (Approval, Document, DocumentType, Message, Notification,
+                        Party, Room, Vessel)
+from app.services.notification_inbox_service import notification_inbox_service
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestNotificationInbox:
+    """Notifications are stored once by producers and read per user."""
+
+    async def test_producers_scanner_and_read_state(self, db_session):
+        """Writes notify the other parties; reruns and refreshes add nothing."""
+        reader = "inbox.reader@maritime.com"
+        room = Room(
+            id=str(uuid.uuid4()),
+            title="Inbox Transfer",
+            location="Fujairah",
+            sts_eta=datetime.utcnow() + timedelta(days=1, hours=12),
+            created_by=reader,
+        )
+        reader_party = Party(id=str(uuid.uuid4()), room_id=room.id, role="charterer",
+                             name="Reader", email=reader)
+        seller = Party(room_id=room.id, role="seller", name="Seller", email="seller@inbox.test")
+        vessel = Vessel(id=str(uuid.uuid4()), room_id=room.id, name="Inbox Star",
+                        vessel_type="Crude Tanker", flag="Malta", imo="9000001")
+        doc_type = DocumentType(id=str(uuid.uuid4()), code="INBOX", name="Q88",
+                                criticality="high")
+        db_session.add_all([room, reader_party, seller, vessel, doc_type])
+        await db_session.commit()
+
+        async def inbox(**kwargs):
+            page, _ = await notification_inbox_service.list(db_session, reader, **kwargs)
+            return page
+
+        # Chat messages: one notice per room, refreshed and unread again
+        for n in range(3):
+            db_session.add(Message(room_id=room.id, sender_email=seller.email,
+                                   sender_name="Seller", content=f"hello {n}"))
+            await db_session.commit()
+        notices = await inbox(notification_type="message_received")
+        assert len(notices) == 1 and notices[0].read is False
+        assert (await db_session.execute(
+            select(func.count()).select_from(Notification)
+            .where(Notification.user_email == seller.email)
+        )).scalar() == 0
+
+        # Approvals: notified while pending, read once decided
+        approval = Approval(room_id=room.id, party_id=reader_party.id, status="pending")
+        db_session.add(approval)
+        await db_session.commit()
+        assert len(await inbox(notification_type="approval_required", unread_only=True)) == 1
+        approval.status = "approved"
+        await db_session.commit()
+        assert await inbox(notification_type="approval_required", unread_only=True) == []
+
+        # Expiry scanner: reruns add nothing
+        db_session.add(Document(room_id=room.id, vessel_id=vessel.id, type_id=doc_type.id,
+                                status="approved", expires_on=datetime.utcnow() + timedelta(days=5)))
+        await db_session.commit()
+        for _ in range(3):
+            await notification_inbox_service.scan(db_session)
+            await db_session.commit()
+        expiry = await inbox(notification_type="document_expiry")
+        assert len(expiry) == 1 and expiry[0].priority == "high"
+        assert "Inbox Star" in expiry[0].message
+        assert len(await inbox(notification_type="deadline_approaching")) == 1
+
+        summary = await notification_inbox_service.summary(db_session, reader)
+        assert summary["total_notifications"] == 4
+        assert summary["unread_count"] == 3
+
+        # Read state is real and per user
+        assert await notification_inbox_service.mark_read(db_session, reader, expiry[0].id)
+        assert not await notification_inbox_service.mark_read(db_session, "other@x.test", notices[0].id)
+        assert await notification_inbox_service.mark_all_read(db_session, reader) == 2
+        await db_session.commit()
+        assert (await notification_inbox_service.summary(db_session, reader))["unread_count"] == 0
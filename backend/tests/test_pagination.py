@@ -0,0 +1,91 @@
+"""
+Unit tests for keyset pagination
+Tests cursor encoding, ordering of undated rows and invalid cursors
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert, select, update
+
+from app.dependencies import log_activity
+from app.models import ActivityLog, Room
+from app.pagination import (decode_cursor, encode_cursor,
+                            fetch_keyset_page, parse_cursor)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestKeysetPagination:
+    """Test cursor pages over (timestamp, id)."""
+
+    async def test_rows_without_timestamp_are_reachable(self, db_session):
+        """Undated rows come after every dated row and are paged through too."""
+        room = Room(id=str(uuid.uuid4()), title="Undated Room", location="Fujairah",
+                    sts_eta=datetime.utcnow(), created_by="bench@maritime.com")
+        db_session.add(room)
+        await db_session.commit()
+
+        base = datetime.utcnow() - timedelta(days=1)
+        rows = [
+            {"id": f"activity-{i:03d}", "room_id": room.id, "actor": "bench@maritime.com",
+             "action": "document_uploaded", "ts": base + timedelta(minutes=i)}
+            for i in range(60)
+        ]
+        await db_session.execute(insert(ActivityLog), rows)
+        # Inserting None would get the column default; clear it afterwards
+        await db_session.execute(
+            update(ActivityLog)
+            .where(ActivityLog.id.in_([r["id"] for r in rows[::3]]))
+            .values(ts=None)
+        )
+        await db_session.commit()
+        for row in rows[::3]:
+            row["ts"] = None
+
+        dated = sorted((r for r in rows if r["ts"]), key=lambda r: (r["ts"], r["id"]), reverse=True)
+        undated = sorted((r for r in rows if r["ts"] is None), key=lambda r: r["id"], reverse=True)
+
+        seen = await self._walk(db_session, room.id, 7)
+        assert seen == [r["id"] for r in dated + undated]
+
+    async def test_default_timestamps_advance(self, db_session):
+        """Rows stamped by the column default compare correctly against cursors."""
+        room = Room(id=str(uuid.uuid4()), title="Logged Room", location="Fujairah",
+                    sts_eta=datetime.utcnow(), created_by="bench@maritime.com")
+        db_session.add(room)
+        await db_session.commit()
+
+        for n in range(12):
+            await log_activity(room.id, "bench@maritime.com", "document_uploaded",
+                               {"n": n}, session=db_session)
+        await db_session.commit()
+
+        seen = await self._walk(db_session, room.id, 5)
+        assert len(seen) == len(set(seen)) == 12
+
+    async def test_invalid_cursor_is_rejected(self):
+        """Malformed tokens are a client error, not a server error."""
+        ts = datetime(2026, 10, 16, 12, 30, 15, 123456)
+        assert decode_cursor(encode_cursor(ts, "abc")) == (ts, "abc")
+        assert decode_cursor(encode_cursor(None, "abc")) == (None, "abc")
+        assert parse_cursor(None) is None
+        with pytest.raises(HTTPException) as exc_info:
+            parse_cursor("not-a-cursor")
+        assert exc_info.value.status_code == 400
+
+    async def _walk(self, db_session, room_id: str, limit: int):
+        """Follow cursors to the end; fail rather than loop if they stop advancing."""
+        seen, cursor = [], None
+        for _ in range(50):
+            page, next_cursor = await fetch_keyset_page(
+                db_session, select(ActivityLog).where(ActivityLog.room_id == room_id),
+                ActivityLog.ts, ActivityLog.id, cursor, limit, "ts",
+            )
+            seen.extend(activity.id for activity in page)
+            if next_cursor is None:
+                return seen
+            cursor = decode_cursor(next_cursor)
+        pytest.fail("keyset pagination did not terminate")
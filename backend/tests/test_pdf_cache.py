@@ -0,0 +1,93 @@
+"""
+Unit tests for the snapshot PDF cache
+Tests cache keys, single-flight rendering and memory accounting
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from app.services.pdf_cache_service import PDFCacheService
+
+
+def _room_data(snapshot_id: str, documents: int = 3, activities: int = 3):
+    """Snapshot payload shaped like gather_room_snapshot_data output."""
+    return {
+        "id": "room-cache",
+        "title": "STS Operation Cache",
+        "location": "Offshore Malta",
+        "status": "active",
+        "sts_eta": "2026-11-01T08:00:00",
+        "created_at": "2026-10-01T08:00:00",
+        "created_by": "owner@maritime.com",
+        "description": "Cache room",
+        "parties": [
+            {"id": f"p{i}", "name": f"Party {i}", "email": f"p{i}@maritime.com",
+             "role": "owner", "company": "N/A"}
+            for i in range(2)
+        ],
+        "vessels": [],
+        "generated_by": "owner@maritime.com",
+        "snapshot_id": snapshot_id,
+        "documents": [
+            {"id": f"d{i}", "type_id": f"t{i}", "type_name": f"Certificate {i}",
+             "status": "approved", "uploaded_by": "owner@maritime.com",
+             "uploaded_at": "2026-10-02T08:00:00", "expires_on": "2027-10-02T08:00:00",
+             "notes": "", "priority": "normal"}
+            for i in range(documents)
+        ],
+        "approvals": [],
+        "activities": [
+            {"id": f"a{i}", "actor": "owner@maritime.com", "action": "document_uploaded",
+             "meta_json": "{}", "ts": "2026-10-03T08:00:00"}
+            for i in range(activities)
+        ],
+    }
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestPDFCache:
+    """Test snapshot cache keys and rendering."""
+
+    async def test_cache_key_covers_full_payload(self, tmp_path):
+        """Status, approval and activity changes produce a new key; identical input hits."""
+        cache = PDFCacheService(max_memory_cache_size_mb=1)
+        cache.cache_dir = tmp_path
+        base = _room_data("snap-1")
+        key = cache.calculate_content_hash(base, True, True, True)
+
+        reordered = dict(reversed(list(base.items())))
+        assert cache.calculate_content_hash(reordered, True, True, True) == key
+
+        changed_status = _room_data("snap-1")
+        changed_status["documents"][0]["status"] = "expired"
+        more_activity = _room_data("snap-1", activities=4)
+        assert cache.calculate_content_hash(changed_status, True, True, True) != key
+        assert cache.calculate_content_hash(more_activity, True, True, True) != key
+        assert cache.calculate_content_hash(base, True, False, True) != key
+
+        calls = 0
+
+        async def generate():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return b"%PDF" + os.urandom(300 * 1024)
+
+        # Concurrent requests for the same key render once
+        results = await asyncio.gather(
+            *[cache.get_or_generate(key, generate) for _ in range(3)]
+        )
+        assert calls == 1
+        assert [cached for _, cached in results].count(False) == 1
+
+        # Memory accounting is maintained incrementally across evictions
+        for i in range(5):
+            await cache.get_or_generate(f"key-{i}", generate)
+        assert cache.memory_bytes == sum(
+            len(e.pdf_content) for e in cache.memory_cache.values()
+        )
+        assert cache.memory_bytes <= cache.max_memory_size
+        assert cache.cache_evictions > 0
@@ -616,3 +616,59 @@ class TestRoomSecurity:
         for room in rooms:
             # The raw data is stored, but API should sanitize on input/output
             assert room.location in malicious_inputs
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestRoomReadiness:
+    """Test the materialized room readiness projection."""
+
+    async def test_refresh_matches_documents(
+        self, db_session, sample_room, sample_documents
+    ):
+        """Readiness counters reflect the room's documents after refresh."""
+        from app.services.room_readiness_service import room_readiness_service
+
+        readiness = await room_readiness_service.refresh(db_session, sample_room.id)
+        await db_session.commit()
+
+        assert readiness.total_documents == len(sample_documents)
+        assert readiness.missing_documents == 1
+        assert readiness.under_review_documents == 1
+        assert readiness.approved_documents == 1
+        assert readiness.expired_documents == 1
+        # Three of the four sample document types are required
+        assert readiness.required_documents == 3
+        assert readiness.resolved_required_documents == 2
+
+    async def test_refresh_tracks_status_change(
+        self, db_session, sample_room, sample_documents
+    ):
+        """A status change refreshed in the same transaction updates the row."""
+        from app.services.room_readiness_service import room_readiness_service
+
+        await room_readiness_service.refresh(db_session, sample_room.id)
+        await db_session.commit()
+
+        missing_doc = next(d for d in sample_documents if d.status == "missing")
+        missing_doc.status = "under_review"
+        readiness = await room_readiness_service.refresh(db_session, sample_room.id)
+        await db_session.commit()
+
+        assert readiness.missing_documents == 0
+        assert readiness.under_review_documents == 2
+
+    async def test_rebuild_all_creates_rows(
+        self, db_session, sample_room, sample_documents
+    ):
+        """Full rebuild creates a row for every room."""
+        from app.models import RoomReadiness
+        from app.services.room_readiness_service import room_readiness_service
+
+        rebuilt = await room_readiness_service.rebuild_all(db_session)
+        await db_session.commit()
+
+        assert rebuilt >= 1
+        readiness = await db_session.get(RoomReadiness, sample_room.id)
+        assert readiness is not None
+        assert readiness.total_documents == len(sample_documents)
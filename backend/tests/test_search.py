@@ -0,0 +1,201 @@
+"""
+Unit tests for search
+Tests the full-text index, category filters and partial fan-out results
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Message, Party, Room, Vessel
+from app.services.search_index_service import (MESSAGE, ROOM, VESSEL,
+                                               search_index_service)
+from app.services.search_service import SearchService, search_service
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestFullTextSearch:
+    """Search runs on the full-text index, kept in sync by the flush listener."""
+
+    async def test_index_sync_and_ranking(self, db_session):
+        """Writes are searchable at once, scoped to the user's rooms, titles drive suggestions."""
+        user = "search.user@maritime.com"
+        room = Room(
+            id=str(uuid.uuid4()),
+            title="Ocean Transfer Alpha",
+            location="Singapore Anchorage",
+            sts_eta=datetime.utcnow() + timedelta(days=10),
+            created_by=user,
+        )
+        other_room = Room(
+            id=str(uuid.uuid4()),
+            title="Ocean Private Bravo",
+            location="Fujairah",
+            sts_eta=datetime.utcnow() + timedelta(days=10),
+            created_by="someone.else@maritime.com",
+        )
+        db_session.add_all([room, other_room])
+        db_session.add(Party(room_id=room.id, role="owner", name="Search User", email=user))
+        vessel = Vessel(
+            room_id=room.id, name="Nordic Star", vessel_type="Crude Tanker",
+            flag="Norway", imo="9876543",
+        )
+        db_session.add(vessel)
+        db_session.add_all(
+            Message(
+                room_id=room.id, sender_email=user, sender_name="Search User",
+                content=f"pumping rate update {n}" if n % 50 else "ocean swell delaying mooring",
+            )
+            for n in range(150)
+        )
+        await db_session.commit()
+
+        room_ids = [room.id]
+
+        # Prefix match, scoped to the user's rooms
+        hits = await search_index_service.search(db_session, "oce", room_ids, ROOM)
+        assert [hit.entity_id for hit in hits] == [room.id]
+        hits = await search_index_service.search(db_session, "98765", room_ids, VESSEL)
+        assert [hit.entity_id for hit in hits] == [str(vessel.id)]
+        hits = await search_index_service.search(db_session, "ocean mooring", room_ids, MESSAGE)
+        assert len(hits) == 3
+
+        # Updates and deletes are reflected in the same transaction
+        vessel.name = "Southern Cross"
+        await db_session.commit()
+        assert await search_index_service.search(db_session, "nordic", room_ids, VESSEL) == []
+        assert len(await search_index_service.search(db_session, "southern", room_ids, VESSEL)) == 1
+        await db_session.delete(vessel)
+        await db_session.commit()
+        assert await search_index_service.search(db_session, "southern", room_ids, VESSEL) == []
+
+        # Suggestions come from titles only
+        suggestions = await search_service.get_search_suggestions("ocean tr", user, db_session)
+        assert [s["text"] for s in suggestions] == ["Ocean Transfer Alpha"]
+
+    async def test_fts_rows_survive_vacuum(self, db_session):
+        """The FTS index keys on doc_rowid, which VACUUM cannot renumber."""
+        room = Room(id=str(uuid.uuid4()), title="Vacuum Room", location="Fujairah",
+                    sts_eta=datetime.utcnow(), created_by="ops@bench.test")
+        vessels = [
+            Vessel(room_id=room.id, name=f"Tanker {word}", vessel_type="Crude Tanker",
+                   flag="Malta", imo=f"{9600000 + n}")
+            for n, word in enumerate(["alpha", "bravo", "charlie", "delta", "echo", "foxtrot"])
+        ]
+        db_session.add(room)
+        db_session.add_all(vessels)
+        await db_session.commit()
+
+        # Gaps in the key are what VACUUM would otherwise close up
+        for vessel in vessels[:3]:
+            await db_session.delete(vessel)
+        await db_session.commit()
+
+        async with db_session.bind.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.exec_driver_sql("VACUUM")
+
+        aliased = await db_session.execute(
+            text("SELECT count(*) FROM search_index WHERE rowid != doc_rowid")
+        )
+        assert aliased.scalar() == 0
+        hits = await search_index_service.search(db_session, "foxtrot", [room.id], VESSEL)
+        assert [hit.entity_id for hit in hits] == [str(vessels[5].id)]
+        hits = await search_index_service.search(db_session, "tanker", [room.id], VESSEL)
+        assert sorted(hit.title for hit in hits) == ["Tanker delta", "Tanker echo", "Tanker foxtrot"]
+
+    async def test_filters_reach_past_the_first_index_page(self, db_session):
+        """Filtered categories read further index pages until the limit is met."""
+        room = Room(id=str(uuid.uuid4()), title="Filter Room", location="Malta",
+                    sts_eta=datetime.utcnow(), created_by="ops@bench.test")
+        db_session.add(room)
+        # Equal ranks: the index returns these in insertion order, so the
+        # Norwegian flags sit well past the first over-fetched page
+        db_session.add_all(
+            Vessel(room_id=room.id, name=f"Tanker {n}", vessel_type="Crude Tanker",
+                   flag="Norway" if n >= 40 else "Malta", imo=f"{9700000 + n}")
+            for n in range(45)
+        )
+        await db_session.commit()
+
+        found = await search_service._search_vessels(
+            "tanker", [room.id], {"flag": "Norway"}, db_session, 4
+        )
+        assert len(found) == 4
+        assert {vessel["flag"] for vessel in found} == {"Norway"}
+
+        found = await search_service._search_vessels(
+            "tanker", [room.id], {"flag": "Norway"}, db_session, 10
+        )
+        assert len(found) == 5
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestSearchFanOut:
+    """Categories that time out or fail give partial, uncached results."""
+
+    async def test_timed_out_and_failed_categories(self, db_session):
+        """A stuck or raising category is reported and the partial result is not cached."""
+        user = "partial.user@maritime.com"
+        room = Room(
+            id=str(uuid.uuid4()),
+            title="Pilot Transfer Echo",
+            location="Rotterdam",
+            sts_eta=datetime.utcnow() + timedelta(days=10),
+            created_by=user,
+        )
+        db_session.add(room)
+        db_session.add(Party(room_id=room.id, role="owner", name="Partial User", email=user))
+        db_session.add(Vessel(room_id=room.id, name="Pilot Queen", vessel_type="Crude Tanker",
+                              flag="Malta", imo="9123457"))
+        db_session.add_all(
+            Message(room_id=room.id, sender_email=user, sender_name="Partial User",
+                    content=f"pilot boarding {n}")
+            for n in range(20)
+        )
+        await db_session.commit()
+
+        service = SearchService(
+            session_factory=sessionmaker(db_session.bind, class_=AsyncSession, expire_on_commit=False)
+        )
+        service.search_config["category_timeout_seconds"] = 0.5
+
+        # A category stuck past its timeout is dropped; the rest still answer
+        async def stuck(*args, **kwargs):
+            await asyncio.sleep(5)
+
+        service._search_activities = stuck
+        start = time.perf_counter()
+        result = await service.global_search("pilot", user, {}, db_session)
+        assert time.perf_counter() - start < 1.5
+        assert result["partial"] is True
+        assert result["timed_out_categories"] == ["activities"]
+        assert len(result["results"]["messages"]) == service.search_config["max_results"] // 5
+
+        # Partial results are not cached
+        misses = service.cache_misses
+        await service.global_search("pilot", user, {}, db_session)
+        assert service.cache_misses == misses + 1
+        assert service.get_cache_stats()["category_timeouts"] == 2
+
+        # A category that raises is reported, and its empty result not cached
+        async def broken(*args, **kwargs):
+            raise RuntimeError("index unavailable")
+
+        service._search_vessels = service._search_activities = broken
+        result = await service.global_search("queen", user, {}, db_session)
+        assert result["partial"] is True
+        assert result["timed_out_categories"] == []
+        assert result["failed_categories"] == ["vessels", "activities"]
+        misses = service.cache_misses
+        await service.global_search("queen", user, {}, db_session)
+        assert service.cache_misses == misses + 1
+        assert service.get_cache_stats()["category_failures"] == 4
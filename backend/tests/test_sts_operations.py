@@ -326,6 +326,21 @@ class TestEmailService:
         assert all(isinstance(v, bool) for v in results.values())
 
 
+class TestOperationRegions:
+    """Test region names stored on operations"""
+
+    def test_operation_sessions_use_room_regions(self):
+        """STS sessions store the same region names as rooms, old names included"""
+        from app.regions import operation_region
+
+        assert operation_region(None, "Singapore Strait") == "Southeast Asia"
+        assert operation_region("middle east", "Singapore Strait") == "Middle East"
+        # Pre-app.regions names, as migration 023 rewrites them
+        assert operation_region("Asia", "Tokyo Bay, Japan") == "East Asia"
+        assert operation_region("Europe", "Offshore") == "Europe/Mediterranean"
+        assert operation_region(None, "Offshore") is None
+
+
 # Fixtures
 @pytest.fixture
 def client():
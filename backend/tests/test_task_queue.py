@@ -0,0 +1,189 @@
+"""
+Unit tests for the durable background task queue
+Tests retries, deduplication, leases, the status endpoints and producers
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.dependencies import get_current_user
+from app.main import app
+from app.models import BackgroundTaskRecord, Notification, User
+from app.services import task_queue_backends
+from app.services.background_task_service import (BackgroundTaskService,
+                                                  background_task_service)
+from app.services.notification_inbox_service import notification_inbox_service
+from app.services.notification_service import NotificationService
+from app.services.ocr_service import OCRQueueFullError, OCRService
+from app.services.task_queue_backends import (RedisStreamTaskQueueBackend,
+                                              SQLTaskQueueBackend)
+
+
+async def _queue(tmp_path, **kwargs):
+    """Service backed by its own SQLite file, like a separate worker process."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'queue.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(BackgroundTaskRecord.__table__.create)
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    service = BackgroundTaskService(
+        backend=SQLTaskQueueBackend(factory), poll_interval=0.02, **kwargs
+    )
+    return service, engine
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestDurableTaskQueue:
+    """Test delivery guarantees of the SQL-backed queue."""
+
+    async def test_retries_dedup_and_visibility_timeout(self, tmp_path):
+        """Failures retry with backoff, duplicates collapse, lapsed leases are redelivered."""
+        service, engine = await _queue(tmp_path)
+        calls = []
+
+        async def flaky(task):
+            calls.append(task.attempts)
+            if task.attempts < 3:
+                raise RuntimeError("storage unavailable")
+            return {"attempt": task.attempts}
+
+        service.register_handler("flaky", flaky, max_attempts=3, retry_backoff_seconds=0.01)
+
+        try:
+            first = await service.create_task("flaky", {}, dedup_key="room-1")
+            duplicate = await service.create_task("flaky", {}, dedup_key="room-1")
+            assert duplicate == first
+
+            await service.start()
+            status = await service.wait_for_task(first, timeout=5, poll_interval=0.01)
+            assert status["status"] == "completed"
+            assert status["attempts"] == 3
+            assert status["result"] == {"attempt": 3}
+            assert calls == [1, 2, 3]
+            assert service.counters["flaky"]["retried"] == 2
+
+            # Key is released once the task is finished
+            again = await service.create_task("flaky", {}, dedup_key="room-1")
+            assert again != first
+            await service.stop()
+
+            # A worker that dies holding a lease: another worker gets the task
+            crashed = await service.backend.claim("flaky", "worker-a", 1, visibility_timeout=0.05)
+            assert [t.task_id for t in crashed] == [again]
+            assert await service.backend.claim("flaky", "worker-b", 1, visibility_timeout=0.05) == []
+            await asyncio.sleep(0.1)
+            redelivered = await service.backend.claim("flaky", "worker-b", 1, visibility_timeout=30)
+            assert [t.task_id for t in redelivered] == [again]
+            assert redelivered[0].attempts == 2
+        finally:
+            await service.stop()
+            await engine.dispose()
+
+    async def test_snapshot_task_status_endpoint(self, async_client, tmp_path):
+        """/snapshots/tasks/{task_id} reads task state from the queue."""
+        service, engine = await _queue(tmp_path)
+        previous_backend = background_task_service._backend
+        background_task_service.use_backend(service.backend)
+        app.dependency_overrides[get_current_user] = lambda: User(
+            email="admin@maritime.com", name="Admin", role="admin"
+        )
+        try:
+            task_id = await background_task_service.create_task(
+                "generate_pdf", {"snapshot_id": "s1"}, task_id="snapshot-s1"
+            )
+            response = await async_client.get(f"/api/v1/snapshots/tasks/{task_id}")
+            assert response.status_code == 200
+            body = response.json()
+            assert body["status"] == "pending"
+            assert body["priority"] == "low"
+
+            stats = await async_client.get("/api/v1/snapshots/queue/stats")
+            assert stats.status_code == 200
+            assert stats.json()["queue"]["generate_pdf"]["pending"]["low"] == 1
+
+            missing = await async_client.get("/api/v1/snapshots/tasks/unknown")
+            assert missing.status_code == 404
+        finally:
+            background_task_service._backend = previous_backend
+            app.dependency_overrides.pop(get_current_user, None)
+            await engine.dispose()
+
+    async def test_ocr_job_status_is_shared_between_workers(self, tmp_path):
+        """An OCR job queued on one worker is visible to any other, and room-scoped."""
+        service, engine = await _queue(tmp_path)
+        other_worker, other_engine = await _queue(tmp_path)
+        previous_backend = background_task_service._backend
+        background_task_service.use_backend(service.backend)
+        ocr = OCRService(enable_ocr=False, max_queue_size=1)
+        try:
+            job = await ocr.enqueue_job(tmp_path / "q88.pdf", ".pdf", "room-1", "doc-1")
+            assert job["status"] == "queued"
+            again = await ocr.enqueue_job(tmp_path / "q88.pdf", ".pdf", "room-1", "doc-1")
+            assert again["job_id"] == job["job_id"]
+
+            background_task_service.use_backend(other_worker.backend)
+            polled = await ocr.get_queued_job("room-1", job["job_id"])
+            assert polled["status"] == "queued"
+            assert await ocr.get_queued_job("room-2", job["job_id"]) is None
+
+            with pytest.raises(OCRQueueFullError):
+                await ocr.enqueue_job(tmp_path / "sire.pdf", ".pdf", "room-1", "doc-2")
+            assert ocr.stats["rejected"] == 1
+        finally:
+            background_task_service._backend = previous_backend
+            await engine.dispose()
+            await other_engine.dispose()
+
+    async def test_notification_producers_use_the_queue(self, db_session):
+        """Queued sends and approval reminders become send_notification tasks."""
+        factory = sessionmaker(db_session.bind, class_=AsyncSession, expire_on_commit=False)
+        previous_backend = background_task_service._backend
+        previous_factory = notification_inbox_service.session_factory
+        background_task_service.use_backend(SQLTaskQueueBackend(factory))
+        notification_inbox_service.session_factory = factory
+        try:
+            result = await NotificationService().queue_notification_with_retry(
+                "captain@maritime.com", "room_created", data={"room_title": "STS Fujairah"}
+            )
+            assert result["status"] == "queued"
+            task = await background_task_service.get_task_status(result["notification_id"])
+            assert task["task_type"] == "send_notification" and task["priority"] == "high"
+
+            await background_task_service.run_pending()
+            status = await background_task_service.wait_for_task(
+                result["notification_id"], timeout=5, poll_interval=0.01
+            )
+            assert status["status"] == "completed"
+            stored = await db_session.execute(
+                select(Notification).where(Notification.user_email == "captain@maritime.com")
+            )
+            assert [n.title for n in stored.scalars()] == ["New Room Created"]
+        finally:
+            background_task_service._backend = previous_backend
+            notification_inbox_service.session_factory = previous_factory
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestRedisStreamBackend:
+    """Test the Redis Streams queue backend."""
+
+    async def test_redis_backend_publishes_after_commit(self, db_session, mock_redis):
+        """Tasks enqueued in a transaction reach Redis only once it commits."""
+        service = BackgroundTaskService(backend=RedisStreamTaskQueueBackend(mock_redis))
+
+        rolled_back = await service.create_task("send_notification", {"n": 1}, session=db_session)
+        await db_session.rollback()
+        committed = await service.create_task("send_notification", {"n": 2}, session=db_session)
+        mock_redis.xadd.assert_not_awaited()
+        mock_redis.set.assert_not_awaited()
+
+        await db_session.commit()
+        await asyncio.gather(*task_queue_backends._publishing)
+        published = [call.args[1]["task_id"] for call in mock_redis.xadd.await_args_list]
+        assert published == [committed]
+        assert rolled_back not in published
@@ -0,0 +1,183 @@
+"""
+Unit tests for vessel access
+Tests the user_vessel_access grants and access-scoped operation pages
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.models import Message, Room, User, UserVesselAccess, Vessel
+from app.regions import normalize_region
+from app.vessel_access import accessible_operations, rebuild_vessel_access
+
+
+async def _grants(db_session):
+    result = await db_session.execute(select(
+        UserVesselAccess.user_email, UserVesselAccess.vessel_id, UserVesselAccess.reason
+    ))
+    return set(result.all())
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestVesselAccessIndex:
+    """Vessel grants are materialized on write."""
+
+    async def test_grants_follow_vessels_and_users(self, db_session):
+        """Grants record their reason and move with companies, roles and owners."""
+        room = Room(id="room-grants", title="Grants", location="Fujairah",
+                    sts_eta=datetime.utcnow(), created_by="ops@bench.test")
+        owner = User(email="owner@acme.test", name="Owner", role="owner", company="Acme")
+        charterer = User(email="charter@blue.test", name="Charterer", role="charterer",
+                         company="Blue Charters Inc")
+        broker = User(email="broker@bench.test", name="Broker", role="broker", company="Acme")
+        first = Vessel(id="vessel-first", room_id="room-grants", name="First",
+                       vessel_type="Crude Tanker", flag="Malta", imo="9300001",
+                       owner="ACME Shipping Ltd", charterer="Blue Charters")
+        second = Vessel(id="vessel-second", room_id="room-grants", name="Second",
+                        vessel_type="Crude Tanker", flag="Malta", imo="9300002",
+                        owner="Other Owners")
+        db_session.add_all([room, owner, charterer, broker, first, second])
+        await db_session.commit()
+
+        # Brokers see everything without rows; either name may contain the other
+        assert await _grants(db_session) == {
+            ("owner@acme.test", "vessel-first", "owner"),
+            ("charter@blue.test", "vessel-first", "charterer"),
+        }
+
+        owner.company = "Other Owners Group"
+        second.charterer = "Blue Charters Inc"
+        await db_session.commit()
+        assert await _grants(db_session) == {
+            ("owner@acme.test", "vessel-second", "owner"),
+            ("charter@blue.test", "vessel-first", "charterer"),
+            ("charter@blue.test", "vessel-second", "charterer"),
+        }
+
+        charterer.role = "seller"
+        await db_session.delete(second)
+        await db_session.commit()
+        assert await _grants(db_session) == set()
+
+        owner.email = "owner@acme-group.test"
+        first.owner = "Other Owners"
+        await db_session.commit()
+        assert await _grants(db_session) == {
+            ("owner@acme-group.test", "vessel-first", "owner"),
+        }
+
+    async def test_index_matches_reference_rules(self, db_session):
+        """Flush maintenance and a full rebuild agree with the access rules."""
+        rng = random.Random(25)
+        companies = ["Acme", "Acme Shipping", "Blue", "Blue Charters", "Nordic", "", None]
+        db_session.add_all([
+            Room(id=f"room-ref-{n}", title=f"Room {n}", location="Singapore",
+                 sts_eta=datetime.utcnow(), created_by="ops@bench.test")
+            for n in range(20)
+        ])
+        users = [
+            User(email=f"user-{n}@bench.test", name=f"User {n}",
+                 role=rng.choice(["owner", "charterer", "broker", "seller"]),
+                 company=rng.choice(companies))
+            for n in range(40)
+        ]
+        vessels = [
+            Vessel(id=f"vessel-ref-{n}", room_id=f"room-ref-{n % 20}", name=f"Vessel {n}",
+                   vessel_type="Crude Tanker", flag="Malta", imo=f"{9400000 + n}",
+                   owner=rng.choice(companies[:-1]), charterer=rng.choice(companies))
+            for n in range(100)
+        ]
+        db_session.add_all(users + vessels)
+        await db_session.commit()
+
+        def matches(vessel_company, user_company):
+            vessel_company, user_company = (vessel_company or "").lower(), (user_company or "").lower()
+            return bool(vessel_company and user_company) and (
+                vessel_company in user_company or user_company in vessel_company
+            )
+
+        def reference():
+            return {
+                (user.email, vessel.id, user.role)
+                for user in users
+                for vessel in vessels
+                if (user.role == "owner" and matches(vessel.owner, user.company))
+                or (user.role == "charterer" and matches(vessel.charterer, user.company))
+            }
+
+        assert await _grants(db_session) == reference()
+
+        for user in rng.sample(users, 10):
+            user.company = rng.choice(companies)
+            user.role = rng.choice(["owner", "charterer"])
+        for vessel in rng.sample(vessels, 20):
+            vessel.owner = rng.choice(companies[:-1])
+        await db_session.commit()
+        expected = reference()
+        assert expected and await _grants(db_session) == expected
+
+        assert await rebuild_vessel_access(db_session) == len(expected)
+        assert await _grants(db_session) == expected
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestAccessScopedOperations:
+    """Operation pages carry their counts and honour regions and companies."""
+
+    async def test_counts_regions_and_company_names(self, db_session):
+        """Counts and last activity come with the page; company names are not patterns."""
+        base = datetime.utcnow() - timedelta(days=365)
+        locations = ["Singapore Strait", "Rotterdam", "Fujairah", "Houston"]
+        users = {
+            (role, company): User(email=f"{role}-{company}@bench.test", name=role,
+                                  role=role, company=company)
+            for role, company in [("owner", "ACME"), ("owner", ""), ("owner", "100%"),
+                                  ("owner", "1%0"), ("seller", "Acme"), ("broker", None)]
+        }
+        db_session.add_all(users.values())
+        for n in range(200):
+            db_session.add(Room(id=f"room-{n:06d}", title=f"Operation {n}",
+                                location=locations[n % 4], sts_eta=base + timedelta(days=40),
+                                created_by="ops@bench.test", created_at=base + timedelta(minutes=n)))
+            db_session.add(Vessel(id=f"vessel-{n:06d}", room_id=f"room-{n:06d}",
+                                  name=f"Vessel {n}", vessel_type="Crude Tanker", flag="Malta",
+                                  imo=f"{9200000 + n}",
+                                  owner="Acme Shipping Ltd" if n % 10 == 0 else "Other 100% Owners"))
+        db_session.add(Vessel(id="vessel-extra", room_id="room-000000", name="Second",
+                              vessel_type="Product Tanker", flag="Malta", imo="9299999",
+                              owner="Other 100% Owners"))
+        db_session.add(Message(room_id="room-000000", sender_email="ops@bench.test",
+                               sender_name="Ops", content="done",
+                               created_at=base + timedelta(days=2)))
+        await db_session.commit()
+
+        rows, _ = await accessible_operations(
+            db_session, users["owner", "ACME"], [Room.id == "room-000000"]
+        )
+        assert rows[0].vessel_count == 2 and rows[0].user_vessels == 1
+        assert rows[0].last_activity.replace(tzinfo=None) == base + timedelta(days=2)
+
+        # Region filter on the normalized column, populated on insert
+        rows, _ = await accessible_operations(
+            db_session, users["broker", None], [Room.region == normalize_region("singapore")],
+            limit=50
+        )
+        assert len(rows) == 50
+        assert {row.room.location for row in rows} == {"Singapore Strait"}
+
+        # Region follows location changes
+        room = (await db_session.execute(select(Room).where(Room.id == "room-000004"))).scalar_one()
+        room.location = "Rotterdam anchorage"
+        await db_session.commit()
+        assert room.region == "Europe/Mediterranean"
+
+        # Roles without vessel rules, and company names are not patterns
+        for key, count in [(("seller", "Acme"), 0), (("owner", ""), 0),
+                           (("owner", "100%"), 5), (("owner", "1%0"), 0)]:
+            rows, _ = await accessible_operations(db_session, users[key], limit=5)
+            assert len(rows) == count